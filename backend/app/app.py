@@ -2,20 +2,33 @@ import requests
 import psycopg2
 import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import spacy
-from flask import Flask, request, jsonify
-from .query_mapping import query_mappings
+from flask import Flask, Response, request, jsonify
+from .query_mapping import MAPEAMENTOS_LISTA, query_mappings
+from .deadline import Deadline, DeadlineExcedido, LOG_TIMEOUT_MS
+from .aquecimento import Aquecimento, ModeloPreguicoso
+from . import (conexoes, cubo_vendas, entidades, extracao, lematizador, metrics, ortografia, parametros, profiling,
+               serializacao, snapshot_vendas, tracing)
 
 # ------------------------------------------------------------
 # Configuração básica de logging
 # ------------------------------------------------------------
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# ------------------------------------------------------------
+# Subida do processo: as etapas do import são medidas aqui e as lentas (spaCy,
+# banco, cache_dados) rodam em paralelo a partir de iniciar_aquecimento()
+# ------------------------------------------------------------
+aquecimento = Aquecimento()
+
 # ------------------------------------------------------------
 # Carregar variáveis do .env e validar obrigatoriedade
 # ------------------------------------------------------------
-load_dotenv()
+with aquecimento.medir('dotenv'):
+    load_dotenv()
 required_vars = ['DB_HOST', 'DB_PORT', 'DB_NAME', 'DB_USER', 'DB_PASSWORD', 'GEMINI_API_KEY']
 missing = [v for v in required_vars if not os.getenv(v)]
 if missing:
@@ -23,14 +36,52 @@ if missing:
     exit(1)
 
 # ------------------------------------------------------------
-# Carregar modelo spaCy (português) dentro de try/except
+# Modelo spaCy (português): carregado na etapa 'spacy' do aquecimento ou, se
+# usado antes disso, no primeiro uso
 # ------------------------------------------------------------
-try:
-    nlp = spacy.load("pt_core_news_sm")
-except Exception as e:
-    logging.error("Não foi possível carregar o modelo spaCy 'pt_core_news_sm'. "
-                  "Verifique se instalou com: python -m spacy download pt_core_news_sm")
-    exit(1)
+MODELO_SPACY = 'pt_core_news_sm'
+
+
+def carregar_spacy():
+    try:
+        return spacy.load(MODELO_SPACY)
+    except Exception as e:
+        raise RuntimeError(f"Não foi possível carregar o modelo spaCy '{MODELO_SPACY}' ({e}). "
+                           f"Verifique se instalou com: python -m spacy download {MODELO_SPACY}") from e
+
+
+nlp = ModeloPreguicoso(carregar_spacy)
+
+# ------------------------------------------------------------
+# Tabela de lemas do vocabulário conhecido (caminho rápido sem spaCy); None
+# se o arquivo não existe ou foi gerado com outra versão do modelo. A versão
+# vem do pacote instalado, sem carregar o modelo: com a tabela, perguntas do
+# vocabulário conhecido são roteadas antes de o spaCy terminar de carregar.
+# ------------------------------------------------------------
+with aquecimento.medir('tabela_lemas'):
+    _versao_spacy = spacy.util.get_package_version(MODELO_SPACY)
+    tabela_lemas = lematizador.carregar(modelo=f"{MODELO_SPACY}-{_versao_spacy}" if _versao_spacy else None)
+
+# ------------------------------------------------------------
+# Corretor de erros de digitação usado antes do roteamento: vocabulário das
+# frases de query_mappings; stopwords (da língua, sem depender do modelo),
+# meses e nomes do banco (em carregar_cache_dados) entram só como palavras válidas.
+# Tokens desconhecidos só são corrigidos depois que o léxico geral do português
+# é carregado (etapa 'lexico' do aquecimento); até lá, só os acentos.
+# ------------------------------------------------------------
+corretor = None
+if ortografia.CORRECAO_ORTOGRAFICA:
+    with aquecimento.medir('corretor'):
+        corretor = ortografia.CorretorOrtografico(ortografia.vocabulario_dos_mapeamentos())
+        corretor.incluir(spacy.util.get_lang_class('pt').Defaults.stop_words)
+        corretor.incluir(extracao.MESES)
+
+
+def carregar_lexico_ortografico():
+    """Entrega ao corretor o léxico geral; sem o arquivo, ele só restaura acentos."""
+    lexico = ortografia.carregar_lexico()
+    if lexico is not None:
+        corretor.lexico = lexico
 
 # ------------------------------------------------------------
 # Instruções fixas (para contexto do Assistente, não ao usuário)
@@ -87,18 +138,33 @@ Você é o Assistente Virtual **Sophos**, integrado ao banco de dados da agênci
 historico_conversa = []
 
 # ------------------------------------------------------------
-# Cache global para dados essenciais (preenchido em verificar_banco)
+# Cache global para dados essenciais (preenchido em carregar_cache_dados)
 # ------------------------------------------------------------
 cache_dados = {}
+# Índice dos nomes de cache_dados (funcionários, clientes, departamentos, projetos)
+indice_entidades = entidades.IndiceEntidades()
+# Intervalo em segundos para recarregar cache_dados e o índice (0 desliga)
+CACHE_DADOS_INTERVALO = float(os.getenv('CACHE_DADOS_INTERVALO', '0'))
 
 # ------------------------------------------------------------
-# Função: verificar se as tabelas e dados existem
+# Limites dos resultados SQL enviados ao Gemini
 # ------------------------------------------------------------
-def verificar_banco():
+# Máximo de caracteres de resultados no prompt, somando todos os mapeamentos
+PROMPT_DADOS_MAX_CHARS = int(os.getenv('PROMPT_DADOS_MAX_CHARS', '60000'))
+# Linhas buscadas por FETCH nos cursores no servidor dos mapeamentos de lista
+CURSOR_LOTE_LINHAS = int(os.getenv('CURSOR_LOTE_LINHAS', '2000'))
+
+# ------------------------------------------------------------
+# Função: abre uma conexão com o banco a partir do .env
+# ------------------------------------------------------------
+def abrir_conexao(deadline=None):
     """
-    Função para verificar se as tabelas essenciais e dados estão presentes no banco.
-    Em caso de falha na conexão ou tabelas faltando, encerra o programa.
+    Abre uma nova conexão com o banco. Se houver deadline, o tempo de conexão
+    também fica limitado ao orçamento restante da requisição.
     """
+    extras = {}
+    if deadline is not None:
+        extras['connect_timeout'] = deadline.connect_timeout_s()
     try:
         conn = psycopg2.connect(
             host=os.getenv('DB_HOST'),
@@ -106,76 +172,206 @@ def verificar_banco():
             dbname=os.getenv('DB_NAME'),
             user=os.getenv('DB_USER'),
             password=os.getenv('DB_PASSWORD'),
-            sslmode='require'
+            sslmode=os.getenv('DB_SSLMODE', 'require'),
+            **extras
         )
+    except Exception:
+        metrics.DB_CONEXOES_ERROS_TOTAL.inc()
+        raise
+    return metrics.ConexaoMonitorada(conn)
+
+
+# Pool de conexões (DB_POOL_MAX=0 desliga): as SQLs do catálogo ficam preparadas em cada conexão
+pool = conexoes.PoolConexoes(abrir_conexao, conexoes.DB_POOL_MAX) if conexoes.DB_POOL_MAX > 0 else None
+
+
+def get_db_connection(deadline=None):
+    """
+    Conexão com o banco: emprestada do pool, se ligado, ou uma nova. Em ambos
+    os casos, close() encerra o uso (no pool, desfaz a transação e devolve).
+    """
+    if pool is None:
+        return abrir_conexao(deadline)
+    return pool.emprestar(deadline)
+
+# ------------------------------------------------------------
+# Estruturas em memória (opcionais) que respondem sem ida ao banco:
+#   - snapshot colunar de vendas (VENDAS_SNAPSHOT=1): agregados simples;
+#   - cubo OLAP de vendas (CUBO_VENDAS=1): perguntas com vários filtros.
+# ------------------------------------------------------------
+snapshot = snapshot_vendas.SnapshotVendas(get_db_connection) if snapshot_vendas.VENDAS_SNAPSHOT else None
+cubo = cubo_vendas.CuboVendas(get_db_connection) if cubo_vendas.CUBO_VENDAS else None
+
+
+def iniciar_estruturas_em_memoria():
+    """
+    Inicia a carga e a atualização em segundo plano do snapshot e do cubo
+    habilitados e, com CACHE_DADOS_INTERVALO, a recarga de cache_dados.
+    """
+    for estrutura in (snapshot, cubo):
+        if estrutura is not None:
+            estrutura.iniciar()
+    if CACHE_DADOS_INTERVALO > 0:
+        threading.Thread(target=_recarregar_cache_dados, name='sophos-cache-dados', daemon=True).start()
+
+
+def responder_em_memoria(label, sql):
+    """
+    (linhas, fonte) do snapshot ou do cubo quando um deles responde o
+    mapeamento; (None, 'banco') quando a query precisa ir ao banco.
+    """
+    if snapshot is not None:
+        rows = snapshot.responder(label)
+        if rows is not None:
+            return rows, 'snapshot'
+    if cubo is not None:
+        rows = cubo.responder(label, sql)
+        if rows is not None:
+            return rows, 'cubo'
+    return None, 'banco'
+
+# ------------------------------------------------------------
+# Função: verificar se as tabelas e dados existem
+# ------------------------------------------------------------
+# Tabelas que devemos ter obrigatoriamente
+TABELAS_NECESSARIAS = [
+    'departamentos', 'funcionarios', 'clientes',
+    'projetos', 'vendas', 'contratos_marketing'
+]
+
+# Existência e linhas estimadas (pg_class.reltuples, sem varrer as tabelas) de
+# todas as tabelas numa consulta ao catálogo. reltuples é -1 (ou 0 nas versões
+# antigas) enquanto a tabela não passou por ANALYZE.
+SQL_VERIFICAR_TABELAS = """
+    SELECT t.nome, to_regclass(t.nome) IS NOT NULL AS existe, c.reltuples
+    FROM unnest(%s::text[]) AS t(nome)
+    LEFT JOIN pg_class c ON c.oid = to_regclass(t.nome);
+"""
+
+
+def verificar_banco():
+    """
+    Verifica se as tabelas essenciais existem e têm dados. Levanta
+    RuntimeError se faltar alguma tabela ou o banco não responder; tabelas
+    vazias só geram aviso. Retorna {tabela: linhas estimadas}.
+    """
+    conn = get_db_connection()
+    try:
         cur = conn.cursor()
+        try:
+            cur.execute(SQL_VERIFICAR_TABELAS, (TABELAS_NECESSARIAS,))
+            linhas = cur.fetchall()
+
+            faltando = [nome for nome, existe, _estimativa in linhas if not existe]
+            if faltando:
+                raise RuntimeError(f"Tabela(s) essenciais faltando no banco: {', '.join(faltando)}. "
+                                   "Corrija o schema e tente de novo.")
+
+            estimativas = {}
+            for nome, _existe, estimativa in linhas:
+                if estimativa is None or estimativa <= 0:
+                    # Sem estatísticas (ou estatística antiga de tabela vazia): confere sem contar tudo
+                    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {nome})")
+                    estimativa = 1 if cur.fetchone()[0] else 0
+                estimativas[nome] = int(estimativa)
+                if estimativa == 0:
+                    logging.warning(f"A tabela '{nome}' está vazia. Nenhum registro encontrado.")
+        finally:
+            cur.close()
+    finally:
+        conn.close()
 
-        # Tabelas que devemos ter obrigatoriamente
-        tabelas_necessarias = [
-            'departamentos', 'funcionarios', 'clientes',
-            'projetos', 'vendas', 'contratos_marketing'
-        ]
-        erro = False
-
-        for tabela in tabelas_necessarias:
-            cur.execute(f"SELECT to_regclass('{tabela}')")
-            resultado = cur.fetchone()[0]
-            if resultado is None:
-                logging.error(f"A tabela '{tabela}' não foi encontrada no banco de dados.")
-                erro = True
-
-        if erro:
-            logging.error("Uma ou mais tabelas essenciais estão faltando. Corrija o schema e tente de novo.")
-            exit(1)
-
-        # Verificar se existem ao menos 1 registro em cada tabela
-        for tabela in tabelas_necessarias:
-            cur.execute(f"SELECT COUNT(*) FROM {tabela}")
-            count = cur.fetchone()[0]
-            if count == 0:
-                logging.warning(f"A tabela '{tabela}' está vazia. Nenhum registro encontrado.")
-
-        # Carregar dados essenciais em cache
-        departamentos = executar_query("SELECT nome FROM departamentos;")
-        funcionarios = executar_query("""
-            SELECT f.nome, f.cargo, d.nome AS departamento
+    logging.info("Verificação do banco de dados concluída com sucesso (linhas estimadas: "
+                 + ', '.join(f"{nome}={n}" for nome, n in estimativas.items()) + ").")
+    return estimativas
+
+
+def iniciar_aquecimento():
+    """
+    Carrega o modelo spaCy, verifica o banco e carrega cache_dados e o léxico
+    do corretor em paralelo (o estado aparece em /pronto e /vivo) e inicia as
+    estruturas em memória.
+    """
+    aquecimento.etapa('spacy', nlp.carregar)
+    aquecimento.etapa('banco', verificar_banco)
+    aquecimento.etapa('cache_dados', carregar_cache_dados)
+    if corretor is not None:
+        aquecimento.etapa('lexico', carregar_lexico_ortografico)
+    aquecimento.iniciar()
+    iniciar_estruturas_em_memoria()
+
+# ------------------------------------------------------------
+# Função: carrega os dados essenciais em cache_dados e no índice de entidades
+# ------------------------------------------------------------
+def carregar_cache_dados():
+    """
+    Lê os dados essenciais para cache_dados e atualiza o índice de entidades
+    só com os nomes que mudaram. Uma query que falhar mantém o valor anterior.
+    """
+    global cache_dados
+    novos = {
+        'departamentos': executar_query("SELECT nome, id FROM departamentos;"),
+        'funcionarios': executar_query("""
+            SELECT f.nome, f.cargo, d.nome AS departamento, f.id
             FROM funcionarios f
             JOIN departamentos d ON f.departamento_id = d.id;
-        """)
-        clientes = executar_query("SELECT nome_empresa FROM clientes;")
-        projetos = executar_query("SELECT nome, status FROM projetos;")
-        vendas = executar_query("SELECT valor, status_pagamento FROM vendas;")
-
-        # Preencher cache
-        global cache_dados
-        cache_dados = {
-            'departamentos': departamentos,
-            'funcionarios': funcionarios,
-            'clientes': clientes,
-            'projetos': projetos,
-            'vendas': vendas
-        }
-
-        logging.info("Verificação do banco de dados concluída com sucesso.")
-    except Exception as e:
-        logging.error(f"Erro ao se conectar ou verificar o banco de dados: {e}")
-        exit(1)
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close()
+        """),
+        'clientes': executar_query("SELECT nome_empresa, id FROM clientes;"),
+        'projetos': executar_query("SELECT nome, status, id FROM projetos;"),
+        'vendas': executar_query("SELECT valor, status_pagamento FROM vendas;"),
+    }
+    cache_dados = {chave: valor if valor is not None else cache_dados.get(chave)
+                   for chave, valor in novos.items()}
+
+    # (nome, id) de cada grupo; o id é a última coluna
+    for grupo in ('funcionarios', 'clientes', 'departamentos', 'projetos'):
+        if novos[grupo] is not None:
+            incluidos, removidos = indice_entidades.atualizar(
+                grupo, [(linha[0], linha[-1]) for linha in novos[grupo]])
+            if incluidos or removidos:
+                logging.info(f"Índice de entidades [{grupo}]: +{incluidos} -{removidos} nome(s).")
+            if corretor is not None:
+                # Só acrescenta: um nome removido continua valendo como palavra conhecida
+                corretor.incluir(p for linha in novos[grupo] for p in ortografia.palavras(linha[0]))
+
+
+def _recarregar_cache_dados():
+    while True:
+        time.sleep(CACHE_DADOS_INTERVALO)
+        try:
+            carregar_cache_dados()
+        except Exception as e:
+            logging.error(f"Erro ao recarregar cache_dados: {e}")
 
 # ------------------------------------------------------------
 # Função auxiliar: extrair lemas sem stopwords nem pontuação
 # ------------------------------------------------------------
+def lematizar(texto):
+    """
+    (lemas, caminho): pela tabela de lemas quando todas as palavras do texto
+    estão nela ('tabela'), senão pelo spaCy ('spacy').
+    """
+    if tabela_lemas is not None:
+        lemas = tabela_lemas.lemas(texto)
+        if lemas is not None:
+            return lemas, 'tabela'
+    doc = nlp(texto.lower())
+    return {token.lemma_ for token in doc if token.is_alpha and not token.is_stop}, 'spacy'
+
+
 def extrair_lemmas(texto):
     """
     Recebe uma string, tokeniza com spaCy e retorna um set com os lemas
-    (excluindo stopwords e tokens que não sejam alfabéticos).
+    (excluindo stopwords e tokens que não sejam alfabéticos). Textos só com
+    palavras da tabela de lemas não passam pelo spaCy.
     """
-    doc = nlp(texto.lower())
-    return {token.lemma_ for token in doc if token.is_alpha and not token.is_stop}
+    inicio = time.perf_counter()
+    lemas, caminho = lematizar(texto)
+    metrics.LEMATIZACAO_SEGUNDOS.observe(time.perf_counter() - inicio, caminho)
+    metrics.LEMATIZACAO_TOTAL.inc(caminho)
+    if tabela_lemas is not None:
+        metrics.CACHE_TOTAL.inc('tabela_lemas', 'hit' if caminho == 'tabela' else 'miss')
+    return lemas
 
 # ------------------------------------------------------------
 # Função: seleciona mapeamentos estáticos baseados em lemas
@@ -192,10 +388,7 @@ def selecionar_queries(pergunta):
         # Construir set de lemas a partir de todas as frases-chave
         chaves_lematizadas = set()
         for frase in palavras:
-            doc_frase = nlp(frase.lower())
-            for token in doc_frase:
-                if token.is_alpha and not token.is_stop:
-                    chaves_lematizadas.add(token.lemma_)
+            chaves_lematizadas |= lematizar(frase)[0]
 
         # Se houver interseção de lemas, considera-se compatível
         if chaves_lematizadas & lemmas_pergunta:
@@ -225,25 +418,85 @@ def gerar_query_dinamica(pergunta):
         return [('cliente-promissor', sql)]
     return []
 
+# ------------------------------------------------------------
+# Função: corrige erros de digitação antes do roteamento
+# ------------------------------------------------------------
+def corrigir_pergunta(pergunta):
+    """
+    Pergunta com os tokens trocados pela grafia do vocabulário dos mapeamentos
+    ("funcionarios", "salaro" -> "funcionários", "salário"), para a
+    lematização casar com as frases; sem corretor, a própria pergunta.
+    """
+    if corretor is None:
+        return pergunta
+    texto, correcoes = corretor.corrigir(pergunta)
+    if correcoes:
+        logging.info("Correções antes do roteamento: " + ', '.join(f"{a} -> {b}" for a, b in correcoes))
+    return texto
+
+# ------------------------------------------------------------
+# Função: decisão de roteamento (quais SQLs respondem a pergunta)
+# ------------------------------------------------------------
+def rotear_pergunta(pergunta):
+    """
+    Retorna a lista de (label, query_sql) escolhida para a pergunta, sem
+    executar nada (usada também pelo replay para medir drift de roteamento).
+    """
+    # 1. Perguntas sobre vendas que combinam filtros/agrupamentos vão para o cubo
+    #    (a SQL equivalente roda no banco se o cubo não estiver pronto)
+    consulta_cubo = cubo.interpretar(pergunta) if cubo is not None else None
+    if consulta_cubo is not None:
+        return [(cubo_vendas.LABEL, consulta_cubo.sql())]
+    # 2. Tentar mapeamento estático com lemmas, com os erros de digitação corrigidos
+    consultas = selecionar_queries(corrigir_pergunta(pergunta))
+    # 3. Se não houver mapeamento estático, tentar geração dinâmica
+    if not consultas:
+        consultas = gerar_query_dinamica(pergunta)
+    return consultas
+
+# ------------------------------------------------------------
+# Função: preenche os placeholders de um mapeamento com dados da pergunta
+# ------------------------------------------------------------
+def vincular_parametros(label, sql, pergunta):
+    """
+    (sql, params) prontos para executar: sem placeholders, (sql, None); com
+    placeholders ({id}, '{start_date}' ...), os valores extraídos da pergunta
+    (app/extracao.py) vão como parâmetros da query (app/parametros.py).
+    Retorna None, sem ir ao banco, se algum parâmetro não for encontrado.
+    """
+    nomes = parametros.nomes(sql)
+    if not nomes:
+        return sql, None
+    mencoes = entidades_spacy = None
+    if any(nome not in ('start_date', 'end_date') for nome in nomes):
+        # Uma passada pela pergunta no índice de entidades (app/entidades.py)
+        mencoes = indice_entidades.mencoes(pergunta)
+    if 'nome' in nomes or 'nome_empresa' in nomes:
+        entidades_spacy = [(ent.text, ent.label_) for ent in nlp(pergunta).ents]
+    valores = extracao.extrair(pergunta, label, nomes, mencoes, entidades_spacy)
+    faltando = [nome for nome in nomes if nome not in valores]
+    if faltando:
+        logging.info(f"Pulando [{label}]: parâmetro(s) ausente(s) na pergunta: {', '.join(faltando)}")
+        metrics.PARAMETROS_NAO_RESOLVIDOS_TOTAL.inc(label)
+        return None
+    return parametros.vincular(sql, valores)
+
 # ------------------------------------------------------------
 # Função: executa qualquer query SQL e retorna lista de tuplas
 # ------------------------------------------------------------
-def executar_query(query_sql):
+def executar_query(query_sql, deadline=None, params=None):
     """
-    Abre conexão, executa a query e retorna os resultados como lista de tuplas.
+    Abre conexão, executa a query (com os parâmetros, se houver) e retorna os
+    resultados como lista de tuplas. Com deadline, a query roda com
+    statement_timeout limitado ao orçamento restante.
     Em caso de erro, faz log e retorna None.
     """
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT'),
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            sslmode='require'
-        )
+        conn = get_db_connection(deadline)
         cur = conn.cursor()
-        cur.execute(query_sql)
+        timeout_ms = deadline.statement_timeout_ms() if deadline is not None else None
+        # SQLs do catálogo rodam como EXECUTE de uma SQL preparada na conexão do pool
+        conexoes.executar(conn, cur, query_sql, params, timeout_ms)
         rows = cur.fetchall()
         return rows
     except Exception as e:
@@ -255,6 +508,46 @@ def executar_query(query_sql):
         if 'conn' in locals():
             conn.close()
 
+# ------------------------------------------------------------
+# Função: executa uma query de lista com cursor no servidor
+# ------------------------------------------------------------
+def executar_query_em_fluxo(query_sql, deadline=None, params=None):
+    """
+    Executa a query com um cursor no servidor (DECLARE/FETCH) e retorna um
+    gerador das linhas, buscadas em lotes de CURSOR_LOTE_LINHAS conforme são
+    consumidas, em vez de trazer o resultado inteiro para a memória.
+    O primeiro lote é buscado aqui, para que erros de execução apareçam como
+    em executar_query: faz log e retorna None. Consumir o gerador até o fim
+    ou fechá-lo (close) encerra o cursor e a conexão.
+    """
+    try:
+        conn = get_db_connection(deadline)
+        if deadline is not None:
+            with conn.cursor() as cur_timeout:
+                cur_timeout.execute("SET LOCAL statement_timeout = %s", (deadline.statement_timeout_ms(),))
+        cur = conn.cursor(name='sophos_lista')
+        cur.execute(query_sql, params)
+        lote = cur.fetchmany(CURSOR_LOTE_LINHAS)
+    except Exception as e:
+        logging.error(f"Erro ao executar query: {e}\nQuery: {query_sql}")
+        if 'conn' in locals():
+            conn.close()
+        return None
+    return _linhas_do_cursor(conn, cur, lote, query_sql)
+
+
+def _linhas_do_cursor(conn, cur, lote, query_sql):
+    try:
+        while lote:
+            yield from lote
+            lote = cur.fetchmany(CURSOR_LOTE_LINHAS)
+    except Exception as e:
+        # Falha no meio da leitura: ficam as linhas já entregues
+        logging.error(f"Erro ao ler resultados: {e}\nQuery: {query_sql}")
+    finally:
+        # Fechar a conexão descarta o cursor e a transação no servidor
+        conn.close()
+
 # ------------------------------------------------------------
 # Função: formata lista de tuplas em texto legível para o usuário
 # ------------------------------------------------------------
@@ -262,31 +555,55 @@ def formatar_resultados(resultados):
     """
     Transforma lista de tuplas em linhas de texto. Se vazio ou None, retorna aviso.
     """
-    if not resultados:
-        return "Nenhum resultado encontrado."
-    linhas = []
-    for r in resultados:
-        linhas.append("- " + ", ".join(map(str, r)))
-    return "\n".join(linhas)
+    texto, _n_linhas, _truncado = formatar_linhas(resultados)
+    return texto
+
+
+def formatar_linhas(linhas, limite_chars=None):
+    """
+    Formata linhas (lista ou gerador) uma a uma e retorna (texto, linhas usadas,
+    truncado).
+    Com limite_chars, para de consumir ao atingir o limite e avisa no texto que
+    o resultado foi truncado; um gerador de executar_query_em_fluxo é fechado,
+    sem buscar no banco as linhas restantes.
+    """
+    if linhas is None:
+        return "Nenhum resultado encontrado.", 0, False
+    partes = []
+    total = 0
+    truncado = False
+    for r in linhas:
+        linha = "- " + ", ".join(map(str, r))
+        # A primeira linha sempre entra, para o Gemini ter ao menos um exemplo
+        if limite_chars is not None and partes and total + len(linha) + 1 > limite_chars:
+            truncado = True
+            break
+        partes.append(linha)
+        total += len(linha) + 1
+    if hasattr(linhas, 'close'):
+        linhas.close()
+    if not partes:
+        return "Nenhum resultado encontrado.", 0, False
+    n_linhas = len(partes)
+    if truncado:
+        partes.append(f"(resultado truncado: {n_linhas} linhas exibidas; há mais linhas no banco)")
+    return "\n".join(partes), n_linhas, truncado
 
 # ------------------------------------------------------------
 # Nova função: insere registro na tabela logs_perguntas
 # ------------------------------------------------------------
-def inserir_log(pergunta, sql_gerada, resposta, sucesso):
+def inserir_log(pergunta, sql_gerada, resposta, sucesso, deadline=None):
     """
     Insere um registro em logs_perguntas com a pergunta do usuário,
     as SQLs geradas (todas concatenadas), a resposta gerada e o indicador de sucesso.
+    O log é gravado mesmo com o deadline esgotado, mas com timeout mínimo de LOG_TIMEOUT_MS.
     """
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT'),
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            sslmode='require'
-        )
+        conn = get_db_connection(deadline)
         cur = conn.cursor()
+        if deadline is not None:
+            timeout_ms = max(deadline.restante_ms(), LOG_TIMEOUT_MS)
+            cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
         insert_sql = """
             INSERT INTO logs_perguntas (pergunta, sql_gerada, resposta, sucesso)
             VALUES (%s, %s, %s, %s);
@@ -304,15 +621,16 @@ def inserir_log(pergunta, sql_gerada, resposta, sucesso):
 # ------------------------------------------------------------
 # Função: monta o contexto para enviar ao Gemini (inclui histórico)
 # ------------------------------------------------------------
-def construir_contexto(pergunta, info_dados):
+def construir_contexto(pergunta, info_dados, incluir_historico=True):
     """
     Monta o bloco de contexto que será enviado para a API Gemini.
-    Inclui pergunta, resultados das queries e histórico recente.
+    Inclui pergunta, resultados das queries e histórico recente
+    (o histórico é opcional e pode ser omitido quando o orçamento está curto).
     """
     ctx = f"O usuário perguntou: '{pergunta}'."
     if info_dados:
         ctx += "\nDados obtidos:\n" + info_dados
-    if historico_conversa:
+    if incluir_historico and historico_conversa:
         ultimos = "\n".join(historico_conversa[-6:])
         ctx += "\n\nHistórico de conversa recente:\n" + ultimos
     return ctx
@@ -320,22 +638,39 @@ def construir_contexto(pergunta, info_dados):
 # ------------------------------------------------------------
 # Função: envia para a API Gemini e retorna o texto da resposta
 # ------------------------------------------------------------
-def enviar_para_gemini(contexto):
+def enviar_para_gemini(contexto, deadline=None):
     """
     Faz uma chamada POST para a Gemini (Google Generative Language API)
     e retorna a resposta como texto. Em caso de erro, retorna mensagem de falha.
+    Com deadline, o timeout da chamada é o orçamento restante e, se ele se esgotar,
+    levanta DeadlineExcedido para que o chamador devolva uma resposta parcial.
     """
     api_key = os.getenv('GEMINI_API_KEY')
+    # GEMINI_API_URL permite apontar para um stub local (ver loadtest/stub_gemini.py)
+    base_url = os.getenv('GEMINI_API_URL', 'https://generativelanguage.googleapis.com/v1beta')
     url = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/"
+        f"{base_url}/models/"
         f"gemini-2.0-flash:generateContent?key={api_key}"
     )
     headers = {'Content-Type': 'application/json'}
     payload = {'contents': [{'parts': [{'text': contexto}]}]}
 
+    timeout = 30
+    if deadline is not None:
+        if deadline.expirado():
+            raise DeadlineExcedido("Orçamento esgotado antes da chamada ao Gemini.")
+        timeout = deadline.restante_s()
+
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=30)
+        resp = requests.post(url, json=payload, headers=headers, timeout=timeout)
+    except requests.Timeout as e:
+        metrics.GEMINI_ERROS_TOTAL.inc('timeout')
+        if deadline is not None:
+            raise DeadlineExcedido(f"Gemini não respondeu em {timeout:.1f}s.") from e
+        logging.error(f"Falha ao chamar a API Gemini: {e}")
+        return "Erro ao obter resposta da API Gemini."
     except Exception as e:
+        metrics.GEMINI_ERROS_TOTAL.inc('conexao')
         logging.error(f"Falha ao chamar a API Gemini: {e}")
         return "Erro ao obter resposta da API Gemini."
 
@@ -348,87 +683,191 @@ def enviar_para_gemini(contexto):
                 return parts[0].get('text', 'Sem resposta.')
         return 'Sem resposta.'
     else:
+        metrics.GEMINI_ERROS_TOTAL.inc(str(resp.status_code))
         logging.error(f"Erro na API Gemini (status {resp.status_code}): {resp.text}")
         return "Erro ao obter resposta da API Gemini."
 
 # ------------------------------------------------------------
-# Inicializar app Flask
+# Função: resposta apenas com dados, quando o Gemini perde o prazo
 # ------------------------------------------------------------
-app = Flask(__name__)
+def resposta_parcial(info_texto):
+    """
+    Monta uma resposta somente com os dados obtidos, usada quando o Gemini
+    não responde dentro do orçamento da requisição.
+    """
+    aviso = "Não consegui concluir a análise dentro do tempo limite."
+    if info_texto:
+        return aviso + " Estes são os dados encontrados:\n" + info_texto
+    return aviso + " Tente novamente em instantes."
 
 # ------------------------------------------------------------
-# Endpoint Flask: /pergunta
+# Função: pipeline completo de uma pergunta (NLP → SQL → Gemini → log)
 # ------------------------------------------------------------
-@app.route('/pergunta', methods=['POST'])
-def responder_pergunta():
-    data = request.get_json()
-    pergunta = data.get('pergunta', '').strip()
-
-    if not pergunta:
-        return jsonify({
-            'resposta': '',
-            'sucesso': False,
-            'erro': 'Campo "pergunta" está vazio.'
-        }), 400
-
+def processar_pergunta(pergunta, deadline=None):
+    """
+    Executa todas as etapas para responder uma pergunta e retorna um dicionário
+    com resposta, SQLs usadas, sucesso das queries e se a resposta é parcial.
+    O deadline (opcional) é repassado a cada etapa: limita as queries SQL e a
+    chamada ao Gemini e desliga etapas opcionais quando o orçamento está curto.
+    """
     # Armazenar pergunta no histórico
     historico_conversa.append(f"Usuário: {pergunta}")
 
-    # 1. Tentar mapeamento estático com lemmas
-    consultas = selecionar_queries(pergunta)
-    # 2. Se não houver mapeamento estático, tentar geração dinâmica
-    if not consultas:
-        consultas = gerar_query_dinamica(pergunta)
-
-    # Preparar string contendo todas as SQLs geradas, para log
-    sql_strings = [sql for (_label, sql) in consultas]
-    sql_concat = ";\n".join(sql_strings) if sql_strings else None
+    with tracing.span('nlp') as sp, metrics.ROTEAMENTO_SEGUNDOS.time():
+        consultas = rotear_pergunta(pergunta)
+        sp.definir(labels=[label for label, _sql in consultas])
+    for label, _sql in consultas:
+        metrics.MATCHES_TOTAL.inc(label)
 
     # Executar cada query e montar o info_texto
     info_texto = ''
     sucesso_sql = False
+    executadas = []
     if consultas:
         todas_ok = True
-        for label, sql in consultas:
-            logging.info(f"Executando [{label}]: {sql}")
-            rows = executar_query(sql)
-            if rows is None or rows == []:
+        for i, (label, sql) in enumerate(consultas):
+            # Mapeamentos extras (além do primeiro) só rodam se houver folga no orçamento
+            if deadline is not None and i > 0 and not deadline.permite_opcional():
+                logging.warning(f"Deadline curto: pulando {len(consultas) - i} mapeamento(s) extra(s).")
+                break
+            orcamento_chars = PROMPT_DADOS_MAX_CHARS - len(info_texto)
+            if i > 0 and orcamento_chars <= 0:
+                logging.warning(f"Limite de dados do prompt atingido: pulando {len(consultas) - i} mapeamento(s).")
+                break
+            preparada = vincular_parametros(label, sql, pergunta)
+            if preparada is None:
+                continue
+            sql, params = preparada
+            logging.info(f"Executando [{label}]: {sql}" + (f" {params}" if params else ""))
+            # Log e resposta com os valores consultados, não o modelo com %(chave)s
+            executadas.append(parametros.literal(sql, params))
+            with tracing.span('sql', label=label) as sp, metrics.SQL_SEGUNDOS.time(label):
+                rows, fonte = responder_em_memoria(label, sql)
+                if rows is None and label in MAPEAMENTOS_LISTA:
+                    # Linhas lidas em lotes durante a formatação, só até o limite do prompt
+                    rows, fonte = executar_query_em_fluxo(sql, deadline, params), 'cursor'
+                elif rows is None:
+                    rows = executar_query(sql, deadline, params)
+                sp.definir(rows=len(rows) if rows is not None and fonte != 'cursor' else None, fonte=fonte)
+            with tracing.span('format', label=label) as sp, metrics.FORMATACAO_SEGUNDOS.time():
+                texto, n_linhas, truncado = formatar_linhas(rows, orcamento_chars)
+                sp.definir(chars=len(texto), rows=n_linhas, truncado=truncado)
+            if n_linhas == 0:
                 todas_ok = False
             else:
                 sucesso_sql = True
-            info_texto += f"Resultados ({label}):\n" + formatar_resultados(rows) + "\n"
+            if truncado:
+                metrics.RESULTADOS_TRUNCADOS_TOTAL.inc(label)
+            info_texto += f"Resultados ({label}):\n" + texto + "\n"
         if not todas_ok:
             sucesso_sql = False
     else:
         info_texto = None
         sucesso_sql = False
 
+    # Preparar string contendo todas as SQLs executadas, para log
+    sql_concat = ";\n".join(executadas) if executadas else None
+
     # Montar o contexto completo para enviar ao Gemini
-    contexto = instrucoes_fixas + "\n" + construir_contexto(pergunta, info_texto)
+    incluir_historico = deadline is None or deadline.permite_opcional()
+    contexto = instrucoes_fixas + "\n" + construir_contexto(pergunta, info_texto, incluir_historico)
 
-    # Chamar a API Gemini e obter resposta
-    resposta = enviar_para_gemini(contexto)
+    # Chamar a API Gemini e obter resposta (ou resposta parcial se perder o prazo)
+    parcial = False
+    try:
+        with tracing.span('gemini', prompt_chars=len(contexto)) as sp, metrics.GEMINI_SEGUNDOS.time():
+            resposta = enviar_para_gemini(contexto, deadline)
+            sp.definir(response_chars=len(resposta))
+    except DeadlineExcedido as e:
+        logging.warning(f"Deadline excedido na etapa do Gemini: {e}")
+        metrics.PERGUNTAS_PARCIAIS_TOTAL.inc()
+        resposta = resposta_parcial(info_texto)
+        parcial = True
 
     # Inserir log antes de retornar
-    inserir_log(pergunta, sql_concat, resposta, sucesso_sql)
+    with tracing.span('log'), metrics.LOG_SEGUNDOS.time():
+        inserir_log(pergunta, sql_concat, resposta, sucesso_sql, deadline)
 
     # Armazenar resposta no histórico
     historico_conversa.append(f"IA: {resposta}")
 
-    return jsonify({
+    return {
         'resposta': resposta,
+        'sucesso_sql': sucesso_sql,
+        'sqls_usadas': sql_concat,
+        'parcial': parcial
+    }
+
+# ------------------------------------------------------------
+# Inicializar app Flask
+# ------------------------------------------------------------
+app = Flask(__name__)
+# Profiling sob demanda (só é instalado com PROFILE_ADMIN_TOKEN definido)
+profiling.instalar(app)
+
+# ------------------------------------------------------------
+# Endpoint Flask: /pergunta
+# ------------------------------------------------------------
+@app.route('/pergunta', methods=['POST'])
+def responder_pergunta():
+    data = request.get_json()
+    pergunta = data.get('pergunta', '').strip()
+
+    if not pergunta:
+        return jsonify({
+            'resposta': '',
+            'sucesso': False,
+            'erro': 'Campo "pergunta" está vazio.'
+        }), 400
+
+    # Orçamento de latência da requisição (padrão ou definido pelo header X-Deadline-Ms)
+    deadline = Deadline.da_requisicao(request.headers)
+    with tracing.iniciar_trace('POST /pergunta', deadline_ms=deadline.orcamento_ms) as trace:
+        resultado = processar_pergunta(pergunta, deadline)
+        trace.definir(parcial=resultado['parcial'], sucesso_sql=resultado['sucesso_sql'])
+
+    resposta = serializacao.resposta_json({
+        'resposta': resultado['resposta'],
         'sucesso': True,  # Sempre True se chegou até aqui sem erro
         'erro': None,     # Adiciona campo erro como None para sucesso
-        'sucesso_sql': sucesso_sql,  # Mantém para informação adicional
-        'sqls_usadas': sql_concat
+        'sucesso_sql': resultado['sucesso_sql'],  # Mantém para informação adicional
+        'sqls_usadas': resultado['sqls_usadas'],
+        'parcial': resultado['parcial']  # True quando o Gemini perdeu o prazo
     })
+    resposta.headers['X-Trace-Id'] = trace.trace_id
+    return resposta
+
+# ------------------------------------------------------------
+# Endpoint Flask: /metrics (formato de exposição do Prometheus)
+# ------------------------------------------------------------
+@app.route('/metrics', methods=['GET'])
+def expor_metricas():
+    return Response(metrics.registro.expor(), content_type=metrics.CONTENT_TYPE)
+
+# ------------------------------------------------------------
+# Endpoints Flask: /vivo (liveness) e /pronto (readiness)
+# ------------------------------------------------------------
+@app.route('/vivo', methods=['GET'])
+def verificar_vivo():
+    """200 enquanto nenhuma etapa da subida falhou; 503 pede o reinício do processo."""
+    estado = aquecimento.estado()
+    return jsonify(estado), 503 if aquecimento.falhou else 200
+
+
+@app.route('/pronto', methods=['GET'])
+def verificar_pronto():
+    """200 só depois de todas as etapas da subida terminarem bem."""
+    estado = aquecimento.estado()
+    return jsonify(estado), 200 if estado['pronto'] else 503
 
 # ------------------------------------------------------------
 # Função principal (mantida para execução em modo console, se necessário)
 # ------------------------------------------------------------
 def main():
-    # 1. Verificar conexão e existência de tabelas/dados
-    verificar_banco()
+    # 1. Carregar o modelo e verificar conexão e existência de tabelas/dados
+    iniciar_aquecimento()
+    if not aquecimento.aguardar():
+        exit(1)
 
     print("Sophos, assistente virtual da STOLF LTDA está pronto para responder às suas perguntas.")
     print("(Digite 'sair' ou 'exit' para encerrar.)\n")
@@ -448,56 +887,14 @@ def main():
             print("Encerrando.")
             break
 
-        # Armazenar pergunta no histórico
-        historico_conversa.append(f"Usuário: {pergunta}")
-
-        # 1. Tentar mapeamento estático com lemmas
-        consultas = selecionar_queries(pergunta)
-        # 2. Se não houver mapeamento estático, tentar geração dinâmica
-        if not consultas:
-            consultas = gerar_query_dinamica(pergunta)
-
-        # Preparar string contendo todas as SQLs geradas, para log
-        sql_strings = [sql for (_label, sql) in consultas]
-        sql_concat = ";\n".join(sql_strings) if sql_strings else None
-
-        # Executar cada query e montar o info_texto
-        info_texto = ''
-        sucesso_sql = False
-        if consultas:
-            todas_ok = True
-            for label, sql in consultas:
-                logging.info(f"Executando [{label}]: {sql}")
-                rows = executar_query(sql)
-                if rows is None or rows == []:
-                    todas_ok = False
-                else:
-                    sucesso_sql = True
-                info_texto += f"Resultados ({label}):\n" + formatar_resultados(rows) + "\n"
-            if not todas_ok:
-                sucesso_sql = False
-        else:
-            info_texto = None
-            sucesso_sql = False
-
-        # Montar o contexto completo para enviar ao Gemini
-        contexto = instrucoes_fixas + "\n" + construir_contexto(pergunta, info_texto)
-
-        # Chamar a API Gemini e obter resposta
-        resposta = enviar_para_gemini(contexto)
-
-        # Inserir log antes de exibir a resposta
-        inserir_log(pergunta, sql_concat, resposta, sucesso_sql)
+        resultado = processar_pergunta(pergunta, Deadline())
 
         # Exibir apenas a resposta natural ao usuário
-        print("\n" + resposta.strip() + "\n")
-
-        # Armazenar resposta no histórico
-        historico_conversa.append(f"IA: {resposta}")
+        print("\n" + resultado['resposta'].strip() + "\n")
 
 if __name__ == '__main__':
-    # Verifica banco antes de iniciar o servidor
-    verificar_banco()
+    # Aquece em segundo plano (spaCy, banco, cache_dados); /pronto diz quando terminou
+    iniciar_aquecimento()
     # Inicia o Flask para responder via HTTP
     app.run(host='0.0.0.0', port=5000)
     # main()
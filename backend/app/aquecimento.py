@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from . import metrics
+
+# ------------------------------------------------------------
+# Subida do processo: etapas em paralelo e estado para /vivo e /pronto
+# ------------------------------------------------------------
+# O servidor começa a aceitar conexões logo depois dos imports; o que é lento
+# (modelo spaCy, verificação do banco, cache_dados) roda em threads próprias,
+# ao mesmo tempo. /pronto só responde 200 quando todas as etapas terminaram
+# bem, e /vivo passa a responder 503 se uma delas falhar (o orquestrador
+# reinicia o processo, como fazia o exit(1) da subida serial).
+#
+# As etapas feitas durante o import (dotenv, tabela de lemas ...) entram no
+# mesmo relatório com medir(); quando a última termina, o tempo de cada etapa
+# vai para o log e para a métrica sophos_aquecimento_etapa_segundos.
+
+
+class ModeloPreguicoso:
+    """
+    Pipeline spaCy carregado no primeiro uso (chamada ou atributo) ou antes,
+    por carregar() numa etapa do aquecimento; quem chega durante a carga espera
+    por ela em vez de carregar de novo.
+    """
+
+    def __init__(self, carregar_modelo):
+        self._carregar_modelo = carregar_modelo
+        self._modelo = None
+        self._trava = threading.Lock()
+
+    @property
+    def carregado(self):
+        return self._modelo is not None
+
+    def carregar(self):
+        if self._modelo is None:
+            with self._trava:
+                if self._modelo is None:
+                    self._modelo = self._carregar_modelo()
+        return self._modelo
+
+    def __call__(self, *args, **kwargs):
+        return self.carregar()(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        return getattr(self.carregar(), nome)
+
+
+class Aquecimento:
+    """Etapas da subida, com estado ('rodando', 'ok', 'erro') e duração de cada uma."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._etapas = {}  # nome -> {'estado': ..., 'segundos': ..., 'erro': ...}
+        self._pendentes = {}  # nome -> função ainda não iniciada
+        self._iniciado = False
+        self._terminado = False
+        self._trava = threading.Lock()
+        self._concluido = threading.Event()
+
+    @contextmanager
+    def medir(self, nome):
+        """Registra como etapa um trecho síncrono (feito durante o import); exceções sobem."""
+        with self._trava:
+            self._etapas[nome] = {'estado': 'rodando', 'segundos': None, 'erro': None}
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self._terminar(nome, inicio, e)
+            raise
+        self._terminar(nome, inicio, None)
+
+    def etapa(self, nome, funcao):
+        """Agenda uma etapa para rodar em thread própria quando iniciar() for chamado."""
+        with self._trava:
+            self._pendentes[nome] = funcao
+
+    def iniciar(self):
+        """Dispara em paralelo todas as etapas agendadas."""
+        with self._trava:
+            pendentes, self._pendentes = self._pendentes, {}
+            self._iniciado = True
+            for nome in pendentes:
+                self._etapas[nome] = {'estado': 'rodando', 'segundos': None, 'erro': None}
+        for nome, funcao in pendentes.items():
+            threading.Thread(target=self._rodar, args=(nome, funcao),
+                             name=f'sophos-aquecimento-{nome}', daemon=True).start()
+        if not pendentes:
+            self._verificar_conclusao()
+
+    def _rodar(self, nome, funcao):
+        inicio = time.perf_counter()
+        try:
+            funcao()
+        except BaseException as e:  # exit() dentro da etapa também conta como falha
+            logging.error(f"Aquecimento: etapa '{nome}' falhou: {e}")
+            self._terminar(nome, inicio, e)
+            return
+        self._terminar(nome, inicio, None)
+
+    def _terminar(self, nome, inicio, erro):
+        segundos = time.perf_counter() - inicio
+        with self._trava:
+            self._etapas[nome] = {'estado': 'erro' if erro is not None else 'ok',
+                                  'segundos': round(segundos, 3),
+                                  'erro': str(erro) if erro is not None else None}
+        metrics.AQUECIMENTO_ETAPA_SEGUNDOS.inc(nome, valor=segundos)
+        self._verificar_conclusao()
+
+    def _verificar_conclusao(self):
+        with self._trava:
+            if not self._iniciado or self._pendentes or self._terminado or \
+                    any(e['estado'] == 'rodando' for e in self._etapas.values()):
+                return
+            self._terminado = True
+            etapas = dict(self._etapas)
+        total = time.perf_counter() - self.inicio
+        detalhes = ', '.join(f"{nome} {e['segundos']:.2f} s" + (' (erro)' if e['estado'] == 'erro' else '')
+                             for nome, e in etapas.items())
+        if all(e['estado'] == 'ok' for e in etapas.values()):
+            metrics.PRONTO.inc()
+            logging.info(f"Aquecimento concluído em {total:.2f} s: {detalhes}")
+        else:
+            logging.error(f"Aquecimento terminou com falha em {total:.2f} s: {detalhes}")
+        # Só depois do relatório: quem espera em aguardar() já encontra o log e a métrica
+        self._concluido.set()
+
+    def aguardar(self, timeout=None):
+        """Espera todas as etapas terminarem; True se todas deram certo."""
+        self._concluido.wait(timeout)
+        return self.pronto
+
+    @property
+    def pronto(self):
+        with self._trava:
+            return self._concluido.is_set() and all(e['estado'] == 'ok' for e in self._etapas.values())
+
+    @property
+    def falhou(self):
+        with self._trava:
+            return any(e['estado'] == 'erro' for e in self._etapas.values())
+
+    def estado(self):
+        """{'pronto', 'segundos' desde o início, 'etapas': {nome: {...}}} para os endpoints."""
+        pronto = self.pronto
+        with self._trava:
+            etapas = {nome: dict(e) for nome, e in self._etapas.items()}
+        return {'pronto': pronto, 'segundos': round(time.perf_counter() - self.inicio, 3), 'etapas': etapas}
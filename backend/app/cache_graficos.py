@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import logging
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, só gzip
+    brotli = None
+
+from . import metrics
+
+# ------------------------------------------------------------
+# Cache das respostas JSON dos endpoints de gráfico
+# ------------------------------------------------------------
+# Cada entrada guarda o corpo já serializado, o ETag e as versões comprimidas
+# (br/gzip), calculadas uma vez quando a entrada é preenchida; a requisição só
+# escolhe a codificação pelo Accept-Encoding. Uma entrada é fresca por `ttl`
+# segundos; depois disso, por mais `stale` segundos ela ainda é servida na hora
+# (stale-while-revalidate) enquanto uma única thread em segundo plano recalcula.
+# Passado esse prazo, a requisição recalcula na hora, e requisições simultâneas
+# para a mesma chave esperam o mesmo cálculo em vez de repeti-lo. Como as chaves
+# incluem os parâmetros da query string, o número de entradas é limitado: ao
+# passar de max_entradas, as entradas mais antigas saem primeiro.
+
+# Corpos menores que isto não são comprimidos (o ganho não paga o cabeçalho)
+COMPRESSAO_MIN_BYTES = 256
+
+
+class EntradaCache:
+    """Resposta pronta para servir: corpo, ETag, headers e versões comprimidas."""
+
+    def __init__(self, corpo, headers=None, etag=None, comprimir=True):
+        self.corpo = corpo
+        self.headers = headers or {}
+        self.etag = etag or hashlib.sha1(corpo).hexdigest()
+        self.criada_em = time.monotonic()
+        # Em ordem de preferência do servidor (usada no empate de qualidade)
+        self.comprimidos = {}
+        if comprimir and len(corpo) >= COMPRESSAO_MIN_BYTES:
+            if brotli is not None:
+                self.comprimidos['br'] = brotli.compress(corpo, quality=5)
+            self.comprimidos['gzip'] = gzip.compress(corpo, compresslevel=6, mtime=0)
+
+    @property
+    def idade(self):
+        return time.monotonic() - self.criada_em
+
+
+class CacheRespostas:
+    """
+    Cache em memória por chave (normalmente o endpoint). `calcular` é uma
+    função sem argumentos que devolve (corpo em bytes, headers, etag ou None);
+    ela pode rodar fora da requisição, então não deve usar o request do Flask.
+    Com ttl <= 0 o cache fica desligado e cada chamada recalcula.
+    """
+
+    def __init__(self, ttl, stale=0, max_entradas=256):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entradas = max_entradas
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._locks_chave = {}
+        self._revalidando = set()
+
+    def obter(self, chave, calcular):
+        """
+        Devolve (entrada, estado), com estado 'hit', 'stale', 'miss' ou
+        'desligado'. Exceções de `calcular` sobem para quem chamou e não são
+        guardadas no cache.
+        """
+        if self.ttl <= 0:
+            return EntradaCache(*calcular(), comprimir=False), 'desligado'
+
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            idade = entrada.idade
+            if idade < self.ttl:
+                return entrada, 'hit'
+            if idade < self.ttl + self.stale:
+                self._revalidar_em_segundo_plano(chave, calcular)
+                return entrada, 'stale'
+
+        with self._lock_da_chave(chave):
+            # Outra requisição pode ter preenchido enquanto esperávamos o lock
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada.idade < self.ttl:
+                return entrada, 'hit'
+            return self._preencher(chave, calcular), 'miss'
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def _lock_da_chave(self, chave):
+        with self._lock:
+            return self._locks_chave.setdefault(chave, threading.Lock())
+
+    def _preencher(self, chave, calcular):
+        entrada = EntradaCache(*calcular())
+        with self._lock:
+            self._entradas.pop(chave, None)
+            self._entradas[chave] = entrada
+            # dict mantém a ordem de inserção: as primeiras chaves são as mais antigas
+            while len(self._entradas) > self.max_entradas:
+                antiga = next(iter(self._entradas))
+                del self._entradas[antiga]
+                self._locks_chave.pop(antiga, None)
+        return entrada
+
+    def _revalidar_em_segundo_plano(self, chave, calcular):
+        with self._lock:
+            if chave in self._revalidando:
+                return
+            self._revalidando.add(chave)
+        threading.Thread(target=self._revalidar, args=(chave, calcular),
+                         name=f'sophos-cache-{chave}', daemon=True).start()
+
+    def _revalidar(self, chave, calcular):
+        endpoint = chave.split('?', 1)[0]  # sem a query string, para não multiplicar as séries da métrica
+        try:
+            with self._lock_da_chave(chave):
+                self._preencher(chave, calcular)
+            metrics.GRAFICO_CACHE_REVALIDACOES_TOTAL.inc(endpoint, 'ok')
+        except Exception as e:
+            # A entrada antiga continua sendo servida até sair da janela stale
+            metrics.GRAFICO_CACHE_REVALIDACOES_TOTAL.inc(endpoint, 'erro')
+            logging.warning(f"Falha ao revalidar o cache de '{chave}': {e}")
+        finally:
+            with self._lock:
+                self._revalidando.discard(chave)
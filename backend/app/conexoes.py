@@ -0,0 +1,237 @@
+import logging
+import os
+import re
+import threading
+
+from psycopg2 import errors
+
+from . import metrics, parametros
+from .query_mapping import query_mappings
+
+# ------------------------------------------------------------
+# Pool de conexões e SQLs do catálogo preparadas no servidor
+# ------------------------------------------------------------
+# As conexões físicas ficam abertas entre as requisições: close() numa conexão
+# emprestada desfaz a transação em aberto (e com ela SET LOCAL e cursores no
+# servidor) e a devolve ao pool. Como a sessão no Postgres sobrevive, cada
+# conexão prepara (PREPARE) uma SQL de query_mappings na primeira vez que a
+# executa e dali em diante só faz EXECUTE com os parâmetros, sem o parse e o
+# planejamento de novo a cada pergunta.
+#
+# O Postgres replaneja sozinho as SQLs preparadas quando uma tabela usada muda;
+# o que ele não faz é mudar as colunas do resultado ("cached plan must not
+# change result type", num SELECT * depois de um ALTER TABLE). Nesse caso, ou
+# se a SQL preparada sumiu da sessão (DISCARD ALL, proxy de conexões), a
+# transação é desfeita e a SQL é preparada de novo uma vez. invalidar() faz
+# todas as conexões descartarem suas SQLs preparadas no próximo uso (depois de
+# uma migração, por exemplo).
+
+# Máximo de conexões abertas pelo pool (0 desliga o pool: uma conexão por uso)
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '5'))
+# Espera máxima por uma vaga no pool sem deadline na requisição (segundos)
+DB_POOL_ESPERA_S = float(os.getenv('DB_POOL_ESPERA_S', '10'))
+# Usar PREPARE/EXECUTE para as SQLs do catálogo nas conexões do pool
+SQL_PREPARADAS = os.getenv('SQL_PREPARADAS', '1') == '1'
+
+_PARAMETRO = re.compile(r'%\((\w+)\)s|%%')
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão do pool ficou livre dentro do tempo de espera."""
+
+
+class Preparada:
+    """SQL do catálogo com o nome e os textos de PREPARE e EXECUTE."""
+
+    __slots__ = ('nome', 'prepare', 'execute', 'chaves')
+
+    def __init__(self, nome, texto, chaves):
+        """`texto` e `chaves` como em parametros.modelo (sem chaves: a SQL original)."""
+        posicoes = {}
+
+        def trocar(m):
+            if m.group(1) is None:
+                return '%'
+            return f"${posicoes.setdefault(m.group(1), len(posicoes) + 1)}"
+
+        corpo = _PARAMETRO.sub(trocar, texto) if chaves else texto
+        self.nome = nome
+        self.prepare = f"PREPARE {nome} AS {corpo.strip().rstrip(';').strip()}"
+        self.chaves = tuple(posicoes)
+        if self.chaves:
+            self.execute = f"EXECUTE {nome} ({', '.join(['%s'] * len(self.chaves))})"
+        else:
+            self.execute = f"EXECUTE {nome}"
+
+    def valores(self, params):
+        """Valores dos parâmetros do EXECUTE, na ordem de $1, $2 ..."""
+        return tuple(params[chave] for chave in self.chaves) if self.chaves else None
+
+
+def _catalogo():
+    """
+    {sql como chega em executar_query: Preparada}. Com placeholders, a SQL
+    chega com %(chave)s (parametros.vincular); sem, a SQL do mapeamento.
+    """
+    catalogo = {}
+    for _frases, label, sql in query_mappings:
+        texto, chaves = parametros.modelo(sql)
+        if not chaves:
+            texto = sql
+        if texto not in catalogo:
+            catalogo[texto] = Preparada('sophos_' + re.sub(r'\W', '_', label), texto, chaves)
+    return catalogo
+
+
+CATALOGO = _catalogo()
+
+# Incrementada por invalidar(); a conexão que preparou numa geração anterior
+# descarta suas SQLs preparadas antes do próximo uso
+_geracao = 0
+
+
+def invalidar():
+    """Faz todas as conexões do pool prepararem de novo as SQLs do catálogo."""
+    global _geracao
+    _geracao += 1
+
+
+class _Fisica:
+    """Conexão física do pool e as SQLs preparadas na sessão dela."""
+
+    __slots__ = ('conn', 'preparadas', 'geracao')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.preparadas = set()
+        self.geracao = _geracao
+
+
+class ConexaoDoPool:
+    """
+    Conexão emprestada do pool. Delegação simples, como ConexaoMonitorada:
+    close() devolve a conexão ao pool em vez de fechá-la.
+    """
+
+    def __init__(self, pool, fisica):
+        self._pool = pool
+        self.fisica = fisica
+        self._emprestada = True
+
+    def close(self):
+        if self._emprestada:
+            self._emprestada = False
+            self._pool.devolver(self.fisica)
+
+    def __getattr__(self, nome):
+        return getattr(self.fisica.conn, nome)
+
+
+class PoolConexoes:
+    """
+    No máximo `maximo` conexões abertas com conectar(deadline), reaproveitadas
+    entre os usos. As conexões são abertas sob demanda (nada antes do primeiro
+    uso, o que mantém o pool seguro num fork do servidor).
+    """
+
+    def __init__(self, conectar, maximo):
+        self._conectar = conectar
+        self._livres = []
+        self._trava = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(maximo)
+
+    def emprestar(self, deadline=None):
+        """
+        ConexaoDoPool com uma conexão livre ou nova. Espera por uma vaga até o
+        fim do deadline (ou DB_POOL_ESPERA_S) e levanta PoolEsgotado.
+        """
+        espera = deadline.restante_s() if deadline is not None else DB_POOL_ESPERA_S
+        if not self._vagas.acquire(timeout=espera):
+            metrics.DB_POOL_ESGOTADO_TOTAL.inc()
+            raise PoolEsgotado(f"Nenhuma conexão livre no pool em {espera:.1f}s")
+        try:
+            fisica = None
+            with self._trava:
+                while self._livres and fisica is None:
+                    candidata = self._livres.pop()
+                    if candidata.conn.closed:
+                        candidata.conn.close()  # atualiza o gauge de conexões abertas
+                    else:
+                        fisica = candidata
+            if fisica is None:
+                fisica = _Fisica(self._conectar(deadline))
+        except Exception:
+            self._vagas.release()
+            raise
+        metrics.DB_POOL_EM_USO.inc()
+        return ConexaoDoPool(self, fisica)
+
+    def devolver(self, fisica):
+        """Desfaz a transação em aberto e guarda a conexão; se ela estiver quebrada, fecha."""
+        try:
+            if not fisica.conn.closed:
+                fisica.conn.rollback()
+                with self._trava:
+                    self._livres.append(fisica)
+                return
+        except Exception as e:
+            logging.warning(f"Descartando conexão do pool: {e}")
+        finally:
+            metrics.DB_POOL_EM_USO.dec()
+            self._vagas.release()
+        fisica.conn.close()
+
+    def fechar(self):
+        """Fecha as conexões livres (as emprestadas são fechadas ao voltar)."""
+        with self._trava:
+            livres, self._livres = self._livres, []
+        for fisica in livres:
+            fisica.conn.close()
+
+
+def _statement_timeout(cur, timeout_ms):
+    if timeout_ms is not None:
+        cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+
+
+def _executar_preparada(fisica, cur, preparada, params, timeout_ms):
+    if fisica.geracao != _geracao:
+        cur.execute("DEALLOCATE ALL")
+        fisica.preparadas.clear()
+        fisica.geracao = _geracao
+    _statement_timeout(cur, timeout_ms)
+    if preparada.nome not in fisica.preparadas:
+        cur.execute(preparada.prepare)
+        fisica.preparadas.add(preparada.nome)
+        metrics.SQL_PREPARES_TOTAL.inc(preparada.nome)
+    cur.execute(preparada.execute, preparada.valores(params))
+    metrics.SQL_EXECUTES_TOTAL.inc(preparada.nome)
+
+
+def executar(conn, cur, sql, params=None, timeout_ms=None):
+    """
+    cur.execute(sql, params), com statement_timeout local se houver timeout_ms.
+    Numa conexão do pool, uma SQL do catálogo vira EXECUTE da SQL preparada
+    na sessão (PREPARE no primeiro uso); as demais SQLs vão direto.
+    """
+    preparada = CATALOGO.get(sql) if SQL_PREPARADAS and isinstance(conn, ConexaoDoPool) else None
+    if preparada is None:
+        _statement_timeout(cur, timeout_ms)
+        cur.execute(sql, params)
+        return
+    fisica = conn.fisica
+    try:
+        _executar_preparada(fisica, cur, preparada, params, timeout_ms)
+    except (errors.InvalidSqlStatementName, errors.FeatureNotSupported) as e:
+        schema = isinstance(e, errors.FeatureNotSupported)
+        if schema and 'cached plan' not in str(e):
+            raise
+        logging.warning(f"SQL preparada {preparada.nome} invalidada ({e}); preparando de novo.")
+        metrics.SQL_PREPARADAS_INVALIDADAS_TOTAL.inc('schema' if schema else 'ausente')
+        conn.rollback()
+        if schema:
+            # O schema mudou: as outras SQLs preparadas, em todas as conexões, também
+            invalidar()
+        else:
+            fisica.preparadas.discard(preparada.nome)
+        _executar_preparada(fisica, cur, preparada, params, timeout_ms)
@@ -0,0 +1,433 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from . import metrics
+from .texto import normalizar
+
+# ------------------------------------------------------------
+# Cubo OLAP de vendas em memória (opcional)
+# ------------------------------------------------------------
+# Agregados de vendas por mês × departamento × funcionário × cliente × status
+# de pagamento, com três medidas: quantidade de vendas, quantidade com valor
+# não nulo e soma do valor em centavos. O cubo é esparso (formato COO): cada
+# célula não vazia é uma posição dos arrays de DIMENSOES e MEDIDAS. Um cubo
+# denso teria centenas de milhões de células quase todas vazias, já que cada
+# funcionário pertence a um só departamento.
+#
+# As células vêm já agregadas do banco (GROUP BY das cinco dimensões). A cada
+# CUBO_VENDAS_INTERVALO segundos só as vendas com id maior que o último
+# carregado são agregadas e somadas às células; a cada CUBO_VENDAS_RECONSTRUCAO
+# segundos o cubo é reconstruído do zero, o que absorve UPDATE, DELETE, vendas
+# confirmadas fora da ordem dos ids e funcionários que mudaram de departamento.
+#
+# interpretar() reconhece perguntas sobre vendas que combinam dois ou mais
+# filtros/agrupamentos ("vendas pagas do departamento de Criação por mês") e
+# devolve uma ConsultaCubo: fatiamento (filtros), roll-up (agrupar só pelas
+# dimensões pedidas) e top-N. A consulta também tem uma SQL equivalente, com a
+# especificação em um comentário no início, usada pelo banco quando o cubo não
+# está pronto.
+
+CUBO_VENDAS = os.getenv('CUBO_VENDAS', '0') == '1'
+# Intervalo entre as atualizações incrementais (segundos)
+CUBO_VENDAS_INTERVALO = float(os.getenv('CUBO_VENDAS_INTERVALO', '30'))
+# Intervalo entre as reconstruções completas (segundos)
+CUBO_VENDAS_RECONSTRUCAO = float(os.getenv('CUBO_VENDAS_RECONSTRUCAO', '900'))
+# Idade máxima do cubo para responder perguntas (segundos)
+CUBO_VENDAS_MAX_IDADE = float(os.getenv('CUBO_VENDAS_MAX_IDADE', '120'))
+
+LABEL = 'cubo-vendas'
+DIMENSOES = ('mes', 'departamento', 'funcionario', 'cliente', 'status')
+MEDIDAS = ('quantidade', 'com_valor', 'centavos')
+TOP_LIMITE = 100
+
+# Marcador de NULL nas dimensões (ids e meses são sempre >= 0)
+NULO = -1
+
+SQL_CELULAS = """
+SELECT COALESCE((EXTRACT(YEAR FROM v.data_venda) * 12 + EXTRACT(MONTH FROM v.data_venda) - 1)::INTEGER, -1),
+       COALESCE(f.departamento_id, -1), COALESCE(v.funcionario_id, -1), COALESCE(p.cliente_id, -1),
+       v.status_pagamento,
+       COUNT(*), COUNT(v.valor), COALESCE((SUM(v.valor) * 100)::BIGINT, 0), MAX(v.id)
+FROM vendas v
+LEFT JOIN funcionarios f ON f.id = v.funcionario_id
+LEFT JOIN projetos p ON p.id = v.projeto_id
+WHERE v.id > %s
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+SQL_NOMES = {
+    'departamento': "SELECT id, nome FROM departamentos",
+    'funcionario': "SELECT id, nome FROM funcionarios",
+    'cliente': "SELECT id, nome_empresa FROM clientes",
+}
+
+# Expressões da SQL equivalente a uma ConsultaCubo: (rótulo, chave do agrupamento/filtro)
+_SQL_DIMENSOES = {
+    'mes': ("TO_CHAR(v.data_venda, 'YYYY-MM')",
+            "(EXTRACT(YEAR FROM v.data_venda) * 12 + EXTRACT(MONTH FROM v.data_venda) - 1)"),
+    'departamento': ("d.nome", "f.departamento_id"),
+    'funcionario': ("f.nome", "v.funcionario_id"),
+    'cliente': ("c.nome_empresa", "p.cliente_id"),
+    'status': ("v.status_pagamento", "v.status_pagamento"),
+}
+
+_SQL_CONSULTA = """/* {label} {especificacao} */
+SELECT {colunas}COUNT(*) AS total_vendas, SUM(v.valor) AS total_valor
+FROM vendas v
+LEFT JOIN funcionarios f ON f.id = v.funcionario_id
+LEFT JOIN departamentos d ON d.id = f.departamento_id
+LEFT JOIN projetos p ON p.id = v.projeto_id
+LEFT JOIN clientes c ON c.id = p.cliente_id
+{where}{group_by}{order_by}"""
+
+_ESPECIFICACAO = re.compile(r'^/\* ' + LABEL + r' (\{.*?\}) \*/')
+
+
+# ------------------------------------------------------------
+# Consulta ao cubo
+# ------------------------------------------------------------
+class ConsultaCubo:
+    """
+    Fatia do cubo: `filtros` é {dimensão: valores aceitos} (ids de
+    departamento/funcionário/cliente, meses como ano * 12 + mês - 1, textos de
+    status), `agrupar` as dimensões do resultado e `top` o limite de grupos
+    por valor total. Sem agrupar, o resultado é uma linha com os totais.
+    """
+
+    def __init__(self, filtros=None, agrupar=(), top=None):
+        self.filtros = {dim: sorted(set(valores)) for dim, valores in (filtros or {}).items()}
+        self.agrupar = tuple(agrupar)
+        self.top = top
+        for dim in list(self.filtros) + list(self.agrupar):
+            if dim not in DIMENSOES:
+                raise ValueError(f"Dimensão desconhecida: {dim}")
+
+    def __eq__(self, outra):
+        return isinstance(outra, ConsultaCubo) and vars(self) == vars(outra)
+
+    def __repr__(self):
+        return f"ConsultaCubo({self.especificacao()})"
+
+    def especificacao(self):
+        return json.dumps({'filtros': self.filtros, 'agrupar': self.agrupar, 'top': self.top},
+                          ensure_ascii=False, sort_keys=True).replace('*/', '*\\/')
+
+    @classmethod
+    def da_sql(cls, sql):
+        """ConsultaCubo descrita no comentário inicial de uma SQL gerada por sql(), ou None."""
+        encontrado = _ESPECIFICACAO.match(sql)
+        if not encontrado:
+            return None
+        especificacao = json.loads(encontrado.group(1))
+        return cls(especificacao['filtros'], especificacao['agrupar'], especificacao['top'])
+
+    def sql(self):
+        """SQL equivalente (mesmas colunas e ordem do resultado do cubo), para rodar no banco."""
+        colunas = ''.join(f"{_SQL_DIMENSOES[dim][0]} AS {dim}, " for dim in self.agrupar)
+        condicoes = [f"{_SQL_DIMENSOES[dim][1]} IN ({', '.join(_literal(v) for v in valores)})"
+                     if valores else "FALSE"
+                     for dim, valores in self.filtros.items()]
+        where = f"WHERE {' AND '.join(condicoes)}\n" if condicoes else ''
+        group_by = ''
+        if self.agrupar:
+            chaves = []
+            for dim in self.agrupar:
+                rotulo, chave = _SQL_DIMENSOES[dim]
+                # Agrupa pelo id (nomes repetidos ficam separados, como no cubo) e pelo rótulo exibido
+                chaves += [rotulo] if dim in ('mes', 'status') else [chave, rotulo]
+            group_by = f"GROUP BY {', '.join(chaves)}\n"
+        if self.top:
+            order_by = f"ORDER BY total_valor DESC NULLS LAST LIMIT {int(self.top)}"
+        elif 'mes' in self.agrupar:
+            order_by = "ORDER BY mes, total_valor DESC NULLS LAST"
+        elif self.agrupar:
+            order_by = "ORDER BY total_valor DESC NULLS LAST"
+        else:
+            order_by = ''
+        return _SQL_CONSULTA.format(label=LABEL, especificacao=self.especificacao(), colunas=colunas,
+                                    where=where, group_by=group_by, order_by=order_by).rstrip() + ';'
+
+
+def _literal(valor):
+    if isinstance(valor, int):
+        return str(valor)
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def _mes_texto(indice):
+    return None if indice == NULO else f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def _agrupar(chaves, medidas):
+    """
+    Soma as medidas por combinação de chaves (arrays de mesmo tamanho): devolve
+    (chaves únicas em ordem, somas). As somas ficam em int64, sem arredondamento.
+    """
+    n = len(medidas[0])
+    if n == 0:
+        return [c[:0] for c in chaves], [m[:0] for m in medidas]
+    ordem = np.lexsort(chaves[::-1])
+    ordenadas = [c[ordem] for c in chaves]
+    muda = np.zeros(n, dtype=bool)
+    muda[0] = True
+    for coluna in ordenadas:
+        muda[1:] |= coluna[1:] != coluna[:-1]
+    inicios = np.flatnonzero(muda)
+    return [c[inicios] for c in ordenadas], [np.add.reduceat(m[ordem], inicios) for m in medidas]
+
+
+# ------------------------------------------------------------
+# Interpretação das perguntas
+# ------------------------------------------------------------
+_PALAVRAS_VENDAS = re.compile(r'\b(vendas?|vendid[oa]s?|vendeu|venderam|receitas?|faturamento|faturou)\b')
+_AGRUPAMENTOS = [
+    ('mes', re.compile(r'\b(por|cada) mes\b|\bmensa(l|is|lmente)\b|\bmes a mes\b')),
+    ('departamento', re.compile(r'\b(por|cada) (departamento|setor|area|equipe)s?\b')),
+    ('funcionario', re.compile(r'\b(por|cada) (funcionario|vendedor|colaborador)(a|es|as|s)?\b')),
+    ('cliente', re.compile(r'\b(por|cada) (cliente|empresa)s?\b')),
+    ('status', re.compile(r'\b(por|cada) (status|situacao)\b')),
+]
+_TOP = re.compile(r'\btop (\d+)\b|\b(\d+) (maiores|melhores|principais)\b|\b(maiores|melhores|principais) (\d+)\b')
+_MESES = ['janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho', 'julho', 'agosto',
+          'setembro', 'outubro', 'novembro', 'dezembro']
+_MES_ANO = re.compile(r'\b(' + '|'.join(_MESES) + r')(?: de| do ano de)? (\d{4})\b')
+_ANO = re.compile(r'\b(?:em|de|no ano de|durante) (\d{4})\b')
+_PREFIXO_DEPARTAMENTO = r'\b(?:departamento|depto|setor|area|equipe)(?: de| da| do)? '
+
+
+def _padrao_nome(nome):
+    return re.compile(r'\b' + re.escape(normalizar(nome)) + r'\b')
+
+
+class _Vocabulario:
+    """Padrões de busca dos nomes das dimensões, montados uma vez por carga do cubo."""
+
+    def __init__(self, nomes, categorias):
+        self.entidades = {}
+        for dim in ('funcionario', 'cliente'):
+            self.entidades[dim] = [(id_, _padrao_nome(nome)) for id_, nome in nomes[dim].items() if nome]
+        # "Vendas" também é o nome de um departamento: sem o prefixo, a palavra fala da medida
+        self.entidades['departamento'] = [
+            (id_, re.compile(_PREFIXO_DEPARTAMENTO + re.escape(normalizar(nome)) + r'\b')
+             if _PALAVRAS_VENDAS.fullmatch(normalizar(nome)) else _padrao_nome(nome))
+            for id_, nome in nomes['departamento'].items() if nome]
+        # Status pelo radical: "Pago" casa com pago/paga/pagos/pagas, "Atrasado" com atrasadas etc.
+        self.status = [(categoria, re.compile(r'\b' + re.escape(normalizar(categoria)[:-1]) + r'\w{0,2}\b'))
+                       for categoria in categorias if categoria and len(categoria) > 3]
+
+
+def interpretar(pergunta, vocabulario):
+    """ConsultaCubo para perguntas sobre vendas com dois ou mais filtros/agrupamentos; senão None."""
+    texto = normalizar(pergunta)
+    if not _PALAVRAS_VENDAS.search(texto):
+        return None
+    filtros = {}
+    for dim, padroes in vocabulario.entidades.items():
+        ids = [id_ for id_, padrao in padroes if padrao.search(texto)]
+        if ids:
+            filtros[dim] = ids
+    status = [categoria for categoria, padrao in vocabulario.status if padrao.search(texto)]
+    if status:
+        filtros['status'] = status
+    meses = [int(ano) * 12 + _MESES.index(mes) for mes, ano in _MES_ANO.findall(texto)]
+    if not meses:
+        meses = [int(ano) * 12 + m for ano in _ANO.findall(texto) for m in range(12)]
+    if meses:
+        filtros['mes'] = meses
+    agrupar = [dim for dim, padrao in _AGRUPAMENTOS if padrao.search(texto)]
+    top = None
+    encontrado = _TOP.search(texto)
+    if encontrado and agrupar:
+        top = min(int(next(g for g in encontrado.groups() if g and g.isdigit())), TOP_LIMITE)
+    if len(filtros) + len(agrupar) < 2:
+        return None  # um filtro ou agrupamento só: os mapeamentos estáticos respondem
+    return ConsultaCubo(filtros, agrupar, top)
+
+
+# ------------------------------------------------------------
+# Cubo
+# ------------------------------------------------------------
+class CuboVendas:
+    """
+    Cubo de vendas. `conectar` é uma função sem argumentos que abre uma conexão
+    psycopg2. `dados` é a tupla (células, nomes, categorias, vocabulário),
+    trocada de uma vez a cada atualização; as leituras não precisam de lock.
+    """
+
+    def __init__(self, conectar, intervalo=CUBO_VENDAS_INTERVALO,
+                 reconstrucao=CUBO_VENDAS_RECONSTRUCAO, max_idade=CUBO_VENDAS_MAX_IDADE):
+        self.conectar = conectar
+        self.intervalo = intervalo
+        self.reconstrucao = reconstrucao
+        self.max_idade = max_idade
+        self.dados = None
+        self.ultimo_id = 0
+        self.reconstruido_em = None
+        self.atualizado_em = None
+        self._lock_atualizacao = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    @property
+    def pronto(self):
+        return (self.dados is not None and self.atualizado_em is not None
+                and time.monotonic() - self.atualizado_em <= self.max_idade)
+
+    def atualizar(self):
+        """Reconstrói o cubo na primeira vez e a cada `reconstrucao` segundos; nas demais, soma as vendas novas."""
+        with self._lock_atualizacao:
+            completa = self.dados is None or time.monotonic() - self.reconstruido_em >= self.reconstrucao
+            tipo = 'completa' if completa else 'incremental'
+            try:
+                conn = self.conectar()
+                try:
+                    cur = conn.cursor()
+                    # Nomes e células vindos do mesmo estado do banco
+                    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                    self._carregar(cur, completa)
+                    conn.rollback()
+                finally:
+                    conn.close()
+            except Exception:
+                metrics.CUBO_VENDAS_ATUALIZACOES_TOTAL.inc(tipo, 'erro')
+                raise
+            agora = time.monotonic()
+            if completa:
+                self.reconstruido_em = agora
+            self.atualizado_em = agora
+            metrics.CUBO_VENDAS_ATUALIZACOES_TOTAL.inc(tipo, 'ok')
+
+    def _carregar(self, cur, completa):
+        nomes = {}
+        for dim, sql in SQL_NOMES.items():
+            cur.execute(sql)
+            nomes[dim] = dict(cur.fetchall())
+        ultimo_id = 0 if completa else self.ultimo_id
+        cur.execute(SQL_CELULAS, (ultimo_id,))
+        linhas = cur.fetchall()
+
+        categorias = [] if completa else list(self.dados[2])
+        novas = self._celulas(linhas, categorias)
+        if not completa:
+            anteriores = self.dados[0]
+            juntas = {nome: np.concatenate((anteriores[nome], novas[nome])) for nome in DIMENSOES + MEDIDAS}
+            chaves, somas = _agrupar([juntas[d] for d in DIMENSOES], [juntas[m] for m in MEDIDAS])
+            novas = dict(zip(DIMENSOES + MEDIDAS, chaves + somas))
+        if linhas:
+            ultimo_id = max(ultimo_id, max(linha[8] for linha in linhas))
+        categorias = tuple(categorias)
+        self.dados = (novas, nomes, categorias, _Vocabulario(nomes, categorias))
+        self.ultimo_id = ultimo_id
+        if completa:
+            logging.info(f"Cubo de vendas reconstruído: {len(novas['quantidade'])} células.")
+
+    @staticmethod
+    def _celulas(linhas, categorias):
+        """Arrays das células a partir das linhas do GROUP BY; status novos entram no fim de `categorias`."""
+        if not linhas:
+            return {nome: np.empty(0, dtype=np.int64) for nome in DIMENSOES + MEDIDAS}
+        colunas = list(zip(*linhas))
+        celulas = {dim: np.array(colunas[i], dtype=np.int64) for i, dim in enumerate(DIMENSOES) if dim != 'status'}
+        for status in colunas[4]:
+            if status not in categorias:
+                categorias.append(status)
+        codigos = {status: i for i, status in enumerate(categorias)}
+        celulas['status'] = np.array([codigos[s] for s in colunas[4]], dtype=np.int64)
+        for i, medida in enumerate(MEDIDAS, start=5):
+            celulas[medida] = np.array(colunas[i], dtype=np.int64)
+        return celulas
+
+    # --------------------------------------------------------
+    # Thread de atualização
+    # --------------------------------------------------------
+    def iniciar(self):
+        """Carrega e passa a atualizar em segundo plano (thread daemon)."""
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._laco, name='sophos-cubo-vendas', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                self.atualizar()
+            except Exception as e:
+                logging.warning(f"Falha ao atualizar o cubo de vendas: {e}")
+            self._parar.wait(self.intervalo)
+
+    # --------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------
+    def interpretar(self, pergunta):
+        """ConsultaCubo da pergunta (ver interpretar()), ou None sem cubo carregado."""
+        dados = self.dados
+        return None if dados is None else interpretar(pergunta, dados[3])
+
+    def responder(self, label, sql):
+        """Linhas de uma SQL gerada por ConsultaCubo.sql(), ou None se não for do cubo ou ele não estiver pronto."""
+        if label != LABEL or not self.pronto:
+            return None
+        consulta = ConsultaCubo.da_sql(sql)
+        if consulta is None:
+            return None
+        linhas = self.consultar(consulta)
+        metrics.CUBO_VENDAS_CONSULTAS_TOTAL.inc()
+        return linhas
+
+    def consultar(self, consulta):
+        """
+        Linhas (rótulos das dimensões agrupadas..., total_vendas, total_valor)
+        na mesma forma e ordem da SQL de consulta.sql(); a ordem entre grupos
+        empatados no valor não é definida, como no banco.
+        """
+        celulas, nomes, categorias, _vocabulario = self.dados
+        mascara = np.ones(len(celulas['quantidade']), dtype=bool)
+        for dim, valores in consulta.filtros.items():
+            if dim == 'status':
+                valores = [categorias.index(v) for v in valores if v in categorias]
+            mascara &= np.isin(celulas[dim], valores)
+        medidas = [celulas[m][mascara] for m in MEDIDAS]
+        if not consulta.agrupar:
+            quantidade, com_valor, centavos = (int(m.sum()) for m in medidas)
+            return [(quantidade, _valor(centavos, com_valor))]
+
+        chaves, (quantidades, com_valor, centavos) = _agrupar(
+            [celulas[d][mascara] for d in consulta.agrupar], medidas)
+        rotulos = [self._rotulos(dim, chave, nomes, categorias) for dim, chave in zip(consulta.agrupar, chaves)]
+        linhas = [(*grupo, int(q), _valor(int(c), int(v)))
+                  for *grupo, q, c, v in zip(*rotulos, quantidades, centavos, com_valor)]
+        # total_valor DESC NULLS LAST (e, agrupando por mês sem top, mês antes)
+        linhas.sort(key=lambda linha: (linha[-1] is None, -(linha[-1] or 0)))
+        if consulta.top:
+            return linhas[:consulta.top]
+        if 'mes' in consulta.agrupar:
+            posicao = consulta.agrupar.index('mes')
+            linhas.sort(key=lambda linha: (linha[posicao] is None, linha[posicao] or ''))
+        return linhas
+
+    @staticmethod
+    def _rotulos(dim, chave, nomes, categorias):
+        if dim == 'mes':
+            return [_mes_texto(int(m)) for m in chave]
+        if dim == 'status':
+            return [categorias[int(c)] for c in chave]
+        return [nomes[dim].get(int(i)) for i in chave]
+
+
+def _valor(centavos, com_valor):
+    """SUM(valor): NULL sem valores, senão Decimal com 2 casas."""
+    return None if com_valor == 0 else Decimal(f"{centavos}E-2")
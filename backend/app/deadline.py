@@ -0,0 +1,74 @@
+import os
+import time
+
+# ------------------------------------------------------------
+# Configuração do orçamento de latência (deadline) por requisição
+# ------------------------------------------------------------
+# Orçamento padrão de cada /pergunta, em milissegundos
+DEADLINE_PADRAO_MS = int(os.getenv('PERGUNTA_DEADLINE_MS', '25000'))
+# Limite superior aceito quando o cliente sobrescreve via header
+DEADLINE_MAXIMO_MS = int(os.getenv('PERGUNTA_DEADLINE_MAX_MS', '60000'))
+# Header que permite ao cliente definir o próprio orçamento
+DEADLINE_HEADER = 'X-Deadline-Ms'
+# Tempo reservado para a chamada ao Gemini enquanto as queries SQL rodam
+RESERVA_LLM_MS = int(os.getenv('DEADLINE_RESERVA_LLM_MS', '5000'))
+# Abaixo deste restante, etapas opcionais (histórico, mapeamentos extras) são puladas
+MARGEM_OPCIONAL_MS = int(os.getenv('DEADLINE_MARGEM_OPCIONAL_MS', '8000'))
+# Timeout mínimo do INSERT em logs_perguntas, mesmo com o orçamento esgotado
+LOG_TIMEOUT_MS = int(os.getenv('DEADLINE_LOG_TIMEOUT_MS', '2000'))
+
+
+class DeadlineExcedido(Exception):
+    """Levantada quando uma etapa não termina dentro do orçamento da requisição."""
+
+
+class Deadline:
+    """
+    Orçamento de tempo de uma requisição, medido com relógio monotônico.
+    Cada etapa do pipeline consulta o restante para ajustar seus próprios timeouts.
+    """
+
+    def __init__(self, orcamento_ms=DEADLINE_PADRAO_MS):
+        self.orcamento_ms = orcamento_ms
+        self.fim = time.monotonic() + orcamento_ms / 1000.0
+
+    @classmethod
+    def da_requisicao(cls, headers):
+        """
+        Cria o deadline a partir do header X-Deadline-Ms, se presente e válido.
+        Valores fora do intervalo (0, DEADLINE_MAXIMO_MS] são limitados.
+        """
+        valor = headers.get(DEADLINE_HEADER)
+        if valor is None:
+            return cls(DEADLINE_PADRAO_MS)
+        try:
+            orcamento = int(valor)
+        except (TypeError, ValueError):
+            return cls(DEADLINE_PADRAO_MS)
+        return cls(min(max(orcamento, 1), DEADLINE_MAXIMO_MS))
+
+    def restante_ms(self):
+        """Milissegundos restantes (nunca negativo)."""
+        return max(0, int((self.fim - time.monotonic()) * 1000))
+
+    def restante_s(self):
+        """Segundos restantes, no formato aceito pelo timeout do requests."""
+        return self.restante_ms() / 1000.0
+
+    def expirado(self):
+        return self.restante_ms() <= 0
+
+    def permite_opcional(self):
+        """Indica se ainda há folga para etapas que não são essenciais."""
+        return self.restante_ms() > MARGEM_OPCIONAL_MS
+
+    def statement_timeout_ms(self, reserva_ms=RESERVA_LLM_MS):
+        """
+        Valor de statement_timeout para a próxima query: o restante menos a reserva
+        da etapa seguinte. Nunca retorna 0, pois no Postgres 0 desativa o limite.
+        """
+        return max(1, self.restante_ms() - reserva_ms)
+
+    def connect_timeout_s(self):
+        """Timeout de conexão (libpq aceita apenas segundos inteiros, mínimo 1)."""
+        return max(1, int(self.restante_s() + 0.999))
@@ -0,0 +1,49 @@
+import numpy as np
+
+# ------------------------------------------------------------
+# Redução de séries para gráficos (Largest-Triangle-Three-Buckets)
+# ------------------------------------------------------------
+# O LTTB mantém o primeiro e o último ponto e divide o restante em baldes; de
+# cada balde escolhe o ponto que forma o maior triângulo com o ponto escolhido
+# no balde anterior e com a média do balde seguinte. Picos e vales sobrevivem
+# à redução, ao contrário de uma média ou de pular pontos a intervalos fixos.
+# Os limites e as médias de todos os baldes são calculados de uma vez (somas
+# acumuladas); só a escolha do ponto é sequencial, com um argmax por balde.
+
+
+def lttb(x, y, max_pontos):
+    """
+    Índices (ordenados) dos pontos que representam a série (x, y) com no
+    máximo `max_pontos` pontos. x deve estar em ordem crescente. Séries que
+    já cabem no limite (ou limites menores que 3) devolvem todos os índices.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if max_pontos >= n or max_pontos < 3:
+        return np.arange(n)
+
+    # Baldes dos pontos internos (1..n-2): o balde i vai de limites[i] a limites[i + 1]
+    baldes = max_pontos - 2
+    limites = (np.arange(baldes + 1) * (n - 2) / baldes).astype(int) + 1
+    limites[-1] = n - 1
+
+    # Média de cada balde, com o último ponto como "balde" seguinte do último balde
+    soma_x = np.concatenate(([0.0], np.cumsum(x)))
+    soma_y = np.concatenate(([0.0], np.cumsum(y)))
+    tamanhos = np.diff(limites)
+    media_x = np.append((soma_x[limites[1:]] - soma_x[limites[:-1]]) / tamanhos, x[-1])
+    media_y = np.append((soma_y[limites[1:]] - soma_y[limites[:-1]]) / tamanhos, y[-1])
+
+    indices = np.empty(max_pontos, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(baldes):
+        inicio, fim = limites[i], limites[i + 1]
+        ax, ay = x[anterior], y[anterior]
+        # Dobro da área do triângulo (anterior, candidato, média do próximo balde)
+        areas = np.abs((ax - media_x[i + 1]) * (y[inicio:fim] - ay)
+                       - (ax - x[inicio:fim]) * (media_y[i + 1] - ay))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
@@ -0,0 +1,108 @@
+import re
+import threading
+
+from . import metrics
+from .texto import normalizar
+
+# ------------------------------------------------------------
+# Índice das entidades conhecidas do banco (gazetteer)
+# ------------------------------------------------------------
+# Os nomes de funcionários, clientes, departamentos e projetos carregados em
+# cache_dados viram uma trie de tokens normalizados (minúsculas, sem acentos
+# nem pontuação). mencoes() percorre a pergunta uma vez: de cada token, desce
+# a trie enquanto os tokens seguintes continuam algum nome, então o custo
+# depende do tamanho da pergunta e do maior nome, não de quantos nomes há.
+#
+# atualizar() recebe o conteúdo novo de um grupo e só inclui e remove os
+# nomes que mudaram. Leituras não usam trava: cada nó é um dict alterado só
+# com operações atômicas e as folhas são tuplas trocadas inteiras.
+
+_NAO_PALAVRA = re.compile(r'[^\w]+')
+_FIM = None  # chave da folha dentro de um nó: {grupo: ((nome, id), ...)}
+
+
+def tokens(texto):
+    """Tokens normalizados do texto (minúsculas, sem acentos, sem pontuação)."""
+    return tuple(_NAO_PALAVRA.sub(' ', normalizar(texto)).split())
+
+
+class IndiceEntidades:
+    """Trie de tokens com os nomes conhecidos de cada grupo ('funcionarios', 'clientes' ...)."""
+
+    def __init__(self):
+        self._raiz = {}
+        self._grupos = {}  # grupo -> {(nome, id): tokens}
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return sum(len(entradas) for entradas in self._grupos.values())
+
+    def atualizar(self, grupo, entradas):
+        """
+        Deixa o grupo com exatamente as `entradas` [(nome, id), ...], mexendo na
+        trie só pelos nomes incluídos e removidos. Retorna (incluídos, removidos).
+        """
+        novas = dict.fromkeys(entradas)
+        with self._trava:
+            atuais = self._grupos.setdefault(grupo, {})
+            removidas = [entrada for entrada in atuais if entrada not in novas]
+            incluidas = [entrada for entrada in novas if entrada not in atuais]
+            for entrada in removidas:
+                self._remover(grupo, entrada, atuais.pop(entrada))
+            for entrada in incluidas:
+                chave = tokens(entrada[0] or '')
+                if chave:
+                    self._incluir(grupo, entrada, chave)
+                atuais[entrada] = chave
+        metrics.ENTIDADES_INDEXADAS.inc(grupo, valor=len(incluidas) - len(removidas))
+        return len(incluidas), len(removidas)
+
+    def _incluir(self, grupo, entrada, chave):
+        no = self._raiz
+        for token in chave:
+            no = no.setdefault(token, {})
+        folha = no.setdefault(_FIM, {})
+        folha[grupo] = folha.get(grupo, ()) + (entrada,)
+
+    def _remover(self, grupo, entrada, chave):
+        if not chave:
+            return
+        caminho = [self._raiz]
+        for token in chave:
+            caminho.append(caminho[-1][token])
+        folha = caminho[-1][_FIM]
+        restantes = tuple(e for e in folha[grupo] if e != entrada)
+        if restantes:
+            folha[grupo] = restantes
+            return
+        del folha[grupo]
+        if not folha:
+            del caminho[-1][_FIM]
+        # Poda os nós que ficaram vazios, de baixo para cima
+        for token, pai, no in zip(reversed(chave), reversed(caminho[:-1]), reversed(caminho[1:])):
+            if no:
+                break
+            del pai[token]
+
+    def mencoes(self, pergunta):
+        """
+        {grupo: (nome, id)} das entidades citadas na pergunta, em palavras
+        inteiras e sem diferença de acento, caixa ou pontuação. Em cada grupo
+        vence o nome mais longo; no empate (homônimos), o primeiro carregado.
+        """
+        texto = tokens(pergunta)
+        melhores = {}  # grupo -> (tamanho, (nome, id))
+        for inicio in range(len(texto)):
+            no = self._raiz
+            tamanho = -1
+            for token in texto[inicio:]:
+                no = no.get(token)
+                if no is None:
+                    break
+                tamanho += len(token) + 1
+                folha = no.get(_FIM)
+                if folha:
+                    for grupo, entradas in tuple(folha.items()):
+                        if tamanho > melhores.get(grupo, (0, None))[0]:
+                            melhores[grupo] = (tamanho, entradas[0])
+        return {grupo: entrada for grupo, (_tamanho, entrada) in melhores.items()}
@@ -0,0 +1,144 @@
+import csv
+import io
+import logging
+import os
+import zlib
+
+from . import metrics, parametros, serializacao
+from .query_mapping import query_mappings
+
+# ------------------------------------------------------------
+# Exportação das linhas de um mapeamento em CSV, NDJSON ou Arrow IPC stream
+# ------------------------------------------------------------
+# A SQL do mapeamento roda num cursor no servidor e as linhas são lidas em
+# lotes de EXPORTACAO_LOTE_LINHAS: cada lote vira um pedaço do corpo da
+# resposta (comprimido com gzip, se o cliente aceitar) e é descartado antes
+# do próximo FETCH, então a memória não cresce com o tamanho do resultado.
+
+EXPORTACAO_LOTE_LINHAS = int(os.getenv('EXPORTACAO_LOTE_LINHAS', '5000'))
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'arrow': serializacao.ARROW_MIMETYPE,
+}
+
+# label -> SQL (um label repetido em query_mappings tem a mesma SQL)
+SQLS = {label: sql for _frases, label, sql in query_mappings}
+
+
+class FalhaExportacao(Exception):
+    """A SQL da exportação não pôde ser executada (conexão ou erro no banco)."""
+
+
+def preparar(label, args):
+    """
+    (sql, params) do mapeamento com os placeholders preenchidos pela query
+    string. Levanta KeyError para label desconhecido e ValueError para
+    parâmetros ausentes ou inválidos.
+    """
+    sql = SQLS[label]
+    return parametros.vincular(sql, {nome: args.get(nome) for nome in parametros.nomes(sql)})
+
+
+def abrir(conn, sql, params):
+    """
+    Executa a SQL num cursor no servidor e busca o primeiro lote, para que
+    erros apareçam antes de a resposta começar. Retorna (cursor, primeiro lote);
+    em caso de erro, fecha a conexão e levanta FalhaExportacao.
+    """
+    try:
+        cur = conn.cursor(name='sophos_exportacao')
+        cur.execute(sql, params)
+        return cur, cur.fetchmany(EXPORTACAO_LOTE_LINHAS)
+    except Exception as e:
+        conn.close()
+        raise FalhaExportacao(str(e)) from e
+
+
+def _lotes(conn, cur, lote, formato):
+    """Lotes de linhas até o fim do cursor; fecha a conexão no fim ou se o cliente desistir."""
+    linhas = 0
+    resultado = 'interrompida'
+    try:
+        while lote:
+            linhas += len(lote)
+            yield lote
+            lote = cur.fetchmany(EXPORTACAO_LOTE_LINHAS)
+        resultado = 'ok'
+    except Exception as e:
+        # Os headers já foram enviados: propagar o erro interrompe a resposta
+        # sem o fim do corpo, para o cliente não tomar o arquivo por completo
+        resultado = 'erro'
+        logging.error(f"Erro durante a exportação: {e}")
+        raise
+    finally:
+        conn.close()
+        metrics.EXPORTACOES_TOTAL.inc(formato, resultado)
+        metrics.EXPORTACAO_LINHAS_TOTAL.inc(formato, valor=linhas)
+
+
+def _csv(lotes, colunas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(colunas)
+    for lote in lotes:
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(lotes, colunas, description):
+    for lote in lotes:
+        yield b''.join(serializacao.dumps(registro) + b'\n'
+                       for registro in serializacao.registros(lote, colunas, description))
+
+
+def _arrow(lotes, colunas, description):
+    # Um RecordBatch por lote; o schema (da description) vai antes do primeiro
+    schema = serializacao.schema_arrow(colunas, description)
+    saida = io.BytesIO()
+    escritor = None
+    for lote in lotes:
+        batch = serializacao.lote_arrow(lote, colunas, schema)
+        if escritor is None:
+            schema = batch.schema
+            escritor = serializacao.pyarrow.ipc.new_stream(saida, schema)
+        escritor.write_batch(batch)
+        yield saida.getvalue()
+        saida.seek(0)
+        saida.truncate()
+    if escritor is None:
+        escritor = serializacao.pyarrow.ipc.new_stream(saida, schema or serializacao.lote_arrow([], colunas).schema)
+    escritor.close()
+    yield saida.getvalue()
+
+
+def _gzip(pedacos):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: cabeçalho gzip
+    for pedaco in pedacos:
+        comprimido = compressor.compress(pedaco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def corpo(conn, cur, primeiro_lote, formato, comprimir=False):
+    """
+    Gerador dos bytes da resposta no formato pedido, lendo o cursor lote a
+    lote a partir do primeiro já buscado. Fechar o gerador (cliente
+    desconectado) encerra o cursor e a conexão.
+    """
+    description = cur.description
+    colunas = [coluna[0] for coluna in description]
+    lotes = _lotes(conn, cur, primeiro_lote, formato)
+    if formato == 'arrow':
+        pedacos = _arrow(lotes, colunas, description)
+    elif formato == 'ndjson':
+        pedacos = _ndjson(lotes, colunas, description)
+    else:
+        pedacos = _csv(lotes, colunas)
+    return _gzip(pedacos) if comprimir else pedacos
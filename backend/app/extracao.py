@@ -0,0 +1,218 @@
+import calendar
+import re
+from datetime import date, timedelta
+
+from .texto import normalizar
+
+# ------------------------------------------------------------
+# Extração dos parâmetros dos mapeamentos a partir da pergunta
+# ------------------------------------------------------------
+# Os placeholders de query_mapping.py ({id}, '{start_date}', '%{nome}%' ...)
+# são preenchidos com valores tirados da pergunta: números e datas por
+# expressões regulares sobre o texto normalizado (minúsculas, sem acentos),
+# intervalos relativos ("mês passado", "últimos 30 dias") a partir de hoje e
+# nomes pelas menções às entidades conhecidas do banco (app/entidades.py), com
+# as entidades PER/ORG do spaCy como alternativa. O que não for encontrado fica
+# de fora do resultado, e o mapeamento é pulado antes de ir ao banco.
+
+MESES = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+}
+_MES = '(?:' + '|'.join(MESES) + ')'
+
+# Períodos na ordem em que aparecem na pergunta (texto normalizado)
+_PERIODO = re.compile(
+    r'\b(?P<iso>(?P<iso_a>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2}))\b'
+    r'|\b(?P<br>(?P<br_d>\d{1,2})/(?P<br_m>\d{1,2})/(?P<br_a>\d{4}|\d{2}))\b'
+    rf'|\b(?P<extenso>(?P<ext_d>\d{{1,2}}) de (?P<ext_m>{_MES})(?: de (?P<ext_a>\d{{4}}))?)\b'
+    rf'|\b(?P<mes_ano>(?P<ma_m>{_MES})(?: de | do ano de |/)(?P<ma_a>\d{{4}}))\b'
+    rf'|\b(?:em|de|desde|ate|a|e|entre|no mes de|mes de) (?P<mes>{_MES})\b(?!(?: de | do ano de |/)\d{{4}})'
+    r'|\b(?:em|de|desde|ate|a|e|entre|no ano de|do ano de|ano de|ano) (?P<ano>(?:19|20)\d{2})\b(?![-/]\d)'
+    r'|\b(?P<relativo>hoje|ontem'
+    r'|(?:esta|nesta|desta|essa|nessa|dessa) semana|semana (?:passada|anterior)'
+    r'|(?:este|neste|deste|esse|nesse|desse) mes|mes (?:atual|corrente)|mes (?:passado|anterior)'
+    r'|(?:este|neste|deste|esse|nesse|desse) ano|ano (?:atual|corrente)|ano (?:passado|anterior))\b'
+    r'|\bultim[oa]s (?P<n>\d+) (?P<unidade>dias|semanas|meses|anos)\b'
+)
+_ANO_SOLTO = re.compile(r'\b(?:19|20)\d{2}\b')
+
+# Identificador explícito ("id 12", "código 12", "nº 12", "#12"), procurado antes
+# da normalização (que transforma "nº" em "no"), ou número solto
+_ID_EXPLICITO = re.compile(r'(?:\bid|\bc[oó]digo|\bn[º°]|\bn[uú]mero|#)\s*[:=]?\s*(\d{1,9})\b')
+_NUMERO = re.compile(r'(?<![\w/.,-])(\d{1,9})(?![\w/.,-]|,\d)')
+
+# Placeholders de nome: mapeamento -> grupo de entidades conhecidas que o resolve
+# (e o rótulo de entidade do spaCy aceito quando o nome não é conhecido)
+ENTIDADES_DO_NOME = {
+    'funcionario-por-nome': ('funcionarios', 'PER'),
+    'departamento-por-nome': ('departamentos', None),
+    'cliente-por-nome': ('clientes', 'ORG'),
+}
+# Placeholders de id resolvidos pelo nome da entidade, se ela for citada
+ENTIDADES_DO_ID = {
+    'cliente_id': 'clientes',
+    'funcionario_id': 'funcionarios',
+}
+# {id} dos mapeamentos "<entidade>-por-id", idem
+ENTIDADES_DO_LABEL = {
+    'cliente-por-id': 'clientes',
+    'funcionario-por-id': 'funcionarios',
+    'departamento-por-id': 'departamentos',
+    'projeto-por-id': 'projetos',
+}
+
+
+def _fim_do_mes(ano, mes):
+    return date(ano, mes, calendar.monthrange(ano, mes)[1])
+
+
+def _menos_meses(dia, meses):
+    total = dia.year * 12 + dia.month - 1 - meses
+    ano, mes = divmod(total, 12)
+    return date(ano, mes + 1, min(dia.day, calendar.monthrange(ano, mes + 1)[1]))
+
+
+def _ano(texto):
+    ano = int(texto)
+    return ano + 2000 if ano < 100 else ano
+
+
+def _relativo(expressao, hoje):
+    """Intervalo de "hoje", "semana passada", "este mês" etc. (o atual vai até hoje)."""
+    if expressao == 'hoje':
+        return hoje, hoje
+    if expressao == 'ontem':
+        return hoje - timedelta(days=1), hoje - timedelta(days=1)
+    unidade_primeiro = expressao.split()[0] in ('semana', 'mes', 'ano')
+    anterior = unidade_primeiro and expressao.split()[1] in ('passada', 'passado', 'anterior')
+    if 'semana' in expressao:
+        segunda = hoje - timedelta(days=hoje.weekday())
+        return (segunda - timedelta(days=7), segunda - timedelta(days=1)) if anterior else (segunda, hoje)
+    if 'mes' in expressao.split():
+        if anterior:
+            fim = hoje.replace(day=1) - timedelta(days=1)
+            return fim.replace(day=1), fim
+        return hoje.replace(day=1), hoje
+    if anterior:
+        return date(hoje.year - 1, 1, 1), date(hoje.year - 1, 12, 31)
+    return date(hoje.year, 1, 1), hoje
+
+
+def _ultimos(n, unidade, hoje):
+    if unidade == 'dias':
+        return hoje - timedelta(days=max(n - 1, 0)), hoje
+    if unidade == 'semanas':
+        return hoje - timedelta(weeks=n), hoje
+    return _menos_meses(hoje, n * (12 if unidade == 'anos' else 1)), hoje
+
+
+def periodos(pergunta, hoje=None):
+    """
+    Lista de ((início, fim), (posição inicial, final)) de cada data, mês, ano ou
+    intervalo relativo citado na pergunta, na ordem do texto. Datas inválidas
+    (31/02) são ignoradas. Um mês sem ano fica no ano citado na pergunta ou,
+    sem ano citado, na ocorrência mais recente até hoje.
+    """
+    hoje = hoje or date.today()
+    texto = normalizar(pergunta)
+    ano_citado = _ANO_SOLTO.search(texto)
+    encontrados = []
+    for m in _PERIODO.finditer(texto):
+        try:
+            if m.group('iso'):
+                dia = date(int(m.group('iso_a')), int(m.group('iso_m')), int(m.group('iso_d')))
+                intervalo = (dia, dia)
+            elif m.group('br'):
+                dia = date(_ano(m.group('br_a')), int(m.group('br_m')), int(m.group('br_d')))
+                intervalo = (dia, dia)
+            elif m.group('extenso'):
+                ano = int(m.group('ext_a')) if m.group('ext_a') else hoje.year
+                dia = date(ano, MESES[m.group('ext_m')], int(m.group('ext_d')))
+                intervalo = (dia, dia)
+            elif m.group('mes_ano'):
+                ano, mes = int(m.group('ma_a')), MESES[m.group('ma_m')]
+                intervalo = (date(ano, mes, 1), _fim_do_mes(ano, mes))
+            elif m.group('mes'):
+                mes = MESES[m.group('mes')]
+                if ano_citado:
+                    ano = int(ano_citado.group())
+                else:
+                    ano = hoje.year if mes <= hoje.month else hoje.year - 1
+                intervalo = (date(ano, mes, 1), _fim_do_mes(ano, mes))
+            elif m.group('ano'):
+                ano = int(m.group('ano'))
+                intervalo = (date(ano, 1, 1), date(ano, 12, 31))
+            elif m.group('relativo'):
+                intervalo = _relativo(m.group('relativo'), hoje)
+            else:
+                intervalo = _ultimos(int(m.group('n')), m.group('unidade'), hoje)
+        except ValueError:
+            continue
+        encontrados.append((intervalo, m.span()))
+    return encontrados
+
+
+def intervalo_de_datas(pergunta, hoje=None):
+    """
+    (start_date, end_date) inclusivos cobrindo do primeiro ao último período
+    citado ("entre 01/01/2024 e 31/03/2024", "de janeiro a março de 2024",
+    "mês passado"), ou None se a pergunta não cita nenhum.
+    """
+    encontrados = periodos(pergunta, hoje)
+    if not encontrados:
+        return None
+    inicio = min(intervalo[0] for intervalo, _pos in encontrados)
+    fim = max(intervalo[1] for intervalo, _pos in encontrados)
+    return inicio, fim
+
+
+def identificador(pergunta, hoje=None):
+    """
+    Id citado na pergunta: o número após "id", "código", "nº" ou "#" ou, sem
+    marcador, o único número solto que não faz parte de uma data. None se não
+    houver ou se for ambíguo.
+    """
+    texto = normalizar(pergunta)
+    explicito = _ID_EXPLICITO.search(pergunta.lower())
+    if explicito:
+        return int(explicito.group(1))
+    ocupados = [pos for _intervalo, pos in periodos(pergunta, hoje)]
+    soltos = [m for m in _NUMERO.finditer(texto)
+              if not any(inicio <= m.start() < fim for inicio, fim in ocupados)]
+    return int(soltos[0].group(1)) if len(soltos) == 1 else None
+
+
+def extrair(pergunta, label, nomes, mencoes=None, entidades=None, hoje=None):
+    """
+    dict {placeholder: valor} com os placeholders `nomes` do mapeamento `label`
+    que a pergunta resolve; os não resolvidos ficam de fora. `mencoes` é
+    {grupo: (nome, id)} das entidades conhecidas citadas na pergunta
+    (IndiceEntidades.mencoes) e `entidades`, uma lista de (texto, rótulo) do spaCy.
+    """
+    mencoes = mencoes or {}
+    valores = {}
+    if 'start_date' in nomes or 'end_date' in nomes:
+        intervalo = intervalo_de_datas(pergunta, hoje)
+        if intervalo is not None:
+            valores['start_date'], valores['end_date'] = intervalo
+    for nome in nomes:
+        if nome in ('nome', 'nome_empresa') and label in ENTIDADES_DO_NOME:
+            grupo, rotulo_spacy = ENTIDADES_DO_NOME[label]
+            citada = mencoes.get(grupo)
+            if citada is not None:
+                valores[nome] = citada[0]
+            elif rotulo_spacy is not None:
+                textos = [texto for texto, rotulo in entidades or () if rotulo == rotulo_spacy]
+                if textos:
+                    valores[nome] = textos[0]
+        elif nome in ENTIDADES_DO_ID or (nome == 'id' and label in ENTIDADES_DO_LABEL):
+            citada = mencoes.get(ENTIDADES_DO_ID.get(nome) or ENTIDADES_DO_LABEL[label])
+            ident = citada[1] if citada is not None else identificador(pergunta, hoje)
+            if ident is not None:
+                valores[nome] = ident
+        elif nome == 'id':
+            ident = identificador(pergunta, hoje)
+            if ident is not None:
+                valores[nome] = ident
+    return valores
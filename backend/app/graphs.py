@@ -1,13 +1,181 @@
+import hashlib
 import os
+from email.utils import format_datetime
+from datetime import date, datetime, timedelta, timezone
 import psycopg2
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from dotenv import load_dotenv
 import logging
+from . import cache_graficos, downsampling, exportacao, metrics, profiling, serializacao, tracing
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
 app = Flask(__name__)
+profiling.instalar(app)
+
+# Lê os gráficos dos rollups materializados (db/migrations/002_rollups.sql); 0 desliga
+GRAFICOS_ROLLUPS = os.getenv('GRAFICOS_ROLLUPS', '1') != '0'
+
+# Cache das respostas dos gráficos (app/cache_graficos.py): segundos em que a
+# resposta é fresca (0 desliga) e janela extra de stale-while-revalidate
+GRAFICOS_CACHE_TTL = float(os.getenv('GRAFICOS_CACHE_TTL', '30'))
+GRAFICOS_CACHE_STALE = float(os.getenv('GRAFICOS_CACHE_STALE', '300'))
+cache_respostas = cache_graficos.CacheRespostas(GRAFICOS_CACHE_TTL, GRAFICOS_CACHE_STALE)
+
+
+class FalhaConexao(Exception):
+    """get_db_connection não conseguiu abrir a conexão com o banco."""
+
+
+# Granularidades de ?granularidade=: (unidade do DATE_TRUNC, formato do rótulo do período)
+GRANULARIDADES = {
+    'dia': ('day', 'YYYY-MM-DD'),
+    'semana': ('week', 'IYYY-"S"IW'),
+    'mes': ('month', 'YYYY-MM'),
+    'trimestre': ('quarter', 'YYYY-"T"Q'),
+}
+# Pontos por série temporal quando ?max_pontos= não é informado; acima disso, LTTB
+GRAFICOS_MAX_PONTOS = int(os.getenv('GRAFICOS_MAX_PONTOS', '500'))
+MAX_PONTOS_LIMITE = 5000
+TOP_PADRAO = 5
+TOP_LIMITE = 100
+
+
+def _filtro_periodo(coluna, inicio, fim):
+    """Condições SQL e parâmetros do intervalo [inicio, fim] (datas inclusivas) sobre `coluna`."""
+    condicoes, params = [], []
+    if inicio is not None:
+        condicoes.append(f"{coluna} >= %s")
+        params.append(inicio)
+    if fim is not None:
+        condicoes.append(f"{coluna} < %s")
+        params.append(fim + timedelta(days=1))
+    return condicoes, params
+
+
+def sql_vendas_por_periodo(granularidade='mes', inicio=None, fim=None):
+    """
+    Retorna (sql ao vivo, rollup, params) da série de vendas por período; rollup
+    é (nome em rollup_atualizacao, sql) ou None quando o rollup mensal não
+    atende o pedido, e params vale para as duas SQLs. A terceira coluna (início
+    do período em epoch) é o eixo x do downsampling e não vai para o JSON.
+    """
+    unidade, formato = GRANULARIDADES[granularidade]
+    periodo = f"DATE_TRUNC('{unidade}', data_venda)"
+    condicoes, params = _filtro_periodo('data_venda', inicio, fim)
+    sql = f"""
+        SELECT TO_CHAR({periodo}, '{formato}') AS mes, SUM(valor) AS total_vendas,
+               EXTRACT(EPOCH FROM {periodo}) AS x
+        FROM vendas
+        WHERE {' AND '.join(['data_venda IS NOT NULL'] + condicoes)}
+        GROUP BY {periodo}
+        ORDER BY {periodo};
+    """
+    rollup = None
+    # O rollup guarda meses inteiros: só serve a granularidade mensal em meses completos
+    if granularidade == 'mes' and (inicio is None or inicio.day == 1) \
+            and (fim is None or (fim + timedelta(days=1)).day == 1):
+        condicoes_rollup, _params = _filtro_periodo('mes', inicio, fim)
+        rollup = ('vendas_mes', f"""
+        SELECT TO_CHAR(mes, 'YYYY-MM') AS mes, total_vendas, EXTRACT(EPOCH FROM mes) AS x
+        FROM rollup_vendas_mes
+        WHERE {' AND '.join(['quantidade > 0'] + condicoes_rollup)}
+        ORDER BY mes;
+    """)
+    return sql, rollup, params
+
+
+def sql_receita_por_cliente(top=TOP_PADRAO, inicio=None, fim=None):
+    """
+    Retorna (sql ao vivo, rollup, params) dos `top` clientes por receita. O
+    rollup não tem a dimensão de data, então só atende pedidos sem intervalo.
+    """
+    condicoes, params = _filtro_periodo('v.data_venda', inicio, fim)
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    sql = f"""
+        SELECT c.nome_empresa AS cliente, SUM(v.valor) AS receita
+        FROM clientes c
+        JOIN projetos p ON p.cliente_id = c.id
+        JOIN vendas v ON v.projeto_id = p.id
+        {where}
+        GROUP BY c.nome_empresa
+        ORDER BY receita DESC
+        LIMIT {int(top)};
+    """
+    rollup = None
+    if inicio is None and fim is None:
+        rollup = ('receita_cliente', f"""
+        SELECT c.nome_empresa AS cliente, SUM(r.receita) AS receita
+        FROM rollup_receita_cliente r
+        JOIN clientes c ON c.id = r.cliente_id
+        WHERE r.quantidade > 0
+        GROUP BY c.nome_empresa
+        ORDER BY receita DESC
+        LIMIT {int(top)};
+    """)
+    return sql, rollup, params
+
+
+# SQL de cada endpoint de gráfico com os parâmetros padrão, por nome (também
+# usadas pelas ferramentas de loadtest/)
+CONSULTAS = {
+    'total_vendas_por_mes': sql_vendas_por_periodo()[0],
+    'funcionarios_por_departamento': """
+        SELECT d.nome AS departamento, COUNT(f.id) AS quantidade
+        FROM departamentos d
+        LEFT JOIN funcionarios f ON f.departamento_id = d.id
+        GROUP BY d.nome
+        ORDER BY quantidade DESC;
+    """,
+    'projetos_por_status': """
+        SELECT status, COUNT(*) AS quantidade
+        FROM projetos
+        GROUP BY status
+        ORDER BY quantidade DESC;
+    """,
+    'receita_por_cliente': sql_receita_por_cliente()[0],
+}
+
+# Mesmas séries lidas dos rollups: (nome em rollup_atualizacao, SQL). O formato
+# das linhas é idêntico ao das CONSULTAS, que ficam como fallback ao vivo.
+CONSULTAS_ROLLUP = {
+    'total_vendas_por_mes': sql_vendas_por_periodo()[1],
+    'funcionarios_por_departamento': ('funcionarios_departamento', """
+        SELECT d.nome AS departamento, COALESCE(SUM(r.quantidade), 0)::BIGINT AS quantidade
+        FROM departamentos d
+        LEFT JOIN rollup_funcionarios_departamento r ON r.departamento_id = d.id
+        GROUP BY d.nome
+        ORDER BY quantidade DESC;
+    """),
+    'projetos_por_status': ('projetos_status', """
+        SELECT status, quantidade
+        FROM rollup_projetos_status
+        WHERE quantidade > 0
+        ORDER BY quantidade DESC;
+    """),
+    'receita_por_cliente': sql_receita_por_cliente()[1],
+}
+
+# Parâmetros da query string que mudam cada série (e entram na chave do cache)
+PARAMETROS_DA_SERIE = {
+    'total_vendas_por_mes': ('inicio', 'fim', 'granularidade', 'max_pontos'),
+    'funcionarios_por_departamento': (),
+    'projetos_por_status': (),
+    'receita_por_cliente': ('inicio', 'fim', 'top'),
+}
+
+# Séries temporais: reduzidas com LTTB (x = 3ª coluna, y = 2ª) acima de max_pontos
+SERIES_TEMPORAIS = {'total_vendas_por_mes'}
+
+# Colunas de cada série, na ordem das consultas (chave do JSON de cada linha)
+COLUNAS = {
+    'total_vendas_por_mes': ['mes', 'total_vendas'],
+    'funcionarios_por_departamento': ['departamento', 'quantidade'],
+    'projetos_por_status': ['status', 'quantidade'],
+    'receita_por_cliente': ['cliente', 'receita'],
+}
+
 
 def get_db_connection():
     try:
@@ -17,13 +185,15 @@ def get_db_connection():
             dbname=os.getenv('DB_NAME'),
             user=os.getenv('DB_USER'),
             password=os.getenv('DB_PASSWORD'),
-            sslmode='require'  # comente se não usar SSL
+            sslmode=os.getenv('DB_SSLMODE', 'require')  # use DB_SSLMODE=disable se não usar SSL
         )
-        return conn
+        return metrics.ConexaoMonitorada(conn)
     except Exception as e:
+        metrics.DB_CONEXOES_ERROS_TOTAL.inc()
         logging.error(f"Erro ao conectar ao banco: {e}")
         return None
 
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
@@ -31,91 +201,362 @@ def health_check():
     """
     return jsonify({"status": "healthy", "message": "API está funcionando"})
 
+
+@app.route('/metrics', methods=['GET'])
+def expor_metricas():
+    """
+    Métricas no formato de exposição do Prometheus
+    """
+    return Response(metrics.registro.expor(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/api/query/total_vendas_por_mes', methods=['GET'])
 def total_vendas_por_mes():
     """
-    Retorna lista de {mes: 'YYYY-MM', total_vendas: valor}
+    Retorna lista de {mes: período, total_vendas: valor}. Aceita ?inicio= e
+    ?fim= (YYYY-MM-DD), ?granularidade=dia|semana|mes|trimestre (o rótulo em
+    'mes' segue a granularidade) e ?max_pontos= (acima disso, reduz com LTTB).
     """
-    query = """
-        SELECT TO_CHAR(data_venda, 'YYYY-MM') AS mes, SUM(valor) AS total_vendas
-        FROM vendas
-        GROUP BY mes
-        ORDER BY mes;
-    """
-    return executar_query_e_gerar_json(query, ['mes', 'total_vendas'])
+    return servir_serie('total_vendas_por_mes')
+
 
 @app.route('/api/query/funcionarios_por_departamento', methods=['GET'])
 def funcionarios_por_departamento():
     """
     Retorna lista de {departamento: nome, quantidade: número de funcionários}
     """
-    query = """
-        SELECT d.nome AS departamento, COUNT(f.id) AS quantidade
-        FROM departamentos d
-        LEFT JOIN funcionarios f ON f.departamento_id = d.id
-        GROUP BY d.nome
-        ORDER BY quantidade DESC;
-    """
-    return executar_query_e_gerar_json(query, ['departamento', 'quantidade'])
+    return servir_serie('funcionarios_por_departamento')
+
 
 @app.route('/api/query/projetos_por_status', methods=['GET'])
 def projetos_por_status():
     """
     Retorna lista de {status: 'Em andamento'|'Concluído'|..., quantidade: count}
     """
-    query = """
-        SELECT status, COUNT(*) AS quantidade
-        FROM projetos
-        GROUP BY status
-        ORDER BY quantidade DESC;
-    """
-    return executar_query_e_gerar_json(query, ['status', 'quantidade'])
+    return servir_serie('projetos_por_status')
+
 
 @app.route('/api/query/receita_por_cliente', methods=['GET'])
 def receita_por_cliente():
     """
-    Retorna lista de {cliente: nome_empresa, receita: soma de vendas}
+    Retorna lista de {cliente: nome_empresa, receita: soma de vendas} com os
+    ?top= clientes (padrão 5), opcionalmente no intervalo ?inicio=/?fim=.
     """
-    query = """
-        SELECT c.nome_empresa AS cliente, SUM(v.valor) AS receita
-        FROM clientes c
-        JOIN projetos p ON p.cliente_id = c.id
-        JOIN vendas v ON v.projeto_id = p.id
-        GROUP BY c.nome_empresa
-        ORDER BY receita DESC
-        LIMIT 5;
+    return servir_serie('receita_por_cliente')
+
+
+@app.route('/api/dashboard', methods=['GET'])
+def dashboard():
     """
-    return executar_query_e_gerar_json(query, ['cliente', 'receita'])
+    Retorna todas as séries dos gráficos numa resposta só:
+    {series: {nome: [...]}, fontes: {nome: 'rollup'|'ao-vivo'}, atualizado_em: {nome: ISO 8601}}.
+    ?series=nome1,nome2 restringe às séries pedidas (400 se alguma não existir)
+    e os parâmetros dos endpoints individuais valem para as séries que os usam.
+    Cada combinação de séries e parâmetros é uma entrada do cache, com ETag das séries.
+    """
+    endpoint = request.endpoint
+    pedidas = [n.strip() for n in request.args.get('series', '').split(',') if n.strip()]
+    desconhecidas = [n for n in pedidas if n not in CONSULTAS]
+    if desconhecidas:
+        return jsonify({"error": f"Séries desconhecidas: {', '.join(desconhecidas)}",
+                        "series_disponiveis": list(CONSULTAS)}), 400
+    nomes = list(dict.fromkeys(pedidas)) or list(CONSULTAS)
+    try:
+        parametros = ler_parametros(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with tracing.iniciar_trace(f'GET {request.path}', series=len(nomes)):
+        chave = chave_cache(f"{endpoint}?series={','.join(nomes)}", nomes, parametros)
+        return servir_do_cache(endpoint, chave, lambda: calcular_dashboard(endpoint, nomes, parametros))
 
-def executar_query_e_gerar_json(query, colunas):
+
+@app.route('/api/export/<label>', methods=['GET'])
+def exportar(label):
     """
-    Executa a query e converte o resultado em JSON array de objetos.
-    Cada coluna mapeia para colunas[i]. Se falhar, retorna status 500.
+    Exporta todas as linhas do mapeamento `label` (query_mapping.py) em
+    ?formato=csv (padrão, com cabeçalho), ndjson ou arrow (também escolhido
+    por Accept: application/vnd.apache.arrow.stream), em streaming a partir de
+    um cursor no servidor. Os placeholders da SQL vêm da query string (ex.:
+    ?start_date=2024-01-01&end_date=2024-06-30 em vendas-periodo). O corpo sai
+    comprimido com gzip se o Accept-Encoding aceitar. Label desconhecido
+    retorna 404; formato ou parâmetros inválidos, 400; Arrow sem pyarrow, 406;
+    falha no banco, 500.
     """
+    formato = request.args.get('formato') or ('arrow' if formato_pedido() == 'arrow' else 'csv')
+    if formato not in exportacao.FORMATOS:
+        return jsonify({"error": f"'formato' deve ser um de: {', '.join(exportacao.FORMATOS)}"}), 400
+    if formato == 'arrow' and serializacao.pyarrow is None:
+        return jsonify({"error": "Formato Arrow indisponível (pyarrow não instalado)"}), 406
+    try:
+        sql, params = exportacao.preparar(label, request.args)
+    except KeyError:
+        return jsonify({"error": f"Mapeamento desconhecido: {label}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     conn = get_db_connection()
     if not conn:
+        metrics.EXPORTACOES_TOTAL.inc(formato, 'erro')
         return jsonify({"error": "Falha na conexão"}), 500
     try:
-        cur = conn.cursor()
-        cur.execute(query)
-        resultados = cur.fetchall()
-        dados = []
-        for row in resultados:
-            registro = {}
-            for i, col in enumerate(colunas):
-                valor = row[i]
-                if isinstance(valor, (float, int)):
-                    registro[col] = float(valor)
-                else:
-                    registro[col] = valor
-            dados.append(registro)
-        return jsonify(dados)
-    except Exception as e:
+        cur, primeiro_lote = exportacao.abrir(conn, sql, params)
+    except exportacao.FalhaExportacao as e:
+        metrics.EXPORTACOES_TOTAL.inc(formato, 'erro')
         logging.error(f"Erro ao executar query: {e}")
         return jsonify({"error": "Erro na consulta"}), 500
+
+    gzip = request.accept_encodings.best_match(['gzip']) == 'gzip'
+    resposta = Response(exportacao.corpo(conn, cur, primeiro_lote, formato, gzip),
+                        content_type=exportacao.FORMATOS[formato])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{label}.{formato}"'
+    if gzip:
+        resposta.headers['Content-Encoding'] = 'gzip'
+    resposta.vary.add('Accept-Encoding')
+    resposta.vary.add('Accept')
+    return resposta
+
+
+def calcular_dashboard(endpoint, nomes, parametros):
+    """
+    Lê as séries em sequência numa única conexão (em vez de uma conexão por
+    gráfico) e serializa o payload do dashboard. Retorna (corpo, headers, etag)
+    para o cache; o ETag cobre só as séries, já que o instante de uma consulta
+    ao vivo muda a cada cálculo.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise FalhaConexao()
+    cur = None
+    try:
+        cur = conn.cursor()
+        resultados, descricoes = {}, {}
+        for nome in nomes:
+            query, rollup, params = montar_serie(nome, parametros)
+            with tracing.span('sql', endpoint=nome) as sp, metrics.GRAFICO_QUERY_SEGUNDOS.time(nome):
+                resultados[nome] = consultar_serie(conn, cur, query, rollup, params)
+                descricoes[nome] = cur.description
+                sp.definir(rows=len(resultados[nome][0]), fonte=resultados[nome][1])
+            metrics.GRAFICO_FONTE_TOTAL.inc(endpoint, resultados[nome][1])
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+    with tracing.span('serializacao'), metrics.GRAFICO_SERIALIZACAO_SEGUNDOS.time(endpoint):
+        series = {nome: serializacao.registros(reduzir_serie(nome, linhas, parametros['max_pontos']),
+                                               COLUNAS[nome], descricoes[nome])
+                  for nome, (linhas, _fonte, _atualizado) in resultados.items()}
+        corpo = serializacao.dumps({
+            'series': series,
+            'fontes': {nome: fonte for nome, (_linhas, fonte, _atualizado) in resultados.items()},
+            'atualizado_em': {nome: atualizado.isoformat()
+                              for nome, (_linhas, _fonte, atualizado) in resultados.items()
+                              if isinstance(atualizado, datetime)},
+        })
+    etag = hashlib.sha1(serializacao.dumps(series)).hexdigest()
+    return corpo, {}, etag
+
+
+def consultar_serie(conn, cur, query, rollup=None, params=None):
+    """
+    Lê a série do rollup, se ele estiver preenchido; senão (ou se a leitura
+    falhar, por exemplo sem a migração aplicada), executa a query ao vivo.
+    params vale para as duas SQLs. Retorna (linhas, fonte, atualizado_em).
+    """
+    if rollup is not None and GRAFICOS_ROLLUPS:
+        nome, sql_rollup = rollup
+        try:
+            cur.execute("SELECT atualizado_em FROM rollup_atualizacao WHERE nome = %s", (nome,))
+            linha = cur.fetchone()
+            if linha is not None and linha[0] is not None:
+                cur.execute(sql_rollup, params or None)
+                return cur.fetchall(), 'rollup', linha[0]
+        except Exception as e:
+            logging.warning(f"Rollup '{nome}' indisponível, usando consulta ao vivo: {e}")
+            conn.rollback()
+    cur.execute(query, params or None)
+    return cur.fetchall(), 'ao-vivo', datetime.now(timezone.utc)
+
+
+def calcular_serie(nome, parametros, formato='json'):
+    """
+    Executa a query da série (ou lê o rollup equivalente), reduz as séries
+    temporais longas e serializa o resultado como JSON array de objetos (ou,
+    com formato='arrow', como Arrow IPC stream com as mesmas colunas). Roda
+    na requisição ou na revalidação em segundo plano do cache, então não usa o
+    request do Flask. Retorna (corpo, headers, etag) para o cache: a fonte e o
+    instante dos dados vão nos headers X-Fonte-Dados, X-Dados-Atualizados-Em e
+    Last-Modified, e X-Pontos-Originais indica uma série reduzida.
+    """
+    query, rollup, params = montar_serie(nome, parametros)
+    conn = get_db_connection()
+    if not conn:
+        raise FalhaConexao()
+    cur = None
+    try:
+        cur = conn.cursor()
+        with tracing.span('sql', endpoint=nome) as sp, metrics.GRAFICO_QUERY_SEGUNDOS.time(nome):
+            resultados, fonte, atualizado_em = consultar_serie(conn, cur, query, rollup, params)
+            descricao = cur.description
+            sp.definir(rows=len(resultados), fonte=fonte)
+        metrics.GRAFICO_FONTE_TOTAL.inc(nome, fonte)
     finally:
-        cur.close()
+        if cur is not None:
+            cur.close()
         conn.close()
+    with tracing.span('serializacao'), metrics.GRAFICO_SERIALIZACAO_SEGUNDOS.time(nome):
+        linhas = reduzir_serie(nome, resultados, parametros['max_pontos'])
+        if formato == 'arrow':
+            corpo = serializacao.arrow_ipc(linhas, COLUNAS[nome], descricao)
+        else:
+            corpo = serializacao.dumps(serializacao.registros(linhas, COLUNAS[nome], descricao))
+    headers = {'X-Fonte-Dados': fonte}
+    if formato == 'arrow':
+        headers['Content-Type'] = serializacao.ARROW_MIMETYPE
+    if isinstance(atualizado_em, datetime):
+        headers['X-Dados-Atualizados-Em'] = atualizado_em.isoformat()
+        headers['Last-Modified'] = format_datetime(atualizado_em.astimezone(timezone.utc), usegmt=True)
+    if len(linhas) < len(resultados):
+        headers['X-Pontos-Originais'] = str(len(resultados))
+    return corpo, headers, None
+
+
+def servir_do_cache(endpoint, chave, calcular):
+    """
+    Obtém a entrada do cache (ou calcula) e monta a resposta: codificação pelo
+    Accept-Encoding, ETag/If-None-Match (304), Cache-Control e X-Cache com o
+    resultado do cache. Se o cálculo falhar, retorna status 500.
+    """
+    try:
+        entrada, estado = cache_respostas.obter(chave, calcular)
+    except FalhaConexao:
+        metrics.GRAFICO_ERROS_TOTAL.inc(endpoint)
+        return jsonify({"error": "Falha na conexão"}), 500
+    except Exception as e:
+        metrics.GRAFICO_ERROS_TOTAL.inc(endpoint)
+        logging.error(f"Erro ao executar query: {e}")
+        return jsonify({"error": "Erro na consulta"}), 500
+    metrics.GRAFICO_CACHE_TOTAL.inc(endpoint, estado)
+
+    codificacao = request.accept_encodings.best_match(list(entrada.comprimidos))
+    resposta = Response(entrada.comprimidos.get(codificacao, entrada.corpo), mimetype='application/json')
+    resposta.headers.update(entrada.headers)
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    resposta.vary.add('Accept-Encoding')
+    resposta.vary.add('Accept')
+    # Cada codificação é uma representação diferente, com o próprio ETag
+    resposta.set_etag(f'{entrada.etag}-{codificacao}' if codificacao else entrada.etag)
+    if estado == 'desligado':
+        resposta.headers['Cache-Control'] = 'no-cache'
+    else:
+        max_age = max(0, int(cache_respostas.ttl - entrada.idade))
+        resposta.headers['Cache-Control'] = (f'public, max-age={max_age}, '
+                                             f'stale-while-revalidate={int(cache_respostas.stale)}')
+    resposta.headers['X-Cache'] = estado
+    return resposta.make_conditional(request)
+
+
+def servir_serie(nome):
+    """
+    Lê os parâmetros da query string e serve a série `nome` pelo cache do
+    endpoint, em JSON ou, com Accept: application/vnd.apache.arrow.stream, em
+    Arrow (cada formato é uma entrada do cache). Parâmetros inválidos retornam
+    400; Arrow sem pyarrow instalado, 406; falhas no banco, 500.
+    """
+    endpoint = request.endpoint
+    try:
+        parametros = ler_parametros(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    formato = formato_pedido()
+    if formato == 'arrow' and serializacao.pyarrow is None:
+        return jsonify({"error": "Formato Arrow indisponível (pyarrow não instalado)"}), 406
+    chave = chave_cache(endpoint, [nome], parametros)
+    if formato == 'arrow':
+        chave += '#arrow'
+    with tracing.iniciar_trace(f'GET {request.path}', formato=formato):
+        return servir_do_cache(endpoint, chave, lambda: calcular_serie(nome, parametros, formato))
+
+
+def formato_pedido():
+    """'arrow' se o Accept da requisição prefere Arrow IPC stream a JSON; senão 'json'."""
+    melhor = request.accept_mimetypes.best_match(['application/json', serializacao.ARROW_MIMETYPE])
+    return 'arrow' if melhor == serializacao.ARROW_MIMETYPE else 'json'
+
+
+def _ler_data(args, nome):
+    valor = args.get(nome)
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"'{nome}' deve estar no formato YYYY-MM-DD")
+
+
+def _ler_inteiro(args, nome, padrao, minimo, maximo):
+    valor = args.get(nome)
+    if not valor:
+        return padrao
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError(f"'{nome}' deve ser um número inteiro")
+    if not minimo <= numero <= maximo:
+        raise ValueError(f"'{nome}' deve estar entre {minimo} e {maximo}")
+    return numero
+
+
+def ler_parametros(args):
+    """
+    Parâmetros dos gráficos na query string, com os padrões preenchidos:
+    inicio/fim (datas inclusivas), granularidade, top e max_pontos. Levanta
+    ValueError com a mensagem para o cliente se algum for inválido.
+    """
+    inicio, fim = _ler_data(args, 'inicio'), _ler_data(args, 'fim')
+    if inicio and fim and inicio > fim:
+        raise ValueError("'inicio' deve ser anterior ou igual a 'fim'")
+    granularidade = args.get('granularidade') or 'mes'
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f"'granularidade' deve ser uma de: {', '.join(GRANULARIDADES)}")
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'granularidade': granularidade,
+        'top': _ler_inteiro(args, 'top', TOP_PADRAO, 1, TOP_LIMITE),
+        'max_pontos': _ler_inteiro(args, 'max_pontos', GRAFICOS_MAX_PONTOS, 3, MAX_PONTOS_LIMITE),
+    }
+
+
+def chave_cache(prefixo, nomes, parametros):
+    """
+    Chave do cache: o prefixo mais só os parâmetros que afetam as séries
+    `nomes`, para que parâmetros irrelevantes não dupliquem entradas.
+    """
+    usados = sorted({p for nome in nomes for p in PARAMETROS_DA_SERIE[nome]})
+    if not usados:
+        return prefixo
+    separador = '&' if '?' in prefixo else '?'
+    return prefixo + separador + '&'.join(f'{p}={parametros[p]}' for p in usados)
+
+
+def montar_serie(nome, parametros):
+    """(query, rollup, params) da série `nome` para os parâmetros de ler_parametros."""
+    if nome == 'total_vendas_por_mes':
+        return sql_vendas_por_periodo(parametros['granularidade'], parametros['inicio'], parametros['fim'])
+    if nome == 'receita_por_cliente':
+        return sql_receita_por_cliente(parametros['top'], parametros['inicio'], parametros['fim'])
+    return CONSULTAS[nome], CONSULTAS_ROLLUP[nome], []
+
+
+def reduzir_serie(nome, linhas, max_pontos):
+    """Reduz com LTTB as séries temporais com mais de max_pontos linhas."""
+    if nome not in SERIES_TEMPORAIS or len(linhas) <= max_pontos:
+        return linhas
+    indices = downsampling.lttb([linha[2] for linha in linhas], [linha[1] or 0 for linha in linhas], max_pontos)
+    return [linhas[i] for i in indices]
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,140 @@
+import logging
+import os
+from collections import Counter, defaultdict
+
+# ------------------------------------------------------------
+# Tabela de lemas para o vocabulário conhecido (caminho rápido)
+# ------------------------------------------------------------
+# Quase todas as palavras das perguntas vêm de um vocabulário pequeno e fechado:
+# as frases de query_mappings, stopwords e palavras de pergunta ("quantos",
+# "mostre" ...). A tabela guarda, para cada forma escrita, o lema e a marca de
+# stopword que o spaCy deu a ela. Ela é gerada offline (loadtest.gerar_lemas,
+# que o CI roda com o modelo baixado e põe no pacote de deploy) e carregada na
+# subida. Uma pergunta em que toda palavra está na tabela é lematizada com
+# buscas num dict; basta uma desconhecida para a pergunta inteira ir para o
+# spaCy, como antes.
+#
+# Arquivo TSV em UTF-8: a primeira linha identifica o modelo que gerou a tabela
+# ("# modelo\tpt_core_news_sm-3.8.0") e cada linha seguinte é
+# "forma\tlema\tstop", com o lema vazio quando é igual à forma e stop 0 ou 1.
+
+LEMATIZACAO_RAPIDA = os.getenv('LEMATIZACAO_RAPIDA', '1') == '1'
+LEMAS_ARQUIVO = os.getenv('LEMAS_ARQUIVO', os.path.join(os.path.dirname(__file__), 'lemas_pt.tsv'))
+
+# Pontuação que o spaCy separa das bordas das palavras
+_BORDAS = '.,;:!?¿¡()[]{}"\'«»“”‘’…'
+
+
+def identificar_modelo(nlp):
+    """Nome e versão do pipeline spaCy ("pt_core_news_sm-3.8.0")."""
+    meta = getattr(nlp, 'meta', None) or {}
+    return f"{meta.get('lang', '')}_{meta.get('name', '')}-{meta.get('version', '')}"
+
+
+class TabelaLemas:
+    """{forma em minúsculas: (lema, é stopword)} e o modelo spaCy que a gerou."""
+
+    def __init__(self, entradas=None, modelo=''):
+        self._entradas = dict(entradas or {})
+        self.modelo = modelo
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, forma):
+        return forma in self._entradas
+
+    def lemas(self, texto):
+        """
+        Set de lemas do texto sem stopwords nem números, como extrair_lemmas,
+        ou None se alguma palavra não está na tabela (ou tem pontuação no
+        meio) e o texto precisa do spaCy.
+        """
+        lemas = set()
+        for pedaco in texto.lower().split():
+            palavra = pedaco.strip(_BORDAS)
+            if not palavra or palavra.isdigit():
+                continue
+            entrada = self._entradas.get(palavra)
+            if entrada is None:
+                return None
+            lema, stop = entrada
+            if not stop:
+                lemas.add(lema)
+        return lemas
+
+    def salvar(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(f"# modelo\t{self.modelo}\n")
+            for forma, (lema, stop) in sorted(self._entradas.items()):
+                f.write(f"{forma}\t{'' if lema == forma else lema}\t{int(stop)}\n")
+
+    @classmethod
+    def ler(cls, caminho):
+        entradas = {}
+        modelo = ''
+        with open(caminho, encoding='utf-8') as f:
+            for linha in f:
+                linha = linha.rstrip('\n')
+                if linha.startswith('#'):
+                    chave, _, valor = linha[1:].strip().partition('\t')
+                    if chave == 'modelo':
+                        modelo = valor
+                    continue
+                if not linha:
+                    continue
+                forma, lema, stop = linha.split('\t')
+                entradas[forma] = (lema or forma, stop == '1')
+        return cls(entradas, modelo)
+
+
+def carregar(caminho=None, modelo=None):
+    """
+    Tabela do arquivo, ou None (caminho rápido desligado, arquivo ausente ou
+    gerado por outro modelo spaCy, cujos lemas não bateriam com os do spaCy
+    carregado): nesse caso toda lematização vai para o spaCy.
+    """
+    if not LEMATIZACAO_RAPIDA:
+        return None
+    caminho = caminho or LEMAS_ARQUIVO
+    try:
+        tabela = TabelaLemas.ler(caminho)
+    except FileNotFoundError:
+        logging.warning(f"Tabela de lemas {caminho} não encontrada; lematização só pelo spaCy. "
+                        "Gere com: python -m loadtest.gerar_lemas")
+        return None
+    except (OSError, ValueError) as e:
+        logging.error(f"Tabela de lemas {caminho} inválida ({e}); lematização só pelo spaCy.")
+        return None
+    if modelo and tabela.modelo != modelo:
+        logging.warning(f"Tabela de lemas gerada com {tabela.modelo or 'modelo desconhecido'}, "
+                        f"spaCy carregado é {modelo}; lematização só pelo spaCy até regerar a tabela.")
+        return None
+    logging.info(f"Tabela de lemas carregada: {len(tabela)} formas ({tabela.modelo}).")
+    return tabela
+
+
+def gerar(nlp, textos, avulsas=()):
+    """
+    Gera a tabela com o pipeline spaCy: cada palavra dos `textos` fica com o
+    lema que recebeu mais vezes no contexto das frases; as `avulsas` que não
+    aparecem nos textos (stopwords, meses ...) são lematizadas sozinhas. Só
+    entram formas alfabéticas que o tokenizador mantém como um token só.
+    """
+    contagem = defaultdict(Counter)  # forma -> Counter {(lema, stop): vezes}
+    for doc in nlp.pipe(texto.lower() for texto in textos):
+        for token in doc:
+            if token.is_alpha:
+                contagem[token.text][(token.lemma_, token.is_stop)] += 1
+    sozinhas = [forma for forma in dict.fromkeys(a.lower() for a in avulsas) if forma not in contagem]
+    for doc in nlp.pipe(sozinhas):
+        if len(doc) == 1 and doc[0].is_alpha:
+            contagem[doc[0].text][(doc[0].lemma_, doc[0].is_stop)] += 1
+
+    entradas = {}
+    for forma, lemas in contagem.items():
+        if [t.text for t in nlp.tokenizer(forma)] != [forma]:
+            continue
+        lema, stop = lemas.most_common(1)[0][0]
+        entradas[forma] = (lema or forma, stop)
+    return TabelaLemas(entradas, identificar_modelo(nlp))
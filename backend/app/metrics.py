@@ -0,0 +1,354 @@
+import threading
+import time
+from bisect import bisect_left
+
+# ------------------------------------------------------------
+# Métricas no formato de exposição do Prometheus (texto 0.0.4)
+# ------------------------------------------------------------
+# A gravação não usa locks: cada thread escreve no seu próprio "shard"
+# (dicionário de séries), e a coleta em /metrics soma os shards de todas as
+# threads. O lock só é usado na primeira gravação de cada thread, para
+# registrar o shard, e durante a coleta.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Buckets de latência em segundos (de 1 ms até 30 s, o timeout antigo do Gemini)
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _formatar_labels(nomes, valores, extra=''):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    """Base das métricas: guarda os shards por thread e os metadados de exposição."""
+
+    tipo = ''
+    # Acima deste número de shards, os de threads encerradas são consolidados
+    # já no registro de um novo shard (o servidor threaded cria uma thread por requisição)
+    LIMITE_SHARDS = 64
+
+    def __init__(self, nome, descricao, labels=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._base = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'series', None)
+        if shard is None:
+            shard = {}
+            self._local.series = shard
+            with self._lock:
+                if len(self._shards) >= self.LIMITE_SHARDS:
+                    self._compactar()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _compactar(self):
+        """Move para a base os shards de threads que já terminaram (chamar com o lock)."""
+        vivos = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                vivos.append((thread, shard))
+            else:
+                for chave, serie in shard.items():
+                    self._base[chave] = self._mesclar(self._base.get(chave), serie)
+        self._shards = vivos
+
+    def _snapshot_shards(self):
+        with self._lock:
+            self._compactar()
+            return [dict(self._base)] + [dict(shard) for _, shard in self._shards]
+
+    def _agregar(self):
+        total = {}
+        for shard in self._snapshot_shards():
+            for chave, serie in shard.items():
+                total[chave] = self._mesclar(total.get(chave), serie)
+        return total
+
+    def reset(self):
+        """Zera todas as séries (usado em testes)."""
+        with self._lock:
+            self._base.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+    def expor(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} {self.tipo}']
+        linhas.extend(self._linhas())
+        return linhas
+
+
+class Counter(_Metrica):
+    """Contador monotônico, somado entre as threads na coleta."""
+
+    tipo = 'counter'
+
+    def inc(self, *valores_labels, valor=1):
+        shard = self._shard()
+        shard[valores_labels] = shard.get(valores_labels, 0) + valor
+
+    def valor(self, *valores_labels):
+        return sum(s.get(valores_labels, 0) for s in self._snapshot_shards())
+
+    @staticmethod
+    def _mesclar(acumulado, valor):
+        return valor if acumulado is None else acumulado + valor
+
+    def _linhas(self):
+        return [
+            f'{self.nome}{_formatar_labels(self.labels, chave)} {_formatar_numero(v)}'
+            for chave, v in sorted(self._agregar().items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    Medidor que sobe e desce (inc/dec), somado entre as threads.
+    Alternativamente, aceita uma função que é avaliada no momento da coleta.
+    """
+
+    tipo = 'gauge'
+
+    def __init__(self, nome, descricao, labels=(), funcao=None):
+        super().__init__(nome, descricao, labels)
+        self.funcao = funcao
+
+    def dec(self, *valores_labels, valor=1):
+        self.inc(*valores_labels, valor=-valor)
+
+    def _agregar(self):
+        if self.funcao is not None:
+            return {(): self.funcao()}
+        return super()._agregar()
+
+
+class _Cronometro:
+    __slots__ = ('histograma', 'valores_labels', 'inicio')
+
+    def __init__(self, histograma, valores_labels):
+        self.histograma = histograma
+        self.valores_labels = valores_labels
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observe(time.perf_counter() - self.inicio, *self.valores_labels)
+        return False
+
+
+class Histogram(_Metrica):
+    """Histograma com buckets fixos; cada série guarda [contagens..., soma, total]."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, labels=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nome, descricao, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, valor, *valores_labels):
+        shard = self._shard()
+        serie = shard.get(valores_labels)
+        if serie is None:
+            serie = shard[valores_labels] = [0] * (len(self.buckets) + 3)
+        # bisect_left: um valor igual ao limite cai no próprio bucket (le = "menor ou igual")
+        serie[bisect_left(self.buckets, valor)] += 1
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def time(self, *valores_labels):
+        """Context manager que observa a duração do bloco em segundos."""
+        return _Cronometro(self, valores_labels)
+
+    def contagem(self, *valores_labels):
+        return sum(s[valores_labels][-1] for s in self._snapshot_shards() if valores_labels in s)
+
+    @staticmethod
+    def _mesclar(acumulado, serie):
+        if acumulado is None:
+            return list(serie)
+        return [a + b for a, b in zip(acumulado, serie)]
+
+    def _linhas(self):
+        linhas = []
+        for chave, serie in sorted(self._agregar().items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), serie):
+                acumulado += contagem
+                le = 'le="' + _formatar_numero(limite) + '"'
+                linhas.append(f'{self.nome}_bucket{_formatar_labels(self.labels, chave, le)} {acumulado}')
+            labels = _formatar_labels(self.labels, chave)
+            linhas.append(f'{self.nome}_sum{labels} {_formatar_numero(serie[-2])}')
+            linhas.append(f'{self.nome}_count{labels} {serie[-1]}')
+        return linhas
+
+
+class Registro:
+    """Conjunto de métricas expostas por um processo."""
+
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def counter(self, *args, **kwargs):
+        return self.registrar(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.registrar(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.registrar(Histogram(*args, **kwargs))
+
+    def expor(self):
+        """Texto completo no formato de exposição do Prometheus."""
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.expor())
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+
+# ------------------------------------------------------------
+# Métricas do pipeline /pergunta (app.py)
+# ------------------------------------------------------------
+ROTEAMENTO_SEGUNDOS = registro.histogram(
+    'sophos_roteamento_segundos', 'Tempo de roteamento da pergunta (spaCy + mapeamentos).')
+SQL_SEGUNDOS = registro.histogram(
+    'sophos_sql_segundos', 'Tempo de execução de cada query SQL por mapeamento.', ['label'])
+FORMATACAO_SEGUNDOS = registro.histogram(
+    'sophos_formatacao_segundos', 'Tempo de formatação dos resultados para o prompt.')
+GEMINI_SEGUNDOS = registro.histogram(
+    'sophos_gemini_segundos', 'Tempo da chamada à API Gemini.')
+LOG_SEGUNDOS = registro.histogram(
+    'sophos_log_insert_segundos', 'Tempo do INSERT em logs_perguntas.')
+MATCHES_TOTAL = registro.counter(
+    'sophos_mapeamento_matches_total', 'Perguntas que casaram com cada mapeamento.', ['label'])
+CACHE_TOTAL = registro.counter(
+    'sophos_cache_total', 'Consultas a caches internos (snapshot_vendas, tabela_lemas) por resultado (hit/miss).',
+    ['cache', 'resultado'])
+GEMINI_ERROS_TOTAL = registro.counter(
+    'sophos_gemini_erros_total', 'Erros da API Gemini por status HTTP (ou timeout/conexao).', ['status'])
+PERGUNTAS_PARCIAIS_TOTAL = registro.counter(
+    'sophos_perguntas_parciais_total', 'Respostas parciais por deadline excedido.')
+PARAMETROS_NAO_RESOLVIDOS_TOTAL = registro.counter(
+    'sophos_parametros_nao_resolvidos_total',
+    'Mapeamentos pulados por parâmetros ausentes na pergunta.', ['label'])
+CORRECOES_ORTOGRAFICAS_TOTAL = registro.counter(
+    'sophos_correcoes_ortograficas_total', 'Tokens da pergunta corrigidos antes do roteamento.')
+AQUECIMENTO_ETAPA_SEGUNDOS = registro.gauge(
+    'sophos_aquecimento_etapa_segundos', 'Duração de cada etapa da subida do processo.', ['etapa'])
+PRONTO = registro.gauge(
+    'sophos_pronto', 'Processo aquecido e pronto para receber perguntas (1) ou não (0).')
+LEMATIZACAO_TOTAL = registro.counter(
+    'sophos_lematizacao_total', 'Perguntas lematizadas pela tabela de lemas ou pelo spaCy.', ['caminho'])
+LEMATIZACAO_SEGUNDOS = registro.histogram(
+    'sophos_lematizacao_segundos', 'Tempo de lematização da pergunta, por caminho (tabela/spacy).', ['caminho'])
+ENTIDADES_INDEXADAS = registro.gauge(
+    'sophos_entidades_indexadas', 'Nomes no índice de entidades conhecidas, por grupo.', ['grupo'])
+RESULTADOS_TRUNCADOS_TOTAL = registro.counter(
+    'sophos_resultados_truncados_total', 'Resultados SQL cortados pelo limite de dados do prompt.', ['label'])
+SNAPSHOT_VENDAS_RESPOSTAS_TOTAL = registro.counter(
+    'sophos_snapshot_vendas_respostas_total', 'Mapeamentos respondidos pelo snapshot de vendas em memória.',
+    ['label'])
+SNAPSHOT_VENDAS_ATUALIZACOES_TOTAL = registro.counter(
+    'sophos_snapshot_vendas_atualizacoes_total', 'Atualizações do snapshot de vendas por tipo e resultado.',
+    ['tipo', 'resultado'])
+CUBO_VENDAS_CONSULTAS_TOTAL = registro.counter(
+    'sophos_cubo_vendas_consultas_total', 'Perguntas respondidas pelo cubo de vendas em memória.')
+CUBO_VENDAS_ATUALIZACOES_TOTAL = registro.counter(
+    'sophos_cubo_vendas_atualizacoes_total', 'Atualizações do cubo de vendas por tipo e resultado.',
+    ['tipo', 'resultado'])
+
+# ------------------------------------------------------------
+# Métricas de conexões com o banco (app.py e graphs.py)
+# ------------------------------------------------------------
+DB_CONEXOES_ABERTAS = registro.gauge(
+    'sophos_db_conexoes_abertas', 'Conexões com o banco abertas no momento.')
+DB_CONEXOES_TOTAL = registro.counter(
+    'sophos_db_conexoes_total', 'Conexões com o banco abertas desde o início do processo.')
+DB_CONEXOES_ERROS_TOTAL = registro.counter(
+    'sophos_db_conexoes_erros_total', 'Falhas ao abrir conexão com o banco.')
+DB_POOL_EM_USO = registro.gauge(
+    'sophos_db_pool_em_uso', 'Conexões do pool emprestadas no momento.')
+DB_POOL_ESGOTADO_TOTAL = registro.counter(
+    'sophos_db_pool_esgotado_total', 'Pedidos de conexão que esperaram demais por uma vaga no pool.')
+SQL_PREPARES_TOTAL = registro.counter(
+    'sophos_sql_prepares_total', 'SQLs do catálogo preparadas (PREPARE) nas conexões do pool.', ['nome'])
+SQL_EXECUTES_TOTAL = registro.counter(
+    'sophos_sql_executes_total', 'Execuções de SQLs preparadas do catálogo (EXECUTE).', ['nome'])
+SQL_PREPARADAS_INVALIDADAS_TOTAL = registro.counter(
+    'sophos_sql_preparadas_invalidadas_total',
+    'SQLs preparadas descartadas e preparadas de novo, por motivo (ausente/schema).', ['motivo'])
+
+# ------------------------------------------------------------
+# Métricas dos endpoints de gráficos (graphs.py)
+# ------------------------------------------------------------
+GRAFICO_QUERY_SEGUNDOS = registro.histogram(
+    'sophos_grafico_query_segundos', 'Tempo da query de cada endpoint de gráfico.', ['endpoint'])
+GRAFICO_SERIALIZACAO_SEGUNDOS = registro.histogram(
+    'sophos_grafico_serializacao_segundos', 'Tempo de conversão para JSON de cada endpoint de gráfico.',
+    ['endpoint'])
+GRAFICO_FONTE_TOTAL = registro.counter(
+    'sophos_grafico_fonte_total', 'Respostas dos gráficos por fonte dos dados (rollup/ao-vivo).',
+    ['endpoint', 'fonte'])
+GRAFICO_CACHE_TOTAL = registro.counter(
+    'sophos_grafico_cache_total', 'Respostas dos gráficos por resultado do cache (hit/stale/miss/desligado).',
+    ['endpoint', 'resultado'])
+GRAFICO_CACHE_REVALIDACOES_TOTAL = registro.counter(
+    'sophos_grafico_cache_revalidacoes_total', 'Revalidações em segundo plano do cache dos gráficos.',
+    ['endpoint', 'resultado'])
+GRAFICO_ERROS_TOTAL = registro.counter(
+    'sophos_grafico_erros_total', 'Erros nos endpoints de gráfico.', ['endpoint'])
+EXPORTACOES_TOTAL = registro.counter(
+    'sophos_exportacoes_total', 'Exportações de mapeamentos por formato e resultado (ok/erro/interrompida).',
+    ['formato', 'resultado'])
+EXPORTACAO_LINHAS_TOTAL = registro.counter(
+    'sophos_exportacao_linhas_total', 'Linhas enviadas pelas exportações de mapeamentos.', ['formato'])
+
+
+class ConexaoMonitorada:
+    """
+    Envolve uma conexão psycopg2 para manter o gauge de conexões abertas.
+    Delegação simples: apenas close() é interceptado.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._aberta = True
+        DB_CONEXOES_TOTAL.inc()
+        DB_CONEXOES_ABERTAS.inc()
+
+    def close(self):
+        if self._aberta:
+            self._aberta = False
+            DB_CONEXOES_ABERTAS.dec()
+        self._conn.close()
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
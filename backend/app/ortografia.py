@@ -0,0 +1,326 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from . import metrics
+from .query_mapping import query_mappings
+from .texto import normalizar
+
+# ------------------------------------------------------------
+# Correção de erros de digitação antes do roteamento
+# ------------------------------------------------------------
+# Dicionário de "deleções simétricas" (SymSpell): cada palavra do vocabulário
+# (as frases de query_mappings e os nomes das entidades conhecidas), já sem
+# acentos, é guardada sob todas as variantes com até DISTANCIA_MAXIMA letras
+# apagadas do seu prefixo. Para corrigir um token, apagam-se letras dele do
+# mesmo jeito: cada variante é uma busca num dict, e os candidatos encontrados
+# são conferidos com a distância de edição (Damerau-Levenshtein restrita).
+# Nenhum passo depende do tamanho do vocabulário.
+#
+# A palavra corrigida volta com a grafia do vocabulário ("funcionarios" e
+# "funcoinarios" viram "funcionários"), para o spaCy lematizar a pergunta do
+# mesmo jeito que as frases dos mapeamentos.
+#
+# O vocabulário é pequeno: uma palavra válida que não está nele ("inativos",
+# "gerente", "despesa") ficaria a uma ou duas letras de alguma que está
+# ("ativos", "recente", "dessa") e mudaria o sentido da pergunta. Por isso só
+# se corrigem tokens que também não existem no léxico geral do português
+# (Lexico), e só quando há um único candidato na menor distância. Um token
+# válido como está escrito também não ganha acentos: "é" não vira "e".
+#
+# O léxico (cerca de 900 mil formas da tabela lemma_lookup do
+# spacy-lookups-data) é gerado offline por loadtest.gerar_lexico num arquivo
+# de hashes de 64 bits (LEXICO_ARQUIVO, ~10 MB), lido na subida em
+# milissegundos; o spacy-lookups-data não é dependência da aplicação.
+
+CORRECAO_ORTOGRAFICA = os.getenv('CORRECAO_ORTOGRAFICA', '1') == '1'
+DISTANCIA_MAXIMA = 2
+# Letras do início da palavra usadas nas deleções (limita as variantes por palavra)
+PREFIXO = 7
+# Tokens menores não são corrigidos ("de", "do", "os" ...)
+TAMANHO_MINIMO = 4
+# Tokens até este tamanho aceitam uma edição; maiores, DISTANCIA_MAXIMA
+TAMANHO_UM_ERRO = 8
+LEXICO_ARQUIVO = os.getenv('LEXICO_ARQUIVO', os.path.join(os.path.dirname(__file__), 'lexico_pt.bin'))
+_CABECALHO_LEXICO = b'sophos-lexico 1'
+
+_PALAVRA = re.compile(r'\w+')
+
+
+def _delecoes(palavra, distancia):
+    """A palavra e todas as variantes com até `distancia` letras apagadas."""
+    variantes = {palavra}
+    borda = {palavra}
+    for _ in range(distancia):
+        borda = {p[:i] + p[i + 1:] for p in borda if len(p) > 1 for i in range(len(p))} - variantes
+        variantes |= borda
+    return variantes
+
+
+def distancia(a, b, limite):
+    """
+    Distância de edição entre a e b com transposição de letras vizinhas
+    (optimal string alignment); qualquer valor acima de `limite` volta como limite + 1.
+    """
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        atual = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            custo = 0 if a[i - 1] == b[j - 1] else 1
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + custo)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                atual[j] = min(atual[j], anterior2[j - 2] + 1)
+        if min(atual) > limite:
+            return limite + 1
+        anterior2, anterior = anterior, atual
+    return min(anterior[-1], limite + 1)
+
+
+def limite_para(token):
+    """Erros aceitos por tamanho do token: 1 até 8 letras, 2 a partir de 9."""
+    return 1 if len(token) <= TAMANHO_UM_ERRO else DISTANCIA_MAXIMA
+
+
+def _ordem(chave, candidata, d):
+    """
+    Chave de ordenação dos candidatos: menor distância e, com uma edição, a
+    inversão de letras vizinhas ("contratso" -> "contratos") antes da letra a
+    mais ou a menos ("detalhs" -> "detalhes"), e esta antes da troca de letra
+    ("detalhe"). Com duas edições, a menor diferença de tamanho.
+    """
+    if d != 1 or len(chave) != len(candidata):
+        return (d, abs(len(candidata) - len(chave)))
+    i = next(i for i, (a, b) in enumerate(zip(chave, candidata)) if a != b)
+    invertidas = chave[i + 1:i + 2] == candidata[i] and candidata[i + 1:i + 2] == chave[i]
+    return (1, 0 if invertidas else 2)
+
+
+def _sem_acentos(palavra):
+    """Minúsculas sem acentos; mais barata que normalizar() para as centenas de milhares de formas do léxico."""
+    palavra = palavra.lower()
+    if palavra.isascii():
+        return palavra
+    return unicodedata.normalize('NFKD', palavra).encode('ascii', 'ignore').decode('ascii')
+
+
+def _hash(palavra):
+    """Hash de 64 bits estável entre processos (hash() de str muda a cada execução)."""
+    return int.from_bytes(hashlib.blake2b(palavra.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _buscar(hashes, h):
+    i = bisect_left(hashes, h)
+    return i < len(hashes) and hashes[i] == h
+
+
+class Lexico:
+    """
+    Formas válidas de um léxico geral, em minúsculas, guardadas como hashes
+    ordenados em arrays (8 bytes por forma, em vez de um set de strings): as
+    formas como escritas e, para as acentuadas, também sem os acentos.
+    """
+
+    def __init__(self, formas=()):
+        formas = {forma.lower() for forma in formas}
+        self._formas = array('Q', sorted({_hash(forma) for forma in formas}))
+        self._sem_acentos = array('Q', sorted({_hash(_sem_acentos(forma)) for forma in formas
+                                               if not forma.isascii()}))
+
+    def __len__(self):
+        return len(self._formas)
+
+    def __contains__(self, palavra):
+        """A palavra existe exatamente como escrita (acentos incluídos)."""
+        return _buscar(self._formas, _hash(palavra.lower()))
+
+    def reconhece(self, palavra):
+        """A palavra existe como escrita ou é uma forma acentuada digitada sem acentos ("codigo")."""
+        return palavra in self or _buscar(self._sem_acentos, _hash(_sem_acentos(palavra)))
+
+    def salvar(self, caminho):
+        with open(caminho, 'wb') as f:
+            f.write(b'%s %d %d\n' % (_CABECALHO_LEXICO, len(self._formas), len(self._sem_acentos)))
+            for hashes in (self._formas, self._sem_acentos):
+                if sys.byteorder != 'little':
+                    hashes = array('Q', hashes)
+                    hashes.byteswap()
+                hashes.tofile(f)
+
+    @classmethod
+    def ler(cls, caminho):
+        lexico = cls()
+        with open(caminho, 'rb') as f:
+            cabecalho = f.readline().rstrip(b'\n').rsplit(b' ', 2)
+            if len(cabecalho) != 3 or cabecalho[0] != _CABECALHO_LEXICO:
+                raise ValueError('cabeçalho inválido')
+            try:
+                lexico._formas.fromfile(f, int(cabecalho[1]))
+                lexico._sem_acentos.fromfile(f, int(cabecalho[2]))
+            except EOFError as e:
+                raise ValueError('arquivo truncado') from e
+        if sys.byteorder != 'little':
+            lexico._formas.byteswap()
+            lexico._sem_acentos.byteswap()
+        return lexico
+
+
+def carregar_lexico(caminho=None):
+    """
+    Lexico do arquivo gerado por loadtest.gerar_lexico, ou None se ele não
+    existe ou é inválido: nesse caso o corretor só restaura acentos.
+    """
+    caminho = caminho or LEXICO_ARQUIVO
+    try:
+        lexico = Lexico.ler(caminho)
+    except FileNotFoundError:
+        logging.warning(f"Léxico {caminho} não encontrado; a correção ortográfica só restaura acentos. "
+                        "Gere com: python -m loadtest.gerar_lexico")
+        return None
+    except (OSError, ValueError) as e:
+        logging.error(f"Léxico {caminho} inválido ({e}); a correção ortográfica só restaura acentos.")
+        return None
+    logging.info(f"Léxico do corretor ortográfico carregado: {len(lexico)} formas.")
+    return lexico
+
+
+def palavras(texto):
+    """Palavras (só letras) do texto em minúsculas, com os acentos."""
+    return [p for p in _PALAVRA.findall((texto or '').lower()) if p.isalpha()]
+
+
+def vocabulario_dos_mapeamentos():
+    """Counter {palavra como escrita nas frases de query_mappings: ocorrências}."""
+    contagem = Counter()
+    for frases, _label, _sql in query_mappings:
+        for frase in frases:
+            contagem.update(palavras(frase))
+    return contagem
+
+
+class CorretorOrtografico:
+    """
+    Corrige tokens pelo vocabulário: `pesos` {palavra: peso} escolhe a grafia
+    de cada palavra (os dos mapeamentos vêm antes) e as palavras incluídas
+    depois (nomes, stopwords) só são aceitas como estão ou como destino de
+    correção com peso 0. Sem `lexico` (léxico geral), nenhum token
+    desconhecido é corrigido: só os acentos das palavras do vocabulário.
+    """
+
+    def __init__(self, pesos=None, lexico=None):
+        self._grafias = {}   # palavra sem acento -> (peso, grafia)
+        self._formas = set()  # palavras incluídas com peso 0 (stopwords, meses, nomes) como escritas
+        self._delecoes = {}  # variante -> [palavra sem acento, ...]
+        self._trava = threading.Lock()
+        self.lexico = lexico
+        self.incluir(pesos or {})
+
+    def __len__(self):
+        return len(self._grafias)
+
+    def incluir(self, pesos):
+        """
+        Acrescenta palavras ({palavra: peso} ou iterável de palavras, peso 0).
+        Uma palavra já conhecida mantém a grafia de maior peso; havendo empate,
+        a acentuada ("funcionários" em vez de "funcionarios").
+        """
+        if not isinstance(pesos, dict):
+            pesos = dict.fromkeys(pesos, 0)
+        novas = 0
+        with self._trava:
+            for palavra, peso in pesos.items():
+                chave = normalizar(palavra)
+                if not chave or ' ' in chave:
+                    continue
+                if not peso:
+                    self._formas.add(palavra.lower())
+                atual = self._grafias.get(chave)
+                if atual is None:
+                    novas += 1
+                    for variante in _delecoes(chave[:PREFIXO], DISTANCIA_MAXIMA):
+                        self._delecoes.setdefault(variante, []).append(chave)
+                    self._grafias[chave] = (peso, palavra.lower())
+                elif (peso, palavra.lower() != chave) > (atual[0], atual[1] != chave):
+                    self._grafias[chave] = (peso, palavra.lower())
+        return novas
+
+    def sugestao(self, token):
+        """
+        Grafia do vocabulário para o token, ou None se ele não pode ser
+        corrigido. Um token válido como está escrito (palavra incluída com
+        peso 0 ou do léxico geral) volta como está; uma palavra do vocabulário escrita sem
+        os acentos volta com a grafia dos mapeamentos ("funcionarios" ->
+        "funcionários"). Os demais tokens só são corrigidos se o léxico geral
+        não os conhece, por _candidata.
+        """
+        escrito = token.lower()
+        chave = normalizar(token)
+        conhecida = self._grafias.get(chave)
+        if conhecida is not None:
+            return conhecida[1] if conhecida[0] > 0 and not self._valida(escrito) else escrito
+        if len(chave) < TAMANHO_MINIMO or not chave.isalpha():
+            return None
+        lexico = self.lexico
+        if lexico is None or lexico.reconhece(escrito):
+            return None
+        return self._candidata(chave)
+
+    def _valida(self, escrito):
+        """O token existe exatamente como escrito entre as palavras de peso 0 ou no léxico geral."""
+        return escrito in self._formas or (self.lexico is not None and escrito in self.lexico)
+
+    def _candidata(self, chave):
+        """
+        Grafia da única palavra do vocabulário a até limite_para(chave)
+        edições que vem antes na _ordem; None se não há nenhuma ou há empate. Não conta como erro de digitação
+        a chave que é outra palavra com letras a mais na frente ("inativos"
+        não vira "ativos", "reagendar" não vira "agendar").
+        """
+        limite = limite_para(chave)
+        melhor = None
+        empatadas = 0
+        for candidata in {c for variante in _delecoes(chave[:PREFIXO], limite)
+                          for c in self._delecoes.get(variante, ())}:
+            d = distancia(chave, candidata, limite)
+            if d > limite or (len(chave) - len(candidata) >= 2 and chave.endswith(candidata)):
+                continue
+            ordem = _ordem(chave, candidata, d)
+            if melhor is None or ordem < melhor[0]:
+                melhor = (ordem, candidata)
+                empatadas = 1
+            elif ordem == melhor[0]:
+                empatadas += 1
+        if melhor is None or empatadas > 1:
+            return None
+        return self._grafias[melhor[1]][1]
+
+    def corrigir(self, pergunta):
+        """
+        A pergunta com cada token trocado pela grafia do vocabulário, quando
+        houver; o resto do texto (pontuação, números, palavras desconhecidas)
+        fica como está. Retorna (texto, [(token original, correção), ...]).
+        """
+        correcoes = []
+
+        def trocar(m):
+            token = m.group()
+            sugestao = self.sugestao(token)
+            if sugestao is None or sugestao == token.lower():
+                return token
+            if normalizar(sugestao) != normalizar(token):
+                correcoes.append((token, sugestao))
+            return sugestao
+
+        texto = _PALAVRA.sub(trocar, pergunta)
+        if correcoes:
+            metrics.CORRECOES_ORTOGRAFICAS_TOTAL.inc(valor=len(correcoes))
+        return texto, correcoes
@@ -0,0 +1,114 @@
+import re
+from datetime import date
+
+from psycopg2.extensions import adapt
+
+# ------------------------------------------------------------
+# Parâmetros das SQLs de query_mapping.py
+# ------------------------------------------------------------
+# Alguns mapeamentos têm placeholders no texto da SQL: {id}, '{start_date}',
+# '%{nome}%' etc. Em vez de formatar o valor dentro da SQL, cada placeholder
+# vira um parâmetro nomeado do psycopg2 (%(nome)s), com o valor convertido
+# para o tipo do placeholder; as aspas e os % do ILIKE saem da SQL e o valor
+# de um ILIKE é escapado e envolvido em % aqui.
+
+# Tipo de cada placeholder conhecido
+TIPOS = {
+    'id': int,
+    'cliente_id': int,
+    'funcionario_id': int,
+    'start_date': date,
+    'end_date': date,
+    'nome': str,
+    'nome_empresa': str,
+}
+
+# '%{nome}%' (busca por trecho), '{data}' (literal entre aspas) ou {id}
+_PLACEHOLDER = re.compile(r"'%\{(\w+)\}%'|'\{(\w+)\}'|\{(\w+)\}")
+
+
+def nomes(sql):
+    """Nomes dos placeholders da SQL, na ordem em que aparecem e sem repetição."""
+    return tuple(dict.fromkeys(next(filter(None, m.groups())) for m in _PLACEHOLDER.finditer(sql)))
+
+
+def converter(nome, valor):
+    """
+    Converte o valor (texto da query string ou já tipado) para o tipo do
+    placeholder. Levanta ValueError com a mensagem para o cliente.
+    """
+    tipo = TIPOS.get(nome)
+    if tipo is None:
+        raise ValueError(f"Parâmetro desconhecido: '{nome}'")
+    if isinstance(valor, tipo) and not isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip()
+    if tipo is int:
+        if not texto.isdigit():
+            raise ValueError(f"'{nome}' deve ser um número inteiro positivo")
+        return int(texto)
+    if tipo is date:
+        try:
+            return date.fromisoformat(texto)
+        except ValueError:
+            raise ValueError(f"'{nome}' deve estar no formato YYYY-MM-DD")
+    if not texto:
+        raise ValueError(f"'{nome}' não pode ser vazio")
+    return texto
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def modelo(sql):
+    """
+    A SQL de vincular() sem os valores: (texto com %(chave)s e os % literais
+    dobrados, ((chave, nome, busca por trecho), ...) na ordem do texto).
+    """
+    chaves = []
+    partes = []
+    inicio = 0
+    for m in _PLACEHOLDER.finditer(sql):
+        like, entre_aspas, bruto = m.groups()
+        nome = like or entre_aspas or bruto
+        chave = f"{nome}_like" if like else nome
+        chaves.append((chave, nome, bool(like)))
+        partes.append(sql[inicio:m.start()].replace('%', '%%'))
+        partes.append(f"%({chave})s")
+        inicio = m.end()
+    partes.append(sql[inicio:].replace('%', '%%'))
+    return ''.join(partes), tuple(chaves)
+
+
+def vincular(sql, valores):
+    """
+    (sql, params) prontos para cursor.execute: placeholders trocados por
+    %(nome)s e valores convertidos com converter(). Os % literais da SQL são
+    dobrados. Levanta ValueError se faltar ou for inválido algum parâmetro.
+    """
+    texto, chaves = modelo(sql)
+    params = {}
+    for chave, nome, like in chaves:
+        if valores.get(nome) in (None, ''):
+            raise ValueError(f"Parâmetro obrigatório ausente: '{nome}'")
+        valor = converter(nome, valores[nome])
+        params[chave] = f"%{_escapar_like(valor)}%" if like else valor
+    return texto, params
+
+
+def literal(sql, params):
+    """
+    A SQL de vincular() com os valores no lugar de cada %(chave)s, citados
+    como o psycopg2 os envia ao banco (equivalente ao cursor.mogrify, sem
+    precisar de conexão). Só para log e resposta: a execução usa os parâmetros.
+    """
+    if not params:
+        return sql
+    citados = {}
+    for chave, valor in params.items():
+        adaptado = adapt(valor)
+        if hasattr(adaptado, 'encoding'):
+            adaptado.encoding = 'utf8'
+        citados[chave] = adaptado.getquoted().decode('utf-8')
+    return sql % citados
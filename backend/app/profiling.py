@@ -0,0 +1,249 @@
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import jsonify, request
+
+# ------------------------------------------------------------
+# Profiling sob demanda de requisições em produção
+# ------------------------------------------------------------
+# Desativado por padrão: sem PROFILE_ADMIN_TOKEN nenhum hook é instalado no
+# Flask, então o custo é zero. Com o token, um administrador inicia uma sessão
+# (POST /admin/profile ou header X-Profile-Token) que perfila as próximas N
+# requisições ou os próximos T segundos com cProfile e, em paralelo, com um
+# amostrador estatístico de pilhas. Ao fim, grava em PROFILE_DIR:
+#   - perfil-<data>.pstats     (abrir com pstats, snakeviz etc.)
+#   - perfil-<data>.collapsed  (pilhas colapsadas para flamegraph.pl/speedscope)
+
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_HEADER = 'X-Profile-Token'
+# Intervalo entre amostras de pilha do amostrador estatístico
+PROFILE_INTERVALO_MS = float(os.getenv('PROFILE_INTERVALO_MS', '5'))
+# Limites para proteger o processo de sessões muito longas
+PROFILE_MAX_REQUISICOES = 1000
+PROFILE_MAX_SEGUNDOS = 600
+
+
+def _rotulo_frame(frame):
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+class SessaoProfiling:
+    """
+    Uma sessão de profiling: acumula os perfis cProfile das requisições e as
+    pilhas amostradas até atingir o número de requisições ou o tempo limite.
+    """
+
+    def __init__(self, requisicoes=None, segundos=None, diretorio=None):
+        self.requisicoes = requisicoes
+        self.fim = time.monotonic() + segundos if segundos else None
+        self.diretorio = diretorio or PROFILE_DIR
+        self.perfiladas = 0
+        self.pilhas = Counter()
+        self.stats = None
+        self.arquivos = None
+        self._threads = set()
+        self._lock = threading.Lock()
+        # cProfile aceita um único profiler ativo por vez: as requisições são perfiladas em série
+        self._lock_perfil = threading.Lock()
+        self._parar = threading.Event()
+        self._amostrador = threading.Thread(target=self._amostrar, name='sophos-profiler', daemon=True)
+        self._amostrador.start()
+
+    # ---------------- amostrador estatístico ----------------
+    def _amostrar(self):
+        intervalo = PROFILE_INTERVALO_MS / 1000.0
+        while not self._parar.wait(intervalo):
+            with self._lock:
+                alvos = list(self._threads)
+            if not alvos:
+                continue
+            frames = sys._current_frames()
+            for thread_id in alvos:
+                frame = frames.get(thread_id)
+                pilha = []
+                while frame is not None:
+                    pilha.append(_rotulo_frame(frame))
+                    frame = frame.f_back
+                if pilha:
+                    self.pilhas[';'.join(reversed(pilha))] += 1
+
+    # ---------------- ciclo de uma requisição ----------------
+    def iniciar_requisicao(self):
+        """Começa a perfilar a requisição atual; retorna o profiler ou None se ocupado."""
+        if not self._lock_perfil.acquire(blocking=False):
+            return None
+        perfil = cProfile.Profile()
+        with self._lock:
+            self._threads.add(threading.get_ident())
+        perfil.enable()
+        return perfil
+
+    def encerrar_requisicao(self, perfil):
+        """Para o profiler da requisição e agrega o resultado; retorna True se a sessão acabou."""
+        perfil.disable()
+        with self._lock:
+            self._threads.discard(threading.get_ident())
+            try:
+                if self.stats is None:
+                    self.stats = pstats.Stats(perfil)
+                else:
+                    self.stats.add(perfil)
+            except TypeError:
+                # Perfil vazio (nenhuma chamada registrada)
+                pass
+            self.perfiladas += 1
+        self._lock_perfil.release()
+        return self.concluida()
+
+    def concluida(self):
+        if self.requisicoes is not None and self.perfiladas >= self.requisicoes:
+            return True
+        return self.fim is not None and time.monotonic() >= self.fim
+
+    # ---------------- gravação dos resultados ----------------
+    def finalizar(self):
+        """Para o amostrador e grava os arquivos .pstats e .collapsed (uma única vez)."""
+        self._parar.set()
+        if self._amostrador is not threading.current_thread():
+            self._amostrador.join()
+        with self._lock:
+            if self.arquivos is not None:
+                return self.arquivos
+            os.makedirs(self.diretorio, exist_ok=True)
+            carimbo = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+            base = os.path.join(self.diretorio, f'perfil-{carimbo}')
+            arquivos = {}
+            if self.stats is not None:
+                arquivos['pstats'] = base + '.pstats'
+                self.stats.dump_stats(arquivos['pstats'])
+            arquivos['collapsed'] = base + '.collapsed'
+            with open(arquivos['collapsed'], 'w', encoding='utf-8') as saida:
+                for pilha, contagem in self.pilhas.most_common():
+                    saida.write(f"{pilha} {contagem}\n")
+            self.arquivos = arquivos
+        logging.info(f"Profiling concluído ({self.perfiladas} requisições): {arquivos}")
+        return arquivos
+
+    def resumo(self):
+        return {
+            'ativa': self.arquivos is None,
+            'requisicoes_perfiladas': self.perfiladas,
+            'requisicoes_alvo': self.requisicoes,
+            'segundos_restantes': max(0.0, self.fim - time.monotonic()) if self.fim else None,
+            'amostras': sum(self.pilhas.values()),
+            'arquivos': self.arquivos,
+        }
+
+
+# Sessão atual (None = nenhuma sessão ativa) e a última concluída, para consulta
+_sessao = None
+_ultima = None
+_lock_sessao = threading.Lock()
+
+
+def _token_valido(token):
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode('utf-8'), PROFILE_ADMIN_TOKEN.encode('utf-8'))
+
+
+def iniciar_sessao(requisicoes=None, segundos=None, diretorio=None):
+    """Inicia uma sessão, se não houver outra ativa. Retorna a sessão ativa."""
+    global _sessao
+    with _lock_sessao:
+        if _sessao is None:
+            if requisicoes is None and segundos is None:
+                requisicoes = 1
+            if requisicoes is not None:
+                requisicoes = min(max(int(requisicoes), 1), PROFILE_MAX_REQUISICOES)
+            if segundos is not None:
+                segundos = min(max(float(segundos), 0.1), PROFILE_MAX_SEGUNDOS)
+            _sessao = SessaoProfiling(requisicoes, segundos, diretorio)
+            if segundos is not None:
+                # Garante a gravação mesmo se nenhuma requisição chegar até o fim do prazo
+                timer = threading.Timer(segundos, encerrar_sessao, args=(_sessao,))
+                timer.daemon = True
+                timer.start()
+            logging.info(f"Profiling iniciado: requisicoes={requisicoes}, segundos={segundos}")
+        return _sessao
+
+
+def encerrar_sessao(apenas=None):
+    """
+    Encerra a sessão ativa (se houver) e grava os arquivos. Com 'apenas',
+    só encerra se a sessão ativa for aquela (usado pelo timer de cada sessão).
+    """
+    global _sessao, _ultima
+    with _lock_sessao:
+        if _sessao is None or (apenas is not None and _sessao is not apenas):
+            return None
+        sessao, _sessao = _sessao, None
+    sessao.finalizar()
+    _ultima = sessao
+    return sessao
+
+
+def _antes_da_requisicao():
+    sessao = _sessao
+    if sessao is None:
+        token = request.headers.get(PROFILE_HEADER)
+        if token is None or request.path.startswith('/admin/') or not _token_valido(token):
+            return
+        sessao = iniciar_sessao(
+            request.headers.get('X-Profile-Requisicoes', type=int),
+            request.headers.get('X-Profile-Segundos', type=float))
+    elif request.path.startswith('/admin/'):
+        return
+    perfil = sessao.iniciar_requisicao()
+    if perfil is not None:
+        request.environ['sophos.profiling'] = (sessao, perfil)
+
+
+def _depois_da_requisicao(_exc):
+    ativo = request.environ.pop('sophos.profiling', None)
+    if ativo is None:
+        return
+    sessao, perfil = ativo
+    if sessao.encerrar_requisicao(perfil):
+        encerrar_sessao(sessao)
+
+
+def _admin_profile():
+    if not _token_valido(request.headers.get(PROFILE_HEADER)):
+        return jsonify({'erro': 'Token de administrador inválido.'}), 403
+
+    if request.method == 'GET':
+        sessao = _sessao or _ultima
+        return jsonify(sessao.resumo() if sessao else {'ativa': False})
+
+    if request.method == 'DELETE':
+        sessao = encerrar_sessao()
+        return jsonify(sessao.resumo() if sessao else {'ativa': False})
+
+    dados = request.get_json(silent=True) or {}
+    try:
+        sessao = iniciar_sessao(dados.get('requisicoes'), dados.get('segundos'))
+    except (TypeError, ValueError):
+        return jsonify({'erro': 'Parâmetros "requisicoes" e "segundos" devem ser numéricos.'}), 400
+    return jsonify(sessao.resumo()), 202
+
+
+def instalar(app):
+    """
+    Registra os hooks e o endpoint /admin/profile no app Flask.
+    Sem PROFILE_ADMIN_TOKEN, não registra nada (custo zero).
+    """
+    if not PROFILE_ADMIN_TOKEN:
+        return False
+    app.before_request(_antes_da_requisicao)
+    app.teardown_request(_depois_da_requisicao)
+    app.add_url_rule('/admin/profile', 'admin_profile', _admin_profile, methods=['GET', 'POST', 'DELETE'])
+    return True
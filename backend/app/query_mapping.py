@@ -627,3 +627,15 @@ query_mappings = [
      FROM coef;
      """)
 ]
+
+# Mapeamentos que devolvem linhas sem limite (listas e detalhes, sem agregação):
+# em tabelas grandes são lidos por cursor no servidor, em lotes, só até o
+# limite de dados do prompt (ver executar_query_em_fluxo em app.py).
+MAPEAMENTOS_LISTA = frozenset({
+    'funcionarios-lista', 'clientes-lista', 'projetos-lista', 'vendas-lista', 'departamentos-lista',
+    'contratos-lista', 'vendas-detalhes', 'contratos-detalhes', 'projetos-detalhes',
+    'funcionarios-departamentos', 'departamentos-orcamento-por-departamento', 'clientes-ativos',
+    'contratos-expirando', 'vendas-periodo', 'contratos-periodo', 'funcionarios-periodo',
+    'clientes-periodo', 'projetos-periodo', 'projetos-por-cliente', 'projetos-por-responsavel',
+    'contratos-do-cliente', 'funcionario-por-nome', 'cliente-por-nome', 'departamento-por-nome',
+})
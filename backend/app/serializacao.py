@@ -0,0 +1,199 @@
+import datetime
+import io
+import json
+import math
+from decimal import Decimal
+
+import psycopg2.extensions
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, usa o json da biblioteca padrão
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+except ImportError:  # pyarrow é opcional: sem ele, não há respostas Arrow
+    pyarrow = None
+
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# ------------------------------------------------------------
+# Serialização das respostas JSON (gráficos e /pergunta)
+# ------------------------------------------------------------
+# As linhas do banco são convertidas por coluna: o conversor de cada coluna é
+# escolhido uma vez pelo type_code do cursor.description (ou, sem description,
+# pelo primeiro valor não nulo da coluna) e aplicado com map() na coluna
+# inteira, em vez de testar o tipo de cada célula. Política de tipos:
+#   - inteiros e floats ficam como estão (um COUNT continua inteiro no JSON);
+#   - NUMERIC (Decimal) vira número; NaN e infinito viram null;
+#   - date, timestamp e time viram texto ISO 8601.
+# O JSON é gerado com orjson, se instalado, ou com json (separadores compactos).
+
+
+def _numero(valor):
+    if valor is None:
+        return None
+    numero = float(valor)
+    return numero if math.isfinite(numero) else None
+
+
+def _iso(valor):
+    return None if valor is None else valor.isoformat()
+
+
+_CONVERSORES_POR_OID = {}
+for _tipo, _conversor in ((psycopg2.extensions.DECIMAL, _numero),
+                          (psycopg2.extensions.DATE, _iso),
+                          (psycopg2.extensions.PYDATETIME, _iso),
+                          (psycopg2.extensions.PYDATETIMETZ, _iso),
+                          (psycopg2.extensions.TIME, _iso)):
+    for _oid in _tipo.values:
+        _CONVERSORES_POR_OID[_oid] = _conversor
+
+
+def _conversor_pelo_valor(coluna):
+    for valor in coluna:
+        if valor is None:
+            continue
+        if isinstance(valor, Decimal):
+            return _numero
+        if isinstance(valor, (datetime.date, datetime.time)):
+            return _iso
+        return None
+    return None
+
+
+def conversores(description, colunas_de_valores):
+    """
+    Conversor de cada coluna (None quando o valor já é JSON nativo). Usa os
+    type_codes de cursor.description; sem description válida, olha o primeiro
+    valor não nulo de cada coluna.
+    """
+    try:
+        type_codes = [coluna[1] for coluna in description]
+    except (TypeError, IndexError, KeyError):
+        type_codes = None
+    if type_codes is None or len(type_codes) < len(colunas_de_valores) \
+            or not all(isinstance(codigo, int) for codigo in type_codes):
+        return [_conversor_pelo_valor(coluna) for coluna in colunas_de_valores]
+    return [_CONVERSORES_POR_OID.get(codigo) for codigo in type_codes[:len(colunas_de_valores)]]
+
+
+def registros(linhas, nomes, description=None):
+    """
+    Lista de dicts {nomes[i]: valor i} a partir das linhas do banco, com os
+    valores convertidos coluna a coluna. Colunas além de len(nomes) (como o
+    eixo x usado no downsampling) são ignoradas.
+    """
+    if not linhas:
+        return []
+    colunas = list(zip(*linhas))[:len(nomes)]
+    convertidas = [list(map(conversor, coluna)) if conversor else coluna
+                   for coluna, conversor in zip(colunas, conversores(description, colunas))]
+    return [dict(zip(nomes, valores)) for valores in zip(*convertidas)]
+
+
+def _padrao(valor):
+    """Tipos fora do JSON que escapam da conversão por coluna (ex.: payloads montados à mão)."""
+    if isinstance(valor, Decimal):
+        return _numero(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+def dumps(obj):
+    """Serializa obj em JSON (bytes UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_padrao, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def resposta_json(obj, status=200):
+    """Response JSON com dumps(); substitui o jsonify nas respostas grandes ou frequentes."""
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+# ------------------------------------------------------------
+# Respostas Apache Arrow (IPC stream), para clientes que pedem
+# Accept: application/vnd.apache.arrow.stream
+# ------------------------------------------------------------
+# Cada coluna das linhas vira um array Arrow de uma vez (pyarrow.array sobre a
+# coluna inteira, em C), sem dict nem conversão por linha. A política de tipos
+# segue a do JSON: NUMERIC vira float64 (NaN e infinito viram null), inteiros
+# int64, datas date32 e timestamps microssegundos (UTC quando têm fuso).
+
+def _tipos_arrow_por_oid():
+    ext = psycopg2.extensions
+    tipos = {}
+    for tipo, arrow in ((ext.INTEGER, pyarrow.int64()), (ext.LONGINTEGER, pyarrow.int64()),
+                        (ext.FLOAT, pyarrow.float64()), (ext.DECIMAL, pyarrow.float64()),
+                        (ext.BOOLEAN, pyarrow.bool_()), (ext.UNICODE, pyarrow.string()),
+                        (ext.DATE, pyarrow.date32()), (ext.PYDATETIME, pyarrow.timestamp('us')),
+                        (ext.PYDATETIMETZ, pyarrow.timestamp('us', tz='UTC')),
+                        (ext.TIME, pyarrow.time64('us'))):
+        for oid in tipo.values:
+            tipos[oid] = arrow
+    return tipos
+
+
+_TIPOS_ARROW_POR_OID = _tipos_arrow_por_oid() if pyarrow is not None else {}
+
+
+def _array_arrow(coluna, tipo):
+    if tipo is None and _conversor_pelo_valor(coluna) is _numero:
+        tipo = pyarrow.float64()
+    if tipo is None:
+        return pyarrow.array(coluna)
+    if tipo == pyarrow.float64():
+        # Decimal -> float direto (inferir decimal128 no pyarrow é ~10x mais lento);
+        # NaN e infinito viram null como no JSON
+        array = pyarrow.array([None if v is None else float(v) for v in coluna], type=tipo)
+        return pyarrow.compute.if_else(pyarrow.compute.is_finite(array), array, None)
+    if tipo == pyarrow.string():
+        try:
+            return pyarrow.array(coluna, type=tipo)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            return pyarrow.array((None if v is None else str(v) for v in coluna), type=tipo)
+    return pyarrow.array(coluna, type=tipo)
+
+
+def schema_arrow(nomes, description):
+    """
+    Schema Arrow das colunas `nomes` pelos type_codes de cursor.description
+    (OIDs sem tipo Arrow equivalente viram texto). None sem description válida.
+    """
+    try:
+        type_codes = [coluna[1] for coluna in description][:len(nomes)]
+    except (TypeError, IndexError, KeyError):
+        return None
+    if len(type_codes) < len(nomes) or not all(isinstance(codigo, int) for codigo in type_codes):
+        return None
+    return pyarrow.schema([(nome, _TIPOS_ARROW_POR_OID.get(codigo, pyarrow.string()))
+                           for nome, codigo in zip(nomes, type_codes)])
+
+
+def lote_arrow(linhas, nomes, schema=None):
+    """
+    RecordBatch com as colunas `nomes` das linhas do banco. Com schema (de
+    schema_arrow), os tipos são os dele; sem, são inferidos pelos valores.
+    """
+    colunas = list(zip(*linhas))[:len(nomes)] if linhas else [()] * len(nomes)
+    tipos = schema.types if schema is not None else [None] * len(nomes)
+    arrays = [_array_arrow(coluna, tipo) for coluna, tipo in zip(colunas, tipos)]
+    if schema is not None:
+        return pyarrow.record_batch(arrays, schema=schema)
+    return pyarrow.record_batch(arrays, names=list(nomes))
+
+
+def arrow_ipc(linhas, nomes, description=None):
+    """Linhas do banco no formato Arrow IPC stream (bytes), com uma única RecordBatch."""
+    lote = lote_arrow(linhas, nomes, schema_arrow(nomes, description))
+    saida = io.BytesIO()
+    with pyarrow.ipc.new_stream(saida, lote.schema) as escritor:
+        escritor.write_batch(lote)
+    return saida.getvalue()
@@ -0,0 +1,461 @@
+import calendar
+import datetime
+import io
+import logging
+import math
+import os
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9: sem fuso do banco, "vendas-ultimo-mes" fica com o SQL
+    ZoneInfo = None
+
+from . import metrics
+
+# ------------------------------------------------------------
+# Snapshot colunar de vendas em memória (opcional)
+# ------------------------------------------------------------
+# Mantém as colunas de `vendas` usadas pelos agregados mais pedidos como arrays
+# NumPy: valor em centavos (int64, somas exatas), data_venda em dias desde
+# 1970-01-01, status_pagamento codificado (categorias), projeto_id e
+# funcionario_id. A carga inicial é feita com COPY em lotes; depois, a cada
+# VENDAS_SNAPSHOT_INTERVALO segundos, uma thread relê só as linhas novas
+# (id maior que o último carregado) e as escritas por transações que ainda não
+# tinham terminado na leitura anterior (xmin >= marca), e recarrega tudo se
+# houve DELETE/TRUNCATE (contagem diferente) ou volta do contador de xids.
+#
+# Os mapeamentos elegíveis (MAPEAMENTOS) são respondidos com agregações
+# vetorizadas no mesmo formato de linhas do psycopg2, inclusive a escala dos
+# NUMERIC: SUM mantém 2 casas e AVG/STDDEV seguem a regra de escala da divisão
+# do Postgres (select_div_scale), arredondando metade para longe do zero.
+# Snapshot ainda não carregado ou desatualizado (mais velho que
+# VENDAS_SNAPSHOT_MAX_IDADE) devolve None, e a pergunta vai para o banco.
+
+VENDAS_SNAPSHOT = os.getenv('VENDAS_SNAPSHOT', '0') == '1'
+# Intervalo entre as atualizações incrementais (segundos)
+VENDAS_SNAPSHOT_INTERVALO = float(os.getenv('VENDAS_SNAPSHOT_INTERVALO', '30'))
+# Idade máxima do snapshot para responder perguntas (segundos)
+VENDAS_SNAPSHOT_MAX_IDADE = float(os.getenv('VENDAS_SNAPSHOT_MAX_IDADE', '120'))
+# Linhas por COPY na carga completa
+VENDAS_SNAPSHOT_LOTE = int(os.getenv('VENDAS_SNAPSHOT_LOTE', '500000'))
+
+MAPEAMENTOS = ('vendas-total', 'vendas-valor-total', 'estatisticas-vendas',
+               'vendas-por-status', 'vendas-ultimo-mes')
+
+COLUNAS = ('id', 'centavos', 'valor_nulo', 'dias', 'projeto_id', 'funcionario_id', 'status')
+
+# Marcador de NULL nas colunas inteiras (datas nulas nunca entram em um filtro de período)
+NULO = np.iinfo(np.int64).min
+
+SQL_COPY = """
+COPY (
+    SELECT id, (valor * 100)::BIGINT, data_venda - DATE '1970-01-01',
+           projeto_id, funcionario_id, status_pagamento
+    FROM vendas
+    WHERE {filtro}
+    ORDER BY id
+    {limite}
+) TO STDOUT
+"""
+
+# Linhas por bloco nas somas em int64 (cada bloco cabe em int64; o total é int do Python)
+_BLOCO = 1 << 20
+
+_EPOCA = datetime.date(1970, 1, 1)
+_ESCAPES_COPY = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v'}
+
+
+# ------------------------------------------------------------
+# Aritmética NUMERIC do Postgres (valores como inteiro + escala)
+# ------------------------------------------------------------
+def _peso_e_primeiro_digito(inteiro, escala):
+    """weight e primeiro dígito em base 10000 (NBASE) de inteiro * 10^-escala; zero -> (0, 0)."""
+    inteiro = abs(inteiro)
+    if inteiro == 0:
+        return 0, 0
+    peso = (len(str(inteiro)) - 1 - escala) // 4
+    expoente = -escala - 4 * peso
+    if expoente >= 0:
+        return peso, inteiro * 10 ** expoente
+    return peso, inteiro // 10 ** -expoente
+
+
+def escala_divisao(dividendo, escala_dividendo, divisor, escala_divisor):
+    """Escala do resultado de uma divisão NUMERIC (select_div_scale do Postgres)."""
+    peso1, digito1 = _peso_e_primeiro_digito(dividendo, escala_dividendo)
+    peso2, digito2 = _peso_e_primeiro_digito(divisor, escala_divisor)
+    peso_quociente = peso1 - peso2
+    if digito1 <= digito2:
+        peso_quociente -= 1
+    escala = 16 - peso_quociente * 4
+    return min(max(escala, escala_dividendo, escala_divisor, 0), 1000)
+
+
+def _dividir_arredondando(numerador, denominador):
+    """numerador / denominador arredondado para o inteiro mais próximo (metade para longe do zero)."""
+    quociente, resto = divmod(abs(numerador), abs(denominador))
+    if 2 * resto >= abs(denominador):
+        quociente += 1
+    return -quociente if (numerador < 0) != (denominador < 0) else quociente
+
+
+def _decimal(inteiro, escala):
+    """Decimal exato de inteiro * 10^-escala, com `escala` casas (como o psycopg2 devolve um NUMERIC)."""
+    return Decimal(f"{inteiro}E-{escala}")
+
+
+def dividir(dividendo, escala_dividendo, divisor):
+    """
+    dividendo * 10^-escala_dividendo dividido por um inteiro, como numeric_div:
+    devolve (inteiro, escala) do quociente na escala de select_div_scale.
+    """
+    escala = escala_divisao(dividendo, escala_dividendo, divisor, 0)
+    return _dividir_arredondando(dividendo * 10 ** (escala - escala_dividendo), divisor), escala
+
+
+def media(soma_centavos, n):
+    """AVG de um NUMERIC(_, 2): soma em centavos e quantidade de valores não nulos."""
+    if n == 0:
+        return None
+    return _decimal(*dividir(soma_centavos, 2, n))
+
+
+def desvio_padrao(soma_centavos, soma_quadrados, n):
+    """
+    STDDEV (amostral) de um NUMERIC(_, 2), como numeric_stddev_internal:
+    (n * soma(x²) - soma(x)²) / (n * (n - 1)) na escala da divisão, e a raiz
+    quadrada arredondada na mesma escala. soma_quadrados em centavos².
+    """
+    if n <= 1:
+        return None
+    numerador = n * soma_quadrados - soma_centavos * soma_centavos  # escala 4
+    if numerador <= 0:
+        return Decimal(0)
+    variancia, escala = dividir(numerador, 4, n * (n - 1))
+    # raiz de variancia * 10^-escala com `escala` casas: isqrt(variancia * 10^escala), arredondada
+    radicando = variancia * 10 ** escala
+    raiz = math.isqrt(radicando)
+    if radicando > raiz * raiz + raiz:
+        raiz += 1
+    return _decimal(raiz, escala)
+
+
+def soma_numeric(soma_centavos, n):
+    """SUM de um NUMERIC(_, 2): NULL sem valores, senão a soma com 2 casas."""
+    return None if n == 0 else _decimal(soma_centavos, 2)
+
+
+def inicio_ultimo_mes(agora):
+    """
+    Primeiro dia que satisfaz `data_venda >= NOW() - INTERVAL '1 month'` no fuso
+    de `agora`: o mês é subtraído no horário local (dia limitado ao fim do mês,
+    como no Postgres) e a data, promovida à meia-noite, precisa alcançar o limite.
+    """
+    ano, mes = (agora.year, agora.month - 1) if agora.month > 1 else (agora.year - 1, 12)
+    dia = min(agora.day, calendar.monthrange(ano, mes)[1])
+    limite = agora.replace(year=ano, month=mes, day=dia)
+    if limite.time() == datetime.time(0):
+        return limite.date()
+    return limite.date() + datetime.timedelta(days=1)
+
+
+# ------------------------------------------------------------
+# Somas exatas sobre arrays int64
+# ------------------------------------------------------------
+def somar(valores):
+    """Soma exata (int do Python) de um array int64, em blocos que não estouram int64."""
+    return sum(int(valores[i:i + _BLOCO].sum()) for i in range(0, len(valores), _BLOCO))
+
+
+def somar_quadrados(valores):
+    """
+    Soma exata dos quadrados de um array int64 de centavos (|x| < 2^40, o
+    bastante para NUMERIC(12, 2)). Cada x é separado em alto * 2^20 + baixo e
+    x² = alto² * 2^40 + 2 * alto * baixo * 2^20 + baixo², com cada parcela
+    somada em int64 por bloco.
+    """
+    total = 0
+    for i in range(0, len(valores), _BLOCO):
+        bloco = np.abs(valores[i:i + _BLOCO])
+        alto, baixo = bloco >> 20, bloco & ((1 << 20) - 1)
+        total += (int((alto * alto).sum()) << 40) + (int((alto * baixo).sum()) << 21) \
+            + int((baixo * baixo).sum())
+    return total
+
+
+# ------------------------------------------------------------
+# Leitura do COPY
+# ------------------------------------------------------------
+def _texto_copy(valor):
+    """Valor de texto do formato COPY (\\N é NULL; barras invertidas escapam caracteres)."""
+    if valor == '\\N':
+        return None
+    if '\\' not in valor:
+        return valor
+    partes, i = [], 0
+    while i < len(valor):
+        if valor[i] == '\\' and i + 1 < len(valor):
+            partes.append(_ESCAPES_COPY.get(valor[i + 1], valor[i + 1]))
+            i += 2
+        else:
+            partes.append(valor[i])
+            i += 1
+    return ''.join(partes)
+
+
+def _inteiros(textos):
+    """Coluna inteira do COPY como int64, com NULO no lugar de \\N."""
+    textos = np.asarray(textos)
+    nulos = textos == '\\N'
+    inteiros = np.where(nulos, '0', textos).astype(np.int64)
+    inteiros[nulos] = NULO
+    return inteiros
+
+
+class SnapshotVendas:
+    """
+    Snapshot colunar de vendas. `conectar` é uma função sem argumentos que abre
+    uma conexão psycopg2 (app.get_db_connection). `dados` é a tupla (dict de
+    arrays, categorias de status_pagamento), que nunca é alterada depois de
+    publicada: cada atualização monta uma nova e a troca de uma vez, então as
+    leituras não precisam de lock.
+    """
+
+    def __init__(self, conectar, intervalo=VENDAS_SNAPSHOT_INTERVALO,
+                 max_idade=VENDAS_SNAPSHOT_MAX_IDADE, lote=VENDAS_SNAPSHOT_LOTE):
+        self.conectar = conectar
+        self.intervalo = intervalo
+        self.max_idade = max_idade
+        self.lote = lote
+        self.dados = None
+        self.fuso = None
+        self.marca_xid = None  # txid_snapshot_xmin da última leitura
+        self.atualizado_em = None
+        self._memo = (None, {})  # (dados, respostas já calculadas sobre eles)
+        self._lock_atualizacao = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    # --------------------------------------------------------
+    # Carga e atualização
+    # --------------------------------------------------------
+    @property
+    def pronto(self):
+        return (self.dados is not None and self.atualizado_em is not None
+                and time.monotonic() - self.atualizado_em <= self.max_idade)
+
+    def atualizar(self):
+        """Carga completa na primeira vez (ou quando a incremental não basta), incremental nas demais."""
+        with self._lock_atualizacao:
+            tipo = 'completa' if self.dados is None else 'incremental'
+            try:
+                conn = self.conectar()
+                try:
+                    cur = conn.cursor()
+                    # Uma transação REPEATABLE READ: COPY, marca e contagem veem o mesmo estado
+                    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                    if tipo == 'incremental' and not self._atualizar_incremental(cur):
+                        tipo = 'completa'
+                    if tipo == 'completa':
+                        self._carregar_tudo(cur)
+                    conn.rollback()
+                finally:
+                    conn.close()
+            except Exception:
+                metrics.SNAPSHOT_VENDAS_ATUALIZACOES_TOTAL.inc(tipo, 'erro')
+                raise
+            self.atualizado_em = time.monotonic()
+            metrics.SNAPSHOT_VENDAS_ATUALIZACOES_TOTAL.inc(tipo, 'ok')
+
+    def _marca(self, cur):
+        cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cur.fetchone()[0]
+
+    def _carregar_tudo(self, cur):
+        marca = self._marca(cur)
+        cur.execute("SHOW TimeZone")
+        self.fuso = self._ler_fuso(cur.fetchone()[0])
+        categorias = []
+        lotes, ultimo_id = [], 0
+        while True:
+            lote = self._copiar(cur, categorias, cur.mogrify("id > %s", (ultimo_id,)).decode(), self.lote)
+            if lote is None:
+                break
+            lotes.append(lote)
+            ultimo_id = int(lote['id'][-1])
+            if len(lote['id']) < self.lote:
+                break
+        if lotes:
+            colunas = {nome: np.concatenate([lote[nome] for lote in lotes]) for nome in COLUNAS}
+        else:
+            colunas = {nome: np.empty(0, dtype=bool if nome == 'valor_nulo' else np.int64)
+                       for nome in COLUNAS}
+        self.dados, self.marca_xid = (colunas, tuple(categorias)), marca
+        logging.info(f"Snapshot de vendas carregado: {len(colunas['id'])} linhas.")
+
+    def _atualizar_incremental(self, cur):
+        """Aplica as linhas novas e alteradas; False quando é preciso recarregar tudo."""
+        marca = self._marca(cur)
+        if marca >> 32 != self.marca_xid >> 32:
+            return False  # o contador de xids de 32 bits deu a volta: xmin não é mais comparável
+        colunas, categorias = self.dados
+        categorias = list(categorias)
+        ultimo_id = int(colunas['id'][-1]) if len(colunas['id']) else 0
+        filtro = cur.mogrify("id > %s OR xmin::text::bigint >= %s",
+                             (ultimo_id, self.marca_xid & 0xFFFFFFFF)).decode()
+        lote = self._copiar(cur, categorias, filtro)
+        if lote is not None:
+            colunas = _mesclar(colunas, lote)
+        cur.execute("SELECT COUNT(*) FROM vendas")
+        if cur.fetchone()[0] != len(colunas['id']):
+            return False  # linhas apagadas: DELETE não deixa rastro no xmin
+        self.dados, self.marca_xid = (colunas, tuple(categorias)), marca
+        return True
+
+    def _copiar(self, cur, categorias, filtro, limite=None):
+        """
+        COPY das linhas que atendem `filtro` como dict de arrays (None se não
+        houver linhas). Status novos entram no fim de `categorias`.
+        """
+        sql = SQL_COPY.format(filtro=filtro, limite=f"LIMIT {int(limite)}" if limite else '')
+        buffer = io.StringIO()
+        cur.copy_expert(sql, buffer)
+        linhas = buffer.getvalue().splitlines()
+        if not linhas:
+            return None
+        ids, centavos, dias, projetos, funcionarios, status = zip(*(linha.split('\t') for linha in linhas))
+        centavos = _inteiros(centavos)
+        valor_nulo = centavos == NULO
+        centavos[valor_nulo] = 0
+        return {
+            'id': _inteiros(ids),
+            'centavos': centavos,
+            'valor_nulo': valor_nulo,
+            'dias': _inteiros(dias),
+            'projeto_id': _inteiros(projetos),
+            'funcionario_id': _inteiros(funcionarios),
+            'status': _codificar(status, categorias),
+        }
+
+    @staticmethod
+    def _ler_fuso(nome):
+        try:
+            return ZoneInfo(nome) if ZoneInfo is not None else None
+        except Exception:
+            logging.warning(f"Fuso do banco '{nome}' desconhecido: vendas-ultimo-mes segue pelo SQL.")
+            return None
+
+    # --------------------------------------------------------
+    # Thread de atualização
+    # --------------------------------------------------------
+    def iniciar(self):
+        """Carrega e passa a atualizar em segundo plano (thread daemon)."""
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._laco, name='sophos-snapshot-vendas', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                self.atualizar()
+            except Exception as e:
+                # Continua servindo o snapshot anterior até passar de max_idade
+                logging.warning(f"Falha ao atualizar o snapshot de vendas: {e}")
+            self._parar.wait(self.intervalo)
+
+    # --------------------------------------------------------
+    # Agregados
+    # --------------------------------------------------------
+    def responder(self, label, agora=None):
+        """
+        Linhas do mapeamento `label` (como cursor.fetchall() devolveria) ou None
+        se o mapeamento não é elegível ou o snapshot não está pronto. O
+        resultado fica memorizado até a próxima atualização publicar dados novos.
+        """
+        if label not in MAPEAMENTOS or not self.pronto:
+            return None
+        dados = self.dados
+        inicio = None
+        if label == 'vendas-ultimo-mes':
+            if self.fuso is None:
+                return None
+            agora = agora or datetime.datetime.now(self.fuso)
+            inicio = inicio_ultimo_mes(agora.astimezone(self.fuso))
+        memo = self._memo
+        if memo[0] is not dados:
+            memo = self._memo = (dados, {})
+        chave = (label, inicio)
+        if chave in memo[1]:
+            metrics.CACHE_TOTAL.inc('snapshot_vendas', 'hit')
+        else:
+            metrics.CACHE_TOTAL.inc('snapshot_vendas', 'miss')
+            memo[1][chave] = _agregar(label, *dados, inicio)
+        metrics.SNAPSHOT_VENDAS_RESPOSTAS_TOTAL.inc(label)
+        return list(memo[1][chave])
+
+
+def _agregar(label, c, categorias, inicio_periodo):
+    if label == 'vendas-total':
+        return [(len(c['id']),)]
+    if label == 'vendas-valor-total':
+        return [(soma_numeric(somar(c['centavos']), _nao_nulos(c)),)]
+    if label == 'estatisticas-vendas':
+        soma, n = somar(c['centavos']), _nao_nulos(c)
+        return [(media(soma, n), desvio_padrao(soma, somar_quadrados(c['centavos']), n))]
+    if label == 'vendas-por-status':
+        contagens = np.bincount(c['status'], minlength=len(categorias))
+        return [(categorias[codigo], int(total)) for codigo, total in enumerate(contagens) if total]
+    # vendas-ultimo-mes
+    filtro = c['dias'] >= (inicio_periodo - _EPOCA).days
+    n = int(np.count_nonzero(filtro))
+    return [(n, soma_numeric(somar(c['centavos'][filtro]),
+                             n - int(np.count_nonzero(c['valor_nulo'][filtro]))))]
+
+
+def _codificar(textos, categorias):
+    """Códigos (int32) de status_pagamento; categorias novas entram no fim da lista."""
+    unicos, inversos = np.unique(np.asarray(textos), return_inverse=True)
+    codigos = np.empty(len(unicos), dtype=np.int32)
+    for i, texto in enumerate(unicos):
+        valor = _texto_copy(str(texto))
+        if valor not in categorias:
+            categorias.append(valor)
+        codigos[i] = categorias.index(valor)
+    return codigos[inversos.ravel()]
+
+
+def _nao_nulos(colunas):
+    return len(colunas['id']) - int(np.count_nonzero(colunas['valor_nulo']))
+
+
+def _mesclar(colunas, lote):
+    """Novo dict de colunas com as linhas do lote: ids existentes são substituídos, os novos inseridos em ordem."""
+    ids = colunas['id']
+    posicoes = np.searchsorted(ids, lote['id'])
+    existentes = posicoes < len(ids)
+    existentes[existentes] = ids[posicoes[existentes]] == lote['id'][existentes]
+    novas = {nome: coluna.copy() for nome, coluna in colunas.items()}
+    for nome in COLUNAS:
+        novas[nome][posicoes[existentes]] = lote[nome][existentes]
+    inseridas = ~existentes
+    if inseridas.any():
+        fora_de_ordem = len(ids) and lote['id'][inseridas][0] < ids[-1]
+        novas = {nome: np.concatenate((novas[nome], lote[nome][inseridas])) for nome in COLUNAS}
+        if fora_de_ordem:
+            # Transação que terminou depois da última leitura com ids menores que o último carregado
+            ordem = np.argsort(novas['id'], kind='stable')
+            novas = {nome: coluna[ordem] for nome, coluna in novas.items()}
+    return novas
@@ -0,0 +1,15 @@
+import re
+import unicodedata
+
+# ------------------------------------------------------------
+# Normalização de texto para comparar perguntas com nomes do banco
+# ------------------------------------------------------------
+
+_ESPACOS = re.compile(r'\s+')
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com espaços simples ("  Criação " -> "criacao")."""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return _ESPACOS.sub(' ', sem_acentos).strip()
@@ -0,0 +1,164 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+# ------------------------------------------------------------
+# Tracing leve: árvore de spans por requisição, emitida como uma linha JSON
+# ------------------------------------------------------------
+# Cada requisição abre um trace (span raiz); as etapas internas abrem spans
+# filhos com duração e atributos (linhas, tamanho do prompt etc.). No fim do
+# trace, ele é emitido se for sorteado pela amostragem ou se passar do limite
+# de lentidão. O formato segue os nomes de campos do OpenTelemetry (trace_id,
+# span_id, parent_span_id, start_time_unix_nano...) para facilitar exportação.
+
+# Fração dos traces emitidos (0 = apenas os lentos, 1 = todos)
+TRACE_AMOSTRAGEM = float(os.getenv('TRACE_AMOSTRAGEM', '0.01'))
+# Traces com duração igual ou maior que este limite são sempre emitidos
+TRACE_LENTO_MS = float(os.getenv('TRACE_LENTO_MS', '5000'))
+# Se definido, os traces são gravados neste arquivo (JSON Lines) em vez do log
+TRACE_ARQUIVO = os.getenv('TRACE_ARQUIVO')
+
+logger = logging.getLogger('sophos.trace')
+_lock_arquivo = threading.Lock()
+_span_atual = contextvars.ContextVar('sophos_span_atual', default=None)
+
+
+class Span:
+    """Uma etapa medida; guarda os filhos para montar a árvore do trace."""
+
+    __slots__ = ('nome', 'trace_id', 'span_id', 'parent_id', 'atributos',
+                 'inicio_ns', '_t0', 'duracao_ns', 'filhos', '_token')
+
+    def __init__(self, nome, trace_id, parent_id=None, atributos=None):
+        self.nome = nome
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.atributos = dict(atributos or {})
+        self.inicio_ns = 0
+        self._t0 = 0
+        self.duracao_ns = None
+        self.filhos = []
+        self._token = None
+
+    def definir(self, **atributos):
+        """Acrescenta atributos ao span (por exemplo, o número de linhas ao fim da query)."""
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        self.inicio_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        self._token = _span_atual.set(self)
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        self.duracao_ns = time.perf_counter_ns() - self._t0
+        if tipo_exc is not None:
+            self.atributos['erro'] = tipo_exc.__name__
+        _span_atual.reset(self._token)
+        return False
+
+    @property
+    def duracao_ms(self):
+        return (self.duracao_ns or 0) / 1e6
+
+    def para_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'name': self.nome,
+            'start_time_unix_nano': self.inicio_ns,
+            'duration_ms': round(self.duracao_ms, 3),
+            'attributes': self.atributos,
+        }
+
+    def percorrer(self):
+        """Todos os spans da árvore em pré-ordem (pai antes dos filhos)."""
+        yield self
+        for filho in self.filhos:
+            yield from filho.percorrer()
+
+
+class Trace(Span):
+    """Span raiz de uma requisição; decide na saída se o trace é emitido."""
+
+    __slots__ = ()
+
+    def __init__(self, nome, atributos=None):
+        super().__init__(nome, os.urandom(16).hex(), None, atributos)
+
+    def __exit__(self, tipo_exc, exc, tb):
+        super().__exit__(tipo_exc, exc, tb)
+        if deve_emitir(self):
+            emitir(self)
+        return False
+
+    def para_json(self):
+        """Uma linha JSON com o trace completo (spans em lista plana com parent_span_id)."""
+        return json.dumps({
+            'trace_id': self.trace_id,
+            'name': self.nome,
+            'duration_ms': round(self.duracao_ms, 3),
+            'slow': self.duracao_ms >= TRACE_LENTO_MS,
+            'spans': [s.para_dict() for s in self.percorrer()],
+        }, ensure_ascii=False, default=str)
+
+
+class _SpanNulo:
+    """Span usado quando não há trace ativo: todas as operações são no-op."""
+
+    __slots__ = ()
+
+    def definir(self, **atributos):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+def iniciar_trace(nome, **atributos):
+    """Abre o span raiz de uma requisição (usar com 'with')."""
+    return Trace(nome, atributos)
+
+
+def span(nome, **atributos):
+    """
+    Abre um span filho do span atual (usar com 'with'). Fora de um trace,
+    devolve um span nulo, então as funções podem ser chamadas sem requisição.
+    """
+    pai = _span_atual.get()
+    if pai is None:
+        return _SPAN_NULO
+    filho = Span(nome, pai.trace_id, pai.span_id, atributos)
+    pai.filhos.append(filho)
+    return filho
+
+
+def span_atual():
+    """Span ativo no contexto atual (ou o span nulo)."""
+    return _span_atual.get() or _SPAN_NULO
+
+
+def deve_emitir(trace):
+    return trace.duracao_ms >= TRACE_LENTO_MS or random.random() < TRACE_AMOSTRAGEM
+
+
+def emitir(trace):
+    linha = trace.para_json()
+    if TRACE_ARQUIVO:
+        with _lock_arquivo:
+            with open(TRACE_ARQUIVO, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linha + '\n')
+    else:
+        logger.info(linha)
@@ -0,0 +1,41 @@
+-- ------------------------------------------------------------
+-- 001: índices para a carga de consultas mapeadas (query_mapping.py e graphs.py)
+-- ------------------------------------------------------------
+-- CREATE INDEX CONCURRENTLY não bloqueia escritas, mas não pode rodar dentro
+-- de uma transação: aplique com psql (cada comando em sua própria transação)
+--     psql "$DSN" -f db/migrations/001_indices.sql
+-- ou com: python -m loadtest.analisar_planos --dsn "$DSN" --aplicar-migracoes
+-- Idempotente (IF NOT EXISTS). Para reverter: 001_indices_down.sql.
+
+-- Vendas: filtros por período (último mês, BETWEEN) e somas mensais; o INCLUDE
+-- permite index-only scan nas agregações de valor.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vendas_data_venda ON vendas (data_venda) INCLUDE (valor);
+-- Vendas: junções com projetos (receita por cliente/projeto) e funcionários (vendas por funcionário)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vendas_projeto_id ON vendas (projeto_id) INCLUDE (valor);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vendas_funcionario_id ON vendas (funcionario_id) INCLUDE (valor);
+
+-- Projetos: junção com clientes, filtro por status e por responsável, "último projeto"
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projetos_cliente_id ON projetos (cliente_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projetos_status ON projetos (status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projetos_responsavel_id ON projetos (responsavel_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projetos_data_inicio ON projetos (data_inicio);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projetos_data_termino ON projetos (data_termino);
+
+-- Contratos de marketing: junção com clientes, status, vigência
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_cliente_id ON contratos_marketing (cliente_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_status ON contratos_marketing (status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_data_inicio ON contratos_marketing (data_inicio);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contratos_data_termino ON contratos_marketing (data_termino);
+
+-- Funcionários: junção com departamentos e filtro por data de contratação
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_funcionarios_departamento_id ON funcionarios (departamento_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_funcionarios_data_contratacao ON funcionarios (data_contratacao);
+
+-- Clientes: filtro por data de cadastro e "último cliente"
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clientes_data_cadastro ON clientes (data_cadastro);
+
+-- Buscas por nome com ILIKE '%...%': B-tree não serve, trigramas (pg_trgm) sim
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_funcionarios_nome_trgm ON funcionarios USING gin (nome gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clientes_nome_empresa_trgm ON clientes USING gin (nome_empresa gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_departamentos_nome_trgm ON departamentos USING gin (nome gin_trgm_ops);
@@ -0,0 +1,19 @@
+-- Reverte 001_indices.sql (a extensão pg_trgm é mantida).
+DROP INDEX CONCURRENTLY IF EXISTS idx_clientes_data_cadastro;
+DROP INDEX CONCURRENTLY IF EXISTS idx_clientes_nome_empresa_trgm;
+DROP INDEX CONCURRENTLY IF EXISTS idx_contratos_cliente_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_contratos_data_inicio;
+DROP INDEX CONCURRENTLY IF EXISTS idx_contratos_data_termino;
+DROP INDEX CONCURRENTLY IF EXISTS idx_contratos_status;
+DROP INDEX CONCURRENTLY IF EXISTS idx_departamentos_nome_trgm;
+DROP INDEX CONCURRENTLY IF EXISTS idx_funcionarios_data_contratacao;
+DROP INDEX CONCURRENTLY IF EXISTS idx_funcionarios_departamento_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_funcionarios_nome_trgm;
+DROP INDEX CONCURRENTLY IF EXISTS idx_projetos_cliente_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_projetos_data_inicio;
+DROP INDEX CONCURRENTLY IF EXISTS idx_projetos_data_termino;
+DROP INDEX CONCURRENTLY IF EXISTS idx_projetos_responsavel_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_projetos_status;
+DROP INDEX CONCURRENTLY IF EXISTS idx_vendas_data_venda;
+DROP INDEX CONCURRENTLY IF EXISTS idx_vendas_funcionario_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_vendas_projeto_id;
@@ -0,0 +1,223 @@
+-- ------------------------------------------------------------
+-- 002: rollups materializados para os endpoints de gráfico (graphs.py)
+-- ------------------------------------------------------------
+-- Quatro tabelas de agregados mantidas incrementalmente por triggers de
+-- comando (FOR EACH STATEMENT com tabelas de transição), então um COPY ou um
+-- INSERT em lote atualiza cada rollup com uma única consulta agregada:
+--   rollup_vendas_mes                 (vendas por mês)
+--   rollup_receita_cliente            (receita de vendas por cliente)
+--   rollup_projetos_status            (projetos por status)
+--   rollup_funcionarios_departamento  (funcionários por departamento)
+-- rollup_atualizacao guarda quando cada rollup mudou pela última vez; com
+-- atualizado_em NULL o rollup ainda não foi preenchido e graphs.py usa a
+-- consulta ao vivo.
+--
+-- TRUNCATE não dispara os triggers: depois de um TRUNCATE (ou como job
+-- periódico de reconciliação, por exemplo via cron/pg_cron) rode
+--     SELECT rollup_recalcular();
+-- que também faz o preenchimento inicial, já incluído no fim deste arquivo.
+--
+-- Aplicar com: psql "$DSN" -f db/migrations/002_rollups.sql
+-- ou: python -m loadtest.analisar_planos --dsn "$DSN" --aplicar-migracoes
+
+CREATE TABLE IF NOT EXISTS rollup_vendas_mes (
+    mes           DATE PRIMARY KEY,
+    total_vendas  NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    quantidade    BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_receita_cliente (
+    cliente_id  INTEGER PRIMARY KEY,
+    receita     NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    quantidade  BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_projetos_status (
+    status      VARCHAR(50) PRIMARY KEY,
+    quantidade  BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_funcionarios_departamento (
+    departamento_id  INTEGER PRIMARY KEY,
+    quantidade       BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_atualizacao (
+    nome           VARCHAR(50) PRIMARY KEY,
+    atualizado_em  TIMESTAMPTZ
+);
+
+INSERT INTO rollup_atualizacao (nome) VALUES
+    ('vendas_mes'), ('receita_cliente'), ('projetos_status'), ('funcionarios_departamento')
+ON CONFLICT (nome) DO NOTHING;
+
+-- ------------------------------------------------------------
+-- Triggers de vendas: vendas por mês e receita por cliente
+-- ------------------------------------------------------------
+-- As tabelas de transição (antigas/novas) só são visíveis na própria função
+-- do trigger, por isso o delta é escrito uma vez para cada lado.
+CREATE OR REPLACE FUNCTION rollup_trigger_vendas()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO rollup_vendas_mes AS r (mes, total_vendas, quantidade)
+        SELECT DATE_TRUNC('month', data_venda)::DATE, -COALESCE(SUM(valor), 0), -COUNT(*)
+        FROM antigas WHERE data_venda IS NOT NULL GROUP BY 1
+        ON CONFLICT (mes) DO UPDATE
+            SET total_vendas = r.total_vendas + EXCLUDED.total_vendas,
+                quantidade = r.quantidade + EXCLUDED.quantidade;
+        INSERT INTO rollup_receita_cliente AS r (cliente_id, receita, quantidade)
+        SELECT p.cliente_id, -COALESCE(SUM(a.valor), 0), -COUNT(*)
+        FROM antigas a JOIN projetos p ON p.id = a.projeto_id
+        WHERE p.cliente_id IS NOT NULL GROUP BY p.cliente_id
+        ON CONFLICT (cliente_id) DO UPDATE
+            SET receita = r.receita + EXCLUDED.receita,
+                quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rollup_vendas_mes AS r (mes, total_vendas, quantidade)
+        SELECT DATE_TRUNC('month', data_venda)::DATE, COALESCE(SUM(valor), 0), COUNT(*)
+        FROM novas WHERE data_venda IS NOT NULL GROUP BY 1
+        ON CONFLICT (mes) DO UPDATE
+            SET total_vendas = r.total_vendas + EXCLUDED.total_vendas,
+                quantidade = r.quantidade + EXCLUDED.quantidade;
+        INSERT INTO rollup_receita_cliente AS r (cliente_id, receita, quantidade)
+        SELECT p.cliente_id, COALESCE(SUM(n.valor), 0), COUNT(*)
+        FROM novas n JOIN projetos p ON p.id = n.projeto_id
+        WHERE p.cliente_id IS NOT NULL GROUP BY p.cliente_id
+        ON CONFLICT (cliente_id) DO UPDATE
+            SET receita = r.receita + EXCLUDED.receita,
+                quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    UPDATE rollup_atualizacao SET atualizado_em = NOW()
+    WHERE nome IN ('vendas_mes', 'receita_cliente') AND atualizado_em IS NOT NULL;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS rollup_vendas_insert ON vendas;
+CREATE TRIGGER rollup_vendas_insert AFTER INSERT ON vendas
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_vendas();
+DROP TRIGGER IF EXISTS rollup_vendas_update ON vendas;
+CREATE TRIGGER rollup_vendas_update AFTER UPDATE ON vendas
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_vendas();
+DROP TRIGGER IF EXISTS rollup_vendas_delete ON vendas;
+CREATE TRIGGER rollup_vendas_delete AFTER DELETE ON vendas
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_vendas();
+
+-- ------------------------------------------------------------
+-- Triggers de projetos: contagem por status e troca de cliente de um projeto
+-- (a receita das vendas do projeto passa do cliente antigo para o novo)
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION rollup_trigger_projetos()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO rollup_projetos_status AS r (status, quantidade)
+        SELECT status, -COUNT(*) FROM antigas WHERE status IS NOT NULL GROUP BY status
+        ON CONFLICT (status) DO UPDATE SET quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rollup_projetos_status AS r (status, quantidade)
+        SELECT status, COUNT(*) FROM novas WHERE status IS NOT NULL GROUP BY status
+        ON CONFLICT (status) DO UPDATE SET quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        WITH trocas AS (
+            SELECT a.id, a.cliente_id AS antigo, n.cliente_id AS novo
+            FROM antigas a JOIN novas n ON n.id = a.id
+            WHERE a.cliente_id IS DISTINCT FROM n.cliente_id
+        ), deltas AS (
+            SELECT t.antigo AS cliente_id, -SUM(v.valor) AS receita, -COUNT(*) AS quantidade
+            FROM trocas t JOIN vendas v ON v.projeto_id = t.id WHERE t.antigo IS NOT NULL GROUP BY t.antigo
+            UNION ALL
+            SELECT t.novo, SUM(v.valor), COUNT(*)
+            FROM trocas t JOIN vendas v ON v.projeto_id = t.id WHERE t.novo IS NOT NULL GROUP BY t.novo
+        )
+        INSERT INTO rollup_receita_cliente AS r (cliente_id, receita, quantidade)
+        SELECT cliente_id, SUM(receita), SUM(quantidade) FROM deltas GROUP BY cliente_id
+        ON CONFLICT (cliente_id) DO UPDATE
+            SET receita = r.receita + EXCLUDED.receita,
+                quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    UPDATE rollup_atualizacao SET atualizado_em = NOW()
+    WHERE nome IN ('projetos_status', 'receita_cliente') AND atualizado_em IS NOT NULL;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS rollup_projetos_insert ON projetos;
+CREATE TRIGGER rollup_projetos_insert AFTER INSERT ON projetos
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_projetos();
+DROP TRIGGER IF EXISTS rollup_projetos_update ON projetos;
+CREATE TRIGGER rollup_projetos_update AFTER UPDATE ON projetos
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_projetos();
+DROP TRIGGER IF EXISTS rollup_projetos_delete ON projetos;
+CREATE TRIGGER rollup_projetos_delete AFTER DELETE ON projetos
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_projetos();
+
+-- ------------------------------------------------------------
+-- Triggers de funcionários: contagem por departamento
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION rollup_trigger_funcionarios()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO rollup_funcionarios_departamento AS r (departamento_id, quantidade)
+        SELECT departamento_id, -COUNT(*) FROM antigas WHERE departamento_id IS NOT NULL GROUP BY departamento_id
+        ON CONFLICT (departamento_id) DO UPDATE SET quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rollup_funcionarios_departamento AS r (departamento_id, quantidade)
+        SELECT departamento_id, COUNT(*) FROM novas WHERE departamento_id IS NOT NULL GROUP BY departamento_id
+        ON CONFLICT (departamento_id) DO UPDATE SET quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+    UPDATE rollup_atualizacao SET atualizado_em = NOW()
+    WHERE nome = 'funcionarios_departamento' AND atualizado_em IS NOT NULL;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS rollup_funcionarios_insert ON funcionarios;
+CREATE TRIGGER rollup_funcionarios_insert AFTER INSERT ON funcionarios
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_funcionarios();
+DROP TRIGGER IF EXISTS rollup_funcionarios_update ON funcionarios;
+CREATE TRIGGER rollup_funcionarios_update AFTER UPDATE ON funcionarios
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_funcionarios();
+DROP TRIGGER IF EXISTS rollup_funcionarios_delete ON funcionarios;
+CREATE TRIGGER rollup_funcionarios_delete AFTER DELETE ON funcionarios
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION rollup_trigger_funcionarios();
+
+-- ------------------------------------------------------------
+-- Recalculo completo (preenchimento inicial, reconciliação e depois de TRUNCATE)
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION rollup_recalcular()
+RETURNS VOID LANGUAGE plpgsql AS $$
+BEGIN
+    -- Bloqueia escritas concorrentes para que nenhum delta se perca durante o recálculo
+    LOCK TABLE vendas, projetos, funcionarios IN SHARE MODE;
+
+    DELETE FROM rollup_vendas_mes;
+    INSERT INTO rollup_vendas_mes (mes, total_vendas, quantidade)
+    SELECT DATE_TRUNC('month', data_venda)::DATE, COALESCE(SUM(valor), 0), COUNT(*)
+    FROM vendas WHERE data_venda IS NOT NULL GROUP BY 1;
+
+    DELETE FROM rollup_receita_cliente;
+    INSERT INTO rollup_receita_cliente (cliente_id, receita, quantidade)
+    SELECT p.cliente_id, COALESCE(SUM(v.valor), 0), COUNT(*)
+    FROM vendas v JOIN projetos p ON p.id = v.projeto_id
+    WHERE p.cliente_id IS NOT NULL GROUP BY p.cliente_id;
+
+    DELETE FROM rollup_projetos_status;
+    INSERT INTO rollup_projetos_status (status, quantidade)
+    SELECT status, COUNT(*) FROM projetos WHERE status IS NOT NULL GROUP BY status;
+
+    DELETE FROM rollup_funcionarios_departamento;
+    INSERT INTO rollup_funcionarios_departamento (departamento_id, quantidade)
+    SELECT departamento_id, COUNT(*) FROM funcionarios WHERE departamento_id IS NOT NULL GROUP BY departamento_id;
+
+    UPDATE rollup_atualizacao SET atualizado_em = NOW();
+END;
+$$;
+
+SELECT rollup_recalcular();
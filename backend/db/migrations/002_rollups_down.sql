@@ -0,0 +1,16 @@
+-- Reverte 002_rollups.sql.
+DROP TRIGGER IF EXISTS rollup_vendas_insert ON vendas;
+DROP TRIGGER IF EXISTS rollup_vendas_update ON vendas;
+DROP TRIGGER IF EXISTS rollup_vendas_delete ON vendas;
+DROP TRIGGER IF EXISTS rollup_projetos_insert ON projetos;
+DROP TRIGGER IF EXISTS rollup_projetos_update ON projetos;
+DROP TRIGGER IF EXISTS rollup_projetos_delete ON projetos;
+DROP TRIGGER IF EXISTS rollup_funcionarios_insert ON funcionarios;
+DROP TRIGGER IF EXISTS rollup_funcionarios_update ON funcionarios;
+DROP TRIGGER IF EXISTS rollup_funcionarios_delete ON funcionarios;
+DROP FUNCTION IF EXISTS rollup_trigger_vendas();
+DROP FUNCTION IF EXISTS rollup_trigger_projetos();
+DROP FUNCTION IF EXISTS rollup_trigger_funcionarios();
+DROP FUNCTION IF EXISTS rollup_recalcular();
+DROP TABLE IF EXISTS rollup_vendas_mes, rollup_receita_cliente, rollup_projetos_status,
+    rollup_funcionarios_departamento, rollup_atualizacao;
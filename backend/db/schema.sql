@@ -0,0 +1,66 @@
+-- ------------------------------------------------------------
+-- Schema do banco da STOLF LTDA usado pelo assistente Sophos
+-- ------------------------------------------------------------
+-- Reflete as colunas consultadas em app/query_mapping.py e app/graphs.py.
+-- Idempotente: pode ser aplicado sobre um banco que já tenha as tabelas.
+
+CREATE TABLE IF NOT EXISTS departamentos (
+    id          SERIAL PRIMARY KEY,
+    nome        VARCHAR(100) NOT NULL,
+    orcamento   NUMERIC(14, 2)
+);
+
+CREATE TABLE IF NOT EXISTS funcionarios (
+    id                SERIAL PRIMARY KEY,
+    nome              VARCHAR(150) NOT NULL,
+    cargo             VARCHAR(100),
+    departamento_id   INTEGER REFERENCES departamentos (id),
+    salario           NUMERIC(12, 2),
+    data_contratacao  DATE
+);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id             SERIAL PRIMARY KEY,
+    nome_empresa   VARCHAR(150) NOT NULL,
+    setor          VARCHAR(100),
+    data_cadastro  DATE
+);
+
+CREATE TABLE IF NOT EXISTS projetos (
+    id              SERIAL PRIMARY KEY,
+    nome            VARCHAR(150) NOT NULL,
+    cliente_id      INTEGER REFERENCES clientes (id),
+    responsavel_id  INTEGER REFERENCES funcionarios (id),
+    data_inicio     DATE,
+    data_termino    DATE,
+    status          VARCHAR(30),   -- 'Em andamento', 'Concluído', 'Cancelado', 'Em aprovação'
+    orcamento       NUMERIC(14, 2)
+);
+
+CREATE TABLE IF NOT EXISTS vendas (
+    id                BIGSERIAL PRIMARY KEY,
+    projeto_id        INTEGER REFERENCES projetos (id),
+    funcionario_id    INTEGER REFERENCES funcionarios (id),
+    data_venda        DATE,
+    valor             NUMERIC(12, 2),
+    status_pagamento  VARCHAR(20)   -- 'Pago', 'Pendente', 'Atrasado'
+);
+
+CREATE TABLE IF NOT EXISTS contratos_marketing (
+    id            SERIAL PRIMARY KEY,
+    cliente_id    INTEGER REFERENCES clientes (id),
+    descricao     TEXT,
+    data_inicio   DATE,
+    data_termino  DATE,
+    valor_total   NUMERIC(14, 2),
+    status        VARCHAR(20)       -- 'Ativo', 'Encerrado', 'Cancelado', 'Pendente'
+);
+
+CREATE TABLE IF NOT EXISTS logs_perguntas (
+    id          BIGSERIAL PRIMARY KEY,
+    pergunta    TEXT NOT NULL,
+    sql_gerada  TEXT,
+    resposta    TEXT,
+    sucesso     BOOLEAN,
+    data_hora   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
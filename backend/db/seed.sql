@@ -0,0 +1,56 @@
+-- ------------------------------------------------------------
+-- Dados mínimos e determinísticos para desenvolvimento e teste de carga
+-- ------------------------------------------------------------
+-- Para volumes maiores, use o gerador de dados sintéticos.
+
+INSERT INTO departamentos (nome, orcamento) VALUES
+    ('Vendas', 250000.00),
+    ('Marketing Digital', 320000.00),
+    ('Criação', 180000.00),
+    ('Atendimento', 120000.00);
+
+INSERT INTO funcionarios (nome, cargo, departamento_id, salario, data_contratacao)
+SELECT
+    'Funcionário ' || g,
+    (ARRAY['Analista', 'Designer', 'Gerente de Contas', 'Executivo de Vendas'])[1 + g % 4],
+    1 + g % 4,
+    3000 + (g * 137) % 7000,
+    DATE '2018-01-01' + (g * 53) % 2400
+FROM generate_series(1, 20) AS g;
+
+INSERT INTO clientes (nome_empresa, setor, data_cadastro)
+SELECT
+    'Cliente ' || g || ' LTDA',
+    (ARRAY['Moda', 'Tecnologia', 'Alimentos', 'Saúde', 'Educação'])[1 + g % 5],
+    DATE '2019-01-01' + (g * 71) % 2000
+FROM generate_series(1, 10) AS g;
+
+INSERT INTO projetos (nome, cliente_id, responsavel_id, data_inicio, data_termino, status, orcamento)
+SELECT
+    'Projeto ' || g,
+    1 + g % 10,
+    1 + g % 20,
+    DATE '2020-01-01' + (g * 37) % 1500,
+    DATE '2020-01-01' + (g * 37) % 1500 + 30 + (g * 11) % 300,
+    (ARRAY['Em andamento', 'Concluído', 'Cancelado', 'Em aprovação'])[1 + g % 4],
+    10000 + (g * 911) % 90000
+FROM generate_series(1, 30) AS g;
+
+INSERT INTO vendas (projeto_id, funcionario_id, data_venda, valor, status_pagamento)
+SELECT
+    1 + g % 30,
+    1 + (g * 7) % 20,
+    CURRENT_DATE - (g * 3) % 1500,
+    500 + (g * 389) % 20000,
+    (ARRAY['Pago', 'Pago', 'Pendente', 'Atrasado'])[1 + g % 4]
+FROM generate_series(1, 500) AS g;
+
+INSERT INTO contratos_marketing (cliente_id, descricao, data_inicio, data_termino, valor_total, status)
+SELECT
+    1 + g % 10,
+    'Contrato de marketing ' || g,
+    DATE '2019-06-01' + (g * 97) % 2000,
+    DATE '2019-06-01' + (g * 97) % 2000 + 180 + (g * 13) % 365,
+    20000 + (g * 1237) % 200000,
+    (ARRAY['Ativo', 'Encerrado', 'Cancelado', 'Pendente'])[1 + g % 4]
+FROM generate_series(1, 25) AS g;
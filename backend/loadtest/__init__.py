@@ -0,0 +1,33 @@
+"""
+Teste de carga offline do backend Sophos.
+
+Roteiro para medir capacidade sem gastar cota da API Gemini:
+
+1. Postgres local com o schema da STOLF:
+       createdb sophos_carga
+       python -m loadtest.carga --preparar-banco "dbname=sophos_carga"
+   ou, para volumes maiores (escala 10000 = 10 milhões de vendas):
+       python -m loadtest.gerar_dados --dsn "dbname=sophos_carga" --escala 100 --recriar --medir
+
+2. Stub do Gemini com latência realista:
+       python -m loadtest.stub_gemini --porta 8089 --latencia lognormal:900:0.4
+
+3. Backend apontando para o banco local e para o stub:
+       export DB_HOST=localhost DB_PORT=5432 DB_NAME=sophos_carga DB_SSLMODE=disable ...
+       export GEMINI_API_URL=http://localhost:8089/v1beta
+       python -m app.app      # /pergunta na porta 5000
+       python -m app.graphs   # /api/query/* na porta 5001
+
+4. Carga:
+       python -m loadtest.carga --concorrencia 16 --duracao 60 --json relatorio.json
+
+   Planos de execução de todas as consultas mapeadas (antes/depois de db/migrations/):
+       python -m loadtest.analisar_planos --dsn "dbname=sophos_carga" --aplicar-migracoes
+
+   Snapshot de vendas em memória (VENDAS_SNAPSHOT=1) conferido contra as SQLs dos mapeamentos:
+       python -m loadtest.verificar_snapshot --dsn "dbname=sophos_carga" --atualizacoes
+
+5. Replay do tráfego real (perguntas de logs_perguntas), para validar mudanças de roteamento e cache:
+       python -m loadtest.replay --dsn "dbname=sophos" --modo roteamento
+       python -m loadtest.replay --dsn "dbname=sophos" --modo http --acelerar 60 --json replay.json
+"""
@@ -0,0 +1,188 @@
+"""
+Consultor de índices: EXPLAIN (ANALYZE, BUFFERS) de toda a carga mapeada.
+
+Roda cada SQL de query_mappings (placeholders preenchidos com valores de
+exemplo) e cada consulta de graphs.py no banco indicado, de preferência com
+dados em escala (loadtest.gerar_dados), e relata por consulta:
+
+- tempo de execução e de planejamento, blocos lidos do cache e do disco;
+- sequential scans que leram muitas linhas (candidatos a índice);
+- nós com estimativa de linhas muito distante do real (estatísticas ruins).
+
+Exemplos:
+    python -m loadtest.gerar_dados --dsn "dbname=sophos_carga" --escala 1000 --recriar
+    python -m loadtest.analisar_planos --dsn "dbname=sophos_carga" --json antes.json
+    python -m loadtest.analisar_planos --dsn "dbname=sophos_carga" --aplicar-migracoes --json depois.json
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+
+from app.graphs import CONSULTAS, CONSULTAS_ROLLUP
+from app.query_mapping import query_mappings
+
+from .carga import DIR_DB
+from .gerar_dados import preencher_parametros
+
+# Seq scans que leem pelo menos este número de linhas são relatados
+LINHAS_MIN_SEQ_SCAN = 1000
+# Fator (para mais ou para menos) a partir do qual a estimativa é considerada ruim
+LIMITE_ERRO_ESTIMATIVA = 10
+
+
+def consultas_da_carga():
+    """Lista de (nome, sql) com os mapeamentos de query_mapping e as consultas de graphs.py (ao vivo e rollup)."""
+    consultas = [(label, preencher_parametros(sql)) for _frases, label, sql in query_mappings]
+    consultas += [(f"graficos/{nome}", sql) for nome, sql in CONSULTAS.items()]
+    consultas += [(f"graficos-rollup/{nome}", sql) for nome, (_rollup, sql) in CONSULTAS_ROLLUP.items()]
+    return consultas
+
+
+def _nos(plano, pai=None):
+    yield plano, pai
+    for filho in plano.get('Plans', ()):
+        yield from _nos(filho, plano)
+
+
+def analisar_plano(explain):
+    """Resume a saída de EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) de uma consulta."""
+    raiz = explain[0]
+    plano = raiz['Plan']
+    seq_scans, estimativas = [], []
+    for no, pai in _nos(plano):
+        loops = no.get('Actual Loops', 1)
+        if loops == 0:
+            continue  # nó nunca executado
+        if no['Node Type'] == 'Seq Scan':
+            lidas = (no['Actual Rows'] + no.get('Rows Removed by Filter', 0)) * loops
+            if lidas >= LINHAS_MIN_SEQ_SCAN:
+                seq_scans.append({'tabela': no.get('Relation Name'), 'linhas_lidas': lidas,
+                                  'linhas_retornadas': no['Actual Rows'] * loops, 'filtro': no.get('Filter')})
+        if pai is not None and pai['Node Type'] == 'Limit':
+            continue  # sob um LIMIT o executor para cedo: a diferença é esperada
+        estimadas, reais = no['Plan Rows'], no['Actual Rows']
+        fator = max(estimadas, 1) / max(reais, 1)
+        if fator >= LIMITE_ERRO_ESTIMATIVA or 1 / fator >= LIMITE_ERRO_ESTIMATIVA:
+            estimativas.append({'no': no['Node Type'], 'tabela': no.get('Relation Name'),
+                                'estimadas': estimadas, 'reais': reais,
+                                'fator': round(max(fator, 1 / fator), 1)})
+    return {
+        'execucao_ms': raiz.get('Execution Time'),
+        'planejamento_ms': raiz.get('Planning Time'),
+        'blocos_cache': plano.get('Shared Hit Blocks', 0),
+        'blocos_lidos': plano.get('Shared Read Blocks', 0),
+        'seq_scans': seq_scans,
+        'estimativas_ruins': estimativas,
+    }
+
+
+def explicar(conn, sql, timeout_ms=None):
+    """Executa EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) e desfaz a transação."""
+    with conn.cursor() as cur:
+        try:
+            if timeout_ms:
+                cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql.strip().rstrip(';'))
+            return cur.fetchone()[0]
+        finally:
+            conn.rollback()
+
+
+def analisar_carga(conn, timeout_ms=None, filtro=None):
+    """Analisa todas as consultas da carga; devolve {nome: resumo ou {'erro': ...}}."""
+    relatorio = {}
+    for nome, sql in consultas_da_carga():
+        if filtro and filtro not in nome:
+            continue
+        try:
+            relatorio[nome] = analisar_plano(explicar(conn, sql, timeout_ms))
+        except Exception as e:
+            logging.warning(f"{nome}: {e}")
+            relatorio[nome] = {'erro': str(e).strip()}
+    return relatorio
+
+
+def comandos_sql(texto):
+    """
+    Separa um arquivo SQL em comandos (sem comentários de linha), um por ';' no
+    fim de linha, sem quebrar corpos de função entre $$ ... $$.
+    """
+    sem_comentarios = '\n'.join(l for l in texto.splitlines() if not l.lstrip().startswith('--'))
+    comandos, atual = [], ''
+    for i, trecho in enumerate(sem_comentarios.split('$$')):
+        if i % 2:
+            atual += '$$' + trecho + '$$'
+            continue
+        partes = re.split(r';\s*$', trecho, flags=re.M)
+        for parte in partes[:-1]:
+            comandos.append(atual + parte)
+            atual = ''
+        atual += partes[-1]
+    comandos.append(atual)
+    return [c.strip() for c in comandos if c.strip()]
+
+
+def aplicar_migracoes(conn):
+    """Aplica db/migrations/*.sql (exceto *_down.sql) em autocommit, comando a comando."""
+    arquivos = sorted(a for a in glob.glob(os.path.join(DIR_DB, 'migrations', '*.sql'))
+                      if not a.endswith('_down.sql'))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for arquivo in arquivos:
+                with open(arquivo, encoding='utf-8') as f:
+                    for comando in comandos_sql(f.read()):
+                        cur.execute(comando)
+                cur.execute("ANALYZE;")
+                logging.info(f"Migração aplicada: {os.path.basename(arquivo)}")
+    finally:
+        conn.autocommit = False
+
+
+def imprimir_relatorio(relatorio):
+    print(f"{'consulta':45} {'exec ms':>9} {'plan ms':>8} {'blocos lidos':>12}  alertas")
+    for nome, r in relatorio.items():
+        if 'erro' in r:
+            print(f"{nome:45} {'erro':>9}  {r['erro'].splitlines()[0]}")
+            continue
+        alertas = [f"seq scan {s['tabela']} ({s['linhas_lidas']} linhas)" for s in r['seq_scans']]
+        alertas += [f"estimativa {e['no']}{' ' + e['tabela'] if e['tabela'] else ''}: "
+                    f"{e['estimadas']} vs {e['reais']}" for e in r['estimativas_ruins']]
+        print(f"{nome:45} {r['execucao_ms']:>9.2f} {r['planejamento_ms']:>8.2f} {r['blocos_lidos']:>12}  "
+              f"{'; '.join(alertas) or '-'}")
+    com_seq = sum(1 for r in relatorio.values() if r.get('seq_scans'))
+    print(f"\n{len(relatorio)} consultas, {com_seq} com seq scan de {LINHAS_MIN_SEQ_SCAN}+ linhas.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN (ANALYZE, BUFFERS) da carga de consultas mapeadas.")
+    parser.add_argument('--dsn', required=True)
+    parser.add_argument('--aplicar-migracoes', action='store_true',
+                        help="Aplica db/migrations/*.sql antes da análise.")
+    parser.add_argument('--filtro', help="Analisa só as consultas cujo nome contém este texto.")
+    parser.add_argument('--timeout-ms', type=int, default=60000, help="statement_timeout de cada consulta.")
+    parser.add_argument('--json', help="Grava o relatório também neste arquivo JSON.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    import psycopg2
+    conn = psycopg2.connect(args.dsn)
+    try:
+        if args.aplicar_migracoes:
+            aplicar_migracoes(conn)
+        relatorio = analisar_carga(conn, args.timeout_ms, args.filtro)
+    finally:
+        conn.close()
+
+    imprimir_relatorio(relatorio)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Gerador de carga para /pergunta e os endpoints de gráfico.
+
+Cada worker é um cliente em laço fechado (envia, espera a resposta, envia a
+próxima), sorteando o endpoint conforme os pesos e as perguntas do mix
+sintético. Ao fim, imprime por endpoint: requisições, erros, vazão e
+latências p50/p95/p99.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+import requests
+
+from .perguntas import gerar_perguntas
+
+ENDPOINTS_GRAFICOS = [
+    '/api/query/total_vendas_por_mes',
+    '/api/query/funcionarios_por_departamento',
+    '/api/query/projetos_por_status',
+    '/api/query/receita_por_cliente',
+    '/api/dashboard',
+]
+
+DIR_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db')
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)."""
+    if not valores_ordenados:
+        return None
+    posto = max(1, int(-(-p * len(valores_ordenados) // 100)))
+    return valores_ordenados[min(posto, len(valores_ordenados)) - 1]
+
+
+class Resultados:
+    """Latências por endpoint, acumuladas pelos workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+
+    def registrar(self, endpoint, segundos, ok):
+        with self._lock:
+            self.latencias[endpoint].append(segundos)
+            if not ok:
+                self.erros[endpoint] += 1
+
+    def relatorio(self, duracao_s):
+        linhas = {}
+        for endpoint, valores in sorted(self.latencias.items()):
+            ordenados = sorted(valores)
+            linhas[endpoint] = {
+                'requisicoes': len(ordenados),
+                'erros': self.erros[endpoint],
+                'vazao_rps': round(len(ordenados) / duracao_s, 2),
+                'media_ms': round(1000 * sum(ordenados) / len(ordenados), 1),
+                'p50_ms': round(1000 * percentil(ordenados, 50), 1),
+                'p95_ms': round(1000 * percentil(ordenados, 95), 1),
+                'p99_ms': round(1000 * percentil(ordenados, 99), 1),
+            }
+        return linhas
+
+
+def _worker(indice, args, perguntas, resultados, fim):
+    rnd = random.Random(args.semente + indice)
+    sessao = requests.Session()
+    headers = {'X-Deadline-Ms': str(args.deadline_ms)} if args.deadline_ms else {}
+    while time.monotonic() < fim:
+        if rnd.random() < args.peso_pergunta:
+            endpoint = '/pergunta'
+            url = args.pergunta_url + endpoint
+            envio = lambda: sessao.post(url, json={'pergunta': rnd.choice(perguntas)},
+                                        headers=headers, timeout=args.timeout)
+        else:
+            endpoint = rnd.choice(ENDPOINTS_GRAFICOS)
+            url = args.graficos_url + endpoint
+            envio = lambda: sessao.get(url, timeout=args.timeout)
+
+        inicio = time.perf_counter()
+        try:
+            ok = envio().status_code < 400
+        except requests.RequestException:
+            ok = False
+        resultados.registrar(endpoint, time.perf_counter() - inicio, ok)
+
+
+def executar_carga(args):
+    """Roda a carga pelo tempo configurado e devolve o relatório por endpoint."""
+    perguntas = gerar_perguntas(1000, semente=args.semente)
+    resultados = Resultados()
+    inicio = time.monotonic()
+    fim = inicio + args.duracao
+    workers = [
+        threading.Thread(target=_worker, args=(i, args, perguntas, resultados, fim), daemon=True)
+        for i in range(args.concorrencia)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return resultados.relatorio(time.monotonic() - inicio)
+
+
+def imprimir_relatorio(relatorio):
+    cabecalho = f"{'endpoint':45} {'req':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    for endpoint, m in relatorio.items():
+        print(f"{endpoint:45} {m['requisicoes']:>7} {m['erros']:>6} {m['vazao_rps']:>8} "
+              f"{m['p50_ms']:>9} {m['p95_ms']:>9} {m['p99_ms']:>9}")
+
+
+def preparar_banco(dsn, arquivos=('schema.sql', 'seed.sql')):
+    """Aplica o schema da STOLF e os dados mínimos no banco indicado pelo DSN."""
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            for arquivo in arquivos:
+                with open(os.path.join(DIR_DB, arquivo), encoding='utf-8') as f:
+                    cur.execute(f.read())
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do backend Sophos.")
+    parser.add_argument('--pergunta-url', default='http://localhost:5000')
+    parser.add_argument('--graficos-url', default='http://localhost:5001')
+    parser.add_argument('--concorrencia', type=int, default=8, help="Número de clientes simultâneos.")
+    parser.add_argument('--duracao', type=float, default=30, help="Duração da carga em segundos.")
+    parser.add_argument('--peso-pergunta', type=float, default=0.7,
+                        help="Fração das requisições que vão para /pergunta (o resto vai para os gráficos).")
+    parser.add_argument('--deadline-ms', type=int, default=None, help="Envia X-Deadline-Ms em /pergunta.")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--json', help="Grava o relatório também neste arquivo JSON.")
+    parser.add_argument('--preparar-banco', metavar='DSN',
+                        help="Aplica db/schema.sql e db/seed.sql no banco e sai.")
+    args = parser.parse_args()
+
+    if args.preparar_banco:
+        preparar_banco(args.preparar_banco)
+        print("Banco preparado com o schema da STOLF.")
+        return
+
+    relatorio = executar_carga(args)
+    imprimir_relatorio(relatorio)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'endpoints': relatorio}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
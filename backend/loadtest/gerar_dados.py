@@ -0,0 +1,345 @@
+"""
+Gerador de dados sintéticos da STOLF LTDA para testes em escala.
+
+Cria o schema (db/schema.sql) e preenche todas as tabelas com um fator de
+escala. As tabelas de dimensão crescem de forma sublinear (uma empresa 10000x
+maior em vendas não tem 10000x mais departamentos), e vendas cresce
+linearmente: 1x = 1.000 vendas, 10000x = 10 milhões.
+
+Os dados são enviados com COPY FROM STDIN a partir de geradores, então a
+memória fica constante independentemente do volume.
+
+Exemplos:
+    python -m loadtest.gerar_dados --dsn "dbname=sophos_carga" --escala 100 --recriar
+    python -m loadtest.gerar_dados --dsn "dbname=sophos_carga" --sem-carga --medir   # tempo de cada mapeamento
+    python -m loadtest.gerar_dados --saida /tmp/stolf --escala 1     # arquivos .tsv, sem banco
+"""
+
+import argparse
+import datetime
+import io
+import logging
+import math
+import os
+import random
+import re
+import time
+
+from app.query_mapping import query_mappings
+
+from .carga import DIR_DB
+
+DEPARTAMENTOS_BASE = ['Vendas', 'Marketing Digital', 'Criação', 'Atendimento']
+CARGOS = {
+    'Vendas': ['Executivo de Vendas', 'Gerente de Vendas', 'Analista Comercial'],
+    'Marketing Digital': ['Analista de Marketing', 'Especialista em SEO', 'Gestor de Tráfego'],
+    'Criação': ['Designer Gráfico', 'Redator', 'Diretor de Arte'],
+    'Atendimento': ['Gerente de Contas', 'Analista de Atendimento', 'Coordenador de Atendimento'],
+}
+SETORES = ['Moda', 'Tecnologia', 'Alimentos', 'Saúde', 'Educação', 'Varejo', 'Financeiro', 'Turismo']
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela',
+         'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Costa', 'Pereira', 'Almeida', 'Ferreira',
+              'Rodrigues', 'Gomes', 'Martins', 'Araújo', 'Ribeiro', 'Carvalho', 'Barbosa']
+PREFIXOS_EMPRESA = ['Alfa', 'Nova', 'Prime', 'Vértice', 'Solar', 'Atlas', 'Horizonte', 'Pulsar', 'Órbita']
+
+# Pesos das categorias (refletem uma carteira saudável: a maioria paga em dia)
+STATUS_PAGAMENTO = (['Pago', 'Pendente', 'Atrasado'], [0.72, 0.18, 0.10])
+STATUS_PROJETO = (['Em andamento', 'Concluído', 'Cancelado', 'Em aprovação'], [0.35, 0.45, 0.08, 0.12])
+STATUS_CONTRATO = (['Ativo', 'Encerrado', 'Cancelado', 'Pendente'], [0.40, 0.45, 0.05, 0.10])
+# Sazonalidade das vendas por mês (dezembro forte, início do ano fraco)
+PESO_MES = [0.75, 0.8, 0.95, 1.0, 1.0, 0.95, 0.9, 1.0, 1.05, 1.1, 1.2, 1.35]
+
+DATA_INICIAL = datetime.date(2019, 1, 1)
+
+TABELAS = ['departamentos', 'funcionarios', 'clientes', 'projetos', 'vendas',
+           'contratos_marketing', 'logs_perguntas']
+
+
+def contagens(escala):
+    """
+    Número de linhas por tabela para o fator de escala. Expoentes:
+    vendas 1, projetos/contratos 0.75, funcionários/clientes/logs 0.5, departamentos 0.25.
+    """
+    return {
+        'departamentos': max(len(DEPARTAMENTOS_BASE), math.ceil(len(DEPARTAMENTOS_BASE) * escala ** 0.25)),
+        'funcionarios': max(8, math.ceil(50 * escala ** 0.5)),
+        'clientes': max(5, math.ceil(30 * escala ** 0.5)),
+        'projetos': max(10, math.ceil(100 * escala ** 0.75)),
+        'vendas': max(10, math.ceil(1000 * escala)),
+        'contratos_marketing': max(5, math.ceil(60 * escala ** 0.75)),
+        'logs_perguntas': max(10, math.ceil(200 * escala ** 0.5)),
+    }
+
+
+class GeradorStolf:
+    """Gera as linhas de cada tabela de forma determinística para uma semente."""
+
+    def __init__(self, escala=1.0, semente=42, data_final=None):
+        self.n = contagens(escala)
+        self.semente = semente
+        self.data_final = data_final or datetime.date.today()
+        self.dias = (self.data_final - DATA_INICIAL).days
+        # Departamento de cada funcionário, para direcionar as vendas à equipe comercial
+        rnd = random.Random(semente)
+        self.depto_funcionario = [self._depto_sorteado(rnd) for _ in range(self.n['funcionarios'])]
+        self.vendedores = [i + 1 for i, d in enumerate(self.depto_funcionario) if d == 1] or [1]
+
+    def _rnd(self, tabela):
+        return random.Random(f"{self.semente}:{tabela}")
+
+    def _depto_sorteado(self, rnd):
+        # Metade da empresa nos quatro departamentos originais, com Vendas maior
+        if rnd.random() < 0.8:
+            return rnd.choices([1, 2, 3, 4], [0.35, 0.25, 0.25, 0.15])[0]
+        return rnd.randint(1, self.n['departamentos'])
+
+    def _data_com_tendencia(self, rnd):
+        """Datas com densidade crescente no tempo (empresa em crescimento) e sazonalidade mensal."""
+        while True:
+            data = DATA_INICIAL + datetime.timedelta(days=int(self.dias * math.sqrt(rnd.random())))
+            if rnd.random() * 1.35 <= PESO_MES[data.month - 1]:
+                return data
+
+    def departamentos(self):
+        rnd = self._rnd('departamentos')
+        for i in range(1, self.n['departamentos'] + 1):
+            nome = DEPARTAMENTOS_BASE[i - 1] if i <= len(DEPARTAMENTOS_BASE) else f"Departamento {i}"
+            yield (i, nome, round(rnd.uniform(80000, 400000), 2))
+
+    def funcionarios(self):
+        rnd = self._rnd('funcionarios')
+        for i in range(1, self.n['funcionarios'] + 1):
+            depto = self.depto_funcionario[i - 1]
+            cargos = CARGOS.get(DEPARTAMENTOS_BASE[depto - 1] if depto <= 4 else '', ['Analista', 'Coordenador'])
+            nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+            salario = round(min(40000, rnd.lognormvariate(math.log(5200), 0.45)), 2)
+            contratacao = DATA_INICIAL - datetime.timedelta(days=730) + datetime.timedelta(
+                days=rnd.randrange(self.dias + 730))
+            yield (i, nome, rnd.choice(cargos), depto, salario, contratacao)
+
+    def clientes(self):
+        rnd = self._rnd('clientes')
+        for i in range(1, self.n['clientes'] + 1):
+            nome = f"{rnd.choice(PREFIXOS_EMPRESA)} {rnd.choice(SOBRENOMES)} {rnd.choice(SETORES)} {i} LTDA"
+            cadastro = DATA_INICIAL + datetime.timedelta(days=rnd.randrange(self.dias))
+            yield (i, nome, rnd.choice(SETORES), cadastro)
+
+    def projetos(self):
+        rnd = self._rnd('projetos')
+        for i in range(1, self.n['projetos'] + 1):
+            inicio = self._data_com_tendencia(rnd)
+            termino = inicio + datetime.timedelta(days=rnd.randint(30, 540))
+            status = rnd.choices(*STATUS_PROJETO)[0]
+            # Clientes grandes concentram projetos (distribuição enviesada para ids baixos)
+            cliente = 1 + int(self.n['clientes'] * rnd.random() ** 2)
+            orcamento = round(rnd.lognormvariate(math.log(60000), 0.7), 2)
+            yield (i, f"Projeto {i} - {rnd.choice(SETORES)}", cliente,
+                   rnd.randint(1, self.n['funcionarios']), inicio, termino, status, orcamento)
+
+    def vendas(self):
+        rnd = self._rnd('vendas')
+        n_projetos = self.n['projetos']
+        for i in range(1, self.n['vendas'] + 1):
+            projeto = 1 + int(n_projetos * rnd.random() ** 2.5)
+            vendedor = rnd.choice(self.vendedores) if rnd.random() < 0.8 else rnd.randint(1, self.n['funcionarios'])
+            valor = round(min(500000, rnd.lognormvariate(math.log(4800), 0.9)), 2)
+            yield (i, projeto, vendedor, self._data_com_tendencia(rnd), valor,
+                   rnd.choices(*STATUS_PAGAMENTO)[0])
+
+    def contratos_marketing(self):
+        rnd = self._rnd('contratos_marketing')
+        for i in range(1, self.n['contratos_marketing'] + 1):
+            inicio = self._data_com_tendencia(rnd)
+            termino = inicio + datetime.timedelta(days=rnd.choice([90, 180, 365, 730]))
+            valor = round(rnd.lognormvariate(math.log(90000), 0.8), 2)
+            yield (i, 1 + int(self.n['clientes'] * rnd.random() ** 1.5),
+                   f"Contrato de {rnd.choice(['SEO', 'mídia paga', 'branding', 'redes sociais', 'conteúdo'])} #{i}",
+                   inicio, termino, valor, rnd.choices(*STATUS_CONTRATO)[0])
+
+    def logs_perguntas(self):
+        rnd = self._rnd('logs_perguntas')
+        inicio = datetime.datetime.combine(self.data_final, datetime.time()) - datetime.timedelta(days=90)
+        instante = inicio
+        passo_medio = 90 * 86400 / self.n['logs_perguntas']
+        for i in range(1, self.n['logs_perguntas'] + 1):
+            frases, _label, sql = rnd.choice(query_mappings)
+            instante += datetime.timedelta(seconds=rnd.expovariate(1 / passo_medio))
+            sucesso = '{' not in sql and rnd.random() < 0.95
+            yield (i, rnd.choice(frases), sql.strip(), "Resposta registrada (sintética).", sucesso,
+                   instante.replace(tzinfo=datetime.timezone.utc))
+
+    def linhas(self, tabela):
+        return getattr(self, tabela)()
+
+
+def _campo_copy(valor):
+    if valor is None:
+        return '\\N'
+    if valor is True:
+        return 't'
+    if valor is False:
+        return 'f'
+    texto = valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+    return texto.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def linha_copy(linha):
+    """Formata uma tupla no formato texto do COPY (tabulações, \\N para nulo)."""
+    return '\t'.join(map(_campo_copy, linha)) + '\n'
+
+
+class FluxoCopy(io.RawIOBase):
+    """
+    Arquivo somente leitura sobre um gerador de linhas, para copy_expert:
+    o psycopg2 chama read() em blocos e as linhas são geradas sob demanda.
+    """
+
+    def __init__(self, linhas):
+        self._linhas = iter(linhas)
+        self._resto = b''
+
+    def readable(self):
+        return True
+
+    def read(self, tamanho=-1):
+        if tamanho is None or tamanho < 0:
+            tamanho = 1 << 20
+        partes = [self._resto]
+        total = len(self._resto)
+        for linha in self._linhas:
+            dados = linha_copy(linha).encode('utf-8')
+            partes.append(dados)
+            total += len(dados)
+            if total >= tamanho:
+                break
+        bloco = b''.join(partes)
+        self._resto = bloco[tamanho:]
+        return bloco[:tamanho]
+
+
+COLUNAS = {
+    'departamentos': 'id, nome, orcamento',
+    'funcionarios': 'id, nome, cargo, departamento_id, salario, data_contratacao',
+    'clientes': 'id, nome_empresa, setor, data_cadastro',
+    'projetos': 'id, nome, cliente_id, responsavel_id, data_inicio, data_termino, status, orcamento',
+    'vendas': 'id, projeto_id, funcionario_id, data_venda, valor, status_pagamento',
+    'contratos_marketing': 'id, cliente_id, descricao, data_inicio, data_termino, valor_total, status',
+    'logs_perguntas': 'id, pergunta, sql_gerada, resposta, sucesso, data_hora',
+}
+
+
+def carregar(conn, gerador, recriar=False):
+    """Cria o schema e carrega todas as tabelas via COPY, na ordem das chaves estrangeiras."""
+    with conn.cursor() as cur:
+        if recriar:
+            cur.execute("DROP TABLE IF EXISTS " + ', '.join(reversed(TABELAS)) + " CASCADE;")
+        with open(os.path.join(DIR_DB, 'schema.sql'), encoding='utf-8') as f:
+            cur.execute(f.read())
+        conn.commit()
+
+        for tabela in TABELAS:
+            inicio = time.perf_counter()
+            cur.execute(f"TRUNCATE {tabela} CASCADE;")
+            cur.copy_expert(f"COPY {tabela} ({COLUNAS[tabela]}) FROM STDIN", FluxoCopy(gerador.linhas(tabela)),
+                            size=1 << 20)
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+                        f"GREATEST((SELECT MAX(id) FROM {tabela}), 1));")
+            conn.commit()
+            logging.info(f"{tabela}: {gerador.n[tabela]} linhas em {time.perf_counter() - inicio:.1f}s")
+
+        # TRUNCATE não dispara os triggers dos rollups (db/migrations/002_rollups.sql): recalcula
+        cur.execute("SELECT to_regproc('rollup_recalcular') IS NOT NULL;")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT rollup_recalcular();")
+        cur.execute("ANALYZE;")
+        conn.commit()
+
+
+def exportar(diretorio, gerador):
+    """Grava cada tabela em <diretorio>/<tabela>.tsv no formato do COPY (sem banco)."""
+    os.makedirs(diretorio, exist_ok=True)
+    for tabela in TABELAS:
+        with open(os.path.join(diretorio, f'{tabela}.tsv'), 'w', encoding='utf-8') as f:
+            for linha in gerador.linhas(tabela):
+                f.write(linha_copy(linha))
+
+
+# Valores de exemplo para os placeholders dos mapeamentos ao medir as queries
+PARAMETROS_EXEMPLO = {
+    'id': 1, 'cliente_id': 1, 'funcionario_id': 1,
+    'nome': 'Silva', 'nome_empresa': 'Alfa',
+    'start_date': (datetime.date.today() - datetime.timedelta(days=365)).isoformat(),
+    'end_date': datetime.date.today().isoformat(),
+}
+
+
+def preencher_parametros(sql, parametros=PARAMETROS_EXEMPLO):
+    """Substitui os placeholders {nome} da SQL de um mapeamento pelos valores de exemplo."""
+    return re.sub(r'\{(\w+)\}', lambda m: str(parametros.get(m.group(1), m.group(0))), sql)
+
+
+def medir_mapeamentos(conn, repeticoes=3, consultas=None):
+    """
+    Executa cada consulta (por padrão, a SQL de cada mapeamento de query_mapping
+    com os placeholders preenchidos por PARAMETROS_EXEMPLO) e devolve
+    {nome: (linhas, melhor tempo em ms)}, ou {nome: (None, erro)} se falhar.
+    """
+    if consultas is None:
+        consultas = [(label, preencher_parametros(sql)) for _frases, label, sql in query_mappings]
+    resultados = {}
+    with conn.cursor() as cur:
+        for nome, sql in consultas:
+            tempos = []
+            try:
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    cur.execute(sql)
+                    linhas = len(cur.fetchall())
+                    tempos.append(1000 * (time.perf_counter() - inicio))
+                resultados[nome] = (linhas, round(min(tempos), 2))
+            except Exception as e:
+                resultados[nome] = (None, str(e).splitlines()[0])
+            conn.rollback()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos da STOLF em escala.")
+    parser.add_argument('--escala', type=float, default=1.0, help="Fator de escala (1 = 1.000 vendas).")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--data-final', type=datetime.date.fromisoformat, default=None,
+                        help="Última data dos dados (AAAA-MM-DD); padrão: hoje.")
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--dsn', help="Banco de destino (ex.: 'dbname=sophos_carga').")
+    destino.add_argument('--saida', help="Diretório para gravar arquivos .tsv em vez de usar o banco.")
+    parser.add_argument('--recriar', action='store_true', help="Apaga e recria as tabelas antes de carregar.")
+    parser.add_argument('--medir', action='store_true',
+                        help="Depois da carga, mede o tempo de cada mapeamento e de cada gráfico (ao vivo e rollup).")
+    parser.add_argument('--sem-carga', action='store_true', help="Não carrega dados (útil com --medir).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    gerador = GeradorStolf(args.escala, args.semente, args.data_final)
+    logging.info(f"Escala {args.escala}: {gerador.n}")
+
+    if args.saida:
+        exportar(args.saida, gerador)
+        return
+
+    import psycopg2
+    conn = psycopg2.connect(args.dsn)
+    try:
+        if not args.sem_carga:
+            carregar(conn, gerador, args.recriar)
+        if args.medir:
+            from .analisar_planos import consultas_da_carga
+            print(f"{'consulta':45} {'linhas':>8} {'ms':>10}")
+            for nome, (linhas, ms) in medir_mapeamentos(conn, consultas=consultas_da_carga()).items():
+                print(f"{nome:45} {linhas if linhas is not None else '-':>8} {ms:>10}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Gera a tabela de lemas do caminho rápido (app/lematizador.py) com o modelo
+spaCy da aplicação. Rode de novo sempre que query_mappings ou o modelo mudarem:
+a aplicação ignora uma tabela gerada por outra versão do modelo.
+
+Vocabulário: as frases de query_mappings, as perguntas sintéticas do teste de
+carga (que trazem os modelos "Qual o ...", "Me mostre ..." e as variações sem
+acento), as stopwords do spaCy, os meses e PALAVRAS_DE_PERGUNTA.
+
+Exemplos:
+    python -m loadtest.gerar_lemas
+    python -m loadtest.gerar_lemas --saida /tmp/lemas_pt.tsv --perguntas 50000
+"""
+
+import argparse
+import logging
+
+from app import lematizador
+from app.extracao import MESES
+from app.query_mapping import query_mappings
+
+from .perguntas import gerar_perguntas
+
+MODELO_SPACY = 'pt_core_news_sm'
+
+# Palavras comuns em perguntas que não estão nas frases dos mapeamentos
+PALAVRAS_DE_PERGUNTA = [
+    'quanto', 'quantos', 'quanta', 'quantas', 'qual', 'quais', 'quem', 'onde', 'quando', 'como',
+    'mostre', 'mostrar', 'liste', 'listar', 'lista', 'informe', 'diga', 'dizer', 'traga', 'ver',
+    'veja', 'quero', 'queria', 'gostaria', 'preciso', 'saber', 'pode', 'poderia', 'favor',
+    'temos', 'tem', 'existem', 'existe', 'há', 'todos', 'todas', 'cada', 'atual', 'atuais',
+    'hoje', 'ontem', 'semana', 'mês', 'mes', 'ano', 'trimestre', 'últimos', 'ultimos', 'passado',
+    'oi', 'olá', 'obrigado', 'obrigada', 'ajuda',
+]
+
+
+def textos_de_referencia(n_perguntas=20000, semente=0):
+    """(textos lematizados em contexto, palavras lematizadas sozinhas) para lematizador.gerar."""
+    textos = [frase for frases, _label, _sql in query_mappings for frase in frases]
+    textos += gerar_perguntas(n_perguntas, semente)
+    return textos, PALAVRAS_DE_PERGUNTA + list(MESES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saida', default=lematizador.LEMAS_ARQUIVO, help='arquivo TSV gerado')
+    parser.add_argument('--modelo', default=MODELO_SPACY, help='modelo spaCy (o mesmo da aplicação)')
+    parser.add_argument('--perguntas', type=int, default=20000, help='perguntas sintéticas usadas como contexto')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    import spacy
+
+    nlp = spacy.load(args.modelo)
+    textos, avulsas = textos_de_referencia(args.perguntas)
+    tabela = lematizador.gerar(nlp, textos, avulsas + sorted(nlp.Defaults.stop_words))
+    tabela.salvar(args.saida)
+    logging.info(f"{len(tabela)} formas gravadas em {args.saida} ({tabela.modelo}).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Gera o léxico geral do corretor ortográfico (app/ortografia.py) a partir da
+tabela lemma_lookup do português do spacy-lookups-data (formas e lemas).
+O pacote só é necessário aqui (está em requirements-test.txt); a aplicação lê
+o arquivo gerado.
+
+Exemplos:
+    python -m loadtest.gerar_lexico
+    python -m loadtest.gerar_lexico --saida /tmp/lexico_pt.bin
+"""
+
+import argparse
+import logging
+
+from app import ortografia
+
+
+def formas_do_lookups():
+    """Formas e lemas da tabela lemma_lookup do português."""
+    import spacy_lookups_data
+    from spacy.util import load_language_data
+
+    tabela = load_language_data(spacy_lookups_data.pt['lemma_lookup'])
+    return [forma for par in tabela.items() for forma in par]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saida', default=ortografia.LEXICO_ARQUIVO, help='arquivo gerado')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    lexico = ortografia.Lexico(formas_do_lookups())
+    lexico.salvar(args.saida)
+    logging.info(f"{len(lexico)} formas gravadas em {args.saida}.")
+
+
+if __name__ == '__main__':
+    main()
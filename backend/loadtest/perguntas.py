@@ -0,0 +1,52 @@
+"""
+Mix sintético de perguntas para o teste de carga, gerado a partir das frases
+de app/query_mapping.py (o que os usuários realmente perguntam) com variações
+de escrita e uma fração de perguntas sem mapeamento.
+"""
+
+import random
+import unicodedata
+
+from app.query_mapping import query_mappings
+
+MODELOS = [
+    "{}",
+    "{}?",
+    "Qual o {}?",
+    "Me mostre {}",
+    "Você pode me dizer {}?",
+    "Preciso saber {} por favor",
+]
+
+FORA_DO_ESCOPO = [
+    "Oi, tudo bem?",
+    "Qual é a capital da França?",
+    "Obrigado pela ajuda!",
+    "Como está o tempo hoje?",
+]
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def gerar_perguntas(n, semente=0, fracao_fora_do_escopo=0.1):
+    """
+    Gera n perguntas. Cada mapeamento tem a mesma chance de ser sorteado (o
+    que espalha a carga por todas as queries), e cerca de um terço das
+    perguntas perde os acentos, como acontece no teclado do celular.
+    """
+    rnd = random.Random(semente)
+    perguntas = []
+    for _ in range(n):
+        if rnd.random() < fracao_fora_do_escopo:
+            perguntas.append(rnd.choice(FORA_DO_ESCOPO))
+            continue
+        frases, _label, _sql = rnd.choice(query_mappings)
+        pergunta = rnd.choice(MODELOS).format(rnd.choice(frases))
+        if rnd.random() < 0.33:
+            pergunta = _sem_acentos(pergunta)
+        if rnd.random() < 0.5:
+            pergunta = pergunta[0].upper() + pergunta[1:]
+        perguntas.append(pergunta)
+    return perguntas
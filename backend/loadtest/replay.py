@@ -0,0 +1,366 @@
+"""
+Replay das perguntas registradas em logs_perguntas como benchmark.
+
+Lê os registros em streaming (cursor nomeado no banco ou arquivo no formato do
+COPY), reenvia cada pergunta pelo pipeline e compara com a execução original:
+
+- drift de roteamento: as SQLs escolhidas agora vs. a sql_gerada registrada;
+- distribuição de latência (p50/p95/p99/máx e histograma), opcionalmente
+  comparada com o relatório JSON de um replay anterior (--baseline), já que
+  logs_perguntas não guarda a duração da execução original.
+
+Modos:
+    roteamento  só a decisão de roteamento (app.rotear_pergunta), sem banco nem Gemini
+    processo    pipeline completo em processo (app.processar_pergunta); usar com o
+                banco de carga e o stub do Gemini, pois o pipeline grava em logs_perguntas
+    http        POST /pergunta em um backend rodando (--alvo)
+
+O ritmo segue os intervalos originais entre as perguntas, divididos por
+--acelerar (0 = o mais rápido possível, limitado por --concorrencia).
+
+Exemplos:
+    \\copy (SELECT * FROM logs_perguntas ORDER BY data_hora) TO 'logs.tsv'
+    python -m loadtest.replay --arquivo logs.tsv --modo roteamento
+    python -m loadtest.replay --dsn "dbname=sophos" --modo http --alvo http://localhost:5000 \\
+        --acelerar 60 --json replay.json --baseline replay_anterior.json
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .carga import percentil
+
+RegistroLog = namedtuple('RegistroLog', 'pergunta sql_gerada sucesso data_hora')
+
+# Limites (em ms) do histograma de latência do relatório
+FAIXAS_MS = (1, 5, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+MAX_EXEMPLOS_DRIFT = 20
+
+
+# ------------------------------------------------------------
+# Leitura dos registros (streaming)
+# ------------------------------------------------------------
+def ler_logs_banco(dsn, desde=None, limite=None, itersize=2000):
+    """Gera os registros de logs_perguntas em ordem cronológica via cursor nomeado (server-side)."""
+    import psycopg2
+
+    sql = ("SELECT pergunta, sql_gerada, sucesso, data_hora FROM logs_perguntas "
+           "WHERE %(desde)s IS NULL OR data_hora >= %(desde)s ORDER BY data_hora, id")
+    if limite:
+        sql += " LIMIT %(limite)s"
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor(name='sophos_replay') as cur:
+            cur.itersize = itersize
+            cur.execute(sql, {'desde': desde, 'limite': limite})
+            for linha in cur:
+                yield RegistroLog(*linha)
+    finally:
+        conn.close()
+
+
+_ESCAPES_COPY = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}
+
+
+def _campo_copy(texto):
+    if texto == '\\N':
+        return None
+    return re.sub(r'\\(.)', lambda m: _ESCAPES_COPY.get(m.group(1), m.group(1)), texto)
+
+
+def ler_logs_arquivo(caminho, limite=None):
+    """
+    Gera os registros de um arquivo no formato texto do COPY com as colunas de
+    logs_perguntas (id, pergunta, sql_gerada, resposta, sucesso, data_hora),
+    como o produzido por \\copy ou por loadtest.gerar_dados --saida.
+    """
+    with open(caminho, encoding='utf-8') as f:
+        for i, linha in enumerate(f):
+            if limite and i >= limite:
+                break
+            _id, pergunta, sql, _resposta, sucesso, data_hora = map(_campo_copy, linha.rstrip('\n').split('\t'))
+            yield RegistroLog(pergunta, sql, sucesso == 't',
+                              datetime.datetime.fromisoformat(data_hora) if data_hora else None)
+
+
+# ------------------------------------------------------------
+# Comparação de roteamento
+# ------------------------------------------------------------
+# Valor de um placeholder numa SQL registrada: literal citado ('2024-01-01'::date,
+# '%Ana%'), número, o próprio placeholder ({id}) ou o parâmetro (%(id)s)
+_COMANDO = re.compile(r"(?:'(?:[^']|'')*'|[^;'])+")
+_VALOR = r"(?:'(?:[^']|'')*'(?:::\w+)?|-?[\w.]+|\{\w+\}|%\(\w+\)s)"
+
+
+@functools.lru_cache(maxsize=None)
+def _modelos_dos_mapeamentos():
+    """[(regex que casa a SQL com quaisquer valores, SQL do mapeamento normalizada)] dos mapeamentos com placeholders."""
+    from app import parametros
+    from app.query_mapping import query_mappings
+
+    modelos = []
+    for _frases, _label, query in query_mappings:
+        for comando in query.split(';'):
+            comando = ' '.join(comando.split())
+            texto, chaves = parametros.modelo(comando)
+            if not chaves:
+                continue
+            partes = re.split(r'%\(\w+\)s', texto)
+            padrao = _VALOR.join(re.escape(parte.replace('%%', '%')) for parte in partes)
+            modelos.append((re.compile(padrao), comando))
+    return modelos
+
+
+def _canonico(comando):
+    """A SQL do mapeamento (com {id}, '{start_date}' ...) se o comando é ela com valores; senão o próprio comando."""
+    for padrao, modelo in _modelos_dos_mapeamentos():
+        if padrao.fullmatch(comando):
+            return modelo
+    return comando
+
+
+def normalizar_sqls(sqls):
+    """
+    Conjunto de comandos SQL normalizados (espaços colapsados, sem ';') a partir
+    do texto registrado. Comandos de mapeamentos com placeholders voltam à
+    forma do mapeamento: a sql_gerada registra os valores consultados
+    ("WHERE id = 3") e rotear_pergunta devolve o modelo ("WHERE id = {id}").
+    """
+    if not sqls:
+        return frozenset()
+    # Separa nos ';' fora de literais (um nome citado pode ter ';')
+    comandos = (' '.join(c.split()) for c in _COMANDO.findall(sqls))
+    return frozenset(_canonico(c) for c in comandos if c)
+
+
+def rotulos_por_sql():
+    """Mapa SQL normalizada → label dos mapeamentos, para relatar o drift por nome."""
+    from app.query_mapping import query_mappings
+
+    return {sql: label for _frases, label, query in query_mappings for sql in normalizar_sqls(query)}
+
+
+# ------------------------------------------------------------
+# Executores (um por modo): recebem a pergunta e devolvem as SQLs usadas
+# ------------------------------------------------------------
+def executor_roteamento():
+    from app.app import rotear_pergunta
+
+    return lambda pergunta: ';\n'.join(sql for _label, sql in rotear_pergunta(pergunta)) or None
+
+
+def executor_processo():
+    from app.app import processar_pergunta
+    from app.deadline import Deadline
+
+    return lambda pergunta: processar_pergunta(pergunta, Deadline())['sqls_usadas']
+
+
+def executor_http(alvo, timeout=60, deadline_ms=None):
+    import requests
+
+    sessao = requests.Session()
+    headers = {'X-Deadline-Ms': str(deadline_ms)} if deadline_ms else {}
+
+    def executar(pergunta):
+        resposta = sessao.post(alvo.rstrip('/') + '/pergunta', json={'pergunta': pergunta},
+                               headers=headers, timeout=timeout)
+        resposta.raise_for_status()
+        return resposta.json().get('sqls_usadas')
+
+    return executar
+
+
+# ------------------------------------------------------------
+# Replay
+# ------------------------------------------------------------
+class ResultadosReplay:
+    """Acumula latências, drift de roteamento e erros do replay (thread-safe)."""
+
+    def __init__(self, rotulos=None):
+        self._lock = threading.Lock()
+        self.rotulos = rotulos or {}
+        self.latencias = []
+        self.total = 0
+        self.iguais = 0
+        self.erros = Counter()
+        self.adicionadas = Counter()
+        self.removidas = Counter()
+        self.exemplos = []
+
+    def _rotulo(self, sql):
+        return self.rotulos.get(sql, sql[:60])
+
+    def registrar(self, registro, sqls_novas, segundos, erro=None):
+        antes = normalizar_sqls(registro.sql_gerada)
+        depois = normalizar_sqls(sqls_novas)
+        with self._lock:
+            self.total += 1
+            if erro is not None:
+                self.erros[erro] += 1
+                return
+            self.latencias.append(segundos)
+            if antes == depois:
+                self.iguais += 1
+                return
+            novas = [self._rotulo(s) for s in depois - antes]
+            perdidas = [self._rotulo(s) for s in antes - depois]
+            self.adicionadas.update(novas)
+            self.removidas.update(perdidas)
+            if len(self.exemplos) < MAX_EXEMPLOS_DRIFT:
+                self.exemplos.append({'pergunta': registro.pergunta, 'adicionadas': novas, 'removidas': perdidas})
+
+    def relatorio(self, duracao_s):
+        ordenadas = sorted(self.latencias)
+        comparadas = self.total - sum(self.erros.values())
+        faixas = Counter()
+        for s in ordenadas:
+            ms = 1000 * s
+            faixas[next((f'<={f}ms' for f in FAIXAS_MS if ms <= f), f'>{FAIXAS_MS[-1]}ms')] += 1
+        latencia = {}
+        if ordenadas:
+            latencia = {
+                'media_ms': round(1000 * sum(ordenadas) / len(ordenadas), 2),
+                'p50_ms': round(1000 * percentil(ordenadas, 50), 2),
+                'p95_ms': round(1000 * percentil(ordenadas, 95), 2),
+                'p99_ms': round(1000 * percentil(ordenadas, 99), 2),
+                'max_ms': round(1000 * ordenadas[-1], 2),
+                'histograma': {f: faixas[f] for f in [f'<={f}ms' for f in FAIXAS_MS] + [f'>{FAIXAS_MS[-1]}ms']
+                               if faixas[f]},
+            }
+        return {
+            'perguntas': self.total,
+            'erros': dict(self.erros),
+            'duracao_s': round(duracao_s, 2),
+            'vazao_rps': round(self.total / duracao_s, 2) if duracao_s else None,
+            'roteamento': {
+                'iguais': self.iguais,
+                'divergentes': comparadas - self.iguais,
+                'taxa_drift': round((comparadas - self.iguais) / comparadas, 4) if comparadas else 0.0,
+                'mapeamentos_adicionados': dict(self.adicionadas.most_common()),
+                'mapeamentos_removidos': dict(self.removidas.most_common()),
+                'exemplos': self.exemplos,
+            },
+            'latencia': latencia,
+        }
+
+
+def _executar_um(executar, registro, resultados):
+    inicio = time.perf_counter()
+    try:
+        sqls = executar(registro.pergunta)
+    except Exception as e:
+        resultados.registrar(registro, None, time.perf_counter() - inicio, erro=type(e).__name__)
+    else:
+        resultados.registrar(registro, sqls, time.perf_counter() - inicio)
+
+
+def replay(registros, executar, acelerar=0.0, concorrencia=1, rotulos=None):
+    """
+    Reenvia os registros (iterável, consumido em streaming) pelo executor.
+    Com acelerar > 0, cada pergunta é disparada no intervalo original dividido
+    por 'acelerar'; com 0, o mais rápido possível. Devolve o relatório.
+    """
+    resultados = ResultadosReplay(rotulos)
+    # Limita as perguntas em voo (e, portanto, os registros lidos à frente)
+    vagas = threading.Semaphore(concorrencia * 2)
+    inicio = time.monotonic()
+    t0_log = None
+
+    def tarefa(registro):
+        try:
+            _executar_um(executar, registro, resultados)
+        finally:
+            vagas.release()
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for registro in registros:
+            if acelerar and registro.data_hora is not None:
+                t0_log = t0_log or registro.data_hora
+                espera = inicio + (registro.data_hora - t0_log).total_seconds() / acelerar - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+            vagas.acquire()
+            executor.submit(tarefa, registro)
+    return resultados.relatorio(time.monotonic() - inicio)
+
+
+def comparar_com_baseline(relatorio, baseline):
+    """Diferença percentual de latência em relação a um relatório de replay anterior."""
+    atual, anterior = relatorio.get('latencia', {}), baseline.get('latencia', {})
+    return {
+        chave: round(100 * (atual[chave] - anterior[chave]) / anterior[chave], 1)
+        for chave in ('media_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+        if atual.get(chave) is not None and anterior.get(chave)
+    }
+
+
+def imprimir_relatorio(relatorio):
+    rot = relatorio['roteamento']
+    print(f"Perguntas: {relatorio['perguntas']}  erros: {sum(relatorio['erros'].values())}  "
+          f"vazão: {relatorio['vazao_rps']} req/s")
+    print(f"Roteamento: {rot['iguais']} iguais, {rot['divergentes']} divergentes "
+          f"(drift {100 * rot['taxa_drift']:.2f}%)")
+    for label, n in rot['mapeamentos_adicionados'].items():
+        print(f"  + {label}: {n}")
+    for label, n in rot['mapeamentos_removidos'].items():
+        print(f"  - {label}: {n}")
+    lat = relatorio['latencia']
+    if lat:
+        print(f"Latência: média {lat['media_ms']} ms, p50 {lat['p50_ms']} ms, p95 {lat['p95_ms']} ms, "
+              f"p99 {lat['p99_ms']} ms, máx {lat['max_ms']} ms")
+        for faixa, n in lat['histograma'].items():
+            print(f"  {faixa:>10} {n}")
+    if 'variacao_baseline_pct' in relatorio:
+        print(f"Variação vs. baseline (%): {relatorio['variacao_baseline_pct']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay das perguntas de logs_perguntas.")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--dsn', help="Banco de onde ler logs_perguntas.")
+    origem.add_argument('--arquivo', help="Arquivo no formato do COPY com as linhas de logs_perguntas.")
+    parser.add_argument('--desde', type=datetime.datetime.fromisoformat, default=None,
+                        help="Só registros a partir desta data/hora (com --dsn).")
+    parser.add_argument('--limite', type=int, default=None, help="Número máximo de perguntas.")
+    parser.add_argument('--modo', choices=['roteamento', 'processo', 'http'], default='roteamento')
+    parser.add_argument('--alvo', default='http://localhost:5000', help="URL do backend (modo http).")
+    parser.add_argument('--deadline-ms', type=int, default=None, help="Envia X-Deadline-Ms (modo http).")
+    parser.add_argument('--acelerar', type=float, default=0.0,
+                        help="Divide os intervalos originais por este fator (0 = sem espera).")
+    parser.add_argument('--concorrencia', type=int, default=1)
+    parser.add_argument('--json', help="Grava o relatório também neste arquivo JSON.")
+    parser.add_argument('--baseline', help="Relatório JSON de um replay anterior para comparar a latência.")
+    args = parser.parse_args()
+
+    if args.dsn:
+        registros = ler_logs_banco(args.dsn, args.desde, args.limite)
+    else:
+        registros = ler_logs_arquivo(args.arquivo, args.limite)
+
+    if args.modo == 'http':
+        executar = executor_http(args.alvo, deadline_ms=args.deadline_ms)
+    elif args.modo == 'processo':
+        executar = executor_processo()
+    else:
+        executar = executor_roteamento()
+
+    relatorio = replay(registros, executar, args.acelerar, args.concorrencia, rotulos_por_sql())
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            relatorio['variacao_baseline_pct'] = comparar_com_baseline(relatorio, json.load(f))
+    imprimir_relatorio(relatorio)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False, default=str)
+
+
+if __name__ == '__main__':
+    main()
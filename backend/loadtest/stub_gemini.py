@@ -0,0 +1,155 @@
+"""
+Servidor local que imita o endpoint generateContent da API Gemini.
+
+Responde POST /v1beta/models/<modelo>:generateContent e
+:streamGenerateContent (com ?alt=sse, em eventos SSE) com uma latência
+sorteada de uma distribuição configurável, sem chamar a API real.
+
+Exemplos de --latencia:
+    fixa:800               sempre 800 ms
+    uniforme:200:1500      uniforme entre 200 e 1500 ms
+    normal:800:200         média 800 ms, desvio 200 ms (truncada em 0)
+    lognormal:900:0.4      mediana 900 ms, sigma 0.4 (cauda longa, mais realista)
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_latencia(spec):
+    """
+    Converte a especificação de latência em uma função sem argumentos que
+    devolve um atraso em segundos.
+    """
+    nome, *params = spec.split(':')
+    try:
+        valores = [float(p) for p in params]
+    except ValueError:
+        raise ValueError(f"Parâmetros inválidos em '{spec}'.")
+    rnd = random.Random()
+
+    if nome == 'fixa' and len(valores) == 1:
+        return lambda: valores[0] / 1000.0
+    if nome == 'uniforme' and len(valores) == 2:
+        return lambda: rnd.uniform(valores[0], valores[1]) / 1000.0
+    if nome == 'normal' and len(valores) == 2:
+        return lambda: max(0.0, rnd.gauss(valores[0], valores[1])) / 1000.0
+    if nome == 'lognormal' and len(valores) == 2:
+        mu = math.log(valores[0])
+        return lambda: rnd.lognormvariate(mu, valores[1]) / 1000.0
+    raise ValueError(f"Distribuição de latência desconhecida: '{spec}'.")
+
+
+def _texto_resposta(prompt):
+    return (
+        "Sou o Sophos, assistente virtual da STOLF LTDA. "
+        f"(resposta simulada para um contexto de {len(prompt)} caracteres)"
+    )
+
+
+def _candidato(texto):
+    return {'candidates': [{'content': {'parts': [{'text': texto}], 'role': 'model'}}]}
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    # Configurados em criar_servidor()
+    latencia = staticmethod(lambda: 0.0)
+    taxa_erro = 0.0
+    chunks = 4
+    requisicoes = 0
+    _lock = threading.Lock()
+
+    def log_message(self, formato, *args):
+        logging.debug(formato % args)
+
+    def _json(self, status, corpo):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        with self._lock:
+            type(self).requisicoes += 1
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(tamanho) or b'{}')
+            prompt = payload['contents'][0]['parts'][0]['text']
+        except (ValueError, KeyError, IndexError, TypeError):
+            return self._json(400, {'error': {'code': 400, 'message': 'Payload inválido.'}})
+
+        atraso = self.latencia()
+        if random.random() < self.taxa_erro:
+            time.sleep(atraso)
+            return self._json(503, {'error': {'code': 503, 'message': 'Modelo sobrecarregado (simulado).'}})
+
+        caminho = self.path.split('?', 1)[0]
+        if caminho.endswith(':streamGenerateContent'):
+            return self._stream(prompt, atraso)
+        if caminho.endswith(':generateContent'):
+            time.sleep(atraso)
+            return self._json(200, _candidato(_texto_resposta(prompt)))
+        return self._json(404, {'error': {'code': 404, 'message': 'Método não encontrado.'}})
+
+    def _stream(self, prompt, atraso):
+        """Envia a resposta em 'chunks' eventos SSE, distribuindo a latência entre eles."""
+        palavras = _texto_resposta(prompt).split(' ')
+        n = max(1, min(self.chunks, len(palavras)))
+        passo = math.ceil(len(palavras) / n)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        for i in range(0, len(palavras), passo):
+            time.sleep(atraso / n)
+            pedaco = ' '.join(palavras[i:i + passo]) + ' '
+            self.wfile.write(b'data: ' + json.dumps(_candidato(pedaco)).encode('utf-8') + b'\r\n\r\n')
+            self.wfile.flush()
+
+
+def criar_servidor(host='127.0.0.1', porta=8089, latencia='fixa:0', taxa_erro=0.0, chunks=4):
+    """Cria (sem iniciar) o servidor do stub; porta 0 escolhe uma porta livre."""
+    handler = type('Handler', (StubGeminiHandler,), {
+        'latencia': staticmethod(parse_latencia(latencia)),
+        'taxa_erro': taxa_erro,
+        'chunks': chunks,
+        'requisicoes': 0,
+    })
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local da API Gemini para testes de carga.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8089)
+    parser.add_argument('--latencia', default='lognormal:900:0.4',
+                        help="Distribuição de latência (fixa, uniforme, normal, lognormal).")
+    parser.add_argument('--taxa-erro', type=float, default=0.0,
+                        help="Fração de respostas 503 simuladas (0 a 1).")
+    parser.add_argument('--chunks', type=int, default=4,
+                        help="Número de eventos SSE em :streamGenerateContent.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    servidor = criar_servidor(args.host, args.porta, args.latencia, args.taxa_erro, args.chunks)
+    logging.info(f"Stub do Gemini em http://{args.host}:{args.porta}/v1beta (latência {args.latencia})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
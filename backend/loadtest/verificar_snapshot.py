@@ -0,0 +1,118 @@
+"""
+Confere o snapshot de vendas em memória (app/snapshot_vendas.py) contra o banco.
+
+Carrega o snapshot a partir do banco indicado e compara, para cada mapeamento
+elegível, as linhas devolvidas pelo snapshot com as da SQL do mapeamento
+(mesmos valores, tipos e escala dos NUMERIC), medindo o tempo de cada lado.
+Com --atualizacoes, confirma um INSERT, um UPDATE e um DELETE em vendas entre
+as leituras, para exercitar a atualização do snapshot, e desfaz as escritas
+no fim.
+
+Exemplo:
+    python -m loadtest.verificar_snapshot --dsn "dbname=sophos_carga" --atualizacoes
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from app.query_mapping import query_mappings
+from app.snapshot_vendas import MAPEAMENTOS, SnapshotVendas
+
+
+def _normalizar(label, linhas):
+    # GROUP BY sem ORDER BY: a ordem das linhas não faz parte do resultado
+    return sorted(linhas, key=repr) if label == 'vendas-por-status' else linhas
+
+
+def comparar(conn, snapshot):
+    """Lista de (label, igual, ms no banco, ms no snapshot, linhas do banco, linhas do snapshot)."""
+    sqls = {label: sql for _frases, label, sql in query_mappings}
+    resultado = []
+    with conn.cursor() as cur:
+        for label in MAPEAMENTOS:
+            inicio = time.perf_counter()
+            cur.execute(sqls[label])
+            do_banco = cur.fetchall()
+            ms_banco = (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
+            do_snapshot = snapshot.responder(label)
+            ms_snapshot = (time.perf_counter() - inicio) * 1000
+            # repr compara também os tipos e a escala dos Decimal (2.00 != 2.0)
+            igual = repr(_normalizar(label, do_banco)) == repr(_normalizar(label, do_snapshot or []))
+            resultado.append((label, igual, ms_banco, ms_snapshot, do_banco, do_snapshot))
+    conn.rollback()
+    return resultado
+
+
+def aplicar_escritas(conn):
+    """INSERT, UPDATE e DELETE em vendas (confirmados; desfeitos por desfazer_escritas)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO vendas (projeto_id, funcionario_id, data_venda, valor, status_pagamento)
+            SELECT projeto_id, funcionario_id, CURRENT_DATE, 1234.56, 'Verificação'
+            FROM vendas ORDER BY id LIMIT 3
+            RETURNING id
+        """)
+        inseridos = [linha[0] for linha in cur.fetchall()]
+        cur.execute("SELECT id, valor FROM vendas WHERE id NOT IN %s ORDER BY id LIMIT 1", (tuple(inseridos),))
+        alterado = cur.fetchone()
+        cur.execute("UPDATE vendas SET valor = valor + 0.01 WHERE id = %s", (alterado[0],))
+        cur.execute("DELETE FROM vendas WHERE id = %s", (inseridos[-1],))
+    conn.commit()
+    return inseridos[:-1], alterado
+
+
+def desfazer_escritas(conn, inseridos, alterado):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM vendas WHERE id IN %s", (tuple(inseridos),))
+        cur.execute("UPDATE vendas SET valor = %s WHERE id = %s", (alterado[1], alterado[0]))
+    conn.commit()
+
+
+def imprimir(titulo, resultado):
+    print(f"\n{titulo}")
+    print(f"{'mapeamento':24} {'igual':>6} {'banco ms':>9} {'snapshot ms':>12}")
+    for label, igual, ms_banco, ms_snapshot, do_banco, do_snapshot in resultado:
+        print(f"{label:24} {'sim' if igual else 'NÃO':>6} {ms_banco:>9.2f} {ms_snapshot:>12.3f}")
+        if not igual:
+            print(f"    banco:    {do_banco}\n    snapshot: {do_snapshot}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o snapshot de vendas com as SQLs dos mapeamentos.")
+    parser.add_argument('--dsn', required=True)
+    parser.add_argument('--atualizacoes', action='store_true',
+                        help="Escreve em vendas (e desfaz no fim) para conferir a atualização incremental.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    import psycopg2
+    conn = psycopg2.connect(args.dsn)
+    snapshot = SnapshotVendas(lambda: psycopg2.connect(args.dsn))
+    try:
+        inicio = time.perf_counter()
+        snapshot.atualizar()
+        logging.info(f"Carga completa em {time.perf_counter() - inicio:.2f} s.")
+        resultados = [('Após a carga completa', comparar(conn, snapshot))]
+        if args.atualizacoes:
+            inseridos, alterado = aplicar_escritas(conn)
+            try:
+                inicio = time.perf_counter()
+                snapshot.atualizar()
+                logging.info(f"Atualização em {time.perf_counter() - inicio:.2f} s.")
+                resultados.append(('Após INSERT/UPDATE/DELETE', comparar(conn, snapshot)))
+            finally:
+                desfazer_escritas(conn, inseridos, alterado)
+    finally:
+        conn.close()
+
+    for titulo, resultado in resultados:
+        imprimir(titulo, resultado)
+    if not all(igual for _titulo, resultado in resultados for _label, igual, *_resto in resultado):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
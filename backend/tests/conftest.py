@@ -241,3 +241,18 @@ def env_vars():
     # Aplicar as variáveis de ambiente
     with patch.dict(os.environ, test_env, clear=True):
         yield test_env
+
+
+@pytest.fixture(autouse=True)
+def limpar_cache_graficos():
+    """
+    Esvazia o cache de respostas dos gráficos antes de cada teste, para que
+    uma resposta guardada por um teste não seja servida em outro.
+    """
+    try:
+        from app.graphs import cache_respostas
+    except ImportError:
+        yield
+        return
+    cache_respostas.limpar()
+    yield
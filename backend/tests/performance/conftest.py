@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures dos benchmarks: banco e Gemini substituídos por stubs, para que a
+suíte rode offline e meça apenas o código do backend.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from tests.performance.dados import conexao_stub, resposta_gemini_stub
+
+
+@pytest.fixture
+def banco_stub():
+    """
+    Substitui get_db_connection em app.app e app.graphs. Chame o fixture com
+    as linhas desejadas: banco_stub(linhas).
+    """
+    patches = []
+
+    def configurar(linhas, descricao=None):
+        conn = conexao_stub(linhas, descricao)
+        for alvo in ('app.app.get_db_connection', 'app.graphs.get_db_connection'):
+            p = patch(alvo, return_value=conn)
+            p.start()
+            patches.append(p)
+        return conn
+
+    yield configurar
+    for p in patches:
+        p.stop()
+
+
+@pytest.fixture
+def gemini_stub():
+    """Substitui a chamada HTTP ao Gemini por uma resposta fixa."""
+    with patch('app.app.requests.post', return_value=resposta_gemini_stub()) as mock_post:
+        yield mock_post
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Dados sintéticos e stubs compartilhados pelos benchmarks.
+
+Tudo roda offline: o banco é substituído por um cursor que devolve linhas
+geradas aqui e o Gemini por uma resposta HTTP fixa.
+"""
+
+import datetime
+import itertools
+import random
+from decimal import Decimal
+from unittest.mock import Mock
+
+# Perguntas realistas, escritas como os usuários do app mobile escrevem
+# (com e sem acento, com erros de digitação leves e perguntas compostas).
+PERGUNTAS = [
+    "Quantos funcionários temos?",
+    "quantos funcionarios a empresa tem hoje",
+    "Qual o total de projetos?",
+    "Qual o valor total de vendas?",
+    "Liste todos os clientes",
+    "Mostrar todas as vendas",
+    "Quais são os projetos em andamento?",
+    "Quantos projetos foram concluídos?",
+    "Qual o salário médio?",
+    "salario medio por departamento",
+    "Quantos funcionários por departamento?",
+    "Qual foi o último projeto?",
+    "Quem vendeu mais?",
+    "Vendas por status de pagamento",
+    "Quanto vendemos no último mês?",
+    "Detalhes de vendas com projeto e funcionário",
+    "Me mostre os contratos de marketing",
+    "Qual a receita por cliente?",
+    "Status dos contratos",
+    "Contratos ativos",
+    "Qual a projeção de contratos para o próximo ano?",
+    "Crescimento de contratos ano a ano",
+    "Orçamento total dos departamentos",
+    "Orçamento por departamento",
+    "Clientes ativos com projetos em andamento",
+    "Projetos por status",
+    "Projetos cancelados",
+    "Média de vendas",
+    "Vendas por projeto",
+    "Contratos por cliente",
+    "Qual o cliente mais promissor?",
+    "Quantos clientes temos e quantas vendas foram feitas?",
+    "Funcionários e departamentos",
+    "Informações do projeto",
+    "Receita anual de contratos",
+    "Contratos expirando em breve",
+    "Oi, tudo bem?",
+    "Qual é a capital da França?",
+]
+
+STATUS_PAGAMENTO = ['Pago', 'Pendente', 'Atrasado']
+
+
+# cursor.description de 'vendas-detalhes' (nome, type_code): int4, date, numeric, varchar, varchar, varchar
+DESCRICAO_VENDAS = [('id', 23), ('data_venda', 1082), ('valor', 1700), ('status_pagamento', 1043),
+                    ('projeto', 1043), ('funcionario', 1043)]
+
+
+def iterar_linhas_vendas(n, semente=42):
+    """Gera, uma a uma, linhas no formato de 'vendas-detalhes' (id, data, valor, status, projeto, funcionário)."""
+    rnd = random.Random(semente)
+    inicio = datetime.date(2020, 1, 1)
+    for i in range(1, n + 1):
+        yield (
+            i,
+            inicio + datetime.timedelta(days=rnd.randrange(2000)),
+            Decimal(f"{rnd.uniform(500, 50000):.2f}"),
+            rnd.choice(STATUS_PAGAMENTO),
+            f"Projeto {rnd.randrange(500)}",
+            f"Funcionário {rnd.randrange(200)}",
+        )
+
+
+def gerar_linhas_vendas(n, semente=42):
+    """Lista com n linhas de iterar_linhas_vendas."""
+    return list(iterar_linhas_vendas(n, semente))
+
+
+def gerar_linhas_mensais(n, semente=42):
+    """Linhas no formato de total_vendas_por_mes ('YYYY-MM', Decimal, início do período em epoch)."""
+    rnd = random.Random(semente)
+    return [
+        (f"{2000 + i // 12:04d}-{i % 12 + 1:02d}", Decimal(f"{rnd.uniform(1e4, 1e6):.2f}"),
+         Decimal(946684800 + i * 2629800))
+        for i in range(n)
+    ]
+
+
+PRIMEIROS_NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Íris', 'João',
+                   'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vânia', 'Yuri']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira', 'Lima', 'Carvalho', 'Gomes', 'Ribeiro', 'Araújo',
+              'Almeida', 'Costa', 'Rocha', 'Dias', 'Barbosa', 'Teixeira', 'Moreira', 'Cardoso', 'Correia', 'Nunes']
+
+
+def gerar_nomes(n, semente=42):
+    """n nomes de pessoas e empresas, (nome, id), com homônimos como num cadastro real."""
+    rng = random.Random(semente)
+    nomes = []
+    for i in range(1, n + 1):
+        nome = f"{rng.choice(PRIMEIROS_NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+        if i % 3 == 0:
+            nome = f"{rng.choice(SOBRENOMES)} {rng.choice(['Comércio', 'Serviços', 'Digital'])} {i} Ltda"
+        nomes.append((nome, i))
+    return nomes
+
+
+# Erros de digitação como chegam do app mobile: (escrito, grafia esperada)
+ERROS_DE_DIGITACAO = [
+    ('funcionarios', 'funcionários'), ('funcoinarios', 'funcionários'), ('funcionaros', 'funcionários'),
+    ('fucionarios', 'funcionários'), ('orcamento', 'orçamento'), ('orçamnto', 'orçamento'),
+    ('salario', 'salário'), ('salaro', 'salário'), ('slario', 'salário'), ('medio', 'médio'),
+    ('cleintes', 'clientes'), ('clietes', 'clientes'), ('contratso', 'contratos'), ('contatos', 'contratos'),
+    ('vendsa', 'vendas'), ('vedas', 'vendas'), ('faturamneto', 'faturamento'), ('faturameto', 'faturamento'),
+    ('departameto', 'departamento'), ('depatamentos', 'departamentos'), ('projetso', 'projetos'),
+    ('projtos', 'projetos'), ('receitta', 'receita'), ('recieta', 'receita'), ('detalhs', 'detalhes'),
+    ('periodo', 'período'), ('periudo', 'período'), ('responsavel', 'responsável'), ('resposavel', 'responsável'),
+    ('pendnetes', 'pendentes'), ('pendetes', 'pendentes'), ('atividdae', 'atividade'), ('cresimento', 'crescimento'),
+    ('marketng', 'marketing'), ('ativs', 'ativos'), ('listta', 'lista'), ('totl', 'total'), ('mensl', 'mensal'),
+]
+
+
+def gerar_erros_de_digitacao(palavras, n, semente=42):
+    """
+    n pares (escrito, palavra) com um erro (até 5 letras) ou até dois (6 ou
+    mais) entre apagar, inserir, trocar ou inverter letras vizinhas.
+    """
+    rng = random.Random(semente)
+    candidatas = sorted(p for p in palavras if len(p) >= 5)
+    letras = 'abcdefghijlmnopqrstuvxz'
+    pares = []
+    while len(pares) < n:
+        palavra = rng.choice(candidatas)
+        escrito = palavra
+        for _ in range(1 if len(palavra) <= 5 else rng.randint(1, 2)):
+            i = rng.randrange(len(escrito) - 1)
+            operacao = rng.choice(('apagar', 'inserir', 'trocar', 'inverter'))
+            if operacao == 'apagar':
+                escrito = escrito[:i] + escrito[i + 1:]
+            elif operacao == 'inserir':
+                escrito = escrito[:i] + rng.choice(letras) + escrito[i:]
+            elif operacao == 'trocar':
+                escrito = escrito[:i] + rng.choice(letras) + escrito[i + 1:]
+            else:
+                escrito = escrito[:i] + escrito[i + 1] + escrito[i] + escrito[i + 2:]
+        if escrito != palavra:
+            pares.append((escrito, palavra))
+    return pares
+
+
+def conexao_stub(linhas, descricao=None):
+    """
+    Conexão psycopg2 falsa cujo cursor devolve 'linhas' em fetchall() e, em
+    lotes, em fetchmany() (recomeçando a cada execute, como um cursor no servidor).
+    """
+    cursor = _cursor_stub(lambda: iter(linhas))
+    cursor.fetchall.side_effect = None
+    cursor.fetchall.return_value = linhas
+    cursor.fetchone.return_value = linhas[0] if linhas else None
+    cursor.description = descricao
+    conn = Mock()
+    conn.cursor.return_value = cursor
+    return conn
+
+
+def conexao_vendas_sob_demanda(n):
+    """
+    Conexão falsa com n linhas de 'vendas-detalhes' geradas só quando buscadas:
+    fetchall() materializa todas, fetchmany() gera apenas o lote pedido.
+    """
+    cursor = _cursor_stub(lambda: iterar_linhas_vendas(n))
+    cursor.description = DESCRICAO_VENDAS
+    conn = Mock()
+    conn.cursor.return_value = cursor
+    return conn
+
+
+def _cursor_stub(abrir):
+    cursor = Mock()
+    estado = {'linhas': iter(())}
+
+    def executar(*_args):
+        estado['linhas'] = abrir()
+
+    cursor.execute.side_effect = executar
+    cursor.fetchall.side_effect = lambda: list(estado['linhas'])
+    cursor.fetchmany.side_effect = lambda tamanho=1: list(itertools.islice(estado['linhas'], tamanho))
+    return cursor
+
+
+def resposta_gemini_stub(texto="Resposta do Sophos."):
+    """Resposta HTTP 200 no formato do generateContent."""
+    resposta = Mock(status_code=200)
+    resposta.json.return_value = {'candidates': [{'content': {'parts': [{'text': texto}]}}]}
+    return resposta
@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks dos caminhos críticos do backend (pytest-benchmark).
+
+Rodar e salvar uma baseline:
+    pytest tests/performance --benchmark-only --benchmark-save=baseline
+Comparar com a baseline e falhar em regressões acima de 15% na média:
+    pytest tests/performance --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from tests.performance.dados import PERGUNTAS, gerar_linhas_mensais, gerar_linhas_vendas
+
+pytestmark = pytest.mark.performance
+
+TAMANHOS = [10, 1000, 100000]
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    from app import app as app_module
+    return app_module
+
+
+class TestBenchmarkNLP:
+    """Roteamento das perguntas (spaCy + mapeamentos)."""
+
+    def test_extrair_lemmas(self, benchmark, app_module):
+        """extrair_lemmas sobre o corpus completo de perguntas."""
+        def rodar():
+            for pergunta in PERGUNTAS:
+                app_module.extrair_lemmas(pergunta)
+
+        benchmark.pedantic(rodar, rounds=10, warmup_rounds=1)
+
+    def test_selecionar_queries(self, benchmark, app_module):
+        """selecionar_queries sobre o corpus completo de perguntas."""
+        def rodar():
+            return [app_module.selecionar_queries(pergunta) for pergunta in PERGUNTAS]
+
+        resultados = benchmark.pedantic(rodar, rounds=3, warmup_rounds=1)
+        assert len(resultados) == len(PERGUNTAS)
+
+    def test_gerar_query_dinamica(self, benchmark, app_module):
+        """gerar_query_dinamica sobre o corpus completo de perguntas."""
+        def rodar():
+            for pergunta in PERGUNTAS:
+                app_module.gerar_query_dinamica(pergunta)
+
+        benchmark.pedantic(rodar, rounds=10, warmup_rounds=1)
+
+
+class TestBenchmarkFormatacao:
+    """Montagem do texto enviado ao Gemini."""
+
+    @pytest.mark.parametrize("n", TAMANHOS)
+    def test_formatar_resultados(self, benchmark, app_module, n):
+        """formatar_resultados com resultados de 10, 1k e 100k linhas."""
+        linhas = gerar_linhas_vendas(n)
+        texto = benchmark.pedantic(app_module.formatar_resultados, args=(linhas,),
+                                   rounds=max(3, 3000 // n), warmup_rounds=1)
+        assert texto.count('\n') == n - 1
+
+    def test_construir_contexto(self, benchmark, app_module):
+        """construir_contexto com dados de 1k linhas e histórico cheio."""
+        dados = app_module.formatar_resultados(gerar_linhas_vendas(1000))
+        historico = [f"Usuário: pergunta {i}" for i in range(20)]
+        original = list(app_module.historico_conversa)
+        app_module.historico_conversa[:] = historico
+        try:
+            benchmark(app_module.construir_contexto, "Mostrar todas as vendas", dados)
+        finally:
+            app_module.historico_conversa[:] = original
+
+
+class TestBenchmarkPipeline:
+    """Pipeline completo de /pergunta com banco e Gemini stubados."""
+
+    def test_processar_pergunta(self, benchmark, app_module, banco_stub, gemini_stub):
+        """processar_pergunta com 1k linhas por query."""
+        banco_stub(gerar_linhas_vendas(1000))
+        original = list(app_module.historico_conversa)
+        try:
+            benchmark.pedantic(app_module.processar_pergunta, args=("Mostrar todas as vendas",),
+                               rounds=5, warmup_rounds=1)
+        finally:
+            app_module.historico_conversa[:] = original
+
+
+class TestBenchmarkListaEmFluxo:
+    """
+    Mapeamento de lista sobre 1M de vendas até o prompt pronto: fetchall com o
+    texto inteiro (caminho antigo) vs. cursor no servidor até o limite do prompt.
+    O pico de memória (tracemalloc) fica em extra_info['pico_memoria_mb'].
+    """
+
+    N = 1_000_000
+
+    def _ate_o_prompt(self, app_module):
+        from tests.performance.dados import conexao_vendas_sob_demanda
+
+        consultas = [('vendas-detalhes', 'SELECT ... FROM vendas v ...;')]
+        original = list(app_module.historico_conversa)
+        with patch('app.app.selecionar_queries', return_value=consultas), \
+             patch('app.app.get_db_connection', side_effect=lambda *_a: conexao_vendas_sob_demanda(self.N)), \
+             patch('app.app.enviar_para_gemini', return_value='ok') as mock_gemini, \
+             patch('app.app.inserir_log'):
+            try:
+                app_module.processar_pergunta("Detalhes de vendas com projeto e funcionário")
+            finally:
+                app_module.historico_conversa[:] = original
+        return len(mock_gemini.call_args.args[0])
+
+    def _medir(self, benchmark, app_module):
+        import tracemalloc
+
+        tracemalloc.start()
+        try:
+            self._ate_o_prompt(app_module)
+            _atual, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['pico_memoria_mb'] = round(pico / 2 ** 20, 1)
+        chars = benchmark.pedantic(self._ate_o_prompt, args=(app_module,), rounds=1, iterations=1)
+        benchmark.extra_info['prompt_chars'] = chars
+        return pico, chars
+
+    def test_fetchall_1m(self, benchmark, app_module):
+        """Caminho antigo: todas as linhas em memória e no prompt."""
+        with patch.object(app_module, 'MAPEAMENTOS_LISTA', frozenset()), \
+             patch.object(app_module, 'PROMPT_DADOS_MAX_CHARS', float('inf')):
+            _pico, chars = self._medir(benchmark, app_module)
+        assert chars > 50 * self.N
+
+    def test_cursor_1m(self, benchmark, app_module):
+        """Cursor no servidor: só os lotes necessários para o limite do prompt."""
+        pico, chars = self._medir(benchmark, app_module)
+        assert chars < app_module.PROMPT_DADOS_MAX_CHARS + len(app_module.instrucoes_fixas) + 1000
+        assert pico < 50 * 2 ** 20
+
+
+class TestBenchmarkExportacao:
+    """
+    Exportação em streaming de 200k linhas de vendas-detalhes. Linhas por
+    segundo em extra_info['linhas_por_segundo']; o pico de memória
+    (extra_info['pico_memoria_mb']) não deve crescer com o número de linhas.
+    """
+
+    N = 200_000
+
+    def _exportar(self, formato, comprimir):
+        from app import exportacao
+        from tests.performance.dados import conexao_vendas_sob_demanda
+
+        conn = conexao_vendas_sob_demanda(self.N)
+        cur, lote = exportacao.abrir(conn, 'SELECT ...;', {})
+        return sum(len(pedaco) for pedaco in exportacao.corpo(conn, cur, lote, formato, comprimir))
+
+    @pytest.mark.parametrize("formato,comprimir", [('csv', False), ('csv', True), ('ndjson', False)])
+    def test_exportar_200k(self, benchmark, formato, comprimir):
+        import tracemalloc
+
+        tracemalloc.start()
+        try:
+            self._exportar(formato, comprimir)
+            _atual, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        tamanho = benchmark.pedantic(self._exportar, args=(formato, comprimir), rounds=3, warmup_rounds=1)
+        benchmark.extra_info['pico_memoria_mb'] = round(pico / 2 ** 20, 1)
+        benchmark.extra_info['bytes'] = tamanho
+        benchmark.extra_info['linhas_por_segundo'] = round(self.N / benchmark.stats.stats.mean)
+        assert pico < 20 * 2 ** 20
+
+
+class TestBenchmarkGraficos:
+    """Serialização dos endpoints de gráfico."""
+
+    @pytest.mark.parametrize("n", TAMANHOS)
+    def test_servir_serie(self, benchmark, banco_stub, n):
+        """servir_serie com 10, 1k e 100k linhas (acima de max_pontos, inclui o LTTB)."""
+        from app import graphs
+
+        banco_stub(gerar_linhas_mensais(n))
+
+        def rodar():
+            with graphs.app.test_request_context('/api/query/total_vendas_por_mes'):
+                return graphs.servir_serie('total_vendas_por_mes')
+
+        # Cache desligado: mede consulta + serialização a cada rodada
+        with patch.object(graphs.cache_respostas, 'ttl', 0):
+            resposta = benchmark.pedantic(rodar, rounds=max(3, 3000 // n), warmup_rounds=1)
+        assert resposta.status_code == 200
+
+    @pytest.mark.parametrize("n", TAMANHOS)
+    def test_resposta_do_cache(self, benchmark, banco_stub, n):
+        """Resposta servida do cache (gzip pré-computado) com 10, 1k e 100k linhas."""
+        from app import graphs
+
+        banco_stub(gerar_linhas_mensais(n))
+
+        def rodar():
+            with graphs.app.test_request_context('/api/query/total_vendas_por_mes',
+                                                 headers={'Accept-Encoding': 'gzip'}):
+                return graphs.servir_serie('total_vendas_por_mes')
+
+        graphs.cache_respostas.limpar()
+        resposta = benchmark.pedantic(rodar, rounds=max(3, 3000 // n), warmup_rounds=1)
+        assert resposta.headers['X-Cache'] == 'hit'
+
+    @pytest.mark.parametrize("encoder", ["orjson", "json"])
+    def test_serializacao_100k(self, benchmark, encoder):
+        """Conversão por coluna + JSON de 100k linhas (NUMERIC e DATE), com e sem orjson."""
+        from app import serializacao
+
+        if encoder == "orjson" and serializacao.orjson is None:
+            pytest.skip("orjson não instalado")
+        linhas = [(data, valor) for _id, data, valor, *_resto in gerar_linhas_vendas(100_000)]
+        descricao = [('data_venda', 1082), ('valor', 1700)]
+
+        def rodar():
+            return serializacao.dumps(serializacao.registros(linhas, ['data_venda', 'valor'], descricao))
+
+        with patch.object(serializacao, 'orjson', serializacao.orjson if encoder == "orjson" else None):
+            corpo = benchmark.pedantic(rodar, rounds=5, warmup_rounds=1)
+        assert corpo.startswith(b'[{')
+
+    @pytest.mark.parametrize("formato", ["json", "arrow"])
+    def test_ida_e_volta_100k(self, benchmark, formato):
+        """
+        100k linhas (DATE, NUMERIC, texto) serializadas pelo backend e lidas pelo
+        cliente: JSON (registros + dumps / loads) vs. Arrow IPC (colunas / open_stream).
+        """
+        from app import serializacao
+
+        if formato == "arrow" and serializacao.pyarrow is None:
+            pytest.skip("pyarrow não instalado")
+        linhas = [(data, valor, status) for _id, data, valor, status, *_resto in gerar_linhas_vendas(100_000)]
+        nomes = ['data_venda', 'valor', 'status_pagamento']
+        descricao = [('data_venda', 1082), ('valor', 1700), ('status_pagamento', 1043)]
+        loads = serializacao.orjson.loads if serializacao.orjson is not None else json.loads
+
+        def rodar():
+            if formato == "arrow":
+                corpo = serializacao.arrow_ipc(linhas, nomes, descricao)
+                return len(corpo), serializacao.pyarrow.ipc.open_stream(corpo).read_all().num_rows
+            corpo = serializacao.dumps(serializacao.registros(linhas, nomes, descricao))
+            return len(corpo), len(loads(corpo))
+
+        tamanho, lidas = benchmark.pedantic(rodar, rounds=5, warmup_rounds=1)
+        benchmark.extra_info['bytes'] = tamanho
+        assert lidas == len(linhas)
+
+    @pytest.mark.parametrize("n", [10_000, 1_000_000])
+    def test_lttb(self, benchmark, n):
+        """Redução LTTB de 10k e 1M pontos para 500."""
+        import numpy as np
+        from app.downsampling import lttb
+
+        x = np.arange(n, dtype=float)
+        y = np.random.default_rng(42).normal(size=n).cumsum()
+        indices = benchmark.pedantic(lttb, args=(x, y, 500), rounds=5, warmup_rounds=1)
+        assert len(indices) == 500
+
+
+class TestBenchmarkSnapshotVendas:
+    """Agregados de vendas respondidos pelo snapshot colunar em memória."""
+
+    @pytest.mark.parametrize("label", ['vendas-valor-total', 'estatisticas-vendas',
+                                       'vendas-por-status', 'vendas-ultimo-mes'])
+    def test_responder_1m(self, benchmark, label):
+        """Mapeamento elegível sobre 1M de vendas, sem ida ao banco."""
+        import time
+        from zoneinfo import ZoneInfo
+
+        import numpy as np
+        from app.snapshot_vendas import SnapshotVendas
+
+        n = 1_000_000
+        rng = np.random.default_rng(42)
+        colunas = {
+            'id': np.arange(1, n + 1),
+            'centavos': rng.integers(100, 5_000_000, n),
+            'valor_nulo': np.zeros(n, dtype=bool),
+            'dias': rng.integers(18_000, 20_000, n),
+            'projeto_id': rng.integers(1, 500, n),
+            'funcionario_id': rng.integers(1, 100, n),
+            'status': rng.integers(0, 3, n).astype(np.int32),
+        }
+        snapshot = SnapshotVendas(conectar=None)
+        snapshot.dados = (colunas, ('Pago', 'Pendente', 'Atrasado'))
+        snapshot.fuso = ZoneInfo('America/Sao_Paulo')
+        snapshot.atualizado_em = time.monotonic()
+
+        linhas = benchmark.pedantic(snapshot.responder, args=(label,), rounds=20, warmup_rounds=2)
+        assert linhas
+
+
+class TestBenchmarkCuboVendas:
+    """Consultas ao cubo OLAP de vendas em memória."""
+
+    @pytest.mark.parametrize("agrupar", [('mes',), ('departamento', 'status'), ('funcionario',)])
+    def test_consultar_500k_celulas(self, benchmark, agrupar):
+        """Fatia (status + ano) agrupada sobre 500k células."""
+        import time
+
+        import numpy as np
+        from app.cubo_vendas import DIMENSOES, MEDIDAS, ConsultaCubo, CuboVendas, _Vocabulario
+
+        n = 500_000
+        rng = np.random.default_rng(42)
+        funcionarios = rng.integers(1, 2_000, n)
+        celulas = {
+            'mes': rng.integers(2020 * 12, 2025 * 12, n),
+            'departamento': funcionarios % 20,
+            'funcionario': funcionarios,
+            'cliente': rng.integers(1, 5_000, n),
+            'status': rng.integers(0, 3, n),
+            'quantidade': rng.integers(1, 50, n),
+            'com_valor': rng.integers(1, 50, n),
+            'centavos': rng.integers(100, 10_000_000, n),
+        }
+        assert set(celulas) == set(DIMENSOES + MEDIDAS)
+        nomes = {'departamento': {i: f"Departamento {i}" for i in range(20)},
+                 'funcionario': {i: f"Funcionário {i}" for i in range(2_000)},
+                 'cliente': {i: f"Cliente {i}" for i in range(5_000)}}
+        categorias = ('Pago', 'Pendente', 'Atrasado')
+        cubo = CuboVendas(conectar=None)
+        cubo.dados = (celulas, nomes, categorias, _Vocabulario(nomes, categorias))
+        cubo.atualizado_em = time.monotonic()
+
+        consulta = ConsultaCubo({'status': ['Pago'], 'mes': list(range(2024 * 12, 2025 * 12))}, agrupar)
+        linhas = benchmark.pedantic(cubo.consultar, args=(consulta,), rounds=10, warmup_rounds=1)
+        assert linhas
+
+
+@pytest.mark.external
+class TestBenchmarkSqlPreparadas:
+    """
+    Planejamento dos mapeamentos com mais joins: a SQL enviada a cada pergunta
+    vs. EXECUTE da SQL preparada na conexão (app/conexoes.py). Roda EXPLAIN sem
+    ANALYZE, que planeja sem executar; a mediana do "Planning Time" informado
+    pelo Postgres fica em extra_info['planejamento_ms']. Precisa de um banco
+    com o schema do Sophos:
+        BENCH_DATABASE_URL=postgresql://... pytest tests/performance -k SqlPreparadas
+    """
+
+    LABELS = ('projetos-detalhes', 'vendas-detalhes', 'crescimento-contratos')
+
+    @pytest.fixture
+    def cursor_real(self):
+        import os
+
+        import psycopg2
+
+        dsn = os.getenv('BENCH_DATABASE_URL')
+        if not dsn:
+            pytest.skip("BENCH_DATABASE_URL não definida")
+        conn = psycopg2.connect(dsn)
+        try:
+            yield conn.cursor()
+        finally:
+            conn.close()
+
+    @pytest.mark.parametrize("modo", ['direto', 'preparada'])
+    @pytest.mark.parametrize("label", LABELS)
+    def test_planejamento(self, benchmark, cursor_real, label, modo):
+        import statistics
+
+        from app import conexoes
+        from app.query_mapping import query_mappings
+
+        sql = next(sql for _frases, nome, sql in query_mappings if nome == label)
+        if modo == 'preparada':
+            preparada = conexoes.CATALOGO[sql]
+            cursor_real.execute(preparada.prepare)
+            explain = "EXPLAIN (SUMMARY) " + preparada.execute
+        else:
+            explain = "EXPLAIN (SUMMARY) " + sql.strip()
+        tempos = []
+
+        def planejar():
+            cursor_real.execute(explain)
+            linha = next(linha for (linha,) in cursor_real.fetchall() if linha.startswith('Planning Time'))
+            tempos.append(float(linha.split(':')[1].split()[0]))
+
+        benchmark.pedantic(planejar, rounds=200, warmup_rounds=10)
+        benchmark.extra_info['planejamento_ms'] = statistics.median(tempos)
+
+
+class TestBenchmarkIndiceEntidades:
+    """
+    Índice de entidades (app/entidades.py) com 100k nomes: menções nas
+    perguntas do corpus, carga inicial e recarga com 1% dos nomes trocados.
+    """
+
+    N = 100_000
+
+    @pytest.fixture(scope="class")
+    def nomes(self):
+        from tests.performance.dados import gerar_nomes
+        return gerar_nomes(self.N)
+
+    @pytest.fixture(scope="class")
+    def indice(self, nomes):
+        from app.entidades import IndiceEntidades
+
+        indice = IndiceEntidades()
+        indice.atualizar('funcionarios', nomes[:self.N // 2])
+        indice.atualizar('clientes', nomes[self.N // 2:])
+        return indice
+
+    def test_mencoes_100k(self, benchmark, indice, nomes):
+        """Uma passada por pergunta do corpus, mais perguntas que citam nomes do índice."""
+        from tests.performance.dados import PERGUNTAS
+
+        perguntas = PERGUNTAS + [f"Quais projetos estão com {nome}?" for nome, _id in nomes[::1000]]
+
+        def rodar():
+            return [indice.mencoes(pergunta) for pergunta in perguntas]
+
+        resultados = benchmark.pedantic(rodar, rounds=20, warmup_rounds=2)
+        benchmark.extra_info['perguntas'] = len(perguntas)
+        assert all(resultados[len(PERGUNTAS):])
+
+    def test_carga_100k(self, benchmark, nomes):
+        from app.entidades import IndiceEntidades
+
+        def carregar():
+            indice = IndiceEntidades()
+            indice.atualizar('clientes', nomes)
+            return indice
+
+        indice = benchmark.pedantic(carregar, rounds=3, warmup_rounds=1)
+        assert len(indice) == self.N
+
+    def test_recarga_1pct_100k(self, benchmark, nomes):
+        """Recarga com 1% dos nomes trocados: só eles mexem na trie."""
+        from app.entidades import IndiceEntidades
+
+        trocados = nomes[:-self.N // 100] + [(f"Cliente Novo {i}", -i) for i in range(self.N // 100)]
+
+        def preparar():
+            indice = IndiceEntidades()
+            indice.atualizar('clientes', nomes)
+            return (indice,), {}
+
+        def recarregar(indice):
+            return indice.atualizar('clientes', trocados)
+
+        benchmark.pedantic(recarregar, setup=preparar, rounds=3)
+
+
+class TestBenchmarkCorrecaoOrtografica:
+    """
+    Correção de erros de digitação (app/ortografia.py) com o vocabulário dos
+    mapeamentos, sem e com 100k nomes do banco. A taxa de acerto fica em
+    extra_info['acerto'] (grafia esperada, sem contar acentos, já que as frases
+    trazem "periodo" e "período").
+    """
+
+    @pytest.fixture(scope="class", params=['mapeamentos', 'com_100k_nomes'])
+    def corretor(self, request):
+        import spacy
+
+        from app import extracao, ortografia
+        from tests.performance.dados import gerar_nomes
+
+        # Léxico geral gerado por loadtest.gerar_lexico; sem ele, um léxico vazio (tudo é candidato a correção)
+        lexico = ortografia.carregar_lexico() or ortografia.Lexico()
+        corretor = ortografia.CorretorOrtografico(ortografia.vocabulario_dos_mapeamentos(), lexico)
+        corretor.incluir(spacy.blank('pt').Defaults.stop_words)
+        corretor.incluir(extracao.MESES)
+        if request.param == 'com_100k_nomes':
+            corretor.incluir(p for nome, _id in gerar_nomes(100_000) for p in ortografia.palavras(nome))
+        return corretor
+
+    def _medir(self, benchmark, corretor, pares):
+        from app.texto import normalizar
+
+        def rodar():
+            return [corretor.sugestao(escrito) for escrito, _certa in pares]
+
+        sugestoes = benchmark.pedantic(rodar, rounds=5, warmup_rounds=1)
+        acertos = sum(normalizar(s or '') == normalizar(certa) for s, (_e, certa) in zip(sugestoes, pares))
+        benchmark.extra_info['acerto'] = round(acertos / len(pares), 3)
+        benchmark.extra_info['us_por_token'] = round(benchmark.stats.stats.mean / len(pares) * 1e6, 1)
+        return acertos / len(pares)
+
+    def test_erros_reais(self, benchmark, corretor):
+        """Erros escritos à mão (ERROS_DE_DIGITACAO)."""
+        from tests.performance.dados import ERROS_DE_DIGITACAO
+
+        # "vedas" é palavra do léxico e fica como está
+        assert self._medir(benchmark, corretor, ERROS_DE_DIGITACAO) >= 0.95
+
+    def test_erros_sinteticos(self, benchmark, corretor):
+        """1000 erros gerados (apagar, inserir, trocar, inverter) sobre o vocabulário."""
+        from app import ortografia
+        from tests.performance.dados import gerar_erros_de_digitacao
+
+        pares = gerar_erros_de_digitacao(ortografia.vocabulario_dos_mapeamentos(), 1000)
+        assert self._medir(benchmark, corretor, pares) >= 0.75
+
+    def test_corrigir_corpus(self, benchmark, corretor):
+        """Perguntas do corpus inteiras, quase todas sem erro (o caso comum)."""
+        from tests.performance.dados import PERGUNTAS
+
+        benchmark.pedantic(lambda: [corretor.corrigir(p) for p in PERGUNTAS], rounds=20, warmup_rounds=2)
+
+
+class TestBenchmarkLematizacao:
+    """
+    Caminho rápido da lematização (app/lematizador.py): tabela gerada com o
+    spaCy carregado e o vocabulário de loadtest.gerar_lemas, medida contra o
+    spaCy sobre as mesmas perguntas. A fração de perguntas resolvidas pela
+    tabela fica em extra_info['acerto_tabela'].
+    """
+
+    @pytest.fixture(scope="class")
+    def tabela(self, app_module):
+        from app import lematizador
+        from loadtest.gerar_lemas import textos_de_referencia
+
+        textos, avulsas = textos_de_referencia(2000)
+        return lematizador.gerar(app_module.nlp, textos, avulsas + sorted(app_module.nlp.Defaults.stop_words))
+
+    @pytest.fixture(scope="class")
+    def perguntas(self):
+        from loadtest.perguntas import gerar_perguntas
+
+        # Semente diferente da usada na geração da tabela
+        return PERGUNTAS + gerar_perguntas(500, semente=7)
+
+    def test_tabela(self, benchmark, app_module, tabela, perguntas):
+        """extrair_lemmas com a tabela; as perguntas fora dela caem no spaCy."""
+        with patch.object(app_module, 'tabela_lemas', tabela):
+            benchmark.pedantic(lambda: [app_module.extrair_lemmas(p) for p in perguntas], rounds=10, warmup_rounds=1)
+        resolvidas = sum(tabela.lemas(p) is not None for p in perguntas)
+        benchmark.extra_info['acerto_tabela'] = round(resolvidas / len(perguntas), 3)
+        benchmark.extra_info['us_por_pergunta'] = round(benchmark.stats.stats.mean / len(perguntas) * 1e6, 1)
+        assert resolvidas / len(perguntas) >= 0.8
+
+    def test_so_spacy(self, benchmark, app_module, perguntas):
+        """extrair_lemmas sem tabela (todas as perguntas pelo spaCy)."""
+        with patch.object(app_module, 'tabela_lemas', None):
+            benchmark.pedantic(lambda: [app_module.extrair_lemmas(p) for p in perguntas], rounds=10, warmup_rounds=1)
+        benchmark.extra_info['us_por_pergunta'] = round(benchmark.stats.stats.mean / len(perguntas) * 1e6, 1)
+
+    def test_selecionar_queries_com_tabela(self, benchmark, app_module, tabela):
+        """selecionar_queries com as frases dos mapeamentos também pela tabela."""
+        with patch.object(app_module, 'tabela_lemas', tabela):
+            benchmark.pedantic(lambda: [app_module.selecionar_queries(p) for p in PERGUNTAS], rounds=3, warmup_rounds=1)
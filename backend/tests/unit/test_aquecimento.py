@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a subida em paralelo (app/aquecimento.py), a
+verificação do banco pelo catálogo e os endpoints /vivo e /pronto (app/app.py).
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import metrics
+from app.aquecimento import Aquecimento, ModeloPreguicoso
+
+
+class TestModeloPreguicoso:
+    """Carga do pipeline no primeiro uso."""
+
+    def test_carrega_so_no_primeiro_uso(self):
+        carregar = MagicMock(return_value=lambda texto: texto.upper())
+        modelo = ModeloPreguicoso(carregar)
+        assert not modelo.carregado
+        carregar.assert_not_called()
+
+        assert modelo("oi") == "OI"
+        assert modelo("tchau") == "TCHAU"
+        assert modelo.carregado
+        carregar.assert_called_once()
+
+    def test_atributos_vem_do_modelo(self):
+        modelo = ModeloPreguicoso(lambda: MagicMock(meta={'lang': 'pt'}))
+        assert modelo.meta == {'lang': 'pt'}
+
+    def test_carga_concorrente_acontece_uma_vez(self):
+        cargas = []
+
+        def carregar():
+            cargas.append(1)
+            time.sleep(0.05)
+            return object()
+
+        modelo = ModeloPreguicoso(carregar)
+        threads = [threading.Thread(target=modelo.carregar) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(cargas) == 1
+
+    def test_falha_tenta_de_novo_no_proximo_uso(self):
+        carregar = MagicMock(side_effect=[RuntimeError("sem modelo"), 'modelo'])
+        modelo = ModeloPreguicoso(carregar)
+        with pytest.raises(RuntimeError):
+            modelo.carregar()
+        assert modelo.carregar() == 'modelo'
+
+
+class TestAquecimento:
+    """Etapas em paralelo e estado da subida."""
+
+    def test_etapas_rodam_em_paralelo(self):
+        aquecimento = Aquecimento()
+        barreira = threading.Barrier(2, timeout=2)
+        aquecimento.etapa('a', barreira.wait)
+        aquecimento.etapa('b', barreira.wait)
+        aquecimento.iniciar()
+        assert aquecimento.aguardar(timeout=5)
+        assert set(aquecimento.estado()['etapas']) == {'a', 'b'}
+
+    def test_nao_fica_pronto_antes_de_iniciar(self):
+        aquecimento = Aquecimento()
+        with aquecimento.medir('dotenv'):
+            pass
+        assert not aquecimento.pronto
+        assert aquecimento.estado()['etapas']['dotenv']['estado'] == 'ok'
+
+        aquecimento.iniciar()
+        assert aquecimento.pronto
+
+    def test_pronto_so_depois_da_ultima_etapa(self):
+        aquecimento = Aquecimento()
+        liberar = threading.Event()
+        aquecimento.etapa('lenta', liberar.wait)
+        aquecimento.iniciar()
+        assert not aquecimento.pronto
+        assert aquecimento.estado()['etapas']['lenta']['estado'] == 'rodando'
+
+        liberar.set()
+        assert aquecimento.aguardar(timeout=5)
+
+    def test_falha_e_relatorio(self, caplog):
+        metrics.AQUECIMENTO_ETAPA_SEGUNDOS.reset()
+        aquecimento = Aquecimento()
+        aquecimento.etapa('banco', MagicMock(side_effect=RuntimeError("tabela faltando")))
+        aquecimento.etapa('spacy', lambda: None)
+        with caplog.at_level('INFO'):
+            aquecimento.iniciar()
+            assert aquecimento.aguardar(timeout=5) is False
+
+        assert aquecimento.falhou
+        etapa = aquecimento.estado()['etapas']['banco']
+        assert etapa['estado'] == 'erro' and etapa['erro'] == "tabela faltando"
+        assert 'banco' in caplog.text and 'spacy' in caplog.text and '(erro)' in caplog.text
+        assert metrics.AQUECIMENTO_ETAPA_SEGUNDOS.valor('spacy') >= 0
+
+
+def conexao_com(*resultados):
+    """Conexão falsa: cada fetchone/fetchall devolve o próximo resultado."""
+    cur = MagicMock()
+    fila = list(resultados)
+    cur.fetchall.side_effect = lambda: fila.pop(0)
+    cur.fetchone.side_effect = lambda: fila.pop(0)
+    conn = MagicMock()
+    conn.cursor.return_value = cur
+    return conn, cur
+
+
+class TestVerificarBanco:
+    """Verificação das tabelas numa consulta ao catálogo."""
+
+    def test_estimativas_sem_count(self):
+        from app import app as app_module
+
+        linhas = [(t, True, 1000.0) for t in app_module.TABELAS_NECESSARIAS]
+        linhas[-1] = ('contratos_marketing', True, -1.0)  # nunca analisada
+        conn, cur = conexao_com(linhas, (True,))
+        with patch('app.app.get_db_connection', return_value=conn):
+            estimativas = app_module.verificar_banco()
+
+        assert estimativas['vendas'] == 1000
+        assert estimativas['contratos_marketing'] == 1
+        sqls = [c.args[0] for c in cur.execute.call_args_list]
+        assert len(sqls) == 2
+        assert not any('COUNT(' in sql for sql in sqls)
+        assert sqls[1] == "SELECT EXISTS (SELECT 1 FROM contratos_marketing)"
+        conn.close.assert_called_once()
+
+    def test_tabela_faltando(self):
+        from app import app as app_module
+
+        linhas = [(t, t != 'vendas', 10.0 if t != 'vendas' else None) for t in app_module.TABELAS_NECESSARIAS]
+        conn, _cur = conexao_com(linhas)
+        with patch('app.app.get_db_connection', return_value=conn), \
+             pytest.raises(RuntimeError, match='vendas'):
+            app_module.verificar_banco()
+        conn.close.assert_called_once()
+
+
+class TestEndpointsSaude:
+    """/vivo e /pronto refletem o aquecimento."""
+
+    @pytest.fixture
+    def cliente(self):
+        from app import app as app_module
+        return app_module.app.test_client()
+
+    def test_aquecendo(self, cliente):
+        aquecimento = Aquecimento()
+        liberar = threading.Event()
+        aquecimento.etapa('spacy', liberar.wait)
+        aquecimento.iniciar()
+        with patch('app.app.aquecimento', aquecimento):
+            assert cliente.get('/vivo').status_code == 200
+            resposta = cliente.get('/pronto')
+            assert resposta.status_code == 503
+            assert resposta.get_json()['etapas']['spacy']['estado'] == 'rodando'
+            liberar.set()
+            aquecimento.aguardar(timeout=5)
+            assert cliente.get('/pronto').status_code == 200
+
+    def test_etapa_falhou(self, cliente):
+        aquecimento = Aquecimento()
+        aquecimento.etapa('banco', MagicMock(side_effect=RuntimeError("sem banco")))
+        aquecimento.iniciar()
+        aquecimento.aguardar(timeout=5)
+        with patch('app.app.aquecimento', aquecimento):
+            assert cliente.get('/vivo').status_code == 503
+            assert cliente.get('/pronto').status_code == 503
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o cache de respostas dos gráficos (app/cache_graficos.py).
+"""
+
+import gzip
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app import cache_graficos
+from app.cache_graficos import CacheRespostas, EntradaCache
+
+
+def calculo(corpo=b'[]', headers=None, etag=None):
+    """Função de cálculo que conta as chamadas em .chamadas."""
+    def calcular():
+        calcular.chamadas += 1
+        return corpo, headers or {}, etag
+    calcular.chamadas = 0
+    return calcular
+
+
+class TestEntradaCache:
+
+    def test_etag_padrao_e_o_hash_do_corpo(self):
+        assert EntradaCache(b'abc').etag == EntradaCache(b'abc').etag
+        assert EntradaCache(b'abc').etag != EntradaCache(b'abd').etag
+        assert EntradaCache(b'abc', etag='fixo').etag == 'fixo'
+
+    def test_comprime_uma_vez_no_preenchimento(self):
+        corpo = b'{"mes": "2025-01", "total_vendas": 1000.0}' * 20
+        with patch.object(cache_graficos, 'brotli', None):
+            entrada = EntradaCache(corpo)
+        assert list(entrada.comprimidos) == ['gzip']
+        assert gzip.decompress(entrada.comprimidos['gzip']) == corpo
+
+    def test_corpo_pequeno_nao_e_comprimido(self):
+        assert EntradaCache(b'[]').comprimidos == {}
+        assert EntradaCache(b'x' * 1000, comprimir=False).comprimidos == {}
+
+
+class TestCacheRespostas:
+
+    def test_hit_dentro_do_ttl(self):
+        cache = CacheRespostas(ttl=60)
+        calcular = calculo()
+        assert cache.obter('a', calcular)[1] == 'miss'
+        assert cache.obter('a', calcular)[1] == 'hit'
+        assert calcular.chamadas == 1
+
+    def test_chaves_independentes(self):
+        cache = CacheRespostas(ttl=60)
+        calcular = calculo()
+        cache.obter('a', calcular)
+        cache.obter('b', calcular)
+        assert calcular.chamadas == 2
+
+    def test_desligado_sempre_recalcula(self):
+        cache = CacheRespostas(ttl=0)
+        calcular = calculo()
+        assert cache.obter('a', calcular)[1] == 'desligado'
+        assert cache.obter('a', calcular)[1] == 'desligado'
+        assert calcular.chamadas == 2
+
+    def test_expirado_sem_stale_recalcula_na_hora(self):
+        cache = CacheRespostas(ttl=60, stale=0)
+        calcular = calculo()
+        cache.obter('a', calcular)
+        cache._entradas['a'].criada_em -= 61
+        assert cache.obter('a', calcular)[1] == 'miss'
+        assert calcular.chamadas == 2
+
+    def test_stale_serve_a_entrada_antiga_e_revalida_uma_vez(self):
+        cache = CacheRespostas(ttl=60, stale=300)
+        cache.obter('a', calculo(b'antigo'))
+        cache._entradas['a'].criada_em -= 61
+
+        liberar = threading.Event()
+        terminou = threading.Event()
+
+        def lento():
+            liberar.wait(5)
+            lento.chamadas += 1
+            terminou.set()
+            return b'novo', {}, None
+        lento.chamadas = 0
+
+        primeira, estado1 = cache.obter('a', lento)
+        segunda, estado2 = cache.obter('a', lento)
+        assert (estado1, estado2) == ('stale', 'stale')
+        assert primeira.corpo == segunda.corpo == b'antigo'
+
+        liberar.set()
+        assert terminou.wait(5)
+        for thread in threading.enumerate():
+            if thread.name == 'sophos-cache-a':
+                thread.join(5)
+        assert lento.chamadas == 1
+        assert cache.obter('a', lento)[0].corpo == b'novo'
+
+    def test_falha_na_revalidacao_mantem_a_entrada(self):
+        cache = CacheRespostas(ttl=60, stale=300)
+        cache.obter('a', calculo(b'antigo'))
+        cache._entradas['a'].criada_em -= 61
+
+        def falha():
+            raise RuntimeError('banco fora')
+
+        entrada, estado = cache.obter('a', falha)
+        for thread in threading.enumerate():
+            if thread.name == 'sophos-cache-a':
+                thread.join(5)
+        assert estado == 'stale'
+        assert cache._entradas['a'] is entrada
+        assert 'a' not in cache._revalidando
+
+    def test_erro_no_calculo_sobe_e_nao_e_guardado(self):
+        cache = CacheRespostas(ttl=60)
+
+        def falha():
+            raise RuntimeError('banco fora')
+
+        with pytest.raises(RuntimeError):
+            cache.obter('a', falha)
+        assert 'a' not in cache._entradas
+
+    def test_requisicoes_simultaneas_calculam_uma_vez(self):
+        cache = CacheRespostas(ttl=60)
+        liberar = threading.Event()
+
+        def lento():
+            liberar.wait(5)
+            lento.chamadas += 1
+            return b'[]', {}, None
+        lento.chamadas = 0
+
+        threads = [threading.Thread(target=cache.obter, args=('a', lento)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+        assert lento.chamadas == 1
+
+    def test_limpar(self):
+        cache = CacheRespostas(ttl=60)
+        calcular = calculo()
+        cache.obter('a', calcular)
+        cache.limpar()
+        assert cache.obter('a', calcular)[1] == 'miss'
+
+    def test_limite_de_entradas_descarta_as_mais_antigas(self):
+        cache = CacheRespostas(ttl=60, max_entradas=2)
+        calcular = calculo()
+        for chave in ('a', 'b', 'c'):
+            cache.obter(chave, calcular)
+        assert list(cache._entradas) == ['b', 'c']
+        assert cache.obter('a', calcular)[1] == 'miss'
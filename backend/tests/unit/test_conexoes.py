@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o pool de conexões e as SQLs do catálogo preparadas no
+servidor (app/conexoes.py) e para o uso delas em executar_query.
+"""
+
+import threading
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+from psycopg2 import errors
+
+from app import conexoes, parametros
+from app.query_mapping import query_mappings
+
+SQLS = {label: sql for _frases, label, sql in query_mappings}
+
+
+def conexao_fisica():
+    """Conexão falsa cujo cursor guarda as SQLs executadas em conn.executadas."""
+    conn = MagicMock()
+    conn.closed = 0
+    conn.executadas = []
+    cur = MagicMock()
+    cur.execute.side_effect = lambda sql, params=None: conn.executadas.append((sql, params))
+    conn.cursor.return_value = cur
+    return conn
+
+
+def pool_com(*fisicas, maximo=2):
+    abrir = MagicMock(side_effect=list(fisicas))
+    return conexoes.PoolConexoes(abrir, maximo), abrir
+
+
+@pytest.fixture(autouse=True)
+def geracao_isolada():
+    with patch.object(conexoes, '_geracao', 0):
+        yield
+
+
+class TestPool:
+    """Empréstimo, devolução e limite de conexões."""
+
+    def test_reaproveita_conexao(self):
+        fisica = conexao_fisica()
+        pool, abrir = pool_com(fisica)
+        pool.emprestar().close()
+        conn = pool.emprestar()
+
+        assert abrir.call_count == 1
+        assert conn.fisica.conn is fisica
+        fisica.rollback.assert_called_once()
+        fisica.close.assert_not_called()
+
+    def test_close_duas_vezes_devolve_uma(self):
+        pool, _abrir = pool_com(conexao_fisica(), maximo=1)
+        conn = pool.emprestar()
+        conn.close()
+        conn.close()
+        assert len(pool._livres) == 1
+
+    def test_esgotado_apos_a_espera(self):
+        pool, _abrir = pool_com(conexao_fisica(), maximo=1)
+        pool.emprestar()
+        deadline = MagicMock()
+        deadline.restante_s.return_value = 0.01
+        with pytest.raises(conexoes.PoolEsgotado):
+            pool.emprestar(deadline)
+
+    def test_espera_a_devolucao(self):
+        fisica = conexao_fisica()
+        pool, _abrir = pool_com(fisica, maximo=1)
+        conn = pool.emprestar()
+        threading.Timer(0.05, conn.close).start()
+        assert pool.emprestar().fisica.conn is fisica
+
+    def test_conexao_quebrada_e_descartada(self):
+        quebrada, nova = conexao_fisica(), conexao_fisica()
+        quebrada.rollback.side_effect = Exception("server closed the connection unexpectedly")
+        pool, abrir = pool_com(quebrada, nova, maximo=1)
+        pool.emprestar().close()
+
+        quebrada.close.assert_called_once()
+        assert pool.emprestar().fisica.conn is nova
+        assert abrir.call_count == 2
+
+    def test_conexao_fechada_enquanto_livre(self):
+        antiga, nova = conexao_fisica(), conexao_fisica()
+        pool, _abrir = pool_com(antiga, nova)
+        pool.emprestar().close()
+        antiga.closed = 2
+
+        assert pool.emprestar().fisica.conn is nova
+        antiga.close.assert_called_once()
+
+    def test_falha_ao_conectar_libera_a_vaga(self):
+        fisica = conexao_fisica()
+        pool, _abrir = pool_com(Exception("connection refused"), fisica, maximo=1)
+        with pytest.raises(Exception, match="refused"):
+            pool.emprestar()
+        assert pool.emprestar().fisica.conn is fisica
+
+
+class TestCatalogo:
+    """Textos de PREPARE e EXECUTE das SQLs de query_mappings."""
+
+    def test_todas_as_sqls_estao_no_catalogo(self):
+        for label, sql in SQLS.items():
+            texto, chaves = parametros.modelo(sql)
+            assert (texto if chaves else sql) in conexoes.CATALOGO, label
+
+    def test_sem_parametros(self):
+        preparada = conexoes.CATALOGO[SQLS['projetos-detalhes']]
+        assert preparada.nome == 'sophos_projetos_detalhes'
+        assert preparada.prepare.startswith("PREPARE sophos_projetos_detalhes AS SELECT p.id")
+        assert not preparada.prepare.endswith(';')
+        assert preparada.execute == "EXECUTE sophos_projetos_detalhes"
+        assert preparada.valores(None) is None
+
+    def test_parametros_posicionais(self):
+        sql, params = parametros.vincular(SQLS['vendas-periodo'],
+                                          {'start_date': '2024-01-01', 'end_date': '2024-03-31'})
+        preparada = conexoes.CATALOGO[sql]
+        assert "BETWEEN $1 AND $2" in preparada.prepare
+        assert preparada.execute == "EXECUTE sophos_vendas_periodo (%s, %s)"
+        assert preparada.valores(params) == (date(2024, 1, 1), date(2024, 3, 31))
+
+    def test_ilike(self):
+        sql, params = parametros.vincular(SQLS['funcionario-por-nome'], {'nome': 'Maria'})
+        preparada = conexoes.CATALOGO[sql]
+        assert preparada.prepare.endswith("WHERE nome ILIKE $1")
+        assert preparada.valores(params) == ('%Maria%',)
+
+    def test_percentual_literal(self):
+        texto, chaves = parametros.modelo("SELECT valor || '%' FROM vendas WHERE id = {id};")
+        preparada = conexoes.Preparada('sophos_teste', texto, chaves)
+        assert preparada.prepare == "PREPARE sophos_teste AS SELECT valor || '%' FROM vendas WHERE id = $1"
+
+
+class TestExecutar:
+    """PREPARE no primeiro uso, EXECUTE depois e reparo de SQLs invalidadas."""
+
+    SQL = SQLS['crescimento-contratos']
+
+    def test_fora_do_pool_executa_direto(self):
+        conn = conexao_fisica()
+        cur = conn.cursor()
+        conexoes.executar(conn, cur, self.SQL)
+        assert conn.executadas == [(self.SQL, None)]
+
+    def test_sql_fora_do_catalogo_executa_direto(self):
+        pool, _abrir = pool_com(conexao_fisica())
+        conn = pool.emprestar()
+        conexoes.executar(conn, conn.cursor(), "SELECT 1", None, 500)
+        assert conn.executadas == [("SET LOCAL statement_timeout = %s", (500,)), ("SELECT 1", None)]
+
+    def test_prepara_uma_vez_por_conexao(self):
+        pool, _abrir = pool_com(conexao_fisica(), conexao_fisica())
+        conn = pool.emprestar()
+        conexoes.executar(conn, conn.cursor(), self.SQL)
+        conn.close()
+        conn = pool.emprestar()
+        conexoes.executar(conn, conn.cursor(), self.SQL)
+        outra = pool.emprestar()
+        conexoes.executar(outra, outra.cursor(), self.SQL)
+
+        comandos = [sql.split(' AS ')[0] for sql, _params in conn.executadas]
+        assert comandos == ["PREPARE sophos_crescimento_contratos", "EXECUTE sophos_crescimento_contratos",
+                            "EXECUTE sophos_crescimento_contratos"]
+        assert outra.executadas[0][0].startswith("PREPARE sophos_crescimento_contratos")
+
+    def test_parametros_e_timeout(self):
+        pool, _abrir = pool_com(conexao_fisica())
+        conn = pool.emprestar()
+        sql, params = parametros.vincular(SQLS['cliente-por-id'], {'id': 7})
+        conexoes.executar(conn, conn.cursor(), sql, params, 1500)
+
+        assert conn.executadas[0] == ("SET LOCAL statement_timeout = %s", (1500,))
+        assert conn.executadas[1][0] == "PREPARE sophos_cliente_por_id AS SELECT * FROM clientes WHERE id = $1"
+        assert conn.executadas[2] == ("EXECUTE sophos_cliente_por_id (%s)", (7,))
+
+    def test_desligado(self):
+        pool, _abrir = pool_com(conexao_fisica())
+        conn = pool.emprestar()
+        with patch.object(conexoes, 'SQL_PREPARADAS', False):
+            conexoes.executar(conn, conn.cursor(), self.SQL)
+        assert conn.executadas == [(self.SQL, None)]
+
+    def test_sql_preparada_ausente_e_preparada_de_novo(self):
+        """Sessão reiniciada por um proxy (DISCARD ALL): a SQL some do servidor."""
+        pool, _abrir = pool_com(conexao_fisica())
+        conn = pool.emprestar()
+        conexoes.executar(conn, conn.cursor(), self.SQL)
+        executar_original = conn.cursor().execute.side_effect
+        falhas = [errors.InvalidSqlStatementName('prepared statement "sophos_crescimento_contratos" does not exist')]
+
+        def execute(sql, params=None):
+            if sql.startswith('EXECUTE') and falhas:
+                raise falhas.pop()
+            executar_original(sql, params)
+
+        conn.cursor().execute.side_effect = execute
+        conexoes.executar(conn, conn.cursor(), self.SQL, None, 800)
+
+        conn.fisica.conn.rollback.assert_called_once()
+        assert [sql.split(' AS ')[0] for sql, _params in conn.executadas[2:]] == [
+            "SET LOCAL statement_timeout = %s", "SET LOCAL statement_timeout = %s",
+            "PREPARE sophos_crescimento_contratos", "EXECUTE sophos_crescimento_contratos"]
+
+    def test_schema_alterado_invalida_todas_as_conexoes(self):
+        pool, _abrir = pool_com(conexao_fisica(), conexao_fisica())
+        a, b = pool.emprestar(), pool.emprestar()
+        for conn in (a, b):
+            conexoes.executar(conn, conn.cursor(), self.SQL)
+        executar_original = a.cursor().execute.side_effect
+        falhas = [errors.FeatureNotSupported('cached plan must not change result type')]
+
+        def execute(sql, params=None):
+            if sql.startswith('EXECUTE') and falhas:
+                raise falhas.pop()
+            executar_original(sql, params)
+
+        a.cursor().execute.side_effect = execute
+        conexoes.executar(a, a.cursor(), self.SQL)
+        conexoes.executar(b, b.cursor(), self.SQL)
+
+        assert [sql.split(' AS ')[0] for sql, _params in a.executadas[2:]] == [
+            "DEALLOCATE ALL", "PREPARE sophos_crescimento_contratos", "EXECUTE sophos_crescimento_contratos"]
+        assert [sql.split(' AS ')[0] for sql, _params in b.executadas[2:]] == [
+            "DEALLOCATE ALL", "PREPARE sophos_crescimento_contratos", "EXECUTE sophos_crescimento_contratos"]
+
+    def test_outro_erro_propaga(self):
+        pool, _abrir = pool_com(conexao_fisica())
+        conn = pool.emprestar()
+        conn.cursor().execute.side_effect = errors.FeatureNotSupported('COPY FROM not supported')
+        with pytest.raises(errors.FeatureNotSupported):
+            conexoes.executar(conn, conn.cursor(), self.SQL)
+        conn.fisica.conn.rollback.assert_not_called()
+
+
+class TestExecutarQuery:
+    """executar_query com conexões do pool."""
+
+    def test_usa_sql_preparada_e_devolve_a_conexao(self):
+        from app import app as app_module
+
+        fisica = conexao_fisica()
+        fisica.cursor.return_value.fetchall.return_value = [(2024.0, 10, None)]
+        pool, _abrir = pool_com(fisica)
+        with patch.object(app_module, 'pool', pool):
+            rows = app_module.executar_query(SQLS['crescimento-contratos'])
+
+        assert rows == [(2024.0, 10, None)]
+        assert fisica.executadas[-1] == ("EXECUTE sophos_crescimento_contratos", None)
+        fisica.rollback.assert_called_once()
+        fisica.close.assert_not_called()
+        assert len(pool._livres) == 1
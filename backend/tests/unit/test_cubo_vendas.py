@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o cubo OLAP de vendas (app/cubo_vendas.py).
+
+BancoFalso guarda as tabelas em listas e responde às SQLs de carga do cubo;
+as respostas do cubo são comparadas com a SQL equivalente da consulta
+avaliada linha a linha sobre as mesmas vendas.
+"""
+
+import datetime
+import random
+from collections import defaultdict
+from decimal import Decimal
+
+import pytest
+
+from app import cubo_vendas
+from app.cubo_vendas import ConsultaCubo, CuboVendas
+
+DEPARTAMENTOS = {1: 'Vendas', 2: 'Marketing Digital', 3: 'Criação', 4: 'Atendimento'}
+FUNCIONARIOS = {1: ('Ana Souza', 1), 2: ('Bruno Lima', 1), 3: ('Carla Dias', 3), 4: ('Davi Rocha', 2),
+                5: ('Ana Souza', 4), 6: ('Eva Nunes', None)}
+CLIENTES = {1: 'Moda Bela', 2: 'Tech Nova', 3: "Casa D'Ouro"}
+PROJETOS = {1: 1, 2: 2, 3: 3, 4: None}
+
+
+class BancoFalso:
+
+    def __init__(self):
+        self.vendas = []
+
+    def inserir(self, valor, data, funcionario_id, projeto_id, status):
+        self.vendas.append({'id': len(self.vendas) + 1, 'valor': None if valor is None else Decimal(valor),
+                            'data': data, 'funcionario_id': funcionario_id, 'projeto_id': projeto_id,
+                            'status': status})
+
+    def conectar(self):
+        return ConexaoFalsa(self)
+
+    def dimensoes(self, venda):
+        """(mês, departamento_id, cliente_id) da venda pelos LEFT JOINs da SQL."""
+        data = venda['data']
+        mes = None if data is None else data.year * 12 + data.month - 1
+        funcionario = FUNCIONARIOS.get(venda['funcionario_id'])
+        return mes, funcionario[1] if funcionario else None, PROJETOS.get(venda['projeto_id'])
+
+
+class ConexaoFalsa:
+    def __init__(self, banco):
+        self.banco = banco
+
+    def cursor(self):
+        return CursorFalso(self.banco)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CursorFalso:
+    def __init__(self, banco):
+        self.banco = banco
+        self.linhas = []
+
+    def execute(self, sql, params=None):
+        if 'FROM departamentos' in sql:
+            self.linhas = list(DEPARTAMENTOS.items())
+        elif 'FROM funcionarios' in sql and 'GROUP BY' not in sql:
+            self.linhas = [(i, nome) for i, (nome, _d) in FUNCIONARIOS.items()]
+        elif 'FROM clientes' in sql:
+            self.linhas = list(CLIENTES.items())
+        elif 'GROUP BY' in sql:
+            celulas = defaultdict(lambda: [0, 0, 0, 0])
+            for venda in self.banco.vendas:
+                if venda['id'] <= params[0]:
+                    continue
+                mes, departamento, cliente = self.banco.dimensoes(venda)
+                nulo = cubo_vendas.NULO
+                chave = (nulo if mes is None else mes, departamento or nulo, venda['funcionario_id'] or nulo,
+                         cliente or nulo, venda['status'])
+                celula = celulas[chave]
+                celula[0] += 1
+                if venda['valor'] is not None:
+                    celula[1] += 1
+                    celula[2] += int(venda['valor'] * 100)
+                celula[3] = max(celula[3], venda['id'])
+            self.linhas = [chave + tuple(medidas) for chave, medidas in celulas.items()]
+
+    def fetchall(self):
+        return self.linhas
+
+
+def resultado_sql(banco, consulta):
+    """A SQL de consulta.sql() avaliada linha a linha (grupos em conjunto; a ordem é testada à parte)."""
+    grupos = defaultdict(lambda: [0, []])
+    for venda in banco.vendas:
+        mes, departamento, cliente = banco.dimensoes(venda)
+        valores = {'mes': mes, 'departamento': departamento, 'funcionario': venda['funcionario_id'],
+                   'cliente': cliente, 'status': venda['status']}
+        if any(valores[dim] not in aceitos for dim, aceitos in consulta.filtros.items()):
+            continue
+        rotulos = {
+            'mes': None if venda['data'] is None else venda['data'].strftime('%Y-%m'),
+            'departamento': DEPARTAMENTOS.get(departamento),
+            'funcionario': FUNCIONARIOS.get(venda['funcionario_id'], (None,))[0],
+            'cliente': CLIENTES.get(cliente),
+            'status': venda['status'],
+        }
+        # Agrupa pelo id e pelo rótulo, como o GROUP BY da SQL
+        chave = tuple((valores[dim], rotulos[dim]) for dim in consulta.agrupar)
+        grupos[chave][0] += 1
+        if venda['valor'] is not None:
+            grupos[chave][1].append(venda['valor'])
+    if not consulta.agrupar and not grupos:
+        return [(0, None)]
+    return sorted(((*(r for _v, r in chave), n, sum(valores) if valores else None)
+                   for chave, (n, valores) in grupos.items()), key=repr)
+
+
+@pytest.fixture
+def banco():
+    gerador = random.Random(7)
+    banco = BancoFalso()
+    for _ in range(3000):
+        banco.inserir(
+            None if gerador.random() < 0.03 else f"{gerador.randint(100, 900_000) / 100:.2f}",
+            None if gerador.random() < 0.02 else datetime.date(2023, 1, 1) + datetime.timedelta(
+                days=gerador.randint(0, 700)),
+            gerador.choice([1, 2, 3, 4, 5, 6, None]),
+            gerador.choice([1, 2, 3, 4, None]),
+            gerador.choice(['Pago', 'Pendente', 'Atrasado', None]))
+    return banco
+
+
+def carregado(banco, **kwargs):
+    cubo = CuboVendas(banco.conectar, **kwargs)
+    cubo.atualizar()
+    return cubo
+
+
+CONSULTAS = [
+    ConsultaCubo(),
+    ConsultaCubo(agrupar=['mes']),
+    ConsultaCubo({'departamento': [3], 'status': ['Pago']}, ['mes']),
+    ConsultaCubo({'mes': list(range(2024 * 12, 2025 * 12))}, ['departamento', 'status']),
+    ConsultaCubo({'cliente': [1, 2]}, ['funcionario']),
+    ConsultaCubo({'status': ['Estornado']}, ['cliente']),
+    ConsultaCubo(agrupar=['mes', 'departamento', 'funcionario', 'cliente', 'status']),
+]
+
+
+class TestConsultar:
+
+    @pytest.mark.parametrize('consulta', CONSULTAS, ids=repr)
+    def test_identico_a_sql(self, banco, consulta):
+        linhas = carregado(banco).consultar(consulta)
+        assert sorted(linhas, key=repr) == resultado_sql(banco, consulta)
+
+    def test_funcionarios_homonimos_ficam_separados(self, banco):
+        linhas = carregado(banco).consultar(ConsultaCubo(agrupar=['funcionario']))
+        assert [linha[0] for linha in linhas].count('Ana Souza') == 2
+
+    def test_ordem_por_mes_e_valor(self, banco):
+        linhas = carregado(banco).consultar(ConsultaCubo(agrupar=['mes', 'status']))
+        chaves = [(linha[0] is None, linha[0] or '', -(linha[-1] or 0), linha[-1] is None) for linha in linhas]
+        assert chaves == sorted(chaves, key=lambda c: (c[0], c[1]))
+        for mes in {linha[0] for linha in linhas}:
+            valores = [linha[-1] for linha in linhas if linha[0] == mes and linha[-1] is not None]
+            assert valores == sorted(valores, reverse=True)
+
+    def test_top_n_por_valor(self, banco):
+        consulta = ConsultaCubo(agrupar=['cliente'], top=2)
+        linhas = carregado(banco).consultar(consulta)
+        todas = sorted((l for l in resultado_sql(banco, ConsultaCubo(agrupar=['cliente'])) if l[-1] is not None),
+                       key=lambda l: l[-1], reverse=True)
+        assert linhas == todas[:2]
+
+
+class TestAtualizacao:
+
+    def test_incremental_soma_vendas_novas(self, banco):
+        cubo = carregado(banco)
+        banco.inserir('10.00', datetime.date(2025, 1, 5), 3, 1, 'Pago')
+        banco.inserir('5.50', datetime.date(2025, 1, 6), 3, 1, 'Reembolsado')
+        cubo.atualizar()
+        assert cubo.ultimo_id == len(banco.vendas)
+        for consulta in CONSULTAS:
+            assert sorted(cubo.consultar(consulta), key=repr) == resultado_sql(banco, consulta)
+
+    def test_reconstrucao_absorve_alteracoes(self, banco):
+        cubo = carregado(banco, reconstrucao=0)
+        banco.vendas[0]['valor'] = Decimal('123456.78')
+        del banco.vendas[5]
+        cubo.atualizar()
+        assert cubo.consultar(ConsultaCubo()) == resultado_sql(banco, ConsultaCubo())
+
+    def test_sem_reconstrucao_alteracoes_esperam(self, banco):
+        cubo = carregado(banco)
+        antes = cubo.consultar(ConsultaCubo())
+        banco.vendas[0]['valor'] = Decimal('123456.78')
+        cubo.atualizar()
+        assert cubo.consultar(ConsultaCubo()) == antes
+
+
+class TestSql:
+
+    def test_especificacao_volta_da_sql(self):
+        consulta = ConsultaCubo({'departamento': [3], 'status': ["D'*/x"]}, ['mes'], top=None)
+        sql = consulta.sql()
+        assert sql.startswith('/* cubo-vendas {')
+        assert ConsultaCubo.da_sql(sql) == consulta
+        assert "'D''*/x'" in sql
+
+    def test_sql_agrupa_pelo_id_e_ordena(self):
+        sql = ConsultaCubo({'mes': [24288]}, ['funcionario', 'mes'], top=5).sql()
+        assert "GROUP BY v.funcionario_id, f.nome, TO_CHAR(v.data_venda, 'YYYY-MM')" in sql
+        assert "IN (24288)" in sql
+        assert sql.endswith("ORDER BY total_valor DESC NULLS LAST LIMIT 5;")
+
+    def test_filtro_sem_valores_nao_casa_nada(self):
+        assert "WHERE FALSE" in ConsultaCubo({'cliente': []}).sql()
+
+    def test_sql_de_outros_mapeamentos_nao_e_do_cubo(self):
+        assert ConsultaCubo.da_sql("SELECT COUNT(*) FROM vendas;") is None
+
+    def test_dimensao_desconhecida(self):
+        with pytest.raises(ValueError):
+            ConsultaCubo({'produto': [1]})
+
+    def test_responder(self, banco):
+        cubo = carregado(banco)
+        consulta = ConsultaCubo({'status': ['Pago']}, ['departamento'])
+        assert cubo.responder(cubo_vendas.LABEL, consulta.sql()) == cubo.consultar(consulta)
+        assert cubo.responder('vendas-total', "SELECT COUNT(*) FROM vendas;") is None
+        cubo.atualizado_em -= cubo.max_idade + 1
+        assert cubo.responder(cubo_vendas.LABEL, consulta.sql()) is None
+
+
+class TestInterpretar:
+
+    @pytest.fixture
+    def cubo(self, banco):
+        return carregado(banco)
+
+    def test_filtros_e_agrupamento(self, cubo):
+        consulta = cubo.interpretar("Vendas pagas do departamento de Criação por mês")
+        assert consulta == ConsultaCubo({'departamento': [3], 'status': ['Pago']}, ['mes'])
+
+    def test_sem_acentos_e_departamento_vendas_com_prefixo(self, cubo):
+        consulta = cubo.interpretar("quanto o departamento de vendas faturou em 2024 por cliente")
+        assert consulta.filtros == {'departamento': [1], 'mes': list(range(2024 * 12, 2025 * 12))}
+        assert consulta.agrupar == ('cliente',)
+
+    def test_palavra_vendas_sozinha_nao_e_departamento(self, cubo):
+        consulta = cubo.interpretar("vendas atrasadas por cliente")
+        assert consulta == ConsultaCubo({'status': ['Atrasado']}, ['cliente'])
+
+    def test_mes_do_ano_nomes_e_top(self, cubo):
+        consulta = cubo.interpretar("Top 3 vendedores em vendas da Tech Nova em março de 2024 por funcionário")
+        assert consulta.filtros == {'cliente': [2], 'mes': [2024 * 12 + 2]}
+        assert consulta.agrupar == ('funcionario',) and consulta.top == 3
+
+    def test_funcionario_pelo_nome(self, cubo):
+        consulta = cubo.interpretar("vendas pendentes da Carla Dias por mês")
+        assert consulta == ConsultaCubo({'funcionario': [3], 'status': ['Pendente']}, ['mes'])
+
+    @pytest.mark.parametrize('pergunta', [
+        "total de vendas",            # nenhum filtro
+        "vendas por status",          # um agrupamento só: mapeamento estático
+        "vendas pagas",               # um filtro só
+        "funcionários por departamento em 2024",  # não fala de vendas
+    ])
+    def test_fica_com_os_mapeamentos(self, cubo, pergunta):
+        assert cubo.interpretar(pergunta) is None
+
+    def test_sem_cubo_carregado(self, banco):
+        assert CuboVendas(banco.conectar).interpretar("vendas pagas da Criação por mês") is None
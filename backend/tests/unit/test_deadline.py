@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o orçamento de latência (deadline) por requisição.
+
+Cobre o cálculo do restante, a leitura do header X-Deadline-Ms e a propagação
+do deadline pelas etapas de processar_pergunta.
+"""
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+
+from app.deadline import Deadline, DeadlineExcedido, DEADLINE_PADRAO_MS, DEADLINE_MAXIMO_MS
+
+
+class TestDeadline:
+    """Testes para a classe Deadline."""
+
+    def test_restante_inicial(self):
+        """O restante começa próximo do orçamento definido."""
+        deadline = Deadline(10000)
+        assert 9900 <= deadline.restante_ms() <= 10000
+        assert not deadline.expirado()
+
+    def test_deadline_expirado(self):
+        """Um orçamento zerado expira imediatamente e nunca fica negativo."""
+        deadline = Deadline(0)
+        assert deadline.expirado()
+        assert deadline.restante_ms() == 0
+
+    def test_statement_timeout_nunca_zero(self):
+        """statement_timeout = 0 desativaria o limite no Postgres."""
+        deadline = Deadline(0)
+        assert deadline.statement_timeout_ms() == 1
+
+    def test_statement_timeout_desconta_reserva(self):
+        """O timeout SQL reserva tempo para a etapa do Gemini."""
+        deadline = Deadline(10000)
+        assert deadline.statement_timeout_ms(reserva_ms=4000) <= 6000
+
+    def test_permite_opcional(self):
+        """Etapas opcionais só rodam com folga no orçamento."""
+        assert Deadline(60000).permite_opcional()
+        assert not Deadline(100).permite_opcional()
+
+    def test_header_ausente_usa_padrao(self):
+        """Sem header, usa o orçamento padrão."""
+        assert Deadline.da_requisicao({}).orcamento_ms == DEADLINE_PADRAO_MS
+
+    def test_header_sobrescreve(self):
+        """O header X-Deadline-Ms define o orçamento da requisição."""
+        assert Deadline.da_requisicao({'X-Deadline-Ms': '1500'}).orcamento_ms == 1500
+
+    def test_header_limitado_ao_maximo(self):
+        """Valores acima do máximo configurado são limitados."""
+        deadline = Deadline.da_requisicao({'X-Deadline-Ms': str(DEADLINE_MAXIMO_MS * 10)})
+        assert deadline.orcamento_ms == DEADLINE_MAXIMO_MS
+
+    def test_header_invalido_usa_padrao(self):
+        """Valores não numéricos são ignorados."""
+        assert Deadline.da_requisicao({'X-Deadline-Ms': 'abc'}).orcamento_ms == DEADLINE_PADRAO_MS
+
+
+class TestPropagacaoDeadline:
+    """Testes para a propagação do deadline pelo pipeline da pergunta."""
+
+    def test_gemini_timeout_vira_deadline_excedido(self):
+        """Timeout do requests com deadline levanta DeadlineExcedido."""
+        from app.app import enviar_para_gemini
+
+        with patch('app.app.requests.post', side_effect=requests.Timeout("lento")):
+            with pytest.raises(DeadlineExcedido):
+                enviar_para_gemini("contexto", Deadline(5000))
+
+    def test_gemini_usa_restante_como_timeout(self):
+        """O timeout da chamada ao Gemini é o orçamento restante."""
+        from app.app import enviar_para_gemini
+
+        resp = Mock(status_code=200)
+        resp.json.return_value = {'candidates': [{'content': {'parts': [{'text': 'ok'}]}}]}
+        with patch('app.app.requests.post', return_value=resp) as mock_post:
+            assert enviar_para_gemini("contexto", Deadline(5000)) == 'ok'
+            assert mock_post.call_args.kwargs['timeout'] <= 5.0
+
+    def test_resposta_parcial_quando_gemini_perde_prazo(self):
+        """Se o Gemini perde o prazo, retorna apenas os dados obtidos."""
+        from app.app import processar_pergunta
+
+        with patch('app.app.selecionar_queries', return_value=[('funcionarios-total', 'SELECT 1')]), \
+             patch('app.app.executar_query', return_value=[(42,)]), \
+             patch('app.app.enviar_para_gemini', side_effect=DeadlineExcedido("lento")), \
+             patch('app.app.inserir_log'):
+            resultado = processar_pergunta("Quantos funcionários?", Deadline(20000))
+
+        assert resultado['parcial'] is True
+        assert '42' in resultado['resposta']
+
+    def test_mapeamentos_extras_pulados_com_orcamento_curto(self):
+        """Com orçamento curto, apenas o primeiro mapeamento é executado."""
+        from app.app import processar_pergunta
+
+        consultas = [('a', 'SELECT 1'), ('b', 'SELECT 2'), ('c', 'SELECT 3')]
+        with patch('app.app.selecionar_queries', return_value=consultas), \
+             patch('app.app.executar_query', return_value=[(1,)]) as mock_exec, \
+             patch('app.app.enviar_para_gemini', return_value='ok'), \
+             patch('app.app.inserir_log'):
+            resultado = processar_pergunta("pergunta", Deadline(1000))
+
+        assert mock_exec.call_count == 1
+        assert resultado['sqls_usadas'] == 'SELECT 1'
+        assert resultado['parcial'] is False
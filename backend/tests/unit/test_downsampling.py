@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a redução de séries com LTTB (app/downsampling.py).
+"""
+
+import numpy as np
+
+from app.downsampling import lttb
+
+
+class TestLttb:
+
+    def test_serie_que_cabe_no_limite_fica_inteira(self):
+        assert list(lttb(range(10), range(10), 10)) == list(range(10))
+        assert list(lttb(range(10), range(10), 50)) == list(range(10))
+
+    def test_limite_menor_que_tres_devolve_tudo(self):
+        assert len(lttb(range(10), range(10), 2)) == 10
+
+    def test_tamanho_extremos_e_ordem(self):
+        x = np.arange(10_000)
+        y = np.sin(x / 100)
+        indices = lttb(x, y, 100)
+        assert len(indices) == 100
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert np.all(np.diff(indices) > 0)
+
+    def test_preserva_picos(self):
+        y = np.zeros(1000)
+        y[123], y[789] = 50, -40
+        indices = lttb(np.arange(1000), y, 20)
+        assert 123 in indices and 789 in indices
+
+    def test_aceita_decimal_e_x_irregular(self):
+        from decimal import Decimal
+        x = [0, 1, 5, 6, 20, 21, 22]
+        y = [Decimal('1.5'), Decimal('2'), Decimal('9'), Decimal('1'), Decimal('0'), Decimal('3'), Decimal('2')]
+        indices = lttb(x, y, 4)
+        assert list(indices[[0, -1]]) == [0, 6]
+        assert 2 in indices
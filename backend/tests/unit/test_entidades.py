@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o índice de entidades conhecidas (app/entidades.py) e
+para a carga dele a partir de cache_dados em app.py.
+"""
+
+from unittest.mock import patch
+
+from app import entidades, metrics
+
+
+def indice_com(**grupos):
+    indice = entidades.IndiceEntidades()
+    for grupo, entradas in grupos.items():
+        indice.atualizar(grupo, entradas)
+    return indice
+
+
+FUNCIONARIOS = [('João Silva', 3), ('Maria Oliveira', 4), ('João', 9)]
+CLIENTES = [('Acme Ltda', 10), ('Moda & Cia', 11), ("Padaria D'Ávila", 12)]
+
+
+class TestTokens:
+    """Normalização dos nomes e da pergunta."""
+
+    def test_acentos_caixa_e_pontuacao(self):
+        assert entidades.tokens("Padaria D'Ávila, S.A.!") == ('padaria', 'd', 'avila', 's', 'a')
+
+    def test_vazio(self):
+        assert entidades.tokens("  ?! ") == ()
+
+
+class TestMencoes:
+    """Entidades citadas na pergunta."""
+
+    def test_sem_acento_caixa_nem_pontuacao(self):
+        indice = indice_com(clientes=CLIENTES)
+        assert indice.mencoes("projetos da ACME LTDA?") == {'clientes': ('Acme Ltda', 10)}
+        assert indice.mencoes("contratos da padaria d avila") == {'clientes': ("Padaria D'Ávila", 12)}
+
+    def test_nome_mais_longo_vence(self):
+        indice = indice_com(funcionarios=FUNCIONARIOS)
+        assert indice.mencoes("dados do joao silva") == {'funcionarios': ('João Silva', 3)}
+        assert indice.mencoes("dados do joão") == {'funcionarios': ('João', 9)}
+
+    def test_palavra_inteira(self):
+        indice = indice_com(funcionarios=FUNCIONARIOS, clientes=CLIENTES)
+        assert indice.mencoes("quem é o joãozinho da acmeltda?") == {}
+
+    def test_varios_grupos(self):
+        indice = indice_com(funcionarios=FUNCIONARIOS, clientes=CLIENTES)
+        assert indice.mencoes("Maria Oliveira atende a Moda & Cia?") == {
+            'funcionarios': ('Maria Oliveira', 4), 'clientes': ('Moda & Cia', 11)}
+
+    def test_mesmo_nome_em_grupos_diferentes(self):
+        indice = indice_com(departamentos=[('Vendas', 1)], projetos=[('Vendas', 30)])
+        assert indice.mencoes("vendas") == {'departamentos': ('Vendas', 1), 'projetos': ('Vendas', 30)}
+
+    def test_homonimos_fica_o_primeiro(self):
+        indice = indice_com(funcionarios=[('Ana Lima', 5), ('Ana Lima', 6)])
+        assert indice.mencoes("ana lima") == {'funcionarios': ('Ana Lima', 5)}
+
+    def test_nomes_vazios_sao_ignorados(self):
+        indice = indice_com(projetos=[(None, 1), ('', 2), ('Site', 3)])
+        assert indice.mencoes("projeto site") == {'projetos': ('Site', 3)}
+
+
+class TestAtualizar:
+    """Atualização incremental de um grupo."""
+
+    def test_inclui_e_remove_so_o_que_mudou(self):
+        indice = indice_com(clientes=CLIENTES)
+        with patch.object(indice, '_incluir', wraps=indice._incluir) as incluir:
+            assert indice.atualizar('clientes', [('Acme Ltda', 10), ('Nova Era', 13)]) == (1, 2)
+
+        incluir.assert_called_once()
+        assert indice.mencoes("moda & cia e nova era") == {'clientes': ('Nova Era', 13)}
+        assert len(indice) == 2
+
+    def test_remover_poda_a_trie(self):
+        indice = indice_com(clientes=[('Acme Ltda', 10), ('Acme', 14)])
+        indice.atualizar('clientes', [('Acme', 14)])
+        assert indice.mencoes("acme ltda") == {'clientes': ('Acme', 14)}
+        indice.atualizar('clientes', [])
+        assert indice._raiz == {}
+
+    def test_remover_um_homonimo(self):
+        indice = indice_com(funcionarios=[('Ana Lima', 5), ('Ana Lima', 6)])
+        indice.atualizar('funcionarios', [('Ana Lima', 6)])
+        assert indice.mencoes("ana lima") == {'funcionarios': ('Ana Lima', 6)}
+
+    def test_outros_grupos_nao_mudam(self):
+        indice = indice_com(departamentos=[('Vendas', 1)], projetos=[('Vendas', 30)])
+        indice.atualizar('projetos', [])
+        assert indice.mencoes("vendas") == {'departamentos': ('Vendas', 1)}
+
+    def test_gauge_por_grupo(self):
+        metrics.ENTIDADES_INDEXADAS.reset()
+        indice = indice_com(clientes=CLIENTES)
+        indice.atualizar('clientes', CLIENTES[:1])
+        assert metrics.ENTIDADES_INDEXADAS.valor('clientes') == 1
+
+
+class TestCarregarCacheDados:
+    """cache_dados e o índice carregados juntos em app.py."""
+
+    def test_recarga_incremental_e_falha_mantem_o_anterior(self):
+        from app import app as app_module
+
+        resultados = {
+            'departamentos': [('Vendas', 1)],
+            'funcionarios': [('João Silva', 'Gerente', 'Vendas', 3)],
+            'clientes': [('Acme Ltda', 10)],
+            'projetos': [('Site Institucional', 'Ativo', 21)],
+            'vendas': [(100, 'Pago')],
+        }
+
+        def executar(sql, *_args):
+            tabela = sql.split('FROM')[1].split()[0].strip(';')
+            return resultados[tabela]
+
+        indice = entidades.IndiceEntidades()
+        with patch.object(app_module, 'indice_entidades', indice), \
+             patch.object(app_module, 'cache_dados', {}), \
+             patch('app.app.executar_query', side_effect=executar):
+            app_module.carregar_cache_dados()
+            assert indice.mencoes("projetos do joão silva para a acme ltda") == {
+                'funcionarios': ('João Silva', 3), 'clientes': ('Acme Ltda', 10)}
+
+            resultados['clientes'] = None  # query falhou na recarga
+            resultados['projetos'] = [('Site Institucional', 'Concluído', 21), ('App', 'Ativo', 22)]
+            with patch.object(indice, 'atualizar', wraps=indice.atualizar) as atualizar:
+                app_module.carregar_cache_dados()
+
+            assert app_module.cache_dados['clientes'] == [('Acme Ltda', 10)]
+            assert indice.mencoes("acme ltda") == {'clientes': ('Acme Ltda', 10)}
+            assert indice.mencoes("projeto app") == {'projetos': ('App', 22)}
+            assert 'clientes' not in [c.args[0] for c in atualizar.call_args_list]
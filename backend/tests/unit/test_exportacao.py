@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a exportação de mapeamentos em CSV/NDJSON
+(app/exportacao.py e o endpoint /api/export/<label> de app/graphs.py).
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import json
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from app import exportacao, graphs
+
+DESCRICAO = [('id', 23), ('data_venda', 1082), ('valor', 1700), ('status_pagamento', 25)]
+
+
+def linhas_vendas(n):
+    return [(i, datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 300),
+             Decimal(f"{i}.50") if i % 10 else None, 'Pago' if i % 2 else 'Pendente, "parcial"')
+            for i in range(1, n + 1)]
+
+
+def conexao(linhas, erro=None):
+    """Conexão falsa com cursor no servidor: fetchmany em lotes e contagem das buscas."""
+    cur = MagicMock()
+    estado = {'posicao': 0, 'buscas': 0}
+
+    def execute(sql, params=None):
+        if erro is not None:
+            raise erro
+
+    def fetchmany(tamanho):
+        estado['buscas'] += 1
+        lote = linhas[estado['posicao']:estado['posicao'] + tamanho]
+        estado['posicao'] += len(lote)
+        return lote
+
+    cur.execute.side_effect = execute
+    cur.fetchmany.side_effect = fetchmany
+    cur.description = DESCRICAO
+    conn = MagicMock()
+    conn.cursor.return_value = cur
+    conn.estado = estado
+    return conn
+
+
+def exportar(conn, url, **kwargs):
+    with patch('app.graphs.get_db_connection', return_value=conn), \
+         patch.object(exportacao, 'EXPORTACAO_LOTE_LINHAS', 100):
+        resposta = graphs.app.test_client().get(url, **kwargs)
+        resposta.get_data()  # consome o streaming ainda com os patches ativos
+        return resposta
+
+
+class TestFormatos:
+    """Conteúdo do CSV e do NDJSON."""
+
+    def test_csv(self):
+        linhas = linhas_vendas(250)
+        conn = conexao(linhas)
+        resposta = exportar(conn, '/api/export/vendas-lista')
+
+        assert resposta.status_code == 200
+        assert resposta.content_type == 'text/csv; charset=utf-8'
+        assert resposta.headers['Content-Disposition'] == 'attachment; filename="vendas-lista.csv"'
+        lidas = list(csv.reader(io.StringIO(resposta.get_data(as_text=True))))
+        assert lidas[0] == ['id', 'data_venda', 'valor', 'status_pagamento']
+        assert lidas[1:] == [[str(i), d.isoformat(), '' if v is None else str(v), s] for i, d, v, s in linhas]
+        conn.cursor.assert_called_with(name='sophos_exportacao')
+        conn.close.assert_called_once()
+
+    def test_ndjson(self):
+        linhas = linhas_vendas(250)
+        resposta = exportar(conexao(linhas), '/api/export/vendas-lista?formato=ndjson')
+
+        assert resposta.content_type == 'application/x-ndjson'
+        registros = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+        assert len(registros) == 250
+        assert registros[0] == {'id': 1, 'data_venda': '2024-01-02', 'valor': 1.5,
+                                'status_pagamento': 'Pago'}
+        assert registros[9]['valor'] is None
+
+    @pytest.mark.parametrize("consulta,headers", [('?formato=arrow', {}),
+                                                  ('', {'Accept': 'application/vnd.apache.arrow.stream'})])
+    def test_arrow(self, consulta, headers):
+        pyarrow = pytest.importorskip('pyarrow')
+        linhas = linhas_vendas(250)
+        resposta = exportar(conexao(linhas), '/api/export/vendas-lista' + consulta, headers=headers)
+
+        assert resposta.content_type == 'application/vnd.apache.arrow.stream'
+        leitor = pyarrow.ipc.open_stream(resposta.data)
+        lotes = list(leitor)
+        assert [lote.num_rows for lote in lotes] == [100, 100, 50]
+        assert leitor.schema.types == [pyarrow.int64(), pyarrow.date32(), pyarrow.float64(), pyarrow.string()]
+        assert pyarrow.Table.from_batches(lotes).to_pylist()[9] == {
+            'id': 10, 'data_venda': datetime.date(2024, 1, 11), 'valor': None,
+            'status_pagamento': 'Pendente, "parcial"'}
+
+    def test_arrow_vazio_tem_schema(self):
+        pyarrow = pytest.importorskip('pyarrow')
+        resposta = exportar(conexao([]), '/api/export/vendas-lista?formato=arrow')
+        tabela = pyarrow.ipc.open_stream(resposta.data).read_all()
+        assert (tabela.num_rows, tabela.column_names) == (0, ['id', 'data_venda', 'valor', 'status_pagamento'])
+
+    def test_resultado_vazio_csv_tem_cabecalho(self):
+        resposta = exportar(conexao([]), '/api/export/vendas-lista')
+        assert resposta.get_data(as_text=True) == 'id,data_venda,valor,status_pagamento\n'
+
+    def test_gzip_sob_demanda(self):
+        linhas = linhas_vendas(250)
+        sem = exportar(conexao(linhas), '/api/export/vendas-lista')
+        com = exportar(conexao(linhas), '/api/export/vendas-lista', headers={'Accept-Encoding': 'gzip'})
+
+        assert com.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in com.headers['Vary']
+        assert gzip.decompress(com.data) == sem.data
+        assert 'Content-Encoding' not in sem.headers
+
+
+class TestStreaming:
+    """Leitura em lotes e encerramento do cursor."""
+
+    def test_le_em_lotes(self):
+        conn = conexao(linhas_vendas(250))
+        exportar(conn, '/api/export/vendas-lista')
+        assert conn.estado['buscas'] == 4  # 100 + 100 + 50 + lote vazio
+
+    def test_cliente_desiste_fecha_conexao(self):
+        conn = conexao(linhas_vendas(1000))
+        with patch.object(exportacao, 'EXPORTACAO_LOTE_LINHAS', 100):
+            cur, lote = exportacao.abrir(conn, 'SELECT * FROM vendas;', {})
+            pedacos = exportacao.corpo(conn, cur, lote, 'csv')
+            next(pedacos)
+            pedacos.close()
+
+        assert conn.estado['buscas'] == 1
+        conn.close.assert_called_once()
+
+    def test_erro_no_meio_interrompe_a_resposta(self):
+        """O erro propaga para o servidor cortar a resposta, em vez de entregar um arquivo incompleto."""
+        conn = conexao(linhas_vendas(250))
+        cur = conn.cursor.return_value
+        buscar = cur.fetchmany.side_effect
+        cur.fetchmany.side_effect = [buscar(100), psycopg2.OperationalError("conexão perdida")]
+        with pytest.raises(psycopg2.OperationalError):
+            exportar(conn, '/api/export/vendas-lista')
+        conn.close.assert_called_once()
+
+
+class TestParametrosEErros:
+    """Parâmetros dos placeholders e respostas de erro."""
+
+    def test_parametros_vinculados(self):
+        conn = conexao(linhas_vendas(3))
+        resposta = exportar(conn, '/api/export/vendas-periodo?start_date=2024-01-01&end_date=2024-03-31')
+
+        assert resposta.status_code == 200
+        sql, params = conn.cursor.return_value.execute.call_args[0]
+        assert 'BETWEEN %(start_date)s AND %(end_date)s' in sql
+        assert params == {'start_date': datetime.date(2024, 1, 1), 'end_date': datetime.date(2024, 3, 31)}
+
+    def test_parametro_invalido_400(self):
+        resposta = exportar(conexao([]), "/api/export/cliente-por-id?id=1%20OR%201=1")
+        assert resposta.status_code == 400
+
+    def test_parametro_ausente_400(self):
+        resposta = exportar(conexao([]), '/api/export/vendas-periodo?start_date=2024-01-01')
+        assert resposta.status_code == 400
+        assert 'end_date' in resposta.get_json()['error']
+
+    def test_label_desconhecido_404(self):
+        assert exportar(conexao([]), '/api/export/tabela-secreta').status_code == 404
+
+    def test_formato_invalido_400(self):
+        assert exportar(conexao([]), '/api/export/vendas-lista?formato=xlsx').status_code == 400
+
+    def test_erro_no_banco_500(self):
+        conn = conexao([], erro=psycopg2.ProgrammingError("relation does not exist"))
+        resposta = exportar(conn, '/api/export/vendas-lista')
+        assert resposta.status_code == 500
+        conn.close.assert_called_once()
+
+    def test_sem_conexao_500(self):
+        with patch('app.graphs.get_db_connection', return_value=None):
+            resposta = graphs.app.test_client().get('/api/export/vendas-lista')
+        assert resposta.status_code == 500
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a extração dos parâmetros dos mapeamentos a partir da
+pergunta (app/extracao.py) e para a etapa que os vincula em processar_pergunta.
+"""
+
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from app import entidades, extracao
+
+HOJE = date(2025, 5, 15)  # quinta-feira
+
+CONHECIDOS = {
+    'funcionarios': [('João Silva', 3), ('Maria Oliveira', 4), ('João', 9)],
+    'clientes': [('Acme Ltda', 10), ('Moda & Cia', 11)],
+    'departamentos': [('Vendas', 1), ('Marketing Digital', 2), ('Criação', 3)],
+    'projetos': [('Site Institucional', 21), ('Campanha de Verão', 22)],
+}
+
+
+def mencoes(pergunta):
+    indice = entidades.IndiceEntidades()
+    for grupo, entradas in CONHECIDOS.items():
+        indice.atualizar(grupo, entradas)
+    return indice.mencoes(pergunta)
+
+
+class TestIntervaloDeDatas:
+    """Datas explícitas, meses, anos e intervalos relativos."""
+
+    @pytest.mark.parametrize("pergunta,esperado", [
+        ("vendas entre 01/01/2024 e 31/03/2024", (date(2024, 1, 1), date(2024, 3, 31))),
+        ("vendas de 2024-02-10", (date(2024, 2, 10), date(2024, 2, 10))),
+        ("vendas em 5 de março de 2024", (date(2024, 3, 5), date(2024, 3, 5))),
+        ("vendas de fevereiro de 2024", (date(2024, 2, 1), date(2024, 2, 29))),
+        ("vendas de fevereiro/2024", (date(2024, 2, 1), date(2024, 2, 29))),
+        ("vendas de janeiro a março de 2024", (date(2024, 1, 1), date(2024, 3, 31))),
+        ("contratos de 2023", (date(2023, 1, 1), date(2023, 12, 31))),
+        ("vendas de 10/02/24", (date(2024, 2, 10), date(2024, 2, 10))),
+    ])
+    def test_explicitos(self, pergunta, esperado):
+        assert extracao.intervalo_de_datas(pergunta, HOJE) == esperado
+
+    @pytest.mark.parametrize("pergunta,esperado", [
+        ("clientes cadastrados hoje", (HOJE, HOJE)),
+        ("vendas de ontem", (date(2025, 5, 14), date(2025, 5, 14))),
+        ("vendas desta semana", (date(2025, 5, 12), HOJE)),
+        ("vendas da semana passada", (date(2025, 5, 5), date(2025, 5, 11))),
+        ("vendas do mês passado", (date(2025, 4, 1), date(2025, 4, 30))),
+        ("funcionários contratados neste mês", (date(2025, 5, 1), HOJE)),
+        ("projetos deste ano", (date(2025, 1, 1), HOJE)),
+        ("contratos do ano passado", (date(2024, 1, 1), date(2024, 12, 31))),
+        ("vendas nos últimos 30 dias", (date(2025, 4, 16), HOJE)),
+        ("vendas dos últimos 3 meses", (date(2025, 2, 15), HOJE)),
+    ])
+    def test_relativos(self, pergunta, esperado):
+        assert extracao.intervalo_de_datas(pergunta, HOJE) == esperado
+
+    def test_mes_sem_ano_e_a_ocorrencia_mais_recente(self):
+        assert extracao.intervalo_de_datas("vendas em maio", HOJE) == (date(2025, 5, 1), date(2025, 5, 31))
+        assert extracao.intervalo_de_datas("vendas em junho", HOJE) == (date(2024, 6, 1), date(2024, 6, 30))
+
+    def test_mes_passado_no_inicio_do_ano(self):
+        assert extracao.intervalo_de_datas("vendas do mês passado", date(2025, 1, 10)) == \
+            (date(2024, 12, 1), date(2024, 12, 31))
+
+    @pytest.mark.parametrize("pergunta", ["vendas de 2024-02-30", "liste as vendas", "vendas do Marco"])
+    def test_sem_periodo_valido(self, pergunta):
+        assert extracao.intervalo_de_datas(pergunta, HOJE) is None
+
+
+class TestIdentificador:
+    """Ids com marcador explícito ou número solto."""
+
+    @pytest.mark.parametrize("pergunta,esperado", [
+        ("cliente 12", 12),
+        ("dados do cliente id 7 em 2024", 7),
+        ("venda nº 33", 33),
+        ("venda #5", 5),
+        ("projeto código: 8", 8),
+        ("vendas de 2023 do cliente 8", 8),
+    ])
+    def test_encontra(self, pergunta, esperado):
+        assert extracao.identificador(pergunta, HOJE) == esperado
+
+    @pytest.mark.parametrize("pergunta", ["projetos do cliente 4 e 5", "qual cliente?", "vendas de 01/02/2024"])
+    def test_ausente_ou_ambiguo(self, pergunta):
+        assert extracao.identificador(pergunta, HOJE) is None
+
+
+class TestExtrair:
+    """Valores por placeholder de cada mapeamento."""
+
+    def test_periodo(self):
+        valores = extracao.extrair("vendas do mês passado", 'vendas-periodo', ('start_date', 'end_date'), hoje=HOJE)
+        assert valores == {'start_date': date(2025, 4, 1), 'end_date': date(2025, 4, 30)}
+
+    def test_nome_do_funcionario_conhecido(self):
+        valores = extracao.extrair("quem é Maria Oliveira?", 'funcionario-por-nome', ('nome',),
+                                   mencoes("quem é Maria Oliveira?"))
+        assert valores == {'nome': 'Maria Oliveira'}
+
+    def test_nome_pela_entidade_do_spacy(self):
+        valores = extracao.extrair("quem é Pedro Souza?", 'funcionario-por-nome', ('nome',), mencoes("quem é Pedro Souza?"),
+                                   entidades=[('Pedro Souza', 'PER')])
+        assert valores == {'nome': 'Pedro Souza'}
+
+    def test_departamento_nao_usa_spacy(self):
+        valores = extracao.extrair("departamento Jurídico", 'departamento-por-nome', ('nome',), mencoes("departamento Jurídico"),
+                                   entidades=[('Jurídico', 'ORG')])
+        assert valores == {}
+
+    def test_cliente_id_pelo_nome(self):
+        valores = extracao.extrair("projetos da Moda & Cia", 'projetos-por-cliente', ('cliente_id',),
+                                   mencoes("projetos da Moda & Cia"))
+        assert valores == {'cliente_id': 11}
+
+    def test_cliente_id_pelo_numero(self):
+        valores = extracao.extrair("projetos do cliente 42", 'projetos-por-cliente', ('cliente_id',),
+                                   mencoes("projetos do cliente 42"))
+        assert valores == {'cliente_id': 42}
+
+    def test_id_pelo_nome_do_projeto(self):
+        pergunta = "detalhes do projeto site institucional"
+        assert extracao.extrair(pergunta, 'projeto-por-id', ('id',), mencoes(pergunta)) == {'id': 21}
+
+    def test_id_sem_entidade_no_label(self):
+        pergunta = "detalhes da venda do projeto Site Institucional"
+        assert extracao.extrair(pergunta, 'venda-por-id', ('id',), mencoes(pergunta)) == {}
+
+    def test_nao_resolvido_fica_de_fora(self):
+        assert extracao.extrair("detalhes da venda", 'venda-por-id', ('id',), hoje=HOJE) == {}
+
+
+class TestVincularParametros:
+    """Etapa de parâmetros em processar_pergunta."""
+
+    def test_placeholder_vira_parametro(self):
+        from app.app import processar_pergunta
+
+        with patch('app.app.selecionar_queries',
+                   return_value=[('vendas-periodo', "SELECT * FROM vendas WHERE data_venda BETWEEN "
+                                                    "'{start_date}' AND '{end_date}';")]), \
+             patch('app.app.executar_query_em_fluxo', return_value=iter([(1,)])) as mock_fluxo, \
+             patch('app.app.enviar_para_gemini', return_value='ok'), \
+             patch('app.app.inserir_log'):
+            resultado = processar_pergunta("vendas entre 01/01/2024 e 31/03/2024")
+
+        sql, _deadline, params = mock_fluxo.call_args.args
+        assert "BETWEEN %(start_date)s AND %(end_date)s" in sql
+        assert params == {'start_date': date(2024, 1, 1), 'end_date': date(2024, 3, 31)}
+        assert resultado['sucesso_sql'] is True
+        # Log e resposta trazem os valores consultados
+        assert resultado['sqls_usadas'] == ("SELECT * FROM vendas WHERE data_venda BETWEEN "
+                                            "'2024-01-01'::date AND '2024-03-31'::date;")
+
+    def test_parametro_ausente_pula_sem_ir_ao_banco(self):
+        from app.app import processar_pergunta
+
+        consultas = [('venda-por-id', 'SELECT * FROM vendas WHERE id = {id};'),
+                     ('vendas-total', 'SELECT COUNT(*) FROM vendas;')]
+        with patch('app.app.selecionar_queries', return_value=consultas), \
+             patch('app.app.executar_query', return_value=[(7,)]) as mock_exec, \
+             patch('app.app.enviar_para_gemini', return_value='ok'), \
+             patch('app.app.inserir_log'):
+            resultado = processar_pergunta("quantas vendas temos?")
+
+        mock_exec.assert_called_once_with('SELECT COUNT(*) FROM vendas;', None, None)
+        assert resultado['sqls_usadas'] == 'SELECT COUNT(*) FROM vendas;'
+        assert resultado['sucesso_sql'] is True
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para os endpoints de gráfico (app/graphs.py).
+"""
+
+import datetime
+import gzip
+import json
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from app import graphs
+
+
+def conexao(respostas):
+    """
+    Conexão falsa: cada execute() consome a próxima resposta da lista
+    (lista de linhas, ou uma exceção para simular erro no banco).
+    """
+    fila = list(respostas)
+    cur = MagicMock()
+    estado = {}
+
+    def execute(sql, params=None):
+        resposta = fila.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        estado['linhas'] = resposta
+
+    cur.execute.side_effect = execute
+    cur.fetchall.side_effect = lambda: estado['linhas']
+    cur.fetchone.side_effect = lambda: estado['linhas'][0] if estado['linhas'] else None
+    conn = MagicMock()
+    conn.cursor.return_value = cur
+    return conn
+
+
+ATUALIZADO = datetime.datetime(2025, 3, 1, 12, 30, tzinfo=datetime.timezone.utc)
+
+
+class TestRollups:
+    """Leitura dos gráficos pelos rollups, com fallback ao vivo."""
+
+    def test_le_do_rollup_quando_preenchido(self):
+        conn = conexao([[(ATUALIZADO,)], [('2025-01', Decimal('10.00'))]])
+        with patch('app.graphs.get_db_connection', return_value=conn):
+            resposta = graphs.app.test_client().get('/api/query/total_vendas_por_mes')
+
+        assert resposta.status_code == 200
+        assert json.loads(resposta.data) == [{'mes': '2025-01', 'total_vendas': 10.0}]
+        assert resposta.headers['X-Fonte-Dados'] == 'rollup'
+        assert resposta.headers['X-Dados-Atualizados-Em'] == ATUALIZADO.isoformat()
+        assert resposta.headers['Last-Modified'] == 'Sat, 01 Mar 2025 12:30:00 GMT'
+        sql_executada = conn.cursor.return_value.execute.call_args_list[1][0][0]
+        assert 'rollup_vendas_mes' in sql_executada
+
+    def test_rollup_nao_preenchido_usa_consulta_ao_vivo(self):
+        conn = conexao([[(None,)], [('Concluído', 3)]])
+        with patch('app.graphs.get_db_connection', return_value=conn):
+            resposta = graphs.app.test_client().get('/api/query/projetos_por_status')
+
+        assert json.loads(resposta.data) == [{'status': 'Concluído', 'quantidade': 3}]
+        assert resposta.headers['X-Fonte-Dados'] == 'ao-vivo'
+        sql_executada = conn.cursor.return_value.execute.call_args_list[1][0][0]
+        assert sql_executada == graphs.CONSULTAS['projetos_por_status']
+
+    def test_sem_migracao_faz_rollback_e_usa_consulta_ao_vivo(self):
+        erro = psycopg2.errors.UndefinedTable('relation "rollup_atualizacao" does not exist')
+        conn = conexao([erro, [('Cliente A', Decimal('5.00'))]])
+        with patch('app.graphs.get_db_connection', return_value=conn):
+            resposta = graphs.app.test_client().get('/api/query/receita_por_cliente')
+
+        assert resposta.status_code == 200
+        assert resposta.headers['X-Fonte-Dados'] == 'ao-vivo'
+        conn.rollback.assert_called_once()
+
+    def test_rollups_desligados(self):
+        conn = conexao([[('Vendas', 4)]])
+        with patch('app.graphs.get_db_connection', return_value=conn), \
+                patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            resposta = graphs.app.test_client().get('/api/query/funcionarios_por_departamento')
+
+        assert resposta.headers['X-Fonte-Dados'] == 'ao-vivo'
+        assert conn.cursor.return_value.execute.call_count == 1
+
+    @pytest.mark.parametrize('nome', sorted(graphs.CONSULTAS))
+    def test_rollup_para_cada_consulta(self, nome):
+        _rollup, sql = graphs.CONSULTAS_ROLLUP[nome]
+        assert 'rollup_' in sql
+
+
+class TestDashboard:
+    """Endpoint /api/dashboard: todas as séries numa resposta, com ETag."""
+
+    def respostas_ao_vivo(self):
+        return [[('2025-01', Decimal('10.00'))], [('Vendas', 4)], [('Concluído', 3)], [('Cliente A', Decimal('5.00'))]]
+
+    def test_retorna_todas_as_series_numa_conexao(self):
+        conn = conexao(self.respostas_ao_vivo())
+        with patch('app.graphs.get_db_connection', return_value=conn) as conectar, \
+                patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            resposta = graphs.app.test_client().get('/api/dashboard')
+
+        assert resposta.status_code == 200
+        corpo = json.loads(resposta.data)
+        assert set(corpo['series']) == set(graphs.CONSULTAS)
+        assert corpo['series']['funcionarios_por_departamento'] == [{'departamento': 'Vendas', 'quantidade': 4}]
+        assert set(corpo['fontes'].values()) == {'ao-vivo'}
+        assert set(corpo['atualizado_em']) == set(graphs.CONSULTAS)
+        assert resposta.headers['ETag']
+        conectar.assert_called_once()
+        conn.close.assert_called_once()
+
+    def test_seleciona_series_pelo_parametro(self):
+        conn = conexao([[(ATUALIZADO,)], [('Concluído', 3)]])
+        with patch('app.graphs.get_db_connection', return_value=conn):
+            resposta = graphs.app.test_client().get('/api/dashboard?series=projetos_por_status')
+
+        corpo = json.loads(resposta.data)
+        assert list(corpo['series']) == ['projetos_por_status']
+        assert corpo['fontes'] == {'projetos_por_status': 'rollup'}
+        assert corpo['atualizado_em'] == {'projetos_por_status': ATUALIZADO.isoformat()}
+
+    def test_serie_desconhecida(self):
+        with patch('app.graphs.get_db_connection') as conectar:
+            resposta = graphs.app.test_client().get('/api/dashboard?series=projetos_por_status,inexistente')
+
+        assert resposta.status_code == 400
+        assert 'inexistente' in json.loads(resposta.data)['error']
+        conectar.assert_not_called()
+
+    def test_etag_igual_devolve_304(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            with patch('app.graphs.get_db_connection', return_value=conexao(self.respostas_ao_vivo())):
+                primeira = cliente.get('/api/dashboard')
+            etag = primeira.headers['ETag']
+            with patch('app.graphs.get_db_connection', return_value=conexao(self.respostas_ao_vivo())):
+                segunda = cliente.get('/api/dashboard', headers={'If-None-Match': etag})
+
+        assert segunda.status_code == 304
+        assert segunda.data == b''
+
+    def test_dados_diferentes_mudam_o_etag(self):
+        cliente = graphs.app.test_client()
+        respostas = self.respostas_ao_vivo()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            with patch('app.graphs.get_db_connection', return_value=conexao(respostas)):
+                etag = cliente.get('/api/dashboard').headers['ETag']
+            respostas[3] = [('Cliente A', Decimal('6.00'))]
+            graphs.cache_respostas.limpar()
+            with patch('app.graphs.get_db_connection', return_value=conexao(respostas)):
+                resposta = cliente.get('/api/dashboard', headers={'If-None-Match': etag})
+
+        assert resposta.status_code == 200
+        assert resposta.headers['ETag'] != etag
+
+    def test_erro_na_consulta(self):
+        conn = conexao([psycopg2.OperationalError('conexão perdida')])
+        with patch('app.graphs.get_db_connection', return_value=conn), \
+                patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            resposta = graphs.app.test_client().get('/api/dashboard')
+
+        assert resposta.status_code == 500
+        conn.close.assert_called_once()
+
+
+class TestCacheHttp:
+    """Cache das respostas dos gráficos: ETag, compressão e Cache-Control."""
+
+    def test_segunda_requisicao_vem_do_cache(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch('app.graphs.get_db_connection', return_value=conexao([[('Concluído', 3)]])) as conectar:
+            primeira = cliente.get('/api/query/projetos_por_status')
+            segunda = cliente.get('/api/query/projetos_por_status')
+
+        assert primeira.headers['X-Cache'] == 'miss'
+        assert segunda.headers['X-Cache'] == 'hit'
+        assert segunda.data == primeira.data
+        assert segunda.headers['X-Fonte-Dados'] == 'ao-vivo'
+        assert segunda.headers['Cache-Control'].startswith('public, max-age=')
+        assert 'stale-while-revalidate=' in segunda.headers['Cache-Control']
+        conectar.assert_called_once()
+
+    def test_if_none_match_devolve_304(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch('app.graphs.get_db_connection', return_value=conexao([[('Concluído', 3)]])):
+            etag = cliente.get('/api/query/projetos_por_status').headers['ETag']
+            resposta = cliente.get('/api/query/projetos_por_status', headers={'If-None-Match': etag})
+
+        assert resposta.status_code == 304
+        assert resposta.data == b''
+
+    def test_gzip_pelo_accept_encoding(self):
+        linhas = [(f'Cliente {i}', Decimal('1000.00')) for i in range(50)]
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch('app.graphs.get_db_connection', return_value=conexao([linhas])), \
+                patch('app.cache_graficos.brotli', None):
+            sem = cliente.get('/api/query/receita_por_cliente')
+            com = cliente.get('/api/query/receita_por_cliente', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in sem.headers
+        assert com.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(com.data) == sem.data
+        assert com.headers['ETag'] != sem.headers['ETag']
+        assert 'Accept-Encoding' in com.headers['Vary']
+
+    def test_cache_desligado(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch.object(graphs.cache_respostas, 'ttl', 0), \
+                patch('app.graphs.get_db_connection',
+                      side_effect=lambda: conexao([[('Vendas', 4)]])) as conectar:
+            cliente.get('/api/query/funcionarios_por_departamento')
+            resposta = cliente.get('/api/query/funcionarios_por_departamento')
+
+        assert resposta.headers['X-Cache'] == 'desligado'
+        assert resposta.headers['Cache-Control'] == 'no-cache'
+        assert conectar.call_count == 2
+
+    def test_erro_nao_e_guardado(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            with patch('app.graphs.get_db_connection', return_value=None):
+                assert cliente.get('/api/query/projetos_por_status').status_code == 500
+            with patch('app.graphs.get_db_connection', return_value=conexao([[('Concluído', 3)]])):
+                resposta = cliente.get('/api/query/projetos_por_status')
+
+        assert resposta.status_code == 200
+        assert resposta.headers['X-Cache'] == 'miss'
+
+
+ARROW = 'application/vnd.apache.arrow.stream'
+
+
+class TestArrow:
+    """Respostas Arrow IPC com Accept: application/vnd.apache.arrow.stream."""
+
+    def test_serie_em_arrow(self):
+        pyarrow = pytest.importorskip('pyarrow')
+        linhas = [(f'Cliente {i}', Decimal(f'{i}000.50')) for i in range(5)]
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch('app.graphs.get_db_connection', side_effect=lambda: conexao([linhas])):
+            como_json = cliente.get('/api/query/receita_por_cliente')
+            como_arrow = cliente.get('/api/query/receita_por_cliente', headers={'Accept': ARROW})
+
+        assert como_arrow.status_code == 200
+        assert como_arrow.content_type == ARROW
+        assert 'Accept' in como_arrow.headers['Vary']
+        tabela = pyarrow.ipc.open_stream(como_arrow.data).read_all()
+        assert tabela.to_pylist() == json.loads(como_json.data)
+        assert como_arrow.headers['ETag'] != como_json.headers['ETag']
+
+    def test_json_continua_o_padrao(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch('app.graphs.get_db_connection', return_value=conexao([[('Concluído', 3)]])):
+            resposta = cliente.get('/api/query/projetos_por_status', headers={'Accept': '*/*'})
+        assert resposta.content_type == 'application/json'
+
+    def test_sem_pyarrow_406(self):
+        with patch('app.serializacao.pyarrow', None):
+            resposta = graphs.app.test_client().get('/api/query/projetos_por_status', headers={'Accept': ARROW})
+        assert resposta.status_code == 406
+
+
+class TestParametros:
+    """Intervalo de datas, granularidade, top-N e max_pontos nos gráficos."""
+
+    def executar(self, url, respostas, rollups=True):
+        conn = conexao(respostas)
+        with patch('app.graphs.get_db_connection', return_value=conn), \
+                patch('app.graphs.GRAFICOS_ROLLUPS', rollups):
+            resposta = graphs.app.test_client().get(url)
+        return resposta, conn.cursor.return_value.execute.call_args_list
+
+    @pytest.mark.parametrize('query', [
+        'inicio=2025-13-01', 'inicio=2025-03-01&fim=2025-01-01', 'granularidade=ano',
+        'top=0', 'top=abc', 'max_pontos=2',
+    ])
+    def test_parametros_invalidos(self, query):
+        with patch('app.graphs.get_db_connection') as conectar:
+            resposta = graphs.app.test_client().get(f'/api/query/total_vendas_por_mes?{query}')
+        assert resposta.status_code == 400
+        assert 'error' in json.loads(resposta.data)
+        conectar.assert_not_called()
+
+    def test_granularidade_semanal_usa_consulta_ao_vivo(self):
+        resposta, chamadas = self.executar(
+            '/api/query/total_vendas_por_mes?granularidade=semana&inicio=2025-01-01&fim=2025-01-31',
+            [[('2025-S01', Decimal('10.00'), 1735516800)]])
+
+        assert json.loads(resposta.data) == [{'mes': '2025-S01', 'total_vendas': 10.0}]
+        assert resposta.headers['X-Fonte-Dados'] == 'ao-vivo'
+        assert len(chamadas) == 1
+        sql, params = chamadas[0][0]
+        assert "DATE_TRUNC('week', data_venda)" in sql
+        assert params == [datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)]
+
+    def test_meses_inteiros_usam_o_rollup(self):
+        resposta, chamadas = self.executar(
+            '/api/query/total_vendas_por_mes?inicio=2025-01-01&fim=2025-02-28',
+            [[(ATUALIZADO,)], [('2025-01', Decimal('10.00'), 1735689600)]])
+
+        assert resposta.headers['X-Fonte-Dados'] == 'rollup'
+        sql, params = chamadas[1][0]
+        assert 'rollup_vendas_mes' in sql
+        assert params == [datetime.date(2025, 1, 1), datetime.date(2025, 3, 1)]
+
+    def test_mes_parcial_nao_usa_o_rollup(self):
+        resposta, chamadas = self.executar('/api/query/total_vendas_por_mes?inicio=2025-01-15',
+                                           [[('2025-01', Decimal('10.00'), 1735689600)]])
+        assert resposta.headers['X-Fonte-Dados'] == 'ao-vivo'
+        assert len(chamadas) == 1
+
+    def test_top_n_de_clientes(self):
+        resposta, chamadas = self.executar('/api/query/receita_por_cliente?top=10',
+                                           [[(ATUALIZADO,)], [('Cliente A', Decimal('5.00'))]])
+        assert resposta.headers['X-Fonte-Dados'] == 'rollup'
+        assert 'LIMIT 10;' in chamadas[1][0][0]
+
+    def test_receita_com_intervalo_usa_consulta_ao_vivo(self):
+        resposta, chamadas = self.executar('/api/query/receita_por_cliente?inicio=2025-01-01',
+                                           [[('Cliente A', Decimal('5.00'))]])
+        assert resposta.headers['X-Fonte-Dados'] == 'ao-vivo'
+        sql, params = chamadas[0][0]
+        assert 'v.data_venda >= %s' in sql and 'LIMIT 5;' in sql
+        assert params == [datetime.date(2025, 1, 1)]
+
+    def test_serie_longa_e_reduzida(self):
+        linhas = [(f'2025-{i:05d}', Decimal(i % 7), i * 86400) for i in range(1000)]
+        resposta, _chamadas = self.executar('/api/query/total_vendas_por_mes?granularidade=dia&max_pontos=50',
+                                            [linhas], rollups=False)
+
+        dados = json.loads(resposta.data)
+        assert len(dados) == 50
+        assert dados[0]['mes'] == '2025-00000' and dados[-1]['mes'] == '2025-00999'
+        assert resposta.headers['X-Pontos-Originais'] == '1000'
+
+    def test_parametros_entram_na_chave_do_cache(self):
+        cliente = graphs.app.test_client()
+        with patch('app.graphs.GRAFICOS_ROLLUPS', False), \
+                patch('app.graphs.get_db_connection',
+                      side_effect=lambda: conexao([[('Cliente A', Decimal('5.00'))]])) as conectar:
+            cliente.get('/api/query/receita_por_cliente?top=3')
+            cliente.get('/api/query/receita_por_cliente?top=3&granularidade=dia')
+            cliente.get('/api/query/receita_por_cliente?top=4')
+
+        # granularidade não afeta receita_por_cliente: a segunda requisição é hit
+        assert conectar.call_count == 2
+
+    def test_dashboard_repassa_os_parametros(self):
+        conn = conexao([[('2025-T1', Decimal('10.00'), 1735689600)], [('Cliente A', Decimal('5.00'))]])
+        with patch('app.graphs.get_db_connection', return_value=conn), \
+                patch('app.graphs.GRAFICOS_ROLLUPS', False):
+            resposta = graphs.app.test_client().get(
+                '/api/dashboard?series=total_vendas_por_mes,receita_por_cliente&granularidade=trimestre&top=2')
+
+        corpo = json.loads(resposta.data)
+        assert corpo['series']['total_vendas_por_mes'] == [{'mes': '2025-T1', 'total_vendas': 10.0}]
+        chamadas = conn.cursor.return_value.execute.call_args_list
+        assert "DATE_TRUNC('quarter', data_venda)" in chamadas[0][0][0]
+        assert 'LIMIT 2;' in chamadas[1][0][0]
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a tabela de lemas do caminho rápido (app/lematizador.py)
+e para o uso dela em extrair_lemmas (app/app.py).
+"""
+
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app import lematizador, metrics
+
+ENTRADAS = {
+    'quantos': ('quanto', True),
+    'funcionários': ('funcionário', False),
+    'temos': ('ter', True),
+    'vendas': ('venda', False),
+    'de': ('de', True),
+    'em': ('em', True),
+    'total': ('total', False),
+}
+
+# Lemas e stopwords de um pipeline de mentira para gerar()
+LEMAS_FALSOS = {
+    'vendas': ['venda'], 'total': ['total'], 'de': ['de'], 'o': ['o'],
+    'contratos': ['contrato'], 'ativos': ['ativo', 'ativar', 'ativo'],
+}
+STOPWORDS_FALSAS = {'de', 'o'}
+
+
+class NlpFalso:
+    meta = {'lang': 'pt', 'name': 'falso', 'version': '1.0'}
+
+    def __init__(self):
+        self._vezes = {}
+
+    def tokenizer(self, texto):
+        return [SimpleNamespace(text=t) for t in texto.replace('-', ' - ').split()]
+
+    def _token(self, texto):
+        lemas = LEMAS_FALSOS.get(texto, [texto])
+        vez = self._vezes.get(texto, 0)
+        self._vezes[texto] = vez + 1
+        return SimpleNamespace(text=texto, lemma_=lemas[vez % len(lemas)], is_stop=texto in STOPWORDS_FALSAS,
+                               is_alpha=texto.isalpha())
+
+    def pipe(self, textos):
+        for texto in textos:
+            yield [self._token(t.text) for t in self.tokenizer(texto)]
+
+
+@pytest.fixture
+def tabela():
+    return lematizador.TabelaLemas(ENTRADAS, 'pt_falso-1.0')
+
+
+class TestTabelaLemas:
+    """Lematização pela tabela."""
+
+    def test_todas_conhecidas(self, tabela):
+        assert tabela.lemas("Quantos funcionários temos?") == {'funcionário'}
+        assert tabela.lemas("total de vendas em 2024, (vendas)") == {'total', 'venda'}
+
+    def test_desconhecida_manda_para_o_spacy(self, tabela):
+        assert tabela.lemas("quantos clientes temos") is None
+
+    def test_pontuacao_no_meio_manda_para_o_spacy(self, tabela):
+        assert tabela.lemas("vendas/total") is None
+        assert tabela.lemas("R$ 100") is None
+
+    def test_vazio(self, tabela):
+        assert tabela.lemas("  ?! 10 ") == set()
+
+    def test_salvar_e_ler(self, tabela, tmp_path):
+        caminho = tmp_path / 'lemas.tsv'
+        tabela.salvar(caminho)
+        assert caminho.read_text(encoding='utf-8').splitlines()[:3] == [
+            '# modelo\tpt_falso-1.0', 'de\t\t1', 'em\t\t1']
+        lida = lematizador.TabelaLemas.ler(caminho)
+        assert lida.modelo == 'pt_falso-1.0'
+        assert lida._entradas == ENTRADAS
+
+
+class TestCarregar:
+    """Carga na subida, com as verificações que desligam o caminho rápido."""
+
+    def test_arquivo_ausente(self, tmp_path):
+        assert lematizador.carregar(tmp_path / 'nao_existe.tsv') is None
+
+    def test_arquivo_invalido(self, tmp_path):
+        caminho = tmp_path / 'lemas.tsv'
+        caminho.write_text('vendas\tvenda\n', encoding='utf-8')
+        assert lematizador.carregar(caminho) is None
+
+    def test_modelo_diferente(self, tabela, tmp_path):
+        caminho = tmp_path / 'lemas.tsv'
+        tabela.salvar(caminho)
+        assert lematizador.carregar(caminho, modelo='pt_core_news_sm-3.8.0') is None
+        assert len(lematizador.carregar(caminho, modelo='pt_falso-1.0')) == len(ENTRADAS)
+
+    def test_desligado(self, tabela, tmp_path):
+        caminho = tmp_path / 'lemas.tsv'
+        tabela.salvar(caminho)
+        with patch.object(lematizador, 'LEMATIZACAO_RAPIDA', False):
+            assert lematizador.carregar(caminho) is None
+
+
+class TestTabelaDistribuida:
+    """
+    O app/lemas_pt.tsv que vai no pacote, gerado no CI por loadtest.gerar_lemas
+    (o job falha se ele não for gerado); fora do CI, sem o arquivo, os testes pulam.
+    """
+
+    def test_arquivo_valido(self):
+        if not os.path.isfile(lematizador.LEMAS_ARQUIVO):
+            pytest.skip(f"{lematizador.LEMAS_ARQUIVO} não gerado; gere com: python -m loadtest.gerar_lemas")
+        tabela = lematizador.TabelaLemas.ler(lematizador.LEMAS_ARQUIVO)
+        assert len(tabela) > 0
+        assert tabela.lemas("Quantos funcionários temos?") is not None
+
+    def test_gerado_pelo_modelo_instalado(self):
+        import spacy
+
+        from app.app import MODELO_SPACY
+
+        versao = spacy.util.get_package_version(MODELO_SPACY)
+        if not versao:
+            pytest.skip(f"modelo {MODELO_SPACY} não instalado")
+        if not os.path.isfile(lematizador.LEMAS_ARQUIVO):
+            pytest.skip(f"{lematizador.LEMAS_ARQUIVO} não gerado")
+        tabela = lematizador.TabelaLemas.ler(lematizador.LEMAS_ARQUIVO)
+        assert tabela.modelo == f"{MODELO_SPACY}-{versao}", (
+            "tabela gerada com outro modelo; regere com: python -m loadtest.gerar_lemas")
+
+
+class TestGerar:
+    """Geração da tabela a partir do pipeline spaCy."""
+
+    def test_lema_mais_frequente_e_stopwords(self):
+        nlp = NlpFalso()
+        tabela = lematizador.gerar(nlp, ["Total de vendas", "contratos ativos", "ativos", "ativos"], ['o', 'de'])
+        assert tabela.modelo == 'pt_falso-1.0'
+        assert tabela._entradas == {
+            'total': ('total', False), 'de': ('de', True), 'vendas': ('venda', False),
+            'contratos': ('contrato', False), 'ativos': ('ativo', False), 'o': ('o', True)}
+
+    def test_ignora_numeros_e_formas_que_o_tokenizador_quebra(self):
+        tabela = lematizador.gerar(NlpFalso(), ["vendas 2024"], ['pós-venda'])
+        assert set(tabela._entradas) == {'vendas'}
+
+
+class TestExtrairLemmas:
+    """extrair_lemmas com e sem a tabela carregada."""
+
+    def test_caminho_rapido_nao_chama_o_spacy(self, tabela):
+        from app import app as app_module
+
+        metrics.LEMATIZACAO_TOTAL.reset()
+        metrics.CACHE_TOTAL.reset()
+        with patch.object(app_module, 'tabela_lemas', tabela), patch('app.app.nlp') as nlp:
+            assert app_module.extrair_lemmas("Quantos funcionários temos?") == {'funcionário'}
+        nlp.assert_not_called()
+        assert metrics.LEMATIZACAO_TOTAL.valor('tabela') == 1
+        assert metrics.CACHE_TOTAL.valor('tabela_lemas', 'hit') == 1
+
+    def test_palavra_desconhecida_usa_o_spacy(self, tabela):
+        from app import app as app_module
+
+        token = SimpleNamespace(lemma_='cliente', is_alpha=True, is_stop=False)
+        metrics.LEMATIZACAO_TOTAL.reset()
+        metrics.CACHE_TOTAL.reset()
+        with patch.object(app_module, 'tabela_lemas', tabela), \
+             patch('app.app.nlp', return_value=[token]) as nlp:
+            assert app_module.extrair_lemmas("quantos clientes temos") == {'cliente'}
+        nlp.assert_called_once_with("quantos clientes temos")
+        assert metrics.LEMATIZACAO_TOTAL.valor('spacy') == 1
+        assert metrics.CACHE_TOTAL.valor('tabela_lemas', 'miss') == 1
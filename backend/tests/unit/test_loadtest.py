@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o harness de teste de carga (loadtest/).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+import requests
+from flask import Flask
+from werkzeug.serving import make_server
+
+from loadtest.analisar_planos import analisar_plano, comandos_sql, consultas_da_carga
+from loadtest.carga import DIR_DB, ENDPOINTS_GRAFICOS, executar_carga, percentil
+from loadtest.gerar_dados import FluxoCopy, GeradorStolf, TABELAS, contagens, linha_copy
+from loadtest.perguntas import gerar_perguntas
+from loadtest.replay import (RegistroLog, comparar_com_baseline, ler_logs_arquivo, normalizar_sqls, rotulos_por_sql,
+                             replay)
+from loadtest.stub_gemini import criar_servidor, parse_latencia
+
+
+@pytest.fixture
+def stub_gemini():
+    """Stub do Gemini em uma porta livre, sem latência."""
+    servidor = criar_servidor(porta=0, latencia='fixa:0', chunks=3)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/v1beta"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class TestPercentil:
+    """Testes para o cálculo de percentis."""
+
+    def test_percentis_posto_mais_proximo(self):
+        valores = list(range(1, 101))
+        assert percentil(valores, 50) == 50
+        assert percentil(valores, 95) == 95
+        assert percentil(valores, 99) == 99
+        assert percentil(valores, 100) == 100
+
+    def test_percentil_lista_pequena(self):
+        assert percentil([7], 99) == 7
+        assert percentil([], 50) is None
+
+
+class TestLatencia:
+    """Testes para as distribuições de latência do stub."""
+
+    def test_fixa(self):
+        assert parse_latencia('fixa:250')() == 0.25
+
+    def test_uniforme_no_intervalo(self):
+        sortear = parse_latencia('uniforme:100:200')
+        assert all(0.1 <= sortear() <= 0.2 for _ in range(100))
+
+    def test_lognormal_mediana(self):
+        sortear = parse_latencia('lognormal:900:0.4')
+        amostras = sorted(sortear() for _ in range(2001))
+        assert 0.8 < amostras[1000] < 1.0
+
+    @pytest.mark.parametrize("spec", ['gama:1:2', 'fixa', 'uniforme:a:b'])
+    def test_especificacao_invalida(self, spec):
+        with pytest.raises(ValueError):
+            parse_latencia(spec)
+
+
+class TestPerguntas:
+    """Testes para o mix sintético de perguntas."""
+
+    def test_deterministico(self):
+        assert gerar_perguntas(50, semente=3) == gerar_perguntas(50, semente=3)
+
+    def test_quantidade_e_variedade(self):
+        perguntas = gerar_perguntas(500, semente=1)
+        assert len(perguntas) == 500
+        assert len(set(perguntas)) > 100
+
+
+class TestStubGemini:
+    """Testes do stub do Gemini."""
+
+    def test_generate_content(self, stub_gemini):
+        resposta = requests.post(f"{stub_gemini}/models/gemini-2.0-flash:generateContent?key=x",
+                                 json={'contents': [{'parts': [{'text': 'abc'}]}]}, timeout=5)
+        assert resposta.status_code == 200
+        assert 'Sophos' in resposta.json()['candidates'][0]['content']['parts'][0]['text']
+
+    def test_stream_generate_content(self, stub_gemini):
+        resposta = requests.post(f"{stub_gemini}/models/gemini-2.0-flash:streamGenerateContent?alt=sse",
+                                 json={'contents': [{'parts': [{'text': 'abc'}]}]}, timeout=5, stream=True)
+        eventos = [linha for linha in resposta.iter_lines() if linha.startswith(b'data: ')]
+        assert len(eventos) == 3
+        texto = ''.join(json.loads(e[6:])['candidates'][0]['content']['parts'][0]['text'] for e in eventos)
+        assert 'Sophos' in texto
+
+    def test_payload_invalido(self, stub_gemini):
+        resposta = requests.post(f"{stub_gemini}/models/m:generateContent", data=b'nada', timeout=5)
+        assert resposta.status_code == 400
+
+    def test_backend_usa_stub(self, stub_gemini):
+        """Com GEMINI_API_URL, enviar_para_gemini fala com o stub."""
+        from app.app import enviar_para_gemini
+
+        with patch.dict('os.environ', {'GEMINI_API_URL': stub_gemini}):
+            assert 'Sophos' in enviar_para_gemini("contexto de teste")
+
+
+class TestCarga:
+    """Teste de ponta a ponta do gerador de carga contra um app Flask mínimo."""
+
+    def test_relatorio_por_endpoint(self):
+        app = Flask(__name__)
+
+        @app.route('/pergunta', methods=['POST'])
+        def pergunta():
+            return {'resposta': 'ok'}
+
+        for endpoint in ENDPOINTS_GRAFICOS:
+            app.add_url_rule(endpoint, endpoint, lambda: {'dados': []})
+
+        servidor = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_port}"
+        args = argparse.Namespace(pergunta_url=url, graficos_url=url, concorrencia=4, duracao=0.5,
+                                  peso_pergunta=0.5, deadline_ms=None, timeout=5, semente=0)
+        try:
+            relatorio = executar_carga(args)
+        finally:
+            servidor.shutdown()
+
+        assert '/pergunta' in relatorio
+        for metricas in relatorio.values():
+            assert metricas['requisicoes'] > 0
+            assert metricas['erros'] == 0
+            assert metricas['p50_ms'] <= metricas['p95_ms'] <= metricas['p99_ms']
+
+
+class TestGeradorDados:
+    """Testes para o gerador de dados sintéticos da STOLF."""
+
+    def test_escala_vendas_linear_e_dimensoes_sublineares(self):
+        base, grande = contagens(1), contagens(10000)
+        assert grande['vendas'] == 10000 * base['vendas']
+        assert grande['funcionarios'] == 100 * base['funcionarios']
+        assert grande['departamentos'] <= 10 * base['departamentos']
+
+    def test_deterministico_pela_semente(self):
+        a = GeradorStolf(1, semente=7, data_final=datetime.date(2025, 1, 31))
+        b = GeradorStolf(1, semente=7, data_final=datetime.date(2025, 1, 31))
+        for tabela in TABELAS:
+            assert list(a.linhas(tabela)) == list(b.linhas(tabela))
+
+    def test_chaves_estrangeiras_validas(self):
+        gerador = GeradorStolf(5, data_final=datetime.date(2025, 1, 31))
+        n = gerador.n
+        for _id, projeto, funcionario, data, valor, status in gerador.vendas():
+            assert 1 <= projeto <= n['projetos']
+            assert 1 <= funcionario <= n['funcionarios']
+            assert datetime.date(2019, 1, 1) <= data <= datetime.date(2025, 1, 31)
+            assert valor > 0
+            assert status in ('Pago', 'Pendente', 'Atrasado')
+        for linha in gerador.funcionarios():
+            assert 1 <= linha[3] <= n['departamentos']
+        for linha in gerador.projetos():
+            assert 1 <= linha[2] <= n['clientes']
+
+    def test_linha_copy_escapa_caracteres_especiais(self):
+        assert linha_copy((1, None, True, 'a\tb\nc', datetime.date(2024, 5, 1))) == \
+            '1\t\\N\tt\ta\\tb\\nc\t2024-05-01\n'
+
+    def test_fluxo_copy_entrega_todas_as_linhas_em_blocos(self):
+        gerador = GeradorStolf(1, data_final=datetime.date(2025, 1, 31))
+        esperado = ''.join(linha_copy(linha) for linha in gerador.vendas()).encode('utf-8')
+        fluxo = FluxoCopy(gerador.vendas())
+        blocos = []
+        while True:
+            bloco = fluxo.read(4096)
+            if not bloco:
+                break
+            assert len(bloco) <= 4096
+            blocos.append(bloco)
+        assert b''.join(blocos) == esperado
+
+
+class TestReplay:
+    """Testes para o replay de logs_perguntas."""
+
+    def _registros(self, n, intervalo_s=1.0):
+        inicio = datetime.datetime(2025, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+        return [RegistroLog(f"pergunta {i}", f"SELECT {i};", True, inicio + datetime.timedelta(seconds=i * intervalo_s))
+                for i in range(n)]
+
+    def test_normalizar_sqls_ignora_espacos_e_separadores(self):
+        assert normalizar_sqls("SELECT  *\n FROM vendas;\nSELECT 1;") == \
+            normalizar_sqls("SELECT * FROM vendas;\n SELECT 1")
+        assert normalizar_sqls(None) == frozenset()
+
+    def test_mapeamento_com_placeholder_compara_com_os_valores_registrados(self):
+        from app.query_mapping import query_mappings
+
+        sqls = {label: q for _f, label, q in query_mappings}
+        # sql_gerada registra os valores consultados; rotear_pergunta devolve o modelo com placeholders
+        registrada = ("SELECT * FROM vendas WHERE data_venda BETWEEN '2024-01-01'::date "
+                      "AND '2024-03-31'::date;")
+        assert normalizar_sqls(registrada) == normalizar_sqls(sqls['vendas-periodo'])
+
+        registros = [RegistroLog("vendas no primeiro trimestre", registrada, True, None),
+                     RegistroLog("vendas do trimestre", registrada, True, None)]
+        roteamentos = iter([sqls['vendas-periodo'], sqls['vendas-total']])
+        relatorio = replay(registros, lambda p: next(roteamentos), rotulos=rotulos_por_sql())
+
+        rot = relatorio['roteamento']
+        assert rot['iguais'] == 1 and rot['divergentes'] == 1
+        assert rot['mapeamentos_removidos'] == {'vendas-periodo': 1}
+        assert rot['mapeamentos_adicionados'] == {'vendas-total': 1}
+
+    def test_literal_com_ponto_e_virgula(self):
+        registrada = "SELECT * FROM clientes WHERE nome_empresa ILIKE '%Acme; Ltda%';"
+        assert normalizar_sqls(registrada) == frozenset(
+            {"SELECT * FROM clientes WHERE nome_empresa ILIKE '%{nome_empresa}%'"})
+
+    def test_ler_arquivo_exportado_pelo_gerador(self, tmp_path):
+        gerador = GeradorStolf(1, data_final=datetime.date(2025, 1, 31))
+        caminho = tmp_path / 'logs_perguntas.tsv'
+        caminho.write_text(''.join(linha_copy(l) for l in gerador.logs_perguntas()), encoding='utf-8')
+
+        registros = list(ler_logs_arquivo(str(caminho)))
+        originais = list(gerador.logs_perguntas())
+        assert len(registros) == len(originais)
+        assert registros[0].pergunta == originais[0][1]
+        assert registros[0].sql_gerada == originais[0][2]
+        assert registros[0].data_hora == originais[0][5]
+
+    def test_relatorio_de_drift(self):
+        registros = self._registros(10)
+        # Metade roteia igual; a outra metade escolhe outra SQL
+        executar = lambda p: f"SELECT {p.split()[1]}" if int(p.split()[1]) % 2 == 0 else "SELECT 99"
+        relatorio = replay(registros, executar, concorrencia=2, rotulos={'SELECT 99': 'novo'})
+
+        rot = relatorio['roteamento']
+        assert relatorio['perguntas'] == 10
+        assert rot['iguais'] == 5 and rot['divergentes'] == 5
+        assert rot['taxa_drift'] == 0.5
+        assert rot['mapeamentos_adicionados'] == {'novo': 5}
+        assert sum(relatorio['latencia']['histograma'].values()) == 10
+
+    def test_erros_nao_entram_na_comparacao(self):
+        def executar(pergunta):
+            raise requests.Timeout()
+
+        relatorio = replay(self._registros(3), executar)
+        assert relatorio['erros'] == {'Timeout': 3}
+        assert relatorio['roteamento']['divergentes'] == 0
+        assert relatorio['latencia'] == {}
+
+    def test_ritmo_acelerado_respeita_intervalos(self):
+        # 4 perguntas a 1 s de distância, aceleradas 10x: pelo menos 0,3 s de replay
+        relatorio = replay(self._registros(4), lambda p: None, acelerar=10, concorrencia=4)
+        assert relatorio['duracao_s'] >= 0.29
+
+    def test_comparar_com_baseline(self):
+        atual = {'latencia': {'p50_ms': 110.0, 'p95_ms': 90.0}}
+        anterior = {'latencia': {'p50_ms': 100.0, 'p95_ms': 100.0}}
+        assert comparar_com_baseline(atual, anterior) == {'p50_ms': 10.0, 'p95_ms': -10.0}
+
+
+class TestAnalisarPlanos:
+    """Testes para o consultor de índices (análise dos planos do EXPLAIN)."""
+
+    def _explain(self):
+        return [{
+            'Plan': {
+                'Node Type': 'Hash Join', 'Plan Rows': 10, 'Actual Rows': 5000, 'Actual Loops': 1,
+                'Shared Hit Blocks': 12, 'Shared Read Blocks': 340,
+                'Plans': [
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'vendas', 'Plan Rows': 5000,
+                     'Actual Rows': 5000, 'Actual Loops': 1, 'Rows Removed by Filter': 95000,
+                     'Filter': "(data_venda >= '2024-01-01'::date)"},
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'departamentos', 'Plan Rows': 4,
+                     'Actual Rows': 4, 'Actual Loops': 1},
+                    {'Node Type': 'Index Scan', 'Relation Name': 'projetos', 'Plan Rows': 1,
+                     'Actual Rows': 0, 'Actual Loops': 0},
+                ],
+            },
+            'Planning Time': 0.4,
+            'Execution Time': 85.2,
+        }]
+
+    def test_relata_seq_scan_grande_e_ignora_tabela_pequena(self):
+        resumo = analisar_plano(self._explain())
+        assert [s['tabela'] for s in resumo['seq_scans']] == ['vendas']
+        assert resumo['seq_scans'][0]['linhas_lidas'] == 100000
+        assert resumo['execucao_ms'] == 85.2
+        assert resumo['blocos_lidos'] == 340
+
+    def test_relata_estimativa_ruim(self):
+        ruins = analisar_plano(self._explain())['estimativas_ruins']
+        assert ruins == [{'no': 'Hash Join', 'tabela': None, 'estimadas': 10, 'reais': 5000, 'fator': 500.0}]
+
+    def test_consultas_da_carga_sem_placeholders(self):
+        consultas = consultas_da_carga()
+        nomes = [nome for nome, _sql in consultas]
+        assert 'graficos/receita_por_cliente' in nomes
+        assert all('{' not in sql for _nome, sql in consultas)
+
+    def test_migracao_de_indices_separada_em_comandos(self):
+        with open(os.path.join(DIR_DB, 'migrations', '001_indices.sql'), encoding='utf-8') as f:
+            comandos = comandos_sql(f.read())
+        assert 'CREATE EXTENSION IF NOT EXISTS pg_trgm' in comandos
+        indices = [c for c in comandos if c.startswith('CREATE INDEX')]
+        assert indices and all('CONCURRENTLY IF NOT EXISTS' in c for c in indices)
+        assert any('gin_trgm_ops' in c for c in indices)
+
+    def test_corpos_de_funcao_nao_sao_quebrados(self):
+        with open(os.path.join(DIR_DB, 'migrations', '002_rollups.sql'), encoding='utf-8') as f:
+            comandos = comandos_sql(f.read())
+        funcoes = [c for c in comandos if c.startswith('CREATE OR REPLACE FUNCTION')]
+        assert len(funcoes) == 4
+        assert all(c.endswith('$$') for c in funcoes)
+        assert comandos[-1] == 'SELECT rollup_recalcular()'
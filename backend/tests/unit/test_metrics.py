@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para as métricas no formato Prometheus (app/metrics.py).
+"""
+
+import threading
+
+import pytest
+
+from app.metrics import Counter, Gauge, Histogram, Registro
+
+
+class TestHistogram:
+    """Testes para o histograma com shards por thread."""
+
+    def test_buckets_acumulados(self):
+        """Os buckets expostos são cumulativos e incluem +Inf, _sum e _count."""
+        hist = Histogram('teste_segundos', 'Teste.', ['label'], buckets=(0.1, 1.0))
+        hist.observe(0.05, 'a')
+        hist.observe(0.5, 'a')
+        hist.observe(5.0, 'a')
+
+        linhas = hist.expor()
+        assert '# TYPE teste_segundos histogram' in linhas
+        assert 'teste_segundos_bucket{label="a",le="0.1"} 1' in linhas
+        assert 'teste_segundos_bucket{label="a",le="1"} 2' in linhas
+        assert 'teste_segundos_bucket{label="a",le="+Inf"} 3' in linhas
+        assert 'teste_segundos_count{label="a"} 3' in linhas
+        assert 'teste_segundos_sum{label="a"} 5.55' in linhas
+
+    def test_limite_inclusivo(self):
+        """Um valor igual ao limite entra no próprio bucket (le = menor ou igual)."""
+        hist = Histogram('teste_limite', 'Teste.', buckets=(1.0,))
+        hist.observe(1.0)
+        assert 'teste_limite_bucket{le="1"} 1' in hist.expor()
+
+    def test_time_context_manager(self):
+        """time() registra uma observação ao sair do bloco."""
+        hist = Histogram('teste_time', 'Teste.', ['etapa'])
+        with hist.time('sql'):
+            pass
+        assert hist.contagem('sql') == 1
+
+    def test_agregacao_entre_threads(self):
+        """Observações de várias threads são somadas na coleta."""
+        hist = Histogram('teste_threads', 'Teste.')
+
+        def gravar():
+            for _ in range(1000):
+                hist.observe(0.01)
+
+        threads = [threading.Thread(target=gravar) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert hist.contagem() == 8000
+
+    def test_shards_de_threads_encerradas_sao_compactados(self):
+        """Threads encerradas não acumulam shards indefinidamente."""
+        contador = Counter('teste_compactacao', 'Teste.')
+        for _ in range(Counter.LIMITE_SHARDS * 2):
+            t = threading.Thread(target=contador.inc)
+            t.start()
+            t.join()
+
+        assert len(contador._shards) <= Counter.LIMITE_SHARDS
+        assert contador.valor() == Counter.LIMITE_SHARDS * 2
+
+
+class TestCounterGauge:
+    """Testes para contadores e medidores."""
+
+    def test_counter_com_labels(self):
+        """Contadores são expostos por combinação de labels."""
+        contador = Counter('teste_total', 'Teste.', ['status'])
+        contador.inc('500')
+        contador.inc('500')
+        contador.inc('timeout')
+        linhas = contador.expor()
+        assert 'teste_total{status="500"} 2' in linhas
+        assert 'teste_total{status="timeout"} 1' in linhas
+
+    def test_gauge_inc_dec(self):
+        """Gauge sobe e desce."""
+        gauge = Gauge('teste_gauge', 'Teste.')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert 'teste_gauge 1' in gauge.expor()
+
+    def test_gauge_com_funcao(self):
+        """Gauge com função é avaliado no momento da coleta."""
+        gauge = Gauge('teste_funcao', 'Teste.', funcao=lambda: 7)
+        assert 'teste_funcao 7' in gauge.expor()
+
+    def test_escape_de_labels(self):
+        """Aspas e quebras de linha nos valores de label são escapadas."""
+        contador = Counter('teste_escape', 'Teste.', ['label'])
+        contador.inc('a"b\nc')
+        assert 'teste_escape{label="a\\"b\\nc"} 1' in contador.expor()
+
+
+class TestRegistro:
+    """Testes para o registro e o endpoint /metrics."""
+
+    def test_expor_registro(self):
+        """O registro concatena todas as métricas com quebra de linha final."""
+        registro = Registro()
+        registro.counter('a_total', 'A.').inc()
+        texto = registro.expor()
+        assert texto.endswith('\n')
+        assert 'a_total 1' in texto
+
+    def test_endpoint_metrics(self, app):
+        """GET /metrics responde no formato de exposição do Prometheus."""
+        if not hasattr(app, 'test_client'):
+            pytest.skip("Aplicação Flask não disponível")
+        with app.test_client() as client:
+            response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert b'sophos_sql_segundos' in response.data
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a correção de erros de digitação antes do roteamento
+(app/ortografia.py e corrigir_pergunta em app/app.py).
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app import ortografia
+
+
+# Palavras válidas que estão a uma ou duas letras de alguma do vocabulário
+VALIDAS = ['inativos', 'gerente', 'despesa', 'melhor', 'custo', 'cargos', 'alto', 'empresa', 'mostre']
+
+
+@pytest.fixture(scope="module")
+def corretor():
+    lexico = ortografia.Lexico(['gerente', 'despesa', 'custo', 'alto', 'empresa', 'mostre', 'cargos', 'é', 'quem'])
+    corretor = ortografia.CorretorOrtografico(ortografia.vocabulario_dos_mapeamentos(), lexico)
+    corretor.incluir(['de', 'do', 'dos', 'quais', 'quantos', 'temos', 'está', 'esta', 'marco'])
+    corretor.incluir(['joão', 'silva', 'pedro'])
+    return corretor
+
+
+class TestDistancia:
+    """Distância de edição com transposição."""
+
+    @pytest.mark.parametrize("a,b,esperada", [
+        ('vendas', 'vendas', 0),
+        ('vendsa', 'vendas', 1),      # transposição
+        ('venda', 'vendas', 1),       # inserção
+        ('vemdas', 'vendas', 1),      # troca
+        ('cleintes', 'clientes', 1),
+        ('fncionaros', 'funcionarios', 2),
+    ])
+    def test_distancias(self, a, b, esperada):
+        assert ortografia.distancia(a, b, 2) == esperada
+
+    def test_acima_do_limite(self):
+        assert ortografia.distancia('contratos', 'projetos', 2) == 3
+        assert ortografia.distancia('a', 'abcdef', 2) == 3
+
+    def test_delecoes(self):
+        assert ortografia._delecoes('abc', 1) == {'abc', 'ab', 'ac', 'bc'}
+        assert len(ortografia._delecoes('abcd', 2)) == 1 + 4 + 6
+
+
+class TestSugestao:
+    """Correção de um token."""
+
+    @pytest.mark.parametrize("token,esperada", [
+        ('funcionarios', 'funcionários'),
+        ('FUNCIONARIOS', 'funcionários'),
+        ('orcamento', 'orçamento'),
+        ('salaro', 'salário'),
+        ('funcoinarios', 'funcionários'),
+        ('cleintes', 'clientes'),
+        ('contratso', 'contratos'),
+        ('detalhs', 'detalhes'),
+        ('faturamneto', 'faturamento'),
+    ])
+    def test_corrige(self, corretor, token, esperada):
+        assert corretor.sugestao(token) == esperada
+
+    @pytest.mark.parametrize("token", ['xyzw', 'ab', '2024', 'venda2'])
+    def test_sem_sugestao(self, corretor, token):
+        assert corretor.sugestao(token) is None
+
+    def test_palavras_incluidas_ficam_como_estao(self, corretor):
+        assert corretor.sugestao('esta') == 'esta'
+        assert corretor.sugestao('Pedro') == 'pedro'
+
+    def test_tokens_curtos_aceitam_um_erro(self, corretor):
+        assert ortografia.limite_para('vensa') == 1
+        assert ortografia.limite_para('inativos') == 1
+        assert ortografia.limite_para('contratso') == 2
+        assert corretor.sugestao('vensa') == 'venda'
+        assert corretor.sugestao('vnsa') is None
+
+    def test_empate_nao_corrige(self):
+        corretor = ortografia.CorretorOrtografico({'vendas': 5, 'vendes': 1}, ortografia.Lexico())
+        assert corretor.sugestao('vendos') is None
+
+    @pytest.mark.parametrize("token", VALIDAS)
+    def test_palavras_validas_nao_mudam(self, corretor, token):
+        assert corretor.sugestao(token) is None
+
+    def test_forma_valida_nao_ganha_acento(self, corretor):
+        assert corretor.sugestao('é') == 'é'
+        assert corretor.corrigir("quem é o gerente") == ("quem é o gerente", [])
+        sem_lexico = ortografia.CorretorOrtografico({'e': 3})
+        sem_lexico.incluir(['é'])
+        assert sem_lexico.sugestao('é') == 'é'
+
+    def test_palavra_acentuada_sem_acento_nao_e_erro(self):
+        corretor = ortografia.CorretorOrtografico({'codigos': 1}, ortografia.Lexico(['código']))
+        assert corretor.sugestao('codigo') is None
+        assert corretor.sugestao('codgios') == 'codigos'
+
+    def test_prefixo_nao_e_erro(self):
+        corretor = ortografia.CorretorOrtografico({'agendamentos': 1}, ortografia.Lexico())
+        assert corretor.sugestao('reagendamentos') is None
+        assert corretor.sugestao('agendamnetos') == 'agendamentos'
+
+    def test_sem_lexico_so_restaura_acentos(self):
+        corretor = ortografia.CorretorOrtografico(ortografia.vocabulario_dos_mapeamentos())
+        assert corretor.sugestao('funcionarios') == 'funcionários'
+        assert corretor.sugestao('funcoinarios') is None
+
+    def test_grafia_acentuada_vence_no_empate(self):
+        corretor = ortografia.CorretorOrtografico({'funcionarios': 2, 'funcionários': 2})
+        assert corretor.sugestao('funcionarios') == 'funcionários'
+
+    def test_incluir_conta_so_as_novas(self):
+        corretor = ortografia.CorretorOrtografico({'vendas': 1})
+        assert corretor.incluir(['Vendas', 'Acme', 'acme']) == 1
+        assert len(corretor) == 2
+
+
+class TestCorrigir:
+    """Correção da pergunta inteira."""
+
+    def test_mantem_pontuacao_numeros_e_desconhecidas(self, corretor):
+        texto, correcoes = corretor.corrigir("Quantos funcoinarios temos em 2024, João?")
+        assert texto == "Quantos funcionários temos em 2024, João?"
+        assert correcoes == [('funcoinarios', 'funcionários')]
+
+    def test_acentos_nao_contam_como_correcao(self, corretor):
+        texto, correcoes = corretor.corrigir("salario medio")
+        assert texto == "salário médio"
+        assert correcoes == []
+
+    def test_mes_nao_vira_outra_palavra(self, corretor):
+        assert corretor.corrigir("vendas de marco")[0] == "vendas de marco"
+
+    def test_sentido_da_pergunta_se_mantem(self, corretor):
+        assert corretor.corrigir("Liste os projetos inativos") == ("Liste os projetos inativos", [])
+
+
+class TestLexico:
+    """Léxico geral compacto."""
+
+    def test_grafia_e_caixa(self):
+        lexico = ortografia.Lexico(['Orçamento', 'despesa'])
+        assert 'orçamento' in lexico and 'ORÇAMENTO' in lexico and 'despesa' in lexico
+        assert 'orcamento' not in lexico and lexico.reconhece('orcamento')
+        assert 'despesas' not in lexico and not lexico.reconhece('despesas')
+        assert len(lexico) == 2
+
+    def test_salvar_e_ler(self, tmp_path):
+        caminho = tmp_path / 'lexico.bin'
+        ortografia.Lexico(['orçamento', 'despesa']).salvar(caminho)
+        lexico = ortografia.carregar_lexico(caminho)
+        assert len(lexico) == 2
+        assert 'despesa' in lexico and lexico.reconhece('orcamento') and 'orcamento' not in lexico
+
+    def test_arquivo_ausente_ou_invalido(self, tmp_path):
+        assert ortografia.carregar_lexico(tmp_path / 'nao_existe.bin') is None
+        caminho = tmp_path / 'lexico.bin'
+        ortografia.Lexico(['despesa']).salvar(caminho)
+        caminho.write_bytes(caminho.read_bytes()[:-4])
+        assert ortografia.carregar_lexico(caminho) is None
+        caminho.write_bytes(b'outro formato\n')
+        assert ortografia.carregar_lexico(caminho) is None
+
+    def test_configuracao_da_aplicacao(self):
+        """Vocabulário, stopwords e meses como em app.py, com o léxico do spacy-lookups-data."""
+        pytest.importorskip('spacy_lookups_data')
+        import spacy
+
+        from app import extracao
+        from loadtest.gerar_lexico import formas_do_lookups
+
+        corretor = ortografia.CorretorOrtografico(ortografia.vocabulario_dos_mapeamentos(),
+                                                  ortografia.Lexico(formas_do_lookups()))
+        corretor.incluir(spacy.util.get_lang_class('pt').Defaults.stop_words)
+        corretor.incluir(extracao.MESES)
+        for token in VALIDAS:
+            assert corretor.sugestao(token) is None, token
+        assert corretor.corrigir("Liste os projetos inativos") == ("Liste os projetos inativos", [])
+        assert corretor.corrigir("Mostre o gerente da empresa")[1] == []
+        assert corretor.corrigir("quem é o gerente") == ("quem é o gerente", [])
+        assert corretor.corrigir("total de cleintes e funcoinarios")[0] == "total de clientes e funcionários"
+
+
+class TestCorrigirPergunta:
+    """Roteamento com a pergunta corrigida."""
+
+    def test_roteamento_recebe_a_pergunta_corrigida(self, corretor):
+        from app import app as app_module
+
+        with patch.object(app_module, 'corretor', corretor), \
+             patch.object(app_module, 'cubo', None), \
+             patch('app.app.selecionar_queries', return_value=[('x', 'SELECT 1;')]) as selecionar:
+            app_module.rotear_pergunta("lista de cleintes")
+        selecionar.assert_called_once_with("lista de clientes")
+
+    def test_sem_corretor(self):
+        from app import app as app_module
+
+        with patch.object(app_module, 'corretor', None):
+            assert app_module.corrigir_pergunta("lista de cleintes") == "lista de cleintes"
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para os parâmetros das SQLs de query_mapping.py (app/parametros.py).
+"""
+
+from datetime import date
+
+import pytest
+
+from app import parametros
+from app.query_mapping import query_mappings
+
+SQLS = {label: sql for _frases, label, sql in query_mappings}
+
+
+class TestNomes:
+    """Placeholders encontrados nas SQLs."""
+
+    def test_sql_sem_placeholders(self):
+        assert parametros.nomes(SQLS['vendas-detalhes']) == ()
+
+    def test_periodo(self):
+        assert parametros.nomes(SQLS['vendas-periodo']) == ('start_date', 'end_date')
+
+    def test_todos_os_placeholders_tem_tipo(self):
+        for label, sql in SQLS.items():
+            for nome in parametros.nomes(sql):
+                assert nome in parametros.TIPOS, (label, nome)
+
+
+class TestConverter:
+    """Conversão dos valores da query string."""
+
+    def test_inteiro(self):
+        assert parametros.converter('id', ' 42 ') == 42
+
+    @pytest.mark.parametrize("valor", ['-1', '4.2', '1; DROP TABLE vendas', ''])
+    def test_inteiro_invalido(self, valor):
+        with pytest.raises(ValueError):
+            parametros.converter('id', valor)
+
+    def test_data(self):
+        assert parametros.converter('start_date', '2024-02-29') == date(2024, 2, 29)
+
+    def test_data_invalida(self):
+        with pytest.raises(ValueError, match="YYYY-MM-DD"):
+            parametros.converter('end_date', "2024-01-01' OR '1'='1")
+
+    def test_valor_ja_tipado(self):
+        assert parametros.converter('start_date', date(2024, 1, 1)) == date(2024, 1, 1)
+
+    def test_parametro_desconhecido(self):
+        with pytest.raises(ValueError, match="desconhecido"):
+            parametros.converter('tabela', 'vendas')
+
+
+class TestVincular:
+    """Troca dos placeholders por parâmetros do psycopg2."""
+
+    def test_id(self):
+        sql, params = parametros.vincular(SQLS['cliente-por-id'], {'id': '7'})
+        assert sql == "SELECT * FROM clientes WHERE id = %(id)s;"
+        assert params == {'id': 7}
+
+    def test_datas_entre_aspas(self):
+        sql, params = parametros.vincular(SQLS['vendas-periodo'],
+                                          {'start_date': '2024-01-01', 'end_date': '2024-06-30'})
+        assert "BETWEEN %(start_date)s AND %(end_date)s" in sql
+        assert "'" not in sql
+        assert params == {'start_date': date(2024, 1, 1), 'end_date': date(2024, 6, 30)}
+
+    def test_ilike_escapa_curingas(self):
+        sql, params = parametros.vincular(SQLS['funcionario-por-nome'], {'nome': "50%_O'Neil"})
+        assert sql == "SELECT * FROM funcionarios WHERE nome ILIKE %(nome_like)s;"
+        assert params == {'nome_like': "%50\\%\\_O'Neil%"}
+
+    def test_percentual_literal_e_dobrado(self):
+        sql, params = parametros.vincular("SELECT valor * 100 || '%' FROM vendas WHERE id = {id}", {'id': 1})
+        assert sql == "SELECT valor * 100 || '%%' FROM vendas WHERE id = %(id)s"
+
+    def test_parametro_ausente(self):
+        with pytest.raises(ValueError, match="end_date"):
+            parametros.vincular(SQLS['vendas-periodo'], {'start_date': '2024-01-01'})
+
+    def test_sem_placeholders(self):
+        assert parametros.vincular(SQLS['vendas-lista'], {}) == (SQLS['vendas-lista'], {})
+
+
+class TestLiteral:
+    """SQL com os valores citados, para log."""
+
+    def test_valores_citados(self):
+        sql, params = parametros.vincular(SQLS['vendas-periodo'],
+                                          {'start_date': '2024-01-01', 'end_date': '2024-06-30'})
+        assert parametros.literal(sql, params) == (
+            "SELECT * FROM vendas WHERE data_venda BETWEEN '2024-01-01'::date AND '2024-06-30'::date;")
+
+    def test_aspas_e_percentual(self):
+        sql, params = parametros.vincular("SELECT '%' FROM clientes WHERE nome_empresa ILIKE '%{nome_empresa}%'",
+                                          {'nome_empresa': "D'Ávila"})
+        assert parametros.literal(sql, params) == "SELECT '%' FROM clientes WHERE nome_empresa ILIKE '%D''Ávila%'"
+
+    def test_sem_parametros(self):
+        assert parametros.literal(SQLS['vendas-lista'], None) == SQLS['vendas-lista']
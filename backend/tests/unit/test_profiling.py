@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o profiling sob demanda (app/profiling.py).
+"""
+
+import pstats
+import time
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from app import profiling
+
+TOKEN = 'token-de-teste'
+
+
+def _criar_app():
+    app = Flask(__name__)
+
+    @app.route('/trabalho')
+    def trabalho():
+        # Trabalho suficiente para aparecer no perfil e nas amostras
+        fim = time.perf_counter() + 0.03
+        total = 0
+        while time.perf_counter() < fim:
+            total += sum(range(100))
+        return {'total': total}
+
+    return app
+
+
+@pytest.fixture
+def app_perfilado(tmp_path):
+    """App Flask mínimo com o profiling instalado e gravando em tmp_path."""
+    with patch('app.profiling.PROFILE_ADMIN_TOKEN', TOKEN), \
+         patch('app.profiling.PROFILE_DIR', str(tmp_path)), \
+         patch('app.profiling.PROFILE_INTERVALO_MS', 1):
+        app = _criar_app()
+        assert profiling.instalar(app)
+        yield app.test_client()
+        profiling.encerrar_sessao()
+
+
+class TestInstalacao:
+    """Testes para a instalação condicional dos hooks."""
+
+    def test_sem_token_nao_instala(self):
+        """Sem PROFILE_ADMIN_TOKEN, nenhum hook nem endpoint é registrado."""
+        with patch('app.profiling.PROFILE_ADMIN_TOKEN', None):
+            app = _criar_app()
+            assert not profiling.instalar(app)
+        assert not app.before_request_funcs
+        assert app.test_client().get('/admin/profile').status_code == 404
+
+
+class TestSessaoProfiling:
+    """Testes para as sessões iniciadas pelo endpoint e pelo header."""
+
+    def test_token_invalido(self, app_perfilado):
+        """O endpoint exige o token de administrador."""
+        resposta = app_perfilado.post('/admin/profile', json={'requisicoes': 1},
+                                      headers={'X-Profile-Token': 'errado'})
+        assert resposta.status_code == 403
+        assert profiling._sessao is None
+
+    def test_sessao_por_requisicoes(self, app_perfilado, tmp_path):
+        """Uma sessão de N requisições grava .pstats e .collapsed ao final."""
+        resposta = app_perfilado.post('/admin/profile', json={'requisicoes': 2},
+                                      headers={'X-Profile-Token': TOKEN})
+        assert resposta.status_code == 202
+
+        app_perfilado.get('/trabalho')
+        assert profiling._sessao is not None
+        app_perfilado.get('/trabalho')
+        assert profiling._sessao is None
+
+        resumo = app_perfilado.get('/admin/profile', headers={'X-Profile-Token': TOKEN}).get_json()
+        assert resumo['requisicoes_perfiladas'] == 2
+        arquivos = resumo['arquivos']
+
+        stats = pstats.Stats(arquivos['pstats'])
+        assert any(func[2] == 'trabalho' for func in stats.stats)
+
+        linhas = open(arquivos['collapsed'], encoding='utf-8').read().splitlines()
+        assert linhas, "o amostrador deveria ter coletado pilhas"
+        pilha, contagem = linhas[0].rsplit(' ', 1)
+        assert int(contagem) >= 1
+        assert ';' in pilha
+
+    def test_sessao_por_header(self, app_perfilado, tmp_path):
+        """O header com o token perfila a própria requisição."""
+        app_perfilado.get('/trabalho', headers={'X-Profile-Token': TOKEN})
+        assert profiling._sessao is None
+        assert list(tmp_path.glob('*.pstats'))
+
+    def test_sessao_por_tempo(self, app_perfilado, tmp_path):
+        """Uma sessão por tempo é gravada quando o prazo termina, mesmo sem requisições."""
+        app_perfilado.post('/admin/profile', json={'segundos': 0.2},
+                           headers={'X-Profile-Token': TOKEN})
+        app_perfilado.get('/trabalho')
+        time.sleep(0.5)
+        assert profiling._sessao is None
+        assert list(tmp_path.glob('*.collapsed'))
+
+    def test_parametros_invalidos(self, app_perfilado):
+        """Parâmetros não numéricos retornam 400."""
+        resposta = app_perfilado.post('/admin/profile', json={'requisicoes': 'muitas'},
+                                      headers={'X-Profile-Token': TOKEN})
+        assert resposta.status_code == 400
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários da leitura em fluxo dos mapeamentos de lista.
+
+Cobre o cursor no servidor de executar_query_em_fluxo (lotes, fechamento e
+erros), o limite de caracteres de formatar_linhas e o limite de dados do
+prompt compartilhado pelos mapeamentos em processar_pergunta.
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app.deadline import Deadline
+from app.query_mapping import MAPEAMENTOS_LISTA, query_mappings
+
+
+class CursorNomeado:
+    """Cursor no servidor falso: entrega as linhas em fetchmany e conta as buscas."""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.posicao = 0
+        self.buscas = 0
+        self.executadas = []
+
+    def execute(self, sql, params=None):
+        self.executadas.append((sql, params))
+
+    def fetchmany(self, tamanho):
+        self.buscas += 1
+        lote = self.linhas[self.posicao:self.posicao + tamanho]
+        self.posicao += len(lote)
+        return lote
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def conexao_com_cursor(cursor):
+    conn = Mock()
+    conn.cursor.return_value = cursor
+    return conn
+
+
+def linhas_vendas(n):
+    return [(i, f"Projeto {i % 7}", 1000 + i) for i in range(n)]
+
+
+class TestMapeamentosLista:
+    """Conjunto de mapeamentos lidos em fluxo."""
+
+    def test_labels_existem(self):
+        """Todo label de MAPEAMENTOS_LISTA corresponde a um mapeamento."""
+        labels = {label for _frases, label, _sql in query_mappings}
+        assert MAPEAMENTOS_LISTA <= labels
+
+    def test_sem_agregacoes(self):
+        """Mapeamentos de lista não agregam nem limitam as linhas."""
+        sqls = {label: sql.upper() for _frases, label, sql in query_mappings}
+        for label in MAPEAMENTOS_LISTA:
+            for termo in ('COUNT(', 'SUM(', 'AVG(', 'GROUP BY', 'LIMIT'):
+                assert termo not in sqls[label], label
+
+
+class TestFormatarLinhas:
+    """Formatação com limite de caracteres."""
+
+    def test_sem_limite_igual_a_formatar_resultados(self):
+        from app.app import formatar_linhas, formatar_resultados
+
+        linhas = linhas_vendas(50)
+        texto, n_linhas, truncado = formatar_linhas(linhas)
+        assert texto == formatar_resultados(linhas)
+        assert n_linhas == 50
+        assert truncado is False
+
+    @pytest.mark.parametrize("linhas", [None, [], iter([])])
+    def test_vazio(self, linhas):
+        from app.app import formatar_linhas
+
+        assert formatar_linhas(linhas, 100) == ("Nenhum resultado encontrado.", 0, False)
+
+    def test_trunca_no_limite(self):
+        """Para antes de passar do limite e avisa quantas linhas foram exibidas."""
+        from app.app import formatar_linhas
+
+        texto, n_linhas, truncado = formatar_linhas(linhas_vendas(1000), 500)
+        corpo, aviso = texto.rsplit("\n", 1)
+        assert truncado is True
+        assert len(corpo) <= 500
+        assert corpo.count("\n") + 1 == n_linhas
+        assert aviso == f"(resultado truncado: {n_linhas} linhas exibidas; há mais linhas no banco)"
+
+    def test_primeira_linha_sempre_entra(self):
+        """Mesmo com limite menor que uma linha, o Gemini recebe um exemplo."""
+        from app.app import formatar_linhas
+
+        _texto, n_linhas, truncado = formatar_linhas(linhas_vendas(3), 5)
+        assert n_linhas == 1
+        assert truncado is True
+
+    def test_resultado_que_cabe_nao_trunca(self):
+        from app.app import formatar_linhas
+
+        _texto, n_linhas, truncado = formatar_linhas(linhas_vendas(3), 10000)
+        assert (n_linhas, truncado) == (3, False)
+
+    def test_para_de_consumir_o_gerador(self):
+        """Ao truncar, o gerador é fechado sem ler as linhas restantes."""
+        from app.app import formatar_linhas
+
+        consumidas = []
+        fechado = []
+
+        def gerador():
+            try:
+                for linha in linhas_vendas(100000):
+                    consumidas.append(linha)
+                    yield linha
+            finally:
+                fechado.append(True)
+
+        _texto, n_linhas, _truncado = formatar_linhas(gerador(), 1000)
+        assert len(consumidas) == n_linhas + 1
+        assert fechado == [True]
+
+
+class TestExecutarQueryEmFluxo:
+    """Cursor no servidor para mapeamentos de lista."""
+
+    def test_usa_cursor_nomeado_em_lotes(self):
+        from app import app as app_module
+
+        cursor = CursorNomeado(linhas_vendas(25))
+        conn = conexao_com_cursor(cursor)
+        with patch('app.app.get_db_connection', return_value=conn), \
+             patch.object(app_module, 'CURSOR_LOTE_LINHAS', 10):
+            linhas = app_module.executar_query_em_fluxo("SELECT * FROM vendas;")
+            assert cursor.buscas == 1  # o primeiro lote é buscado já na execução
+            assert list(linhas) == linhas_vendas(25)
+
+        conn.cursor.assert_called_with(name='sophos_lista')
+        assert cursor.buscas == 4  # 10 + 10 + 5 + lote vazio
+        conn.close.assert_called_once()
+
+    def test_fechar_gerador_nao_busca_mais_lotes(self):
+        from app import app as app_module
+
+        cursor = CursorNomeado(linhas_vendas(100))
+        conn = conexao_com_cursor(cursor)
+        with patch('app.app.get_db_connection', return_value=conn), \
+             patch.object(app_module, 'CURSOR_LOTE_LINHAS', 10):
+            linhas = app_module.executar_query_em_fluxo("SELECT * FROM vendas;")
+            primeiras = [next(linhas) for _ in range(15)]
+            linhas.close()
+
+        assert primeiras == linhas_vendas(15)
+        assert cursor.buscas == 2
+        conn.close.assert_called_once()
+
+    def test_deadline_define_statement_timeout(self):
+        from app.app import executar_query_em_fluxo
+
+        cursor = CursorNomeado([])
+        conn = conexao_com_cursor(cursor)
+        with patch('app.app.get_db_connection', return_value=conn):
+            assert list(executar_query_em_fluxo("SELECT * FROM vendas;", Deadline(5000))) == []
+
+        sql_timeout, params = cursor.executadas[0]
+        assert sql_timeout.startswith("SET LOCAL statement_timeout")
+        assert 0 < params[0] <= 5000
+        assert cursor.executadas[1] == ("SELECT * FROM vendas;", None)
+
+    def test_erro_na_execucao_retorna_none(self):
+        from app.app import executar_query_em_fluxo
+
+        cursor = CursorNomeado([])
+        cursor.execute = Mock(side_effect=Exception("relation does not exist"))
+        conn = conexao_com_cursor(cursor)
+        with patch('app.app.get_db_connection', return_value=conn):
+            assert executar_query_em_fluxo("SELECT * FROM tabela_inexistente;") is None
+        conn.close.assert_called_once()
+
+    def test_erro_no_meio_da_leitura_mantem_linhas_lidas(self):
+        from app import app as app_module
+
+        cursor = CursorNomeado(linhas_vendas(30))
+        buscar = cursor.fetchmany
+        cursor.fetchmany = Mock(side_effect=[buscar(10), Exception("conexão perdida")])
+        conn = conexao_com_cursor(cursor)
+        with patch('app.app.get_db_connection', return_value=conn), \
+             patch.object(app_module, 'CURSOR_LOTE_LINHAS', 10):
+            assert list(app_module.executar_query_em_fluxo("SELECT * FROM vendas;")) == linhas_vendas(10)
+        conn.close.assert_called_once()
+
+
+class TestLimiteDoPrompt:
+    """Limite de dados do prompt em processar_pergunta."""
+
+    def test_lista_lida_em_fluxo_ate_o_limite(self):
+        from app import app as app_module
+
+        cursor = CursorNomeado(linhas_vendas(100000))
+        conn = conexao_com_cursor(cursor)
+        with patch('app.app.selecionar_queries', return_value=[('vendas-lista', 'SELECT * FROM vendas;')]), \
+             patch('app.app.get_db_connection', return_value=conn), \
+             patch('app.app.executar_query') as mock_exec, \
+             patch('app.app.enviar_para_gemini', return_value='ok') as mock_gemini, \
+             patch('app.app.inserir_log'), \
+             patch.object(app_module, 'PROMPT_DADOS_MAX_CHARS', 5000), \
+             patch.object(app_module, 'CURSOR_LOTE_LINHAS', 100):
+            resultado = app_module.processar_pergunta("Mostrar todas as vendas")
+
+        mock_exec.assert_not_called()
+        assert cursor.posicao <= 300  # ~5000 caracteres, não as 100 mil linhas
+        conn.close.assert_called_once()
+        assert "resultado truncado" in mock_gemini.call_args.args[0]
+        assert resultado['sucesso_sql'] is True
+
+    def test_limite_compartilhado_entre_mapeamentos(self):
+        """Com o limite esgotado pelo primeiro mapeamento, os seguintes não rodam."""
+        from app import app as app_module
+
+        consultas = [('vendas-detalhes', 'SELECT 1'), ('funcionarios-total', 'SELECT 2')]
+        with patch('app.app.selecionar_queries', return_value=consultas), \
+             patch('app.app.executar_query_em_fluxo', return_value=iter(linhas_vendas(1000))), \
+             patch('app.app.executar_query', return_value=[(1,)]) as mock_exec, \
+             patch('app.app.enviar_para_gemini', return_value='ok'), \
+             patch('app.app.inserir_log'), \
+             patch.object(app_module, 'PROMPT_DADOS_MAX_CHARS', 2000):
+            resultado = app_module.processar_pergunta("vendas detalhadas e total de funcionários")
+
+        mock_exec.assert_not_called()
+        assert resultado['sqls_usadas'] == 'SELECT 1'
+
+    def test_agregados_continuam_com_fetchall(self):
+        from app import app as app_module
+
+        with patch('app.app.selecionar_queries', return_value=[('vendas-total', 'SELECT COUNT(*) FROM vendas;')]), \
+             patch('app.app.executar_query_em_fluxo') as mock_fluxo, \
+             patch('app.app.executar_query', return_value=[(42,)]), \
+             patch('app.app.enviar_para_gemini', return_value='ok'), \
+             patch('app.app.inserir_log'):
+            resultado = app_module.processar_pergunta("Quantas vendas?")
+
+        mock_fluxo.assert_not_called()
+        assert resultado['sucesso_sql'] is True
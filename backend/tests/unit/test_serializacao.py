@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a serialização das respostas JSON (app/serializacao.py).
+"""
+
+import datetime
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from app import serializacao
+from app.serializacao import conversores, dumps, registros
+
+# cursor.description do psycopg2: (name, type_code, ...)
+DESCRICAO = [('mes', 1082), ('total', 1700), ('quantidade', 20), ('nome', 25)]
+
+
+class TestRegistros:
+
+    def test_converte_pelo_type_code(self):
+        linhas = [(datetime.date(2025, 1, 1), Decimal('10.50'), 3, 'A'),
+                  (None, None, None, None)]
+        assert registros(linhas, ['mes', 'total', 'quantidade', 'nome'], DESCRICAO) == [
+            {'mes': '2025-01-01', 'total': 10.5, 'quantidade': 3, 'nome': 'A'},
+            {'mes': None, 'total': None, 'quantidade': None, 'nome': None},
+        ]
+
+    def test_inteiros_continuam_inteiros(self):
+        dados = registros([(3,)], ['quantidade'], [('quantidade', 20)])
+        assert type(dados[0]['quantidade']) is int
+
+    def test_sem_description_infere_pelo_primeiro_valor(self):
+        linhas = [(None, 'x'), (Decimal('2.5'), 'y')]
+        assert conversores(None, list(zip(*linhas)))[0] is not None
+        assert registros(linhas, ['valor', 'nome']) == [{'valor': None, 'nome': 'x'},
+                                                        {'valor': 2.5, 'nome': 'y'}]
+
+    def test_colunas_extras_sao_ignoradas(self):
+        assert registros([('2025-01', 1, 123)], ['mes', 'total']) == [{'mes': '2025-01', 'total': 1}]
+
+    def test_numeric_nao_finito_vira_null(self):
+        assert registros([(Decimal('NaN'),)], ['v'], [('v', 1700)]) == [{'v': None}]
+
+    def test_timestamp_com_fuso(self):
+        instante = datetime.datetime(2025, 3, 1, 12, 30, tzinfo=datetime.timezone.utc)
+        assert registros([(instante,)], ['t'], [('t', 1184)]) == [{'t': '2025-03-01T12:30:00+00:00'}]
+
+    def test_vazio(self):
+        assert registros([], ['a']) == []
+
+
+class TestDumps:
+
+    @pytest.mark.parametrize('com_orjson', [True, False])
+    def test_politica_de_tipos(self, com_orjson):
+        if com_orjson and serializacao.orjson is None:
+            pytest.skip('orjson não instalado')
+        obj = {'valor': Decimal('1.25'), 'dia': datetime.date(2025, 1, 2), 'nome': 'ação', 'n': 3}
+        with patch.object(serializacao, 'orjson', serializacao.orjson if com_orjson else None):
+            texto = dumps(obj)
+        assert isinstance(texto, bytes)
+        assert json.loads(texto) == {'valor': 1.25, 'dia': '2025-01-02', 'nome': 'ação', 'n': 3}
+
+    def test_tipo_desconhecido(self):
+        with pytest.raises(TypeError):
+            dumps({'x': object()})
+
+    def test_resposta_json(self):
+        resposta = serializacao.resposta_json({'a': 1}, status=201)
+        assert resposta.status_code == 201
+        assert resposta.mimetype == 'application/json'
+        assert json.loads(resposta.data) == {'a': 1}
+
+
+class TestArrow:
+
+    @pytest.fixture(autouse=True)
+    def _pyarrow(self):
+        if serializacao.pyarrow is None:
+            pytest.skip('pyarrow não instalado')
+
+    def ler(self, corpo):
+        return serializacao.pyarrow.ipc.open_stream(corpo).read_all()
+
+    def test_tipos_pelo_type_code(self):
+        pa = serializacao.pyarrow
+        linhas = [(datetime.date(2025, 1, 1), Decimal('10.50'), 3, 'A'),
+                  (None, None, None, None)]
+        tabela = self.ler(serializacao.arrow_ipc(linhas, ['mes', 'total', 'quantidade', 'nome'], DESCRICAO))
+        assert tabela.schema.types == [pa.date32(), pa.float64(), pa.int64(), pa.string()]
+        assert tabela.to_pylist() == [
+            {'mes': datetime.date(2025, 1, 1), 'total': 10.5, 'quantidade': 3, 'nome': 'A'},
+            {'mes': None, 'total': None, 'quantidade': None, 'nome': None},
+        ]
+
+    def test_mesmos_valores_que_o_json(self):
+        linhas = [(datetime.date(2025, 1, 1), Decimal('0.10'), 7, 'x'),
+                  (datetime.date(2025, 2, 1), Decimal('12345678901234.99'), 8, 'y')]
+        nomes = ['mes', 'total', 'quantidade', 'nome']
+        como_json = registros(linhas, nomes, DESCRICAO)
+        como_arrow = self.ler(serializacao.arrow_ipc(linhas, nomes, DESCRICAO)).to_pylist()
+        for do_json, do_arrow in zip(como_json, como_arrow):
+            assert do_arrow['mes'].isoformat() == do_json['mes']
+            assert {k: do_arrow[k] for k in ('total', 'quantidade', 'nome')} == \
+                   {k: do_json[k] for k in ('total', 'quantidade', 'nome')}
+
+    def test_numeric_nao_finito_vira_null(self):
+        tabela = self.ler(serializacao.arrow_ipc([(Decimal('NaN'),), (Decimal('1.5'),)], ['v'], [('v', 1700)]))
+        assert tabela.column('v').to_pylist() == [None, 1.5]
+
+    def test_timestamp_com_fuso(self):
+        instante = datetime.datetime(2025, 3, 1, 12, 30, tzinfo=datetime.timezone.utc)
+        tabela = self.ler(serializacao.arrow_ipc([(instante,)], ['t'], [('t', 1184)]))
+        assert str(tabela.schema.field('t').type) == 'timestamp[us, tz=UTC]'
+        assert tabela.column('t').to_pylist() == [instante]
+
+    def test_sem_description_infere_e_ignora_colunas_extras(self):
+        tabela = self.ler(serializacao.arrow_ipc([('2025-01', Decimal('2.5'), 123)], ['mes', 'total']))
+        assert tabela.column_names == ['mes', 'total']
+        assert tabela.to_pylist() == [{'mes': '2025-01', 'total': 2.5}]
+
+    def test_vazio_mantem_o_schema(self):
+        tabela = self.ler(serializacao.arrow_ipc([], ['mes', 'total'], DESCRICAO))
+        assert tabela.num_rows == 0
+        assert tabela.column_names == ['mes', 'total']
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o snapshot colunar de vendas (app/snapshot_vendas.py).
+
+O banco é simulado por BancoFalso, que responde ao COPY no formato texto do
+Postgres. As respostas do snapshot são comparadas com o que as SQLs dos
+mapeamentos devolveriam, calculado linha a linha com Decimal; para AVG e
+STDDEV, a escala esperada vem de resultados conferidos no Postgres.
+"""
+
+import datetime
+import random
+import re
+from collections import Counter
+from decimal import Decimal, localcontext
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from app import metrics, snapshot_vendas
+from app.query_mapping import query_mappings
+from app.snapshot_vendas import SnapshotVendas, desvio_padrao, inicio_ultimo_mes, media
+
+FUSO = ZoneInfo('America/Sao_Paulo')
+
+
+class BancoFalso:
+    """Tabela vendas em memória: id -> (valor, data_venda, projeto_id, funcionario_id, status, xmin)."""
+
+    def __init__(self, fuso='America/Sao_Paulo'):
+        self.vendas = {}
+        self.fuso = fuso
+        self.txid = 5000
+        self.proximo_id = 1
+
+    def inserir(self, valor, data=None, status='Pago', projeto=1, funcionario=1, id=None):
+        self.txid += 1
+        if id is None:
+            id, self.proximo_id = self.proximo_id, self.proximo_id + 1
+        self.vendas[id] = (None if valor is None else Decimal(valor), data, projeto, funcionario,
+                           status, self.txid & 0xFFFFFFFF)
+        return id
+
+    def atualizar(self, id, valor):
+        self.txid += 1
+        self.vendas[id] = (Decimal(valor),) + self.vendas[id][1:5] + (self.txid & 0xFFFFFFFF,)
+
+    def conectar(self):
+        return ConexaoFalsa(self)
+
+
+class ConexaoFalsa:
+    def __init__(self, banco):
+        self.banco = banco
+
+    def cursor(self):
+        return CursorFalso(self.banco)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _campo(valor):
+    if valor is None:
+        return '\\N'
+    return str(valor).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+class CursorFalso:
+    def __init__(self, banco):
+        self.banco = banco
+        self.resultado = None
+
+    def execute(self, sql, params=None):
+        if 'txid_snapshot_xmin' in sql:
+            self.resultado = (self.banco.txid,)
+        elif 'SHOW TimeZone' in sql:
+            self.resultado = (self.banco.fuso,)
+        elif 'COUNT(*)' in sql:
+            self.resultado = (len(self.banco.vendas),)
+
+    def fetchone(self):
+        return self.resultado
+
+    def mogrify(self, sql, params):
+        return (sql % params).encode()
+
+    def copy_expert(self, sql, arquivo):
+        ultimo_id = int(re.search(r'id > (\d+)', sql).group(1))
+        xmin = re.search(r'xmin::text::bigint >= (\d+)', sql)
+        limite = re.search(r'LIMIT (\d+)', sql)
+        ids = [i for i in sorted(self.banco.vendas)
+               if i > ultimo_id or (xmin and self.banco.vendas[i][5] >= int(xmin.group(1)))]
+        if limite:
+            ids = ids[:int(limite.group(1))]
+        for i in ids:
+            valor, data, projeto, funcionario, status, _xmin = self.banco.vendas[i]
+            campos = [i, None if valor is None else int(valor * 100),
+                      None if data is None else (data - datetime.date(1970, 1, 1)).days,
+                      projeto, funcionario, status]
+            arquivo.write('\t'.join(map(_campo, campos)) + '\n')
+
+
+def resultado_sql(banco, label, limite=None):
+    """
+    O que a SQL do mapeamento devolveria, calculado linha a linha. Para
+    vendas-ultimo-mes, `limite` é o valor de NOW() - INTERVAL '1 month'.
+    """
+    vendas = list(banco.vendas.values())
+    valores = [v[0] for v in vendas if v[0] is not None]
+    if label == 'vendas-total':
+        return [(len(vendas),)]
+    if label == 'vendas-valor-total':
+        return [(sum(valores) if valores else None,)]
+    if label == 'vendas-por-status':
+        return sorted(Counter(v[4] for v in vendas).items(), key=repr)
+    if label == 'vendas-ultimo-mes':
+        no_periodo = [v for v in vendas if v[1] is not None
+                      and datetime.datetime.combine(v[1], datetime.time(0), limite.tzinfo) >= limite]
+        soma = [v[0] for v in no_periodo if v[0] is not None]
+        return [(len(no_periodo), sum(soma) if soma else None)]
+    raise ValueError(label)
+
+
+def carregado(banco, **kwargs):
+    snapshot = SnapshotVendas(banco.conectar, **kwargs)
+    snapshot.atualizar()
+    return snapshot
+
+
+class TestAritmeticaNumeric:
+    """Resultados e escalas conferidos com AVG/STDDEV sobre NUMERIC no Postgres."""
+
+    def test_media_com_escala_do_postgres(self):
+        # AVG(x) de (1.00, 2.00, 3.00) -> 2.0000000000000000
+        assert str(media(600, 3)) == '2.0000000000000000'
+        # AVG(x) de (100.00, 200.00) -> 150.0000000000000000
+        assert str(media(30000, 2)) == '150.0000000000000000'
+        # AVG(x) de (10000, 20000) -> 15000.000000000000 (o quociente ganha um dígito em base 10000)
+        assert str(media(3000000, 2)) == '15000.000000000000'
+        assert str(media(-300, 2)) == '-1.5000000000000000'
+        assert media(0, 0) is None
+
+    def test_desvio_padrao_com_escala_do_postgres(self):
+        # STDDEV(x) de (1.00, 2.00, 3.00) -> 1.00000000000000000000
+        assert str(desvio_padrao(600, 140000, 3)) == '1.00000000000000000000'
+        # STDDEV(x) de (1.00, 2.00, 3.00, 4.00) -> 1.2909944487358056
+        assert str(desvio_padrao(1000, 300000, 4)) == '1.2909944487358056'
+        # Valores iguais: numerador zero vira 0 sem casas
+        assert str(desvio_padrao(1000, 500000, 2)) == '0'
+        assert desvio_padrao(100, 10000, 1) is None
+
+    def test_arredonda_metade_para_longe_do_zero(self):
+        # AVG(x) de (2.00, 0.00, 0.00): 2.00 / 3, com o último dígito arredondado para cima
+        assert str(media(200, 3)) == '0.66666666666666666667'
+        assert str(media(-200, 3)) == '-0.66666666666666666667'
+
+    def test_somas_exatas_sem_estouro_de_int64(self):
+        # Maior NUMERIC(12, 2) em centavos: a soma de 2,5 milhões deles passa de 2^63
+        valores = np.full(2_500_000, 999_999_999_999, dtype=np.int64)
+        valores[::7] = -12_345_678_901
+        exatos = valores.astype(object)
+        assert snapshot_vendas.somar(valores) == exatos.sum()
+        assert snapshot_vendas.somar_quadrados(valores) == (exatos * exatos).sum()
+
+
+class TestInicioUltimoMes:
+
+    def test_mesmo_dia_do_mes_anterior_fora_da_meia_noite_conta_do_dia_seguinte(self):
+        agora = datetime.datetime(2024, 5, 15, 10, 30, tzinfo=FUSO)
+        assert inicio_ultimo_mes(agora) == datetime.date(2024, 4, 16)
+
+    def test_meia_noite_exata_inclui_o_proprio_dia(self):
+        agora = datetime.datetime(2024, 5, 15, tzinfo=FUSO)
+        assert inicio_ultimo_mes(agora) == datetime.date(2024, 4, 15)
+
+    def test_dia_limitado_ao_fim_do_mes_e_virada_de_ano(self):
+        assert inicio_ultimo_mes(datetime.datetime(2024, 3, 31, 9, tzinfo=FUSO)) == datetime.date(2024, 3, 1)
+        assert inicio_ultimo_mes(datetime.datetime(2024, 1, 10, 9, tzinfo=FUSO)) == datetime.date(2023, 12, 11)
+
+
+class TestRespostas:
+
+    @pytest.fixture
+    def banco(self):
+        gerador = random.Random(42)
+        banco = BancoFalso()
+        hoje = datetime.date(2024, 5, 31)
+        for _ in range(2000):
+            valor = None if gerador.random() < 0.02 else f"{gerador.randint(1, 5_000_000) / 100:.2f}"
+            data = None if gerador.random() < 0.02 else hoje - datetime.timedelta(days=gerador.randint(0, 90))
+            status = gerador.choice(['Pago', 'Pendente', 'Atrasado', None, 'Em\tanálise\\'])
+            banco.inserir(valor, data, status, gerador.randint(1, 50), gerador.randint(1, 20))
+        return banco
+
+    @pytest.mark.parametrize('label', ['vendas-total', 'vendas-valor-total', 'vendas-por-status'])
+    def test_identico_ao_sql(self, banco, label):
+        resposta = carregado(banco).responder(label)
+        if label == 'vendas-por-status':
+            resposta = sorted(resposta, key=repr)
+        assert resposta == resultado_sql(banco, label)
+        assert [type(v) for v in resposta[0]] == [type(v) for v in resultado_sql(banco, label)[0]]
+
+    def test_ultimo_mes_identico_ao_sql(self, banco):
+        agora = datetime.datetime(2024, 5, 31, 14, 5, tzinfo=FUSO)
+        resposta = carregado(banco).responder('vendas-ultimo-mes', agora=agora)
+        limite = datetime.datetime(2024, 4, 30, 14, 5, tzinfo=FUSO)
+        assert resposta == resultado_sql(banco, 'vendas-ultimo-mes', limite)
+        assert resposta[0][1].as_tuple().exponent == -2
+
+    def test_ultimo_mes_converte_agora_para_o_fuso_do_banco(self, banco):
+        # 02:00 UTC de 31/05 ainda é 30/05 em São Paulo
+        agora_utc = datetime.datetime(2024, 5, 31, 2, 0, tzinfo=datetime.timezone.utc)
+        resposta = carregado(banco).responder('vendas-ultimo-mes', agora=agora_utc)
+        limite = datetime.datetime(2024, 4, 30, 23, 0, tzinfo=FUSO)
+        assert resposta == resultado_sql(banco, 'vendas-ultimo-mes', limite)
+
+    def test_estatisticas_iguais_ao_valor_exato(self, banco):
+        media_snapshot, desvio_snapshot = carregado(banco).responder('estatisticas-vendas')[0]
+        valores = [v[0] for v in banco.vendas.values() if v[0] is not None]
+        with localcontext() as ctx:
+            ctx.prec = 60
+            n = Decimal(len(valores))
+            media_exata = sum(valores) / n
+            desvio_exato = (sum((v - media_exata) ** 2 for v in valores) / (n - 1)).sqrt()
+        # Escala da divisão do Postgres: média ~25 mil (peso 1 em base 10000) -> 12 casas;
+        # variância ~2e8 (peso 2) -> 8 casas, que a raiz mantém. Erro de no máximo meia unidade.
+        for resultado, exato, casas in ((media_snapshot, media_exata, 12), (desvio_snapshot, desvio_exato, 8)):
+            assert resultado.as_tuple().exponent == -casas
+            assert abs(resultado - exato) <= Decimal(f'0.5E-{casas}')
+
+    def test_resposta_memorizada_conta_no_cache(self, banco):
+        metrics.CACHE_TOTAL.reset()
+        snapshot = carregado(banco)
+        assert snapshot.responder('vendas-total') == snapshot.responder('vendas-total')
+        assert metrics.CACHE_TOTAL.valor('snapshot_vendas', 'miss') == 1
+        assert metrics.CACHE_TOTAL.valor('snapshot_vendas', 'hit') == 1
+
+    def test_tabela_vazia(self):
+        snapshot = carregado(BancoFalso())
+        assert snapshot.responder('vendas-total') == [(0,)]
+        assert snapshot.responder('vendas-valor-total') == [(None,)]
+        assert snapshot.responder('estatisticas-vendas') == [(None, None)]
+        assert snapshot.responder('vendas-por-status') == []
+
+    def test_mapeamentos_elegiveis_existem(self):
+        labels = {label for _gatilhos, label, _sql in query_mappings}
+        assert set(snapshot_vendas.MAPEAMENTOS) <= labels
+
+    def test_fora_dos_mapeamentos_ou_sem_carga_devolve_none(self, banco):
+        assert carregado(banco).responder('vendas-lista') is None
+        assert SnapshotVendas(banco.conectar).responder('vendas-total') is None
+
+    def test_snapshot_velho_devolve_none(self, banco):
+        snapshot = carregado(banco, max_idade=10)
+        snapshot.atualizado_em -= 11
+        assert snapshot.responder('vendas-total') is None
+
+    def test_fuso_desconhecido_deixa_ultimo_mes_para_o_sql(self):
+        banco = BancoFalso(fuso='<-03>+03')
+        banco.inserir('1.00', datetime.date(2024, 5, 1))
+        snapshot = carregado(banco)
+        assert snapshot.responder('vendas-ultimo-mes') is None
+        assert snapshot.responder('vendas-total') == [(1,)]
+
+
+class TestAtualizacao:
+
+    def test_carga_em_lotes(self):
+        banco = BancoFalso()
+        for i in range(10):
+            banco.inserir(f"{i}.50")
+        snapshot = carregado(banco, lote=3)
+        assert list(snapshot.dados[0]['id']) == list(range(1, 11))
+        assert snapshot.responder('vendas-valor-total') == resultado_sql(banco, 'vendas-valor-total')
+
+    def test_incremental_pega_novas_e_alteradas(self):
+        banco = BancoFalso()
+        ids = [banco.inserir('10.00') for _ in range(5)]
+        snapshot = carregado(banco)
+        assert snapshot.responder('vendas-valor-total') == [(Decimal('50.00'),)]
+        banco.inserir('7.25', status='Estornado')
+        banco.atualizar(ids[1], '99.99')
+        snapshot.atualizar()
+        assert snapshot.responder('vendas-valor-total') == [(Decimal('147.24'),)]
+        assert sorted(snapshot.responder('vendas-por-status')) == [('Estornado', 1), ('Pago', 5)]
+        assert list(snapshot.dados[0]['id']) == list(range(1, 7))
+
+    def test_id_menor_confirmado_depois_entra_em_ordem(self):
+        banco = BancoFalso()
+        banco.inserir('1.00', id=1)
+        banco.inserir('3.00', id=3)
+        snapshot = carregado(banco)
+        banco.inserir('2.00', id=2)  # transação que pegou o id 2 antes e confirmou depois
+        snapshot.atualizar()
+        assert list(snapshot.dados[0]['id']) == [1, 2, 3]
+        assert snapshot.responder('vendas-valor-total') == [(Decimal('6.00'),)]
+
+    def test_delete_forca_recarga_completa(self):
+        banco = BancoFalso()
+        ids = [banco.inserir('10.00') for _ in range(3)]
+        snapshot = carregado(banco)
+        del banco.vendas[ids[0]]
+        snapshot.atualizar()
+        assert snapshot.responder('vendas-total') == [(2,)]
+
+    def test_volta_do_contador_de_xids_forca_recarga_completa(self):
+        banco = BancoFalso()
+        banco.inserir('10.00')
+        snapshot = carregado(banco)
+        banco.txid += 1 << 32
+        banco.inserir('5.00')
+        snapshot.atualizar()
+        assert snapshot.marca_xid == banco.txid
+        assert snapshot.responder('vendas-valor-total') == [(Decimal('15.00'),)]
+
+    def test_falha_na_atualizacao_mantem_snapshot_anterior(self):
+        banco = BancoFalso()
+        banco.inserir('10.00')
+        snapshot = carregado(banco)
+
+        def falhar():
+            raise RuntimeError('banco fora')
+        snapshot.conectar = falhar
+        with pytest.raises(RuntimeError):
+            snapshot.atualizar()
+        assert snapshot.responder('vendas-total') == [(1,)]
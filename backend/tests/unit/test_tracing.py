@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o tracing por requisição (app/tracing.py).
+"""
+
+import json
+from unittest.mock import patch
+
+from app import tracing
+
+
+class TestSpans:
+    """Testes para a árvore de spans."""
+
+    def test_arvore_de_spans(self):
+        """Spans abertos dentro do trace viram filhos do span atual."""
+        with patch('app.tracing.deve_emitir', return_value=False):
+            with tracing.iniciar_trace('POST /pergunta') as trace:
+                with tracing.span('nlp'):
+                    pass
+                with tracing.span('sql', label='vendas-lista') as sp:
+                    sp.definir(rows=3)
+                    with tracing.span('interno'):
+                        pass
+
+        nomes = [s.nome for s in trace.percorrer()]
+        assert nomes == ['POST /pergunta', 'nlp', 'sql', 'interno']
+        sql = trace.filhos[1]
+        assert sql.parent_id == trace.span_id
+        assert sql.atributos == {'label': 'vendas-lista', 'rows': 3}
+        assert sql.filhos[0].parent_id == sql.span_id
+        assert all(s.trace_id == trace.trace_id for s in trace.percorrer())
+
+    def test_span_fora_de_trace_e_nulo(self):
+        """Fora de um trace, span() não grava nada e não falha."""
+        with tracing.span('sql') as sp:
+            sp.definir(rows=1)
+        assert tracing.span_atual() is tracing._SPAN_NULO
+
+    def test_excecao_registrada_no_span(self):
+        """Exceções dentro de um span ficam registradas como atributo."""
+        with patch('app.tracing.deve_emitir', return_value=False):
+            try:
+                with tracing.iniciar_trace('raiz') as trace:
+                    with tracing.span('gemini'):
+                        raise ValueError("falha")
+            except ValueError:
+                pass
+        assert trace.filhos[0].atributos['erro'] == 'ValueError'
+
+    def test_formato_json_exportavel(self):
+        """O trace vira uma linha JSON com spans no formato de campos do OpenTelemetry."""
+        with patch('app.tracing.deve_emitir', return_value=False):
+            with tracing.iniciar_trace('raiz', rota='/pergunta') as trace:
+                with tracing.span('log'):
+                    pass
+
+        linha = trace.para_json()
+        assert '\n' not in linha
+        dados = json.loads(linha)
+        assert dados['trace_id'] == trace.trace_id
+        assert len(dados['spans']) == 2
+        raiz, log = dados['spans']
+        assert raiz['parent_span_id'] is None
+        assert log['parent_span_id'] == raiz['span_id']
+        for campo in ('name', 'start_time_unix_nano', 'duration_ms', 'attributes'):
+            assert campo in log
+
+
+class TestAmostragem:
+    """Testes para a decisão de emissão dos traces."""
+
+    def test_trace_lento_sempre_emitido(self):
+        """Traces acima do limite de lentidão são emitidos mesmo sem amostragem."""
+        trace = tracing.Trace('raiz')
+        trace.duracao_ns = 10 * 1e9
+        with patch('app.tracing.TRACE_AMOSTRAGEM', 0.0), patch('app.tracing.TRACE_LENTO_MS', 5000):
+            assert tracing.deve_emitir(trace)
+
+    def test_trace_rapido_sem_amostragem_descartado(self):
+        """Com amostragem zero, traces rápidos não são emitidos."""
+        trace = tracing.Trace('raiz')
+        trace.duracao_ns = 1e6
+        with patch('app.tracing.TRACE_AMOSTRAGEM', 0.0), patch('app.tracing.TRACE_LENTO_MS', 5000):
+            assert not tracing.deve_emitir(trace)
+
+    def test_emissao_em_arquivo(self, tmp_path):
+        """Com TRACE_ARQUIVO, cada trace é uma linha JSON no arquivo."""
+        arquivo = tmp_path / 'traces.jsonl'
+        with patch('app.tracing.TRACE_ARQUIVO', str(arquivo)), \
+             patch('app.tracing.TRACE_AMOSTRAGEM', 1.0):
+            with tracing.iniciar_trace('raiz'):
+                pass
+            with tracing.iniciar_trace('raiz'):
+                pass
+
+        linhas = arquivo.read_text(encoding='utf-8').splitlines()
+        assert len(linhas) == 2
+        assert json.loads(linhas[0])['name'] == 'raiz'
@@ -40,19 +40,14 @@ class _ChartsPageState extends State<ChartsPage> {
     });
 
     try {
-      // Carrega todos os dados em paralelo para melhor performance
-      final results = await Future.wait([
-        _apiService.buscarVendasPorMes(),
-        _apiService.buscarFuncionariosPorDepartamento(),
-        _apiService.buscarProjetosPorStatus(),
-        _apiService.buscarReceitaPorCliente(),
-      ]);
+      // Carrega todas as séries numa única requisição ao dashboard
+      final series = await _apiService.buscarDashboard();
 
       setState(() {
-        _vendasData = results[0];
-        _funcionariosData = results[1];
-        _projetosData = results[2];
-        _receitaData = results[3];
+        _vendasData = series['total_vendas_por_mes'] ?? [];
+        _funcionariosData = series['funcionarios_por_departamento'] ?? [];
+        _projetosData = series['projetos_por_status'] ?? [];
+        _receitaData = series['receita_por_cliente'] ?? [];
       });
     } catch (e) {
       _mostrarErro('Erro ao carregar dados: ${e.toString()}');
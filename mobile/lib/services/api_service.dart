@@ -54,6 +54,10 @@ class ApiService {
   static const Duration _timeout = Duration(seconds: 30);
   final http.Client _client;
   ApiService({http.Client? client}) : _client = client ?? http.Client();
+
+  // Última resposta do dashboard por URL, para revalidar com If-None-Match
+  final Map<String, String> _dashboardEtags = {};
+  final Map<String, Map<String, List<Map<String, dynamic>>>> _dashboardCache = {};
   Future<PerguntaResponse> enviarPergunta(String pergunta) async {
     if (pergunta.trim().isEmpty) {
       throw const ApiException('Pergunta não pode estar vazia');
@@ -176,6 +180,53 @@ class ApiService {
     }
   }
 
+  /// Busca todas as séries dos gráficos numa requisição só (ou apenas as de
+  /// [series]). Se o servidor responder 304, reaproveita a última resposta.
+  Future<Map<String, List<Map<String, dynamic>>>> buscarDashboard({
+    List<String>? series,
+  }) async {
+    final url = series == null || series.isEmpty
+        ? '$_baseUrl/api/dashboard'
+        : '$_baseUrl/api/dashboard?series=${series.join(',')}';
+    try {
+      final etag = _dashboardEtags[url];
+      final response = await _client
+          .get(
+            Uri.parse(url),
+            headers: {
+              'Accept': 'application/json',
+              if (etag != null && _dashboardCache.containsKey(url))
+                'If-None-Match': etag,
+            },
+          )
+          .timeout(_timeout);
+      if (response.statusCode == 304 && _dashboardCache.containsKey(url)) {
+        return _dashboardCache[url]!;
+      } else if (response.statusCode == 200) {
+        final data = jsonDecode(response.body) as Map<String, dynamic>;
+        final seriesData = (data['series'] as Map<String, dynamic>).map(
+          (nome, dados) =>
+              MapEntry(nome, List<Map<String, dynamic>>.from(dados)),
+        );
+        final novoEtag = response.headers['etag'];
+        if (novoEtag != null) {
+          _dashboardEtags[url] = novoEtag;
+          _dashboardCache[url] = seriesData;
+        }
+        return seriesData;
+      } else {
+        final data = jsonDecode(response.body);
+        throw ApiException(
+          data['error'] ?? 'Erro ao buscar dados do dashboard',
+          statusCode: response.statusCode,
+        );
+      }
+    } catch (e) {
+      if (e is ApiException) rethrow;
+      throw ApiException('Erro de conexão: ${e.toString()}');
+    }
+  }
+
   Future<bool> verificarSaude() async {
     try {
       final response = await _client